@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+"""
+Helpers shared by the historian benchmarks.
+"""
+
+import contextlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytz
+
+from volttron.platform.agent.base_historian import BatchRecord
+
+
+class Owner:
+    """Stand in for the historian that owns the BackupDatabase."""
+
+
+@contextlib.contextmanager
+def temporary_workdir():
+    """Runs the block in a fresh directory, where the backup cache is created."""
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        os.chdir(cwd)
+
+
+def fill(backupdb, rows, devices, points):
+    """Caches `rows` records as scrapes of `devices` devices with `points` points each."""
+    names = ["Point{}".format(p) for p in range(points)]
+    meta = [{"units": "F", "type": "float", "tz": "UTC"} for _ in range(points)]
+    start = datetime(2020, 1, 1, tzinfo=pytz.UTC)
+    written = 0
+    scrape = 0
+    while written < rows:
+        timestamp = start + timedelta(minutes=scrape)
+        headers = {"Date": timestamp.isoformat(), "TimeStamp": timestamp.isoformat()}
+        batches = []
+        for device in range(devices):
+            batches.append(BatchRecord('scrape', "campus/building/device{}".format(device), timestamp, headers,
+                                       names, [float(scrape)] * points, meta))
+            written += points
+            if written >= rows:
+                break
+        backupdb.backup_new_data(batches)
+        scrape += 1
+    return written
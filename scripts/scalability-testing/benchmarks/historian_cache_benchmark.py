@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+"""
+Measures fill and drain throughput of the historian backup cache.
+
+Caches `--rows` records in device sized batches, reports the size of the
+cache on disk, and then drains them the way
+the historian process loop does, reading `--submit-size` records at a time and
+removing them once "published". Each SQLite journal mode / synchronous pair,
+or "segment_log" for the segment log backend, given on the command line is
+run against a fresh cache.
+
+    python historian_cache_benchmark.py --rows 1000000 --modes DELETE:FULL WAL:NORMAL segment_log
+"""
+
+import argparse
+import os
+import time
+
+from historian_benchmark_utils import Owner, fill, temporary_workdir
+from volttron.platform.agent.base_historian import BackupDatabase, SegmentLogBackupCache
+
+
+def drain(backupdb, submit_size):
+    drained = 0
+    while True:
+        records = backupdb.get_outstanding_to_publish(submit_size)
+        if not records:
+            return drained
+        backupdb.remove_successfully_published({None}, submit_size)
+        drained += len(records)
+
+
+def run(mode, args):
+    with temporary_workdir() as workdir:
+        if mode == "segment_log":
+            backupdb = SegmentLogBackupCache(Owner(), args.storage_limit_gb, 0.9)
+        else:
+            journal_mode, _, synchronous = mode.partition(":")
+            backupdb = BackupDatabase(Owner(), args.storage_limit_gb, 0.9,
+                                      journal_mode=journal_mode, synchronous=synchronous or "NORMAL")
+        start = time.perf_counter()
+        written = fill(backupdb, args.rows, args.devices, args.points)
+        filled = time.perf_counter()
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(workdir) for name in names)
+        drained = drain(backupdb, args.submit_size)
+        done = time.perf_counter()
+        backupdb.close()
+    print("{:>12} fill: {:,.0f} rows/sec  drain: {:,.0f} rows/sec  size: {:,.1f} MB ({} rows)".format(
+        mode, written / (filled - start), drained / (done - filled), size / 1024 ** 2, drained))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--points", type=int, default=60)
+    parser.add_argument("--submit-size", type=int, default=1000)
+    parser.add_argument("--storage-limit-gb", type=float, default=None)
+    parser.add_argument("--modes", nargs="+", default=["DELETE:FULL", "WAL:NORMAL", "segment_log"],
+                        help="journal_mode:synchronous pairs or segment_log to compare")
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+"""
+Measures how fast device scrapes move through the historian event queue into
+the backup cache.
+
+The legacy path queues one dictionary per point and inserts the points into
+the cache one at a time. The batch path queues one BatchRecord per scrape and
+inserts each scrape with a single executemany.
+
+    python historian_ingest_benchmark.py --devices 4000 --points 60
+"""
+
+import argparse
+import time
+from datetime import datetime
+from queue import Queue, Empty
+
+import pytz
+
+from historian_benchmark_utils import Owner, temporary_workdir
+from volttron.platform.agent.base_historian import BackupDatabase, BatchRecord
+
+
+def build_scrape(device_index, points):
+    names = ["Point{}".format(p) for p in range(points)]
+    values = [float(p) for p in range(points)]
+    meta = [{"units": "F", "type": "float", "tz": "UTC"} for _ in range(points)]
+    return "campus/building/device{}".format(device_index), names, values, meta
+
+
+def legacy_items(timestamp, headers, device, names, values, meta):
+    return [{'source': 'scrape',
+             'topic': device + '/' + name,
+             'readings': [(timestamp, value)],
+             'meta': point_meta,
+             'headers': headers}
+            for name, value, point_meta in zip(names, values, meta)]
+
+
+def batch_items(timestamp, headers, device, names, values, meta):
+    return [BatchRecord('scrape', device, timestamp, headers, names, values, meta)]
+
+
+def run(builder, scrapes, rounds):
+    with temporary_workdir():
+        backupdb = BackupDatabase(Owner(), None, 0.9)
+        event_queue = Queue()
+        total = 0
+        start = None
+        # The first round populates the topic and metadata tables and is not timed.
+        for round_number in range(rounds + 1):
+            if round_number == 1:
+                total = 0
+                start = time.perf_counter()
+            timestamp = datetime.utcnow().replace(tzinfo=pytz.UTC)
+            headers = {"Date": timestamp.isoformat(),
+                       "TimeStamp": timestamp.isoformat(),
+                       "SynchronizedTimeStamp": timestamp.isoformat(),
+                       "min_compatible_version": "3.0",
+                       "max_compatible_version": ""}
+            for device, names, values, meta in scrapes:
+                for item in builder(timestamp, headers, device, names, values, meta):
+                    event_queue.put(item)
+                total += len(names)
+            queued = []
+            while True:
+                try:
+                    queued.append(event_queue.get_nowait())
+                except Empty:
+                    break
+            backupdb.backup_new_data(queued)
+        elapsed = time.perf_counter() - start
+        backupdb.close()
+    return total, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--points", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    scrapes = [build_scrape(d, args.points) for d in range(args.devices)]
+    for name, builder in (("per point", legacy_items), ("batch", batch_items)):
+        total, elapsed = run(builder, scrapes, args.rounds)
+        print("{:>10}: {} records in {:.2f}s, {:,.0f} records/sec".format(
+            name, total, elapsed, total / elapsed))
+
+
+if __name__ == '__main__':
+    main()
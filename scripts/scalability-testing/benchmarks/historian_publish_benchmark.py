@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""
+Measures how fast the historian process loop drains a backlog into a slow
+historian.
+
+Fills a fresh backup cache with `--rows` records and then runs the
+BaseHistorianAgent process loop against a historian whose
+publish_to_historian takes `--latency` milliseconds per batch, as a remote
+database insert would. The sequential loop reads, publishes and removes one
+batch at a time. The pipelined loop reads the next batch while the current
+one is published and removes published records in coalesced chunks.
+
+    python historian_publish_benchmark.py --rows 200000 --latency 20
+"""
+
+import argparse
+import time
+from threading import Thread
+
+from historian_benchmark_utils import Owner, fill, temporary_workdir
+from volttron.platform.agent.base_historian import BackupDatabase, BaseHistorianAgent, BatchRecord
+
+
+class SlowHistorian(BaseHistorianAgent):
+    """Historian that spends a fixed time writing each batch."""
+
+    def __init__(self, rows, latency, **kwargs):
+        super(SlowHistorian, self).__init__(**kwargs)
+        self.rows = rows
+        self.latency = latency
+        self.published = 0
+
+    def publish_to_historian(self, to_publish_list):
+        time.sleep(self.latency)
+        self.published += sum(len(item) if isinstance(item, BatchRecord) else 1
+                              for item in to_publish_list)
+        self.report_all_handled()
+        if self.published >= self.rows:
+            self._stop_process_loop = True
+
+
+def run(pipelined, args):
+    with temporary_workdir():
+        backupdb = BackupDatabase(Owner(), None, 0.9)
+        rows = fill(backupdb, args.rows, args.devices, args.points)
+        backupdb.close()
+        historian = SlowHistorian(rows, args.latency / 1000.0,
+                                  submit_size_limit=args.submit_size,
+                                  max_time_publishing=3600,
+                                  batch_publish=args.batch_publish,
+                                  pipelined_publish=pipelined)
+        start = time.perf_counter()
+        thread = Thread(target=historian._process_loop)
+        thread.start()
+        thread.join()
+        elapsed = time.perf_counter() - start
+    print("{:>10}: {:,.0f} records/sec ({} records, {:.2f}s)".format(
+        "pipelined" if pipelined else "sequential", historian.published / elapsed, historian.published, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--points", type=int, default=60)
+    parser.add_argument("--submit-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=20.0,
+                        help="milliseconds the historian spends writing each batch")
+    parser.add_argument("--batch-publish", action="store_true",
+                        help="publish BatchRecord objects rather than per point records")
+    args = parser.parse_args()
+
+    for pipelined in (False, True):
+        run(pipelined, args)
+
+
+if __name__ == '__main__':
+    main()
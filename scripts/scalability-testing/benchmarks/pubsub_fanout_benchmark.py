@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+"""
+Measures router CPU time per published device scrape fanned out to
+`--subscribers` subscribers by PubSubService.
+
+A publisher and the subscribers connect to a router over inproc sockets.
+The publisher publishes `--points` point device "all" messages which the
+router routes to PubSubService. Only the router's CPU time spent receiving,
+routing and fanning out is counted. Each mode given on the command line is
+run in turn:
+
+  per_subscriber  the message is serialized again for every subscriber, as
+                  PubSubService used to do.
+  shared          the message is serialized once and the frames are shared
+                  by all subscribers.
+
+    python pubsub_fanout_benchmark.py --subscribers 12 --points 60
+"""
+
+import argparse
+import time
+
+import zmq
+
+from volttron.platform import jsonapi
+from volttron.platform.vip.pubsubservice import PubSubService
+from volttron.platform.vip.router import BaseRouter
+
+ADDRESS = "inproc://pubsub-fanout-benchmark"
+
+
+class BenchmarkRouter(BaseRouter):
+
+    def setup(self):
+        self.socket.identity = b"router"
+        self.socket.bind(ADDRESS)
+        self.pubsub = PubSubService(self.socket, {}, None)
+
+    def handle_subsystem(self, frames, user_id):
+        if frames[5] == 'pubsub':
+            return self.pubsub.handle_subsystem(frames, user_id)
+
+
+def distribute_per_subscriber(self, frames):
+    """The fan-out loop PubSubService used before sharing serialized frames."""
+    publisher = frames[0]
+    topic = frames[7]
+    bus = frames[8]['bus']
+    subscribers = set()
+    for prefix, subscription in self._peer_subscriptions['internal'][bus].items():
+        if subscription and topic.startswith(prefix):
+            subscribers |= subscription
+    for subscriber in subscribers:
+        frames[0] = subscriber
+        for sub in self._send(frames, publisher):
+            self.peer_drop(sub)
+    return len(subscribers)
+
+
+def connect(context, router, identity):
+    sock = context.socket(zmq.DEALER)
+    sock.identity = identity
+    sock.connect(ADDRESS)
+    sock.send_multipart([b"", b"VIP1", b"", b"", b"hello"])
+    router.route(router.socket.recv_multipart(copy=False))
+    sock.recv_multipart()
+    return sock
+
+
+def run(mode, args):
+    context = zmq.Context()
+    router = BenchmarkRouter(context=context, service_notifier=None)
+    router.start()
+    if mode == "per_subscriber":
+        router.pubsub._distribute_internal = distribute_per_subscriber.__get__(router.pubsub)
+    publisher = connect(context, router, b"publisher")
+    subscribers = []
+    for index in range(args.subscribers):
+        sock = connect(context, router, "subscriber{}".format(index).encode("utf-8"))
+        sock.send_multipart([b"", b"VIP1", b"", b"", b"pubsub", b"subscribe",
+                             jsonapi.dumps({"prefix": "devices", "bus": ""}).encode("utf-8")])
+        router.route(router.socket.recv_multipart(copy=False))
+        subscribers.append(sock)
+
+    values = {"Point{}".format(point): 70.0 + point for point in range(args.points)}
+    meta = {"Point{}".format(point): {"units": "F", "type": "float", "tz": "UTC"} for point in range(args.points)}
+    message = [b"", b"VIP1", b"", b"", b"pubsub", b"publish", b"devices/campus/building/device/all",
+               jsonapi.dumps({"bus": "", "headers": {"Date": "2020-01-01T00:00:00.000000+00:00"},
+                              "message": [values, meta]}).encode("utf-8")]
+    published = 0
+    cpu = 0.0
+    while published < args.messages:
+        batch = min(args.batch, args.messages - published)
+        for _ in range(batch):
+            publisher.send_multipart(message)
+        start = time.process_time()
+        for _ in range(batch):
+            router.route(router.socket.recv_multipart(copy=False))
+        cpu += time.process_time() - start
+        for sock in subscribers:
+            for _ in range(batch):
+                sock.recv_multipart(copy=False)
+        published += batch
+
+    for sock in subscribers + [publisher]:
+        sock.close(0)
+    router.stop(0)
+    context.term()
+    print("{:>14}: {:,.1f} us router CPU per message ({} messages, {} subscribers, {} points)".format(
+        mode, cpu / published * 1e6, published, args.subscribers, args.points))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--subscribers", type=int, default=12)
+    parser.add_argument("--points", type=int, default=60)
+    parser.add_argument("--modes", nargs="+", default=["per_subscriber", "shared"],
+                        choices=["per_subscriber", "shared"])
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
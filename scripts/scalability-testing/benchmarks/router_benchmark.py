@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+"""
+Measures messages/sec routed peer to peer through BaseRouter.route.
+
+A sender and a receiver connect to a router over inproc sockets. The sender
+queues `--batch` RPC style messages, the router receives and routes them and
+the receiver drains them. Only receiving and routing is timed. Each mode
+given on the command line is run in turn:
+
+  decoded  every frame is decoded with deserialize_frames before routing and
+           re-encoded when sent, as the router used to do.
+  opaque   the received zmq.Frame objects are routed, only the envelope is
+           decoded and the payload frames are forwarded as received.
+
+    python router_benchmark.py --messages 200000 --payload-bytes 1024
+"""
+
+import argparse
+import time
+
+import zmq
+
+from volttron.platform import jsonapi
+from volttron.platform.vip.router import BaseRouter
+from volttron.utils.frame_serialization import deserialize_frames
+
+ADDRESS = "inproc://router-benchmark"
+
+
+class BenchmarkRouter(BaseRouter):
+
+    def setup(self):
+        self.socket.identity = b"router"
+        self.socket.bind(ADDRESS)
+
+
+def connect(context, identity):
+    sock = context.socket(zmq.DEALER)
+    sock.identity = identity
+    sock.connect(ADDRESS)
+    return sock
+
+
+def run(mode, args):
+    context = zmq.Context()
+    router = BenchmarkRouter(context=context, service_notifier=None)
+    router.start()
+    sender = connect(context, b"sender")
+    receiver = connect(context, b"receiver")
+    # Introduce the peers to the router.
+    for sock in (sender, receiver):
+        sock.send_multipart([b"", b"VIP1", b"", b"", b"hello"])
+        router.route(router.socket.recv_multipart(copy=False))
+        sock.recv_multipart()
+
+    params = jsonapi.dumps({"point": "x" * args.payload_bytes}).encode("utf-8")
+    message = [b"receiver", b"VIP1", b"", b"", b"RPC",
+               jsonapi.dumps({"jsonrpc": "2.0", "method": "get_point", "id": "12.345"}).encode("utf-8"), params]
+    route = router.route
+    routed = 0
+    elapsed = 0.0
+    while routed < args.messages:
+        batch = min(args.batch, args.messages - routed)
+        for _ in range(batch):
+            sender.send_multipart(message, copy=False)
+        start = time.perf_counter()
+        for _ in range(batch):
+            frames = router.socket.recv_multipart(copy=False)
+            route(deserialize_frames(frames) if mode == "decoded" else frames)
+        elapsed += time.perf_counter() - start
+        for _ in range(batch):
+            receiver.recv_multipart(copy=False)
+        routed += batch
+
+    for sock in (sender, receiver):
+        sock.close(0)
+    router.stop(0)
+    context.term()
+    print("{:>8}: {:,.0f} messages/sec ({} messages, {} byte payload)".format(
+        mode, routed / elapsed, routed, args.payload_bytes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    parser.add_argument("--modes", nargs="+", default=["decoded", "opaque"], choices=["decoded", "opaque"])
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
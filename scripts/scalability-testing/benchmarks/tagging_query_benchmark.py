@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+"""
+Measures the queries/sec a tagging service answers for `--queries` calls of
+get_topics_by_tags cycling through `--conditions` distinct query conditions.
+
+The service keeps `--topics` topics tagged in an in memory SQLite database
+and builds its queries the way the SQLiteTaggingService does. Each mode given
+on the command line is run in turn:
+
+  rebuild  builds the lexer and parser tables for every query, as
+           parse_query used to do.
+  parser   builds the parser once but parses every condition and builds
+           every SQL query again (query_cache_size 0).
+  cached   caches parsed conditions and SQL queries (the default).
+  results  also caches query results (result_cache_size 256).
+
+    python tagging_query_benchmark.py --queries 2000 --topics 2000
+"""
+
+import argparse
+import logging
+import sqlite3
+import time
+
+from volttron.platform.agent import base_tagging
+from volttron.platform.agent.base_tagging import BaseTaggingService
+from volttron.platform.dbutils.sqlitefuncts import SqlLiteFuncts
+
+CONDITIONS = [
+    "equip AND ahu AND siteRef.geoCity = 'Richland'",
+    "equip AND (ahu OR vav) AND NOT boiler",
+    "point AND equipRef.ahu AND siteRef.area > 1000",
+    "(vav OR boiler) AND siteRef.geoCity LIKE 'Rich.*'",
+    "equip AND siteRef.area >= 500 AND siteRef.area < 4000",
+    "point AND NOT equipRef.boiler",
+    "site AND geoCity = 'Seattle'",
+    "equip AND boiler AND siteRef.geoCity = 'Seattle'",
+]
+
+
+class BenchmarkTaggingService(BaseTaggingService):
+
+    def __init__(self, topics, **kwargs):
+        super(BenchmarkTaggingService, self).__init__(**kwargs)
+        self.valid_tags = {"site": "Marker", "equip": "Marker", "point": "Marker", "ahu": "Marker",
+                           "vav": "Marker", "boiler": "Marker", "geoCity": "Str", "area": "Number",
+                           "siteRef": "Ref", "equipRef": "Ref"}
+        self.tag_refs = {"siteRef": "site", "equipRef": "equip"}
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.create_function("REGEXP", 2, SqlLiteFuncts.regexp)
+        self.connection.execute("CREATE TABLE topic_tags (topic_prefix TEXT NOT NULL, "
+                                "tag STRING NOT NULL, value STRING, PRIMARY KEY (topic_prefix, tag))")
+        self.connection.executemany("INSERT INTO topic_tags VALUES (?, ?, ?)", self._topic_tags(topics))
+        self.connection.execute("CREATE INDEX idx_tag_value ON topic_tags (tag, value)")
+
+    @staticmethod
+    def _topic_tags(topics):
+        for site in range(max(topics // 50, 1)):
+            site_topic = "campus/site{}".format(site)
+            yield site_topic, "site", 1
+            yield site_topic, "geoCity", "Richland" if site % 2 else "Seattle"
+            yield site_topic, "area", site * 100
+            for equip in range(5):
+                equip_topic = "{}/equip{}".format(site_topic, equip)
+                yield equip_topic, "equip", 1
+                yield equip_topic, ("ahu", "vav", "boiler")[equip % 3], 1
+                yield equip_topic, "siteRef", site_topic
+                for point in range(9):
+                    point_topic = "{}/point{}".format(equip_topic, point)
+                    yield point_topic, "point", 1
+                    yield point_topic, "equipRef", equip_topic
+                    yield point_topic, "siteRef", site_topic
+
+    def setup(self):
+        pass
+
+    def load_valid_tags(self):
+        pass
+
+    def load_tag_refs(self):
+        pass
+
+    def query_topics_by_tags(self, ast, skip=0, count=None, order=None):
+        query = self.get_backend_query(ast, lambda tree: SqlLiteFuncts.get_tagging_query_from_ast(
+            "topic_tags", tree, self.tag_refs))
+        return [row[0] for row in self.connection.execute(query)]
+
+    def insert_topic_tags(self, tags, update_version=False):
+        pass
+
+
+def run(mode, args):
+    service = BenchmarkTaggingService(args.topics, identity="tagging.benchmark",
+                                      query_cache_size=0 if mode in ("rebuild", "parser") else 256,
+                                      result_cache_size=256 if mode == "results" else 0)
+    conditions = [CONDITIONS[index % len(CONDITIONS)] + " " * (index // len(CONDITIONS))
+                  for index in range(args.conditions)]
+    topics = 0
+
+    begin = time.perf_counter()
+    for index in range(args.queries):
+        if mode == "rebuild":
+            base_tagging._query_parser = None
+        topics += len(service.get_topics_by_tags(condition=conditions[index % len(conditions)]))
+    elapsed = time.perf_counter() - begin
+
+    print("{:>7}: {:,.0f} queries/s, {:,} topics returned, total {:.3f}s".format(
+        mode, args.queries / elapsed, topics, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--conditions", type=int, default=16)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--modes", nargs="+", default=["rebuild", "parser", "cached", "results"],
+                        choices=["rebuild", "parser", "cached", "results"])
+    args = parser.parse_args()
+
+    # The agent and ply log every query and table they build.
+    logging.getLogger().setLevel(logging.WARNING)
+    for mode in args.modes:
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+"""
+Measures the cost of scheduling, cancelling and firing `--timers` timers in
+the BasicCore scheduler.
+
+Deadlines are spread at random over `--horizon` seconds. Every timer is then
+cancelled and rescheduled `--reschedules` times, as the ActuatorAgent does
+with its update event on every reservation change, and every other timer is
+cancelled for good before the scheduler is advanced through the horizon in
+steps of `--step` seconds of simulated time. Each mode given on the command
+line is run in turn:
+
+  heap   a heap of (deadline, tie breaker, event) entries where cancelled
+         events stay queued until their deadline, as BasicCore used to do.
+  wheel  the hierarchical TimerWheel BasicCore schedules timers on.
+
+    python timer_wheel_benchmark.py --timers 100000 --reschedules 4
+"""
+
+import argparse
+import heapq
+import random
+import time
+
+from volttron.platform.vip.agent.core import ScheduledEvent, TimerWheel
+
+
+class HeapScheduler:
+    """The heap based schedule BasicCore used before the timer wheel."""
+
+    def __init__(self):
+        self.heap = []
+        self.tie_breaker = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, deadline, event):
+        self.tie_breaker += 1
+        heapq.heappush(self.heap, (deadline, self.tie_breaker, event))
+
+    def advance(self, now):
+        heap = self.heap
+        due = []
+        while heap and now >= heap[0][0]:
+            due.append(heapq.heappop(heap)[2])
+        return due
+
+
+class WheelScheduler(TimerWheel):
+
+    def schedule(self, deadline, event):
+        timer = self.add(deadline, event)
+        event._cancel_timer = lambda: self.cancel(timer)
+
+
+def run(mode, args):
+    rng = random.Random(args.seed)
+    start = 1600000000.0
+    scheduler = HeapScheduler() if mode == "heap" else WheelScheduler(start)
+    events = []
+
+    begin = time.perf_counter()
+    for _ in range(args.timers):
+        event = ScheduledEvent(lambda: None)
+        scheduler.schedule(start + rng.uniform(0, args.horizon), event)
+        events.append(event)
+    for _ in range(args.reschedules):
+        for index, event in enumerate(events):
+            event.cancel()
+            event = events[index] = ScheduledEvent(event.function)
+            scheduler.schedule(start + rng.uniform(0, args.horizon), event)
+    for event in events[::2]:
+        event.cancel()
+    scheduled = time.perf_counter() - begin
+    pending = len(scheduler)
+
+    begin = time.perf_counter()
+    fired = 0
+    now = start
+    while now <= start + args.horizon + args.step:
+        now += args.step
+        for event in scheduler.advance(now):
+            if not event.canceled:
+                event()
+                fired += 1
+    drained = time.perf_counter() - begin
+
+    operations = args.timers * (1 + 2 * args.reschedules) + len(events[::2])
+    print("{:>6}: {:,.0f} schedule/cancel ops/s, {:,} entries held for {:,} live timers, "
+          "advance {:.3f}s, total {:.3f}s".format(mode, operations / scheduled, pending, fired,
+                                                  drained, scheduled + drained))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timers", type=int, default=100000)
+    parser.add_argument("--reschedules", type=int, default=4)
+    parser.add_argument("--horizon", type=float, default=3600.0)
+    parser.add_argument("--step", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", default=["heap", "wheel"], choices=["heap", "wheel"])
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -450,6 +450,7 @@ import logging
 import sys
 
 import gevent
+from gevent.pool import Pool
 
 from actuator.scheduler import ScheduleManager
 
@@ -514,12 +515,16 @@ def actuator_agent(config_path, **kwargs):
     driver_vip_identity = config.get('driver_vip_identity', PLATFORM_DRIVER)
 
     allow_no_lock_write = bool(config.get('allow_no_lock_write', True))
+    max_concurrent_device_calls = int(config.get('max_concurrent_device_calls', 10))
+    device_call_timeout = float(config.get('device_call_timeout', 60))
 
     return ActuatorAgent(heartbeat_interval,
                          schedule_publish_interval,
                          preempt_grace_time,
                          driver_vip_identity,
                          allow_no_lock_write,
+                         max_concurrent_device_calls,
+                         device_call_timeout,
                          **kwargs)
 
 
@@ -541,11 +546,17 @@ class ActuatorAgent(Agent):
     :param preempt_grace_time: Time in seconds after a schedule is preemted
         before it is actually cancelled. 
     :param driver_vip_identity: VIP identity of the Platform Driver Agent.
+    :param max_concurrent_device_calls: Maximum number of devices called on
+        the Platform Driver at once by requests spanning several devices.
+    :param device_call_timeout: Time in seconds to wait for the Platform
+        Driver to answer for a single device of such a request.
 
     :type heartbeat_interval: float
     :type schedule_publish_interval: float
     :type preempt_grace_time: float
     :type driver_vip_identity: str
+    :type max_concurrent_device_calls: int
+    :type device_call_timeout: float
     """
 
     def __init__(self, heartbeat_interval=60,
@@ -553,6 +564,8 @@ class ActuatorAgent(Agent):
                  preempt_grace_time=60,
                  driver_vip_identity=PLATFORM_DRIVER,
                  allow_no_lock_write=True,
+                 max_concurrent_device_calls=10,
+                 device_call_timeout=60,
                  **kwargs):
 
         super(ActuatorAgent, self).__init__(**kwargs)
@@ -562,6 +575,7 @@ class ActuatorAgent(Agent):
         self._device_states = {}
 
         self.schedule_state_file = "_schedule_state"
+        self.schedule_journal_file = "_schedule_journal"
         self.heartbeat_greenlet = None
         self.heartbeat_interval = heartbeat_interval
         self._schedule_manager = None
@@ -570,12 +584,16 @@ class ActuatorAgent(Agent):
         #Only turn this on once we have confirmation from the config store.
         self.allow_no_lock_write = False
         self._update_event_time = None
+        self.max_concurrent_device_calls = max_concurrent_device_calls
+        self.device_call_timeout = device_call_timeout
 
         self.default_config = {"heartbeat_interval": heartbeat_interval,
                               "schedule_publish_interval": schedule_publish_interval,
                               "preempt_grace_time": preempt_grace_time,
                               "driver_vip_identity": driver_vip_identity,
-                               "allow_no_lock_write": allow_no_lock_write}
+                               "allow_no_lock_write": allow_no_lock_write,
+                               "max_concurrent_device_calls": max_concurrent_device_calls,
+                               "device_call_timeout": device_call_timeout}
 
 
         self.vip.config.set_default("config", self.default_config)
@@ -594,6 +612,10 @@ class ActuatorAgent(Agent):
             heartbeat_interval = float(config["heartbeat_interval"])
             preempt_grace_time = float(config["preempt_grace_time"])
             allow_no_lock_write = bool(config["allow_no_lock_write"])
+            max_concurrent_device_calls = int(config["max_concurrent_device_calls"])
+            device_call_timeout = float(config["device_call_timeout"])
+            if max_concurrent_device_calls < 1:
+                raise ValueError("max_concurrent_device_calls must be at least 1")
         except ValueError as e:
             _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
             #TODO: set a health status for the agent
@@ -602,6 +624,8 @@ class ActuatorAgent(Agent):
         self.driver_vip_identity = driver_vip_identity
         self.schedule_publish_interval = schedule_publish_interval
         self.allow_no_lock_write = allow_no_lock_write
+        self.max_concurrent_device_calls = max_concurrent_device_calls
+        self.device_call_timeout = device_call_timeout
 
         _log.debug("PlatformDriver VIP IDENTITY: {}".format(self.driver_vip_identity))
         _log.debug("Schedule publish interval: {}".format(self.schedule_publish_interval))
@@ -625,7 +649,11 @@ class ActuatorAgent(Agent):
                 state_string = self.vip.config.get(self.schedule_state_file)
             except KeyError:
                 state_string = None
-            self._setup_schedule(preempt_grace_time, state_string)
+            try:
+                journal_string = self.vip.config.get(self.schedule_journal_file)
+            except KeyError:
+                journal_string = None
+            self._setup_schedule(preempt_grace_time, state_string, journal_string)
         else:
             self._schedule_manager.set_grace_period(preempt_grace_time)
 
@@ -670,14 +698,20 @@ class ActuatorAgent(Agent):
         _log.debug("Saving schedule state")
         self.vip.config.set(self.schedule_state_file, state_file_contents, send_update=False)
 
+    def _schedule_journal_callback(self, journal_file_contents):
+        _log.debug("Saving schedule journal")
+        self.vip.config.set(self.schedule_journal_file, journal_file_contents, send_update=False)
 
-    def _setup_schedule(self, preempt_grace_time, initial_state=None):
+
+    def _setup_schedule(self, preempt_grace_time, initial_state=None, initial_journal=None):
         now = utils.get_aware_utc_now()
         self._schedule_manager = ScheduleManager(
             preempt_grace_time,
             now=now,
             save_state_callback=self._schedule_save_callback,
-            initial_state_string=initial_state)
+            initial_state_string=initial_state,
+            save_journal_callback=self._schedule_journal_callback,
+            initial_journal_string=initial_journal)
 
         self._update_device_state_and_schedule(now)
 
@@ -976,7 +1010,10 @@ class ActuatorAgent(Agent):
         """RPC method
 
         Get multiple points on multiple devices. Makes a single
-        RPC call to the platform driver per device.
+        RPC call to the platform driver per device, calling up to
+        max_concurrent_device_calls devices at once. Points of a device
+        that fails or does not answer within device_call_timeout are
+        returned as errors.
 
         :param topics: List of topics or list of [device, point] pairs.
         :param \*\*kwargs: Any driver specific parameters
@@ -1004,14 +1041,15 @@ class ActuatorAgent(Agent):
                 e = ValueError("Invalid topic: {}".format(topic))
                 errors[repr(topic)] = repr(e)
 
-        for device, point_names in devices.items():
-            r, e = self.vip.rpc.call(self.driver_vip_identity,
-                                     'get_multiple_points',
-                                     device,
-                                     point_names,
-                                     **kwargs).get()
-            results.update(r)
-            errors.update(e)
+        replies = self._call_devices('get_multiple_points', devices, **kwargs)
+        for device, (success, reply) in replies.items():
+            if success:
+                r, e = reply
+                results.update(r)
+                errors.update(e)
+            else:
+                for point_name in devices[device]:
+                    errors[device + '/' + point_name] = repr(reply)
 
         return results, errors
 
@@ -1020,7 +1058,10 @@ class ActuatorAgent(Agent):
         """RPC method
 
         Set multiple points on multiple devices. Makes a single
-        RPC call to the platform driver per device.
+        RPC call to the platform driver per device, calling up to
+        max_concurrent_device_calls devices at once. Points of a device
+        that fails or does not answer within device_call_timeout are
+        returned with the error.
 
         :param requester_id: Ignored, VIP Identity used internally
         :param topics_values: List of (topic, value) tuples
@@ -1053,15 +1094,40 @@ class ActuatorAgent(Agent):
             if not self._check_lock(device, requester_id):
                 raise LockError("caller ({}) does not lock for device {}".format(requester_id, device))
 
-        for device, point_names_values in devices.items():
-            r = self.vip.rpc.call(self.driver_vip_identity,
-                                  'set_multiple_points',
-                                  device,
-                                  point_names_values,
-                                  **kwargs).get()
-            results.update(r)
+        replies = self._call_devices('set_multiple_points', devices, **kwargs)
+        for device, (success, reply) in replies.items():
+            if success:
+                results.update(reply)
+            else:
+                for point_name, _ in devices[device]:
+                    results[device + '/' + point_name] = repr(reply)
 
         return results
+
+    def _call_devices(self, method, device_args, **kwargs):
+        """Calls method on the platform driver once per device, for up to
+        max_concurrent_device_calls devices at once.
+
+        :param method: Platform driver RPC method taking the device path
+                       as first argument
+        :param device_args: Dictionary of device paths to the argument
+                            following the path or None for no argument
+        :returns: Dictionary of device paths to a (success, value) tuple
+                  where value is the reply or the exception raised
+        """
+        def call(device, arg):
+            args = (device,) if arg is None else (device, arg)
+            try:
+                return True, self.vip.rpc.call(self.driver_vip_identity, method, *args,
+                                               **kwargs).get(timeout=self.device_call_timeout)
+            except (Exception, gevent.Timeout) as e:
+                _log.debug("{} failed for {}: {!r}".format(method, device, e))
+                return False, e
+
+        pool = Pool(self.max_concurrent_device_calls)
+        greenlets = {device: pool.spawn(call, device, arg) for device, arg in device_args.items()}
+        pool.join()
+        return {device: greenlet.value for device, greenlet in greenlets.items()}
     
     def handle_revert_point(self, peer, sender, bus, topic, headers, message):
         """
@@ -1222,6 +1288,47 @@ class ActuatorAgent(Agent):
         else:
             raise LockError("caller does not have this lock")
 
+    @RPC.export
+    def revert_multiple_devices(self, requester_id, topics, **kwargs):
+        """
+        RPC method
+
+        Reverts all points on multiple devices to a default state. Makes
+        a single RPC call to the platform driver per device, calling up to
+        max_concurrent_device_calls devices at once.
+        Requires all devices be scheduled by the calling agent.
+
+        :param requester_id: Ignored, VIP Identity used internally
+        :param topics: List of topics of the devices to revert
+        :param \*\*kwargs: Any driver specific parameters
+        :type topics: list
+        :type requester_id: str
+
+        :returns: Dictionary of devices to exceptions raised.
+                  If all devices were reverted successfully an empty
+                  dictionary will be returned.
+
+        .. warning:: calling without previously scheduling *all* devices
+                     and not within the time allotted will raise a LockError
+        """
+        rpc_peer = self.vip.rpc.context.vip_message.peer
+        devices = {topic.strip('/'): None for topic in topics}
+
+        for device in devices:
+            if not self._check_lock(device, rpc_peer):
+                raise LockError("caller ({}) does not lock for device {}".format(rpc_peer, device))
+
+        errors = {}
+        headers = self._get_headers(rpc_peer)
+        for device, (success, reply) in self._call_devices('revert_device', devices, **kwargs).items():
+            if success:
+                self._push_result_topic_pair(REVERT_DEVICE_RESPONSE_PREFIX,
+                                             device, headers, None)
+            else:
+                errors[device] = repr(reply)
+
+        return errors
+
     def _check_lock(self, device, requester):
         _log.debug('_check_lock: {device}, {requester}'.format(
             device=device,
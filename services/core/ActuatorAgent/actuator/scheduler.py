@@ -38,7 +38,9 @@
 
 
 import bisect
+import heapq
 import logging
+from base64 import b64decode, b64encode
 from pickle import dumps, loads
 from collections import defaultdict, namedtuple
 from copy import deepcopy
@@ -323,40 +325,240 @@ class Schedule:
         pass
 
 
+class DeviceSlotIndex:
+    """Time slots reserved on a single device by all tasks, sorted by start.
+
+    Slots of different tasks only overlap during the grace period of a
+    preempted task so the longest slot on the device bounds how far back
+    from the end of a query a conflicting slot may start."""
+
+    def __init__(self):
+        self._starts = []
+        self._slots = []
+        self._max_length = timedelta(0)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def add(self, start, end, task_id):
+        index = bisect.bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._slots.insert(index, (start, end, task_id))
+        self._max_length = max(self._max_length, end - start)
+
+    def remove(self, start, end, task_id):
+        index = bisect.bisect_left(self._starts, start)
+        while self._slots[index] != (start, end, task_id):
+            index += 1
+        del self._starts[index]
+        del self._slots[index]
+        if not self._slots:
+            self._max_length = timedelta(0)
+
+    def get_conflicts(self, time_slot, now):
+        """Returns the (start, end, task_id) slots overlapping time_slot
+        that have not ended by now."""
+        low = bisect.bisect_right(self._starts, time_slot.start - self._max_length)
+        high = bisect.bisect_left(self._starts, time_slot.end)
+        return [slot for slot in self._slots[low:high]
+                if slot[1] > time_slot.start and slot[1] > now]
+
+
+def _round_event_time(event_time):
+    # Round to the next second to fix timer goofyness in agent timers.
+    if event_time.microsecond:
+        event_time = event_time.replace(microsecond=0) + timedelta(seconds=1)
+    return event_time
+
+
+def _encode_state(state):
+    return b64encode(dumps(state)).decode('ascii')
+
+
+def _decode_state(state_string):
+    if isinstance(state_string, str):
+        state_string = b64decode(state_string)
+    return loads(state_string)
+
+
 class ScheduleManager:
-    def __init__(self, grace_time, now=None, save_state_callback=None, initial_state_string=None):
+    """Manages the tasks scheduled on devices.
+
+    Reserved slots are indexed per device to find conflicts and all slot
+    and task boundaries are kept in heaps so only the tasks reaching a
+    boundary are brought up to date as time passes.
+
+    If save_journal_callback is given every successful request and
+    cancellation is appended to a journal passed to it and the snapshot
+    of all tasks given to save_state_callback is only rewritten once
+    journal_limit changes have accumulated."""
+
+    def __init__(self, grace_time, now=None, save_state_callback=None, initial_state_string=None,
+                 save_journal_callback=None, initial_journal_string=None, journal_limit=100):
         self.tasks = {}
         self.running_tasks = set()
         self.preempted_tasks = set()
         self.set_grace_period(grace_time)
         self.save_state_callback = save_state_callback
+        self.save_journal_callback = save_journal_callback
+        self.journal_limit = journal_limit
+        self._journal = []
+        self._journal_sequence = 0
+        self._replaying = False
+        self._device_slots = defaultdict(DeviceSlotIndex)
+        # task_id -> (generation, [(device, start, end)]) of the indexed slots
+        self._indexed_tasks = {}
+        self._generation = 0
+        # (time, generation, task_id) of slot and task boundaries
+        self._slot_events = []
+        self._task_events = []
+        self._stale_events = 0
+        self._dirty_tasks = set()
         if now is None:
             now = utils.get_aware_utc_now()
-        self.load_state(now, initial_state_string)
+        self.load_state(now, initial_state_string, initial_journal_string)
 
     def set_grace_period(self, seconds):
         self.grace_time = timedelta(seconds=seconds)
 
-    def load_state(self, now, initial_state_string):
-        if initial_state_string is None:
-            return
+    def load_state(self, now, initial_state_string, initial_journal_string=None):
+        if initial_state_string is not None:
+            try:
+                state = _decode_state(initial_state_string)
+                # States saved before journaling are a dictionary of tasks.
+                if isinstance(state, dict):
+                    state = (0, state)
+                self._journal_sequence, tasks = state
+                for task_id, task in tasks.items():
+                    self._add_task(task_id, task)
+            except Exception:
+                self._reset()
+                _log.error('Scheduler state file corrupted!')
+
+        if initial_journal_string is not None:
+            try:
+                journal = _decode_state(initial_journal_string)
+            except Exception:
+                journal = []
+                _log.error('Scheduler journal corrupted!')
+            self._replay(journal)
 
+        self._cleanup(now)
+
+    def _reset(self):
+        self.tasks = {}
+        self.running_tasks = set()
+        self.preempted_tasks = set()
+        self._device_slots.clear()
+        self._indexed_tasks = {}
+        self._slot_events = []
+        self._task_events = []
+        self._stale_events = 0
+        self._dirty_tasks = set()
+
+    def _replay(self, journal):
+        self._replaying = True
         try:
-            self.tasks = loads(initial_state_string)
-            self._cleanup(now)
-        except Exception:
-            self.tasks = {}
-            _log.error ('Scheduler state file corrupted!')
+            for record in journal:
+                if record[0] <= self._journal_sequence:
+                    continue
+                sequence, action = record[:2]
+                if action == 'request':
+                    agent_id, task_id, requests, priority, now = record[2:]
+                    self.request_slots(agent_id, task_id, requests, priority, now)
+                elif action == 'cancel':
+                    agent_id, task_id, now = record[2:]
+                    self.cancel_task(agent_id, task_id, now)
+                self._journal_sequence = sequence
+                self._journal.append(record)
+        finally:
+            self._replaying = False
 
     def save_state(self, now):
+        """Saves a snapshot of all tasks, returns True on success."""
         if self.save_state_callback is None:
-            return
+            return False
 
         try:
             self._cleanup(now)
-            self.save_state_callback(dumps(self.tasks))
+            self.save_state_callback(_encode_state((self._journal_sequence, self.tasks)))
+            return True
         except Exception:
             _log.error('Failed to save scheduler state!')
+            return False
+
+    def _save_change(self, now, action, *args):
+        if self._replaying:
+            return
+        if self.save_journal_callback is None:
+            self.save_state(now)
+            return
+
+        self._journal_sequence += 1
+        self._journal.append((self._journal_sequence, action) + args)
+        if len(self._journal) >= self.journal_limit and self.save_state(now):
+            self._journal = []
+
+        try:
+            self.save_journal_callback(_encode_state(self._journal))
+        except Exception:
+            _log.error('Failed to save scheduler journal!')
+
+    def _add_task(self, task_id, task):
+        self.tasks[task_id] = task
+        self._index_task(task_id, task)
+        self._dirty_tasks.add(task_id)
+
+    def _remove_task(self, task_id):
+        del self.tasks[task_id]
+        self._unindex_task(task_id)
+        self.running_tasks.discard(task_id)
+        self.preempted_tasks.discard(task_id)
+
+    def _index_task(self, task_id, task):
+        self._unindex_task(task_id)
+        self._generation += 1
+        slots = []
+        for device, schedule in task.devices.items():
+            for time_slot in schedule.time_slots:
+                self._device_slots[device].add(time_slot.start, time_slot.end, task_id)
+                slots.append((device, time_slot.start, time_slot.end))
+                heapq.heappush(self._slot_events, (time_slot.start, self._generation, task_id))
+                heapq.heappush(self._slot_events, (time_slot.end, self._generation, task_id))
+        if task.time_slice.start is not None:
+            heapq.heappush(self._task_events, (task.time_slice.start, self._generation, task_id))
+            heapq.heappush(self._task_events, (task.time_slice.end, self._generation, task_id))
+        self._indexed_tasks[task_id] = (self._generation, slots)
+
+    def _unindex_task(self, task_id):
+        if task_id not in self._indexed_tasks:
+            return
+        _, slots = self._indexed_tasks.pop(task_id)
+        self._stale_events += 2 * len(slots) + 2
+        for device, start, end in slots:
+            device_slots = self._device_slots[device]
+            device_slots.remove(start, end, task_id)
+            if not device_slots:
+                del self._device_slots[device]
+
+    def _is_current(self, event):
+        indexed = self._indexed_tasks.get(event[2])
+        return indexed is not None and indexed[0] == event[1]
+
+    def _get_conflicts(self, new_task, now):
+        """Returns a dictionary of task ids to the slots of the task
+        conflicting with new_task in the format of Task.get_conflicts."""
+        conflicts = defaultdict(list)
+        for device, schedule in new_task.devices.items():
+            device_slots = self._device_slots.get(device)
+            if device_slots is None:
+                continue
+            found = set()
+            for time_slot in schedule.time_slots:
+                found.update(device_slots.get_conflicts(time_slot, now))
+            for start, end, task_id in sorted(found):
+                conflicts[task_id].append([device, str(start), str(end)])
+        return conflicts
 
     def request_slots(self, agent_id, id_, requests, priority, now=None):
         if now is None:
@@ -401,14 +603,12 @@ class ScheduleManager:
         conflicts = defaultdict(dict)
         preempted_tasks = set()
 
-        for task_id, task in self.tasks.items():
-            conflict_list = new_task.get_conflicts(task)
-            agent_id = task.agent_id
-            if conflict_list:
-                if not new_task.check_can_preempt_other(task):
-                    conflicts[agent_id][task_id] = conflict_list
-                else:
-                    preempted_tasks.add((agent_id, task_id))
+        for task_id, conflict_list in self._get_conflicts(new_task, now).items():
+            task = self.tasks[task_id]
+            if not new_task.check_can_preempt_other(task):
+                conflicts[task.agent_id][task_id] = conflict_list
+            else:
+                preempted_tasks.add((task.agent_id, task_id))
 
         if conflicts:
             return RequestResult(False, conflicts,
@@ -417,13 +617,15 @@ class ScheduleManager:
             # By this point we know that any remaining conflicts can be
             # preempted
         # and the request will succeed.
-        self.tasks[id_] = new_task
+        self._add_task(id_, new_task)
 
         for _, task_id in preempted_tasks:
             task = self.tasks[task_id]
             task.preempt(self.grace_time, now)
+            self._index_task(task_id, task)
+            self._dirty_tasks.add(task_id)
 
-        self.save_state(now)
+        self._save_change(now, 'request', agent_id, id_, requests, priority, now)
 
         return RequestResult(True, preempted_tasks, '')
 
@@ -436,9 +638,9 @@ class ScheduleManager:
         if task.agent_id != agent_id:
             return RequestResult(False, {}, 'AGENT_ID_TASK_ID_MISMATCH')
 
-        del self.tasks[task_id]
+        self._remove_task(task_id)
 
-        self.save_state(now)
+        self._save_change(now, 'cancel', agent_id, task_id, now)
 
         return RequestResult(True, {}, '')
 
@@ -469,16 +671,20 @@ class ScheduleManager:
         return running_results
 
     def get_next_event_time(self, now):
-        task_times = (x.get_next_event_time(now) for x in self.tasks.values())
-        events = [x for x in task_times if x is not None]
+        """Returns the next time a slot starts or ends after now."""
+        events = self._slot_events
+        while events and (events[0][0] <= now or not self._is_current(events[0])):
+            heapq.heappop(events)
 
         if events:
-            return min(events)
+            return _round_event_time(events[0][0])
 
         return None
 
     def _cleanup(self, now):
         """Cleans up self and contained tasks to reflect the current time.
+        Only tasks that reached the start or end of their time slice since
+        the last clean up or were changed by a request are updated.
         Should be called:
         1. Before serializing to disk.
         2. After reading from disk.
@@ -486,15 +692,23 @@ class ScheduleManager:
         4. After handling a schedule submission request.
         5. Before handling a state request."""
 
-        # Reset the running tasks.
-        self.running_tasks = set()
-        self.preempted_tasks = set()
-
-        for task_id in list(self.tasks.keys()):
-            task = self.tasks[task_id]
+        due_tasks = self._dirty_tasks
+        self._dirty_tasks = set()
+        events = self._task_events
+        while events and events[0][0] <= now:
+            event = heapq.heappop(events)
+            if self._is_current(event):
+                due_tasks.add(event[2])
+
+        for task_id in due_tasks:
+            task = self.tasks.get(task_id)
+            if task is None:
+                continue
             task.make_current(now)
+            self.running_tasks.discard(task_id)
+            self.preempted_tasks.discard(task_id)
             if task.state == Task.STATE_FINISHED:
-                del self.tasks[task_id]
+                self._remove_task(task_id)
 
             elif task.state == Task.STATE_RUNNING:
                 self.running_tasks.add(task_id)
@@ -502,5 +716,13 @@ class ScheduleManager:
             elif task.state == Task.STATE_PREEMPTED:
                 self.preempted_tasks.add(task_id)
 
+        # Drop events of cancelled and preempted tasks once they pile up.
+        if self._stale_events > 64 and \
+                2 * self._stale_events > len(self._slot_events) + len(self._task_events):
+            for events in (self._slot_events, self._task_events):
+                events[:] = [event for event in events if self._is_current(event)]
+                heapq.heapify(events)
+            self._stale_events = 0
+
     def __repr__(self):
         pass
@@ -0,0 +1,113 @@
+"""
+Unit tests for the per device fan-out of the actuator agent's multiple point RPC methods.
+"""
+
+import gevent
+import pytest
+from gevent.event import AsyncResult
+from mock import MagicMock
+
+from actuator.agent import ActuatorAgent, LockError
+
+
+class FakeDriver:
+    """Answers platform driver RPC calls after delay seconds per device."""
+
+    def __init__(self, delays=None, failures=None):
+        self.delays = delays or {}
+        self.failures = failures or {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def call(self, peer, method, device, *args, **kwargs):
+        self.calls.append((method, device))
+        result = AsyncResult()
+        gevent.spawn(self._answer, result, method, device, *args)
+        return result
+
+    def _answer(self, result, method, device, *args):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        gevent.sleep(self.delays.get(device, 0.01))
+        self.in_flight -= 1
+        if device in self.failures:
+            result.set_exception(self.failures[device])
+        elif method == 'get_multiple_points':
+            result.set(({device + '/' + point: 1 for point in args[0]}, {}))
+        elif method == 'set_multiple_points':
+            result.set({})
+        else:
+            result.set(None)
+
+
+def make_actuator(driver, max_concurrent_device_calls=10, device_call_timeout=60, locked=True):
+    actuator = ActuatorAgent(max_concurrent_device_calls=max_concurrent_device_calls,
+                             device_call_timeout=device_call_timeout)
+    actuator.driver_vip_identity = 'platform.driver'
+    actuator.vip = MagicMock()
+    actuator.vip.rpc.call.side_effect = driver.call
+    actuator.vip.rpc.context.vip_message.peer = 'requester'
+    actuator._check_lock = MagicMock(return_value=locked)
+    return actuator
+
+
+@pytest.mark.actuator
+def test_get_multiple_points_should_call_devices_concurrently():
+    driver = FakeDriver()
+    actuator = make_actuator(driver, max_concurrent_device_calls=3)
+    topics = ['device{}/point{}'.format(device, point) for device in range(8) for point in range(5)]
+
+    results, errors = actuator.get_multiple_points(topics)
+
+    assert errors == {}
+    assert results == {topic: 1 for topic in topics}
+    assert len(driver.calls) == 8
+    assert driver.max_in_flight == 3
+
+
+@pytest.mark.actuator
+def test_get_multiple_points_should_merge_partial_results():
+    driver = FakeDriver(delays={'slow': 1.0}, failures={'broken': KeyError('broken')})
+    actuator = make_actuator(driver, device_call_timeout=0.2)
+
+    results, errors = actuator.get_multiple_points(['ok/a', ['slow', 'b'], 'broken/c', 'broken/d', ['invalid']])
+
+    assert results == {'ok/a': 1}
+    assert set(errors) == {'slow/b', 'broken/c', 'broken/d', repr(['invalid'])}
+    assert 'Timeout' in errors['slow/b']
+    assert errors['broken/c'] == repr(KeyError('broken'))
+
+
+@pytest.mark.actuator
+def test_set_multiple_points_should_report_failed_devices():
+    driver = FakeDriver(failures={'broken': ValueError('bad value')})
+    actuator = make_actuator(driver, max_concurrent_device_calls=1)
+
+    results = actuator.set_multiple_points('ignored', [('ok/a', 1), ('broken/b', 2), ('broken/c', 3)])
+
+    assert results == {'broken/b': repr(ValueError('bad value')), 'broken/c': repr(ValueError('bad value'))}
+    assert driver.max_in_flight == 1
+
+
+@pytest.mark.actuator
+def test_revert_multiple_devices_should_revert_each_device():
+    driver = FakeDriver(failures={'broken': KeyError('broken')})
+    actuator = make_actuator(driver)
+
+    errors = actuator.revert_multiple_devices('ignored', ['ok', '/other/', 'broken'])
+
+    assert errors == {'broken': repr(KeyError('broken'))}
+    assert sorted(driver.calls) == [('revert_device', 'broken'), ('revert_device', 'ok'),
+                                    ('revert_device', 'other')]
+    assert actuator.vip.pubsub.publish.call_count == 2
+
+
+@pytest.mark.actuator
+def test_revert_multiple_devices_should_require_lock():
+    driver = FakeDriver()
+    actuator = make_actuator(driver, locked=False)
+
+    with pytest.raises(LockError):
+        actuator.revert_multiple_devices('ignored', ['ok'])
+    assert driver.calls == []
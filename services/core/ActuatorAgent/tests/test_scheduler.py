@@ -38,7 +38,9 @@
 
 import os
 import sys
+from base64 import b64decode
 from datetime import datetime, timedelta
+from pickle import dumps, loads
 from dateutil.parser import parse
 
 test_dir = os.path.dirname(os.path.realpath(__file__))
@@ -377,3 +379,104 @@ def test_conflict_override_success_running_agent2():
     assert data2 == {('Agent1', 'Task1')}
     assert info_string2 == ''
     assert event_time2 == parse('2013-11-27 12:26:00')
+
+
+def test_conflicts_among_many_tasks():
+    print('Test conflicting requests among many tasks', now)
+    sch_man = ScheduleManager(60, now=now)
+    start = parse('2013-11-27 12:00:00')
+    for index in range(200):
+        device = 'campus/building/rtu{}'.format(index % 20)
+        slot_start = start + timedelta(minutes=30 * (index // 20))
+        result = sch_man.request_slots('Agent1', 'Task{}'.format(index),
+                                       ([device, slot_start, slot_start + timedelta(minutes=30)],),
+                                       PRIORITY_HIGH, now)
+        assert result.success
+
+    result = sch_man.request_slots('Agent2', 'Conflict',
+                                   (['campus/building/rtu3', parse('2013-11-27 12:45:00'),
+                                     parse('2013-11-27 13:15:00')],
+                                    ['campus/building/rtu99', parse('2013-11-27 12:45:00'),
+                                     parse('2013-11-27 13:15:00')]),
+                                   PRIORITY_HIGH, now)
+    assert not result.success
+    assert result.data == {'Agent1': {
+        'Task23': [['campus/building/rtu3', '2013-11-27 12:30:00', '2013-11-27 13:00:00']],
+        'Task43': [['campus/building/rtu3', '2013-11-27 13:00:00', '2013-11-27 13:30:00']]}}
+
+    assert sch_man.cancel_task('Agent1', 'Task23', now).success
+    assert sch_man.cancel_task('Agent1', 'Task43', now).success
+    assert sch_man.request_slots('Agent2', 'Conflict',
+                                 (['campus/building/rtu3', parse('2013-11-27 12:45:00'),
+                                   parse('2013-11-27 13:15:00')],),
+                                 PRIORITY_HIGH, now).success
+    assert sch_man.get_next_event_time(now) == start
+    assert sch_man.get_next_event_time(parse('2013-11-27 12:40:00')) == parse('2013-11-27 12:45:00')
+
+
+def test_finished_slots_do_not_conflict():
+    print('Test requests for slots that ended before now', now)
+    sch_man = ScheduleManager(60, now=now)
+    ag1 = ('Agent1', 'Task1',
+           (['campus/building/rtu1', parse('2013-11-27 12:00:00'), parse('2013-11-27 12:30:00')],
+            ['campus/building/rtu1', parse('2013-11-27 13:00:00'), parse('2013-11-27 13:30:00')]),
+           PRIORITY_HIGH,
+           now)
+    result1, event_time1 = verify_add_task(sch_man, *ag1)
+    assert result1.success
+
+    now2 = parse('2013-11-27 12:40:00')
+    result2 = sch_man.request_slots('Agent2', 'Task2',
+                                    (['campus/building/rtu1', parse('2013-11-27 12:00:00'),
+                                      parse('2013-11-27 12:45:00')],),
+                                    PRIORITY_HIGH, now2)
+    assert result2.success
+    assert sch_man.get_next_event_time(now2) == parse('2013-11-27 12:45:00')
+
+
+def test_state_restored_from_journal():
+    print('Test restoring the schedule from a snapshot and journal', now)
+    saved = {}
+
+    def save_state(state):
+        saved['state'] = state
+
+    def save_journal(journal):
+        saved['journal'] = journal
+
+    sch_man = ScheduleManager(60, now=now, save_state_callback=save_state,
+                              save_journal_callback=save_journal, journal_limit=4)
+    for index in range(4):
+        assert sch_man.request_slots('Agent1', 'Task{}'.format(index),
+                                     (['campus/building/rtu{}'.format(index), parse('2013-11-27 12:00:00'),
+                                       parse('2013-11-27 13:00:00')],),
+                                     PRIORITY_LOW, now).success
+    assert sch_man.cancel_task('Agent1', 'Task0', now).success
+    assert sch_man.request_slots('Agent2', 'Task4',
+                                 (['campus/building/rtu1', parse('2013-11-27 12:30:00'),
+                                   parse('2013-11-27 13:00:00')],),
+                                 PRIORITY_HIGH, now).success
+
+    # The snapshot was taken after the fourth change, the journal holds the rest.
+    assert len(loads(b64decode(saved['journal']))) == 2
+    restored = ScheduleManager(60, now=now, initial_state_string=saved['state'],
+                               initial_journal_string=saved['journal'])
+
+    later = now + timedelta(minutes=45)
+    assert set(restored.tasks) == {'Task2', 'Task3', 'Task4'}
+    assert restored.get_schedule_state(later) == sch_man.get_schedule_state(later)
+    assert restored.get_next_event_time(later) == sch_man.get_next_event_time(later)
+
+
+def test_state_restored_from_full_snapshot():
+    print('Test restoring the schedule saved as a pickled dictionary of tasks', now)
+    sch_man = ScheduleManager(60, now=now)
+    assert sch_man.request_slots('Agent1', 'Task1',
+                                 (['campus/building/rtu1', parse('2013-11-27 12:00:00'),
+                                   parse('2013-11-27 13:00:00')],),
+                                 PRIORITY_HIGH, now).success
+
+    restored = ScheduleManager(60, now=now, initial_state_string=dumps(sch_man.tasks))
+
+    state = restored.get_schedule_state(now + timedelta(minutes=60))
+    assert state == {'campus/building/rtu1': DeviceState('Agent1', 'Task1', 1800.0)}
@@ -37,6 +37,7 @@
 # }}}
 
 import collections
+import copy
 import csv
 import logging
 import sys
@@ -488,10 +489,10 @@ class MongodbTaggingService(BaseTaggingService):
         order_by = 1
         if order == 'LAST_TO_FIRST':
             order_by = -1
-        sub_queries = list()
-        find_cond = mongoutils.get_tagging_queries_from_ast(ast,
-                                                            self.tag_refs,
-                                                            sub_queries)
+        # Sub query results are filled into the main condition, so work on
+        # a copy of the cached queries.
+        find_cond, sub_queries = copy.deepcopy(
+            self.get_backend_query(ast, self._build_tagging_queries))
 
         _log.debug("main query condition: {}".format(find_cond))
         _log.debug("sub queries: {}".format(sub_queries))
@@ -517,6 +518,13 @@ class MongodbTaggingService(BaseTaggingService):
         cursor.close()
         return topic_prefix
 
+    def _build_tagging_queries(self, ast):
+        sub_queries = list()
+        find_cond = mongoutils.get_tagging_queries_from_ast(ast,
+                                                            self.tag_refs,
+                                                            sub_queries)
+        return find_cond, sub_queries
+
     def _find_replace(self, obj, temp_value, new_value):
         # Utility function used to replace sub query place holders with
         # results of the sub query since mongo does not support nested queries
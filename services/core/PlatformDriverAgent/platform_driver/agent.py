@@ -40,11 +40,12 @@ import logging
 import sys
 import gevent
 from collections import defaultdict
-from volttron.platform.vip.agent import Agent, RPC
+from volttron.platform.vip.agent import Agent, Core, RPC
 from volttron.platform.agent import utils
 from volttron.platform.agent import math_utils
 from volttron.platform.agent.known_identities import PLATFORM_DRIVER
 from .driver import DriverAgent
+from .scrape_scheduler import ScrapeScheduler
 import resource
 from datetime import datetime, timedelta
 import bisect
@@ -116,6 +117,11 @@ def platform_driver_agent(config_path, **kwargs):
 
     group_offset_interval = get_config("group_offset_interval", 0.0)
 
+    max_concurrent_scrapes_per_driver_type = get_config("max_concurrent_scrapes_per_driver_type", 0)
+    max_concurrent_scrapes_per_host = get_config("max_concurrent_scrapes_per_host", 0)
+    adaptive_scrape_offsets = get_config("adaptive_scrape_offsets", True)
+    scrape_jitter = get_config("scrape_jitter", 0.0)
+
     return PlatformDriverAgent(driver_config_list, scalability_test,
                              scalability_test_iterations,
                              driver_scrape_interval,
@@ -127,6 +133,10 @@ def platform_driver_agent(config_path, **kwargs):
                              publish_breadth_first_all,
                              publish_depth_first,
                              publish_breadth_first,
+                             max_concurrent_scrapes_per_driver_type,
+                             max_concurrent_scrapes_per_host,
+                             adaptive_scrape_offsets,
+                             scrape_jitter,
                              heartbeat_autostart=True, **kwargs)
 
 
@@ -142,6 +152,10 @@ class PlatformDriverAgent(Agent):
                  publish_breadth_first_all=False,
                  publish_depth_first=False,
                  publish_breadth_first=False,
+                 max_concurrent_scrapes_per_driver_type=0,
+                 max_concurrent_scrapes_per_host=0,
+                 adaptive_scrape_offsets=True,
+                 scrape_jitter=0.0,
                  **kwargs):
         super(PlatformDriverAgent, self).__init__(**kwargs)
         self.instances = {}
@@ -172,6 +186,9 @@ class PlatformDriverAgent(Agent):
         self._override_patterns = None
         self._override_interval_events = {}
 
+        self.scrape_scheduler = ScrapeScheduler()
+        self.vip.health.add_metrics_callback("scrapes", self.scrape_scheduler.get_stats)
+
         if scalability_test:
             self.waiting_to_finish = set()
             self.test_iterations = 0
@@ -187,7 +204,11 @@ class PlatformDriverAgent(Agent):
                                "publish_depth_first_all": self.publish_depth_first_all,
                                "publish_breadth_first_all": self.publish_breadth_first_all,
                                "publish_depth_first": self.publish_depth_first,
-                               "publish_breadth_first": self.publish_breadth_first}
+                               "publish_breadth_first": self.publish_breadth_first,
+                               "max_concurrent_scrapes_per_driver_type": max_concurrent_scrapes_per_driver_type,
+                               "max_concurrent_scrapes_per_host": max_concurrent_scrapes_per_host,
+                               "adaptive_scrape_offsets": adaptive_scrape_offsets,
+                               "scrape_jitter": scrape_jitter}
 
         self.vip.config.set_default("config", self.default_config)
         self.vip.config.subscribe(self.configure_main, actions=["NEW", "UPDATE"], pattern="config")
@@ -307,6 +328,15 @@ class PlatformDriverAgent(Agent):
             _log.info("Running scalability test. Settings may not be changed without restart.")
             return
 
+        try:
+            self.scrape_scheduler.configure(config["max_concurrent_scrapes_per_driver_type"],
+                                            config["max_concurrent_scrapes_per_host"],
+                                            config["adaptive_scrape_offsets"],
+                                            config["scrape_jitter"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver scrape concurrency settings unchanged")
+
         if (self.driver_scrape_interval != driver_scrape_interval or
                 self.group_offset_interval != group_offset_interval):
             self.driver_scrape_interval = driver_scrape_interval
@@ -349,6 +379,8 @@ class PlatformDriverAgent(Agent):
 
         _log.info("Stopping driver: {}".format(real_name))
 
+        self.scrape_scheduler.remove_device(driver)
+
         try:
             driver.core.stop(timeout=5.0)
         except Exception as e:
@@ -433,6 +465,23 @@ class PlatformDriverAgent(Agent):
                 _log.info("Std dev publish time: "+str(stdev))
                 sys.exit(0)
 
+    @Core.receiver('onstop')
+    def stop_scrapes(self, sender, **kwargs):
+        self.scrape_scheduler.stop()
+
+    @RPC.export
+    def get_scrape_stats(self):
+        """RPC method
+
+        Return the scrape statistics of every device, keyed by device path.
+        Each entry holds the number of scrapes, the number of cycles skipped
+        because the previous scrape had not finished, the last, average and
+        maximum scrape duration in seconds, the device's current offset into
+        its interval and a histogram of scrape durations keyed by bucket upper
+        bound in seconds.
+        """
+        return self.scrape_scheduler.get_stats()
+
     @RPC.export
     def get_point(self, path, point_name, **kwargs):
         """RPC method
@@ -39,7 +39,6 @@
 from volttron.platform.vip.agent import BasicAgent, Core
 from volttron.platform.agent import utils
 import logging
-import random
 import gevent
 import traceback
 from volttron.platform.messaging import headers as headers_mod
@@ -88,7 +87,7 @@ class DriverAgent(BasicAgent):
             interval = 60
 
         self.interval = interval
-        self.periodic_read_event = None
+        self.scrape_scheduled = False
 
         self.update_scrape_schedule(time_slot, driver_scrape_interval, group, group_offset_interval)
 
@@ -118,34 +117,9 @@ class DriverAgent(BasicAgent):
             while self.time_slot_offset >= self.interval:
                 self.time_slot_offset -= self.interval
 
-        #check weather or not we have run our starting method.
-        if not self.periodic_read_event:
-            return
-
-        self.periodic_read_event.cancel()
-
-        next_periodic_read = self.find_starting_datetime(utils.get_aware_utc_now())
-
-        self.periodic_read_event = self.core.schedule(next_periodic_read, self.periodic_read, next_periodic_read)
-
-
-
-    def find_starting_datetime(self, now):
-        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        seconds_from_midnight = (now - midnight).total_seconds()
-        interval = self.interval
-
-        offset = seconds_from_midnight % interval
-
-        if not offset:
-            return now
-
-        previous_in_seconds = seconds_from_midnight - offset
-        next_in_seconds = previous_in_seconds + interval
-
-        from_midnight = datetime.timedelta(seconds=next_in_seconds)
-        return midnight + from_midnight + datetime.timedelta(seconds=self.time_slot_offset)
-
+        # The scrape scheduler only knows about the device once it has started.
+        if self.scrape_scheduled:
+            self.parent.scrape_scheduler.update_device(self)
 
     def get_interface(self, driver_type, config_dict, config_string):
         """Returns an instance of the interface"""
@@ -162,15 +136,11 @@ class DriverAgent(BasicAgent):
     def starting(self, sender, **kwargs):
         self.setup_device()
 
-        # interval = self.config.get("interval", 60)
-        # self.core.periodic(interval, self.periodic_read, wait=None)
-
-        next_periodic_read = self.find_starting_datetime(utils.get_aware_utc_now())
-
-        self.periodic_read_event = self.core.schedule(next_periodic_read, self.periodic_read, next_periodic_read)
-
         self.all_path_depth, self.all_path_breadth = self.get_paths_for_point(DRIVER_TOPIC_ALL)
 
+        self.parent.scrape_scheduler.add_device(self)
+        self.scrape_scheduled = True
+
 
     def setup_device(self):
 
@@ -220,22 +190,11 @@ class DriverAgent(BasicAgent):
 
 
     def periodic_read(self, now):
-        #we not use self.core.schedule to prevent drift.
-        next_scrape_time = now + datetime.timedelta(seconds=self.interval)
-        # Sanity check now.
-        # This is specifically for when this is running in a VM that gets
-        # suspended and then resumed.
-        # If we don't make this check a resumed VM will publish one event
-        # per minute of
-        # time the VM was suspended for.
-        test_now = utils.get_aware_utc_now()
-        if test_now - next_scrape_time > datetime.timedelta(seconds=self.interval):
-            next_scrape_time = self.find_starting_datetime(test_now)
-
-        _log.debug("{} next scrape scheduled: {}".format(self.device_path, next_scrape_time))
-
-        self.periodic_read_event = self.core.schedule(next_scrape_time, self.periodic_read, next_scrape_time)
+        """Scrape and publish all points of the device.
 
+        Called by the platform driver's scrape scheduler, now is the time the
+        scrape was scheduled at and determines the sync timestamp of the publish.
+        """
         _log.debug("scraping device: " + self.device_name)
 
         self.parent.scrape_starting(self.device_name)
@@ -265,56 +224,47 @@ class DriverAgent(BasicAgent):
             headers_mod.SYNC_TIMESTAMP: sync_timestamp
         }
 
+        publishes = []
         if self.publish_depth_first or self.publish_breadth_first:
             for point, value in results.items():
                 depth_first_topic, breadth_first_topic = self.get_paths_for_point(point)
                 message = [value, self.meta_data[point]]
 
                 if self.publish_depth_first:
-                    self._publish_wrapper(depth_first_topic,
-                                          headers=headers,
-                                          message=message)
+                    publishes.append((depth_first_topic, headers, message))
 
                 if self.publish_breadth_first:
-                    self._publish_wrapper(breadth_first_topic,
-                                          headers=headers,
-                                          message=message)
+                    publishes.append((breadth_first_topic, headers, message))
 
         message = [results, self.meta_data]
         if self.publish_depth_first_all:
-            self._publish_wrapper(self.all_path_depth,
-                                  headers=headers,
-                                  message=message)
+            publishes.append((self.all_path_depth, headers, message))
 
         if self.publish_breadth_first_all:
-            self._publish_wrapper(self.all_path_breadth,
-                                  headers=headers,
-                                  message=message)
+            publishes.append((self.all_path_breadth, headers, message))
+
+        if publishes:
+            self._publish_wrapper(publishes)
 
         self.parent.scrape_ending(self.device_name)
 
-    def _publish_wrapper(self, topic, headers, message):
-        while True:
-            try:
-                with publish_lock():
-                    _log.debug("publishing: " + topic)
-                    self.vip.pubsub.publish('pubsub',
-                                            topic,
-                                            headers=headers,
-                                            message=message).get(timeout=10.0)
-
-                    _log.debug("finish publishing: " + topic)
-            except gevent.Timeout:
-                _log.warning("Did not receive confirmation of publish to "+topic)
-                break
-            except Again:
-                _log.warning("publish delayed: " + topic + " pubsub is busy")
-                gevent.sleep(random.random())
-            except VIPError as ex:
-                _log.warning("driver failed to publish " + topic + ": " + str(ex))
-                break
-            else:
-                break
+    def _publish_wrapper(self, publishes):
+        """Publish a list of (topic, headers, message) tuples in a single request."""
+        topics = "{} topics of {}".format(len(publishes), self.device_name)
+        try:
+            with publish_lock():
+                _log.debug("publishing: " + topics)
+                self.vip.pubsub.publish_many('pubsub', publishes).get(timeout=10.0)
+
+                _log.debug("finish publishing: " + topics)
+        except gevent.Timeout:
+            _log.warning("Did not receive confirmation of publish to " + topics)
+        except Again:
+            # The platform still delivers every item a subscriber could take,
+            # so sending the batch again would duplicate them.
+            _log.warning("pubsub is busy, some subscribers missed part of " + topics)
+        except VIPError as ex:
+            _log.warning("driver failed to publish " + topics + ": " + str(ex))
 
     def heart_beat(self):
         if self.heart_beat_point is None:
@@ -374,6 +324,7 @@ class DriverAgent(BasicAgent):
             headers_mod.DATE: utcnow_string,
             headers_mod.TIMESTAMP: utcnow_string,
         }
+        publishes = []
         for point, value in point_values.items():
             results = {point_name: value}
             meta = {point_name: self.meta_data[point_name]}
@@ -384,21 +335,16 @@ class DriverAgent(BasicAgent):
                 point_name)
 
             if self.publish_depth_first:
-                self._publish_wrapper(depth_first_topic,
-                                      headers=headers,
-                                      message=individual_point_message)
+                publishes.append((depth_first_topic, headers, individual_point_message))
             #
             if self.publish_breadth_first:
-                self._publish_wrapper(breadth_first_topic,
-                                      headers=headers,
-                                      message=individual_point_message)
+                publishes.append((breadth_first_topic, headers, individual_point_message))
 
             if self.publish_depth_first_all:
-                self._publish_wrapper(self.all_path_depth,
-                                      headers=headers,
-                                      message=all_message)
+                publishes.append((self.all_path_depth, headers, all_message))
 
             if self.publish_breadth_first_all:
-                self._publish_wrapper(self.all_path_breadth,
-                                      headers=headers,
-                                      message=all_message)
+                publishes.append((self.all_path_breadth, headers, all_message))
+
+        if publishes:
+            self._publish_wrapper(publishes)
@@ -40,15 +40,21 @@ from gevent.lock import BoundedSemaphore, DummySemaphore
 from contextlib import contextmanager
 
 _socket_lock = None
+_socket_limit = 0
 
 def configure_socket_lock(max_connections=0):
-    global _socket_lock
+    global _socket_lock, _socket_limit
     if _socket_lock is not None:
         raise RuntimeError("socket_lock already configured!")
     if max_connections < 1:
         _socket_lock = DummySemaphore()
     else:
         _socket_lock = BoundedSemaphore(max_connections)
+        _socket_limit = max_connections
+
+def socket_limit():
+    """Maximum number of open sockets, 0 if unlimited."""
+    return _socket_limit
 
 @contextmanager        
 def socket_lock():
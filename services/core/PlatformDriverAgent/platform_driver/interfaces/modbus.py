@@ -38,6 +38,9 @@
 
 import struct
 import logging
+import select
+import time
+from collections import defaultdict, deque
 
 from gevent import monkey
 monkey.patch_socket()
@@ -47,17 +50,124 @@ from pymodbus.exceptions import ConnectionException, ModbusIOException, ModbusEx
 from pymodbus.pdu import ExceptionResponse
 from pymodbus.constants import Defaults
 
-from contextlib import contextmanager, closing
+from contextlib import contextmanager
 
-from platform_driver.driver_locks import socket_lock
+from platform_driver.driver_locks import socket_lock, socket_limit
 from platform_driver.interfaces import BaseInterface, BaseRegister, BasicRevert, DriverInterfaceError
 from volttron.platform.agent import utils
 
+
+class ModbusConnectionPool(object):
+    """
+    Keeps Modbus TCP connections open between requests so each scrape does
+    not pay for a new connection. Idle connections are kept per host and
+    port and closed once unused for their idle timeout. Idle and in use
+    connections together never exceed the max_open_sockets limit of the
+    driver agent, the oldest idle connection is closed to make room.
+    """
+    def __init__(self, client_class=SyncModbusClient):
+        self.client_class = client_class
+        # (address, port) -> deque of (client, expiry time), most recently used last.
+        self._idle = defaultdict(deque)
+        self._in_use = 0
+
+    def checkout(self, address, port):
+        """
+        :returns: a client for address and port, and whether it was reused from the pool
+        """
+        now = time.monotonic()
+        self._close_expired(now)
+        idle = self._idle.get((address, port))
+        while idle:
+            client, _ = idle.pop()
+            if self._is_healthy(client):
+                self._in_use += 1
+                return client, True
+            client.close()
+        self._in_use += 1
+        self._bound(0)
+        return self.client_class(address, port), False
+
+    def checkin(self, address, port, client, idle_timeout):
+        """
+        Return a client to the pool, or close it if idle_timeout is not positive.
+        """
+        self._in_use -= 1
+        if idle_timeout <= 0 or not client.is_socket_open():
+            client.close()
+            return
+        self._bound(1)
+        self._idle[(address, port)].append((client, time.monotonic() + idle_timeout))
+
+    def discard(self, client):
+        """
+        Close a checked out client that must not be reused.
+        """
+        self._in_use -= 1
+        client.close()
+
+    def close_all(self):
+        for idle in self._idle.values():
+            for client, _ in idle:
+                client.close()
+        self._idle.clear()
+
+    def _close_expired(self, now):
+        for key in list(self._idle):
+            idle = self._idle[key]
+            while idle and idle[0][1] <= now:
+                idle.popleft()[0].close()
+            if not idle:
+                del self._idle[key]
+
+    def _bound(self, adding):
+        limit = socket_limit()
+        if not limit:
+            return
+        idle_count = sum(len(idle) for idle in self._idle.values())
+        while idle_count and idle_count + adding + self._in_use > limit:
+            key = min(self._idle, key=lambda k: self._idle[k][0][1])
+            self._idle[key].popleft()[0].close()
+            if not self._idle[key]:
+                del self._idle[key]
+            idle_count -= 1
+
+    @staticmethod
+    def _is_healthy(client):
+        """
+        An idle connection has nothing to read. If its socket is readable the
+        device closed the connection or sent a stray response.
+        """
+        sock = client.socket
+        if sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+
+connection_pool = ModbusConnectionPool()
+
+
 @contextmanager
-def modbus_client(address, port):
+def modbus_client(address, port, idle_timeout=0):
+    """
+    Yields a client for address and port from the connection pool. The
+    client is returned to the pool for idle_timeout seconds afterwards unless
+    the block raised, in which case the connection may be broken or out of
+    step with the device and is closed.
+    """
     with socket_lock():
-        with closing(SyncModbusClient(address, port)) as client:
+        client, reused = connection_pool.checkout(address, port)
+        client.reused = reused
+        try:
             yield client
+        except BaseException:
+            connection_pool.discard(client)
+            raise
+        connection_pool.checkin(address, port, client, idle_timeout)
 
 
 modbus_logger = logging.getLogger("pymodbus")
@@ -68,6 +178,8 @@ _log = logging.getLogger(__name__)
 
 MODBUS_REGISTER_SIZE = 2
 MODBUS_READ_MAX = 100
+# Seconds an unused connection to a device is kept open.
+DEFAULT_CONNECTION_IDLE_TIMEOUT = 300
 PYMODBUS_REGISTER_STRUCT = struct.Struct('>H')
 
 
@@ -75,6 +187,40 @@ class ModbusInterfaceException(ModbusException):
     pass
 
 
+def plan_requests(ranges, max_gap=0, max_count=MODBUS_READ_MAX):
+    """
+    Plan the reads needed to cover ranges of addresses. Ranges separated
+    by at most max_gap unused addresses are read by the same request, the
+    unused addresses are read and discarded. No request reads more than
+    max_count addresses.
+
+    :param ranges: [start, end] address ranges, inclusive
+    :returns: list of (start, count) requests in address order
+    """
+    requests = []
+    current = None
+    for start, end in sorted(ranges):
+        if current is not None:
+            if end <= current[1]:
+                continue
+            if start <= current[1] + 1 + max_gap:
+                if end - current[0] < max_count:
+                    current[1] = end
+                    continue
+                if start <= current[1] + 1:
+                    # Overlapping or adjacent, fill up this request and read the rest after it.
+                    current[1] = current[0] + max_count - 1
+                    start = current[1] + 1
+            requests.append((current[0], current[1] - current[0] + 1))
+        while end - start >= max_count:
+            requests.append((start, max_count))
+            start += max_count
+        current = [start, end]
+    if current is not None:
+        requests.append((current[0], current[1] - current[0] + 1))
+    return requests
+
+
 class ModbusRegisterBase(BaseRegister):
     def __init__(self, address, register_type, read_only, pointName, units, description='', slave_id=0):
         super(ModbusRegisterBase, self).__init__(register_type, read_only, pointName, units, description=description)
@@ -198,6 +344,14 @@ class Interface(BasicRevert, BaseInterface):
         self.slave_id = config_dict.get("slave_id", 0)
         self.ip_address = config_dict["device_address"]
         self.port = config_dict.get("port", Defaults.Port)
+        self.connection_idle_timeout = float(config_dict.get("connection_idle_timeout",
+                                                             DEFAULT_CONNECTION_IDLE_TIMEOUT))
+        self.max_register_gap = int(config_dict.get("max_register_gap", 0))
+        self.max_read_registers = int(config_dict.get("max_read_registers", MODBUS_READ_MAX))
+        self.max_read_bits = int(config_dict.get("max_read_bits", MODBUS_READ_MAX))
+        if self.max_register_gap < 0 or self.max_read_registers < 1 or self.max_read_bits < 1:
+            raise ValueError("Invalid request planning settings for Modbus device at {}:{}".format(
+                self.ip_address, self.port))
         self.parse_config(registry_config_str) 
         
     def build_ranges_map(self):
@@ -220,34 +374,63 @@ class Interface(BasicRevert, BaseInterface):
 
     def merge_register_ranges(self):
         """
-        Merges any adjacent registers for more efficient scraping. May only be called after all registers have been
-        inserted."""
+        Merges any registers separated by at most max_register_gap unused registers for more efficient scraping and
+        plans the reads for each merged range. May only be called after all registers have been inserted."""
+        self.scrape_request_count = 0
         for key, register_ranges in self.register_ranges.items():
             if not register_ranges:
                 continue
-            register_ranges.sort()
+            register_ranges.sort(key=lambda register_range: register_range[:2])
             result = []
             current = register_ranges[0]
             for register_range in register_ranges[1:]:
-                if register_range[0] > current[1] + 1:
+                if register_range[0] > current[1] + 1 + self.max_register_gap:
                     result.append(current)
                     current = register_range
                     continue
 
-                current[1] = register_range[1]
+                current[1] = max(current[1], register_range[1])
                 current[2].extend(register_range[2])
 
             result.append(current)
 
+            max_count = self.max_read_registers if key[0] == 'byte' else self.max_read_bits
+            for register_range in result:
+                registers = register_range[2]
+                requests = plan_requests([(register.address, register.address + register.get_register_count() - 1)
+                                          for register in registers],
+                                         self.max_register_gap, max_count)
+                register_range[3:] = [requests]
+                self.scrape_request_count += len(requests)
+
             self.register_ranges[key] = result
 
+        _log.info("Modbus device at {}:{} ID: {} needs {} requests per scrape".format(
+            self.ip_address, self.port, self.slave_id, self.scrape_request_count))
+
+    def call_with_client(self, func):
+        """
+        Call func with a pooled client for the device. If a reused connection
+        turns out to have been dropped by the device func is retried once on
+        a new connection.
+        """
+        while True:
+            with modbus_client(self.ip_address, self.port, self.connection_idle_timeout) as client:
+                try:
+                    return func(client)
+                except ConnectionException:
+                    if not client.reused:
+                        raise
+                    # Closed clients are not returned to the pool.
+                    client.close()
+            _log.debug("Reconnecting to {}:{}".format(self.ip_address, self.port))
+
     def get_point(self, point_name):
         register = self.get_register_by_name(point_name)
-        with modbus_client(self.ip_address, self.port) as client:
-            try:
-                result = register.get_state(client)
-            except (ConnectionException, ModbusIOException, ModbusInterfaceException):
-                result = None
+        try:
+            result = self.call_with_client(register.get_state)
+        except (ConnectionException, ModbusIOException, ModbusInterfaceException):
+            result = None
         return result
     
     def _set_point(self, point_name, value):    
@@ -255,11 +438,10 @@ class Interface(BasicRevert, BaseInterface):
         if register.read_only:
             raise  IOError("Trying to write to a point configured read only: "+point_name)
 
-        with modbus_client(self.ip_address, self.port) as client:
-            try:
-                result = register.set_state(client, value)
-            except (ConnectionException, ModbusIOException, ModbusInterfaceException) as ex:
-                raise IOError("Error encountered trying to write to point {}: {}".format(point_name, ex))
+        try:
+            result = self.call_with_client(lambda client: register.set_state(client, value))
+        except (ConnectionException, ModbusIOException, ModbusInterfaceException) as ex:
+            raise IOError("Error encountered trying to write to point {}: {}".format(point_name, ex))
         return result
     
     def scrape_byte_registers(self, client, read_only):
@@ -269,19 +451,19 @@ class Interface(BasicRevert, BaseInterface):
         read_func = client.read_input_registers if read_only else client.read_holding_registers
 
         for register_range in register_ranges:
-            start, end, registers = register_range
-            result = b''
+            start, end, registers, requests = register_range
+            # Addresses in gaps that are not read stay zero and are never parsed.
+            result = bytearray((end - start + 1) * MODBUS_REGISTER_SIZE)
 
-            for group in range(start, end + 1, MODBUS_READ_MAX):
-                count = min(end - group + 1, MODBUS_READ_MAX)
+            for group, count in requests:
                 response = read_func(group, count, unit=self.slave_id)
                 if response is None:
                     raise ModbusInterfaceException("pymodbus returned None")
                 if isinstance(response, ModbusException):
                     raise response
-                response_bytes = response.encode()
+                offset = (group - start) * MODBUS_REGISTER_SIZE
                 # Trim off length byte.
-                result += response_bytes[1:]
+                result[offset:offset + count * MODBUS_REGISTER_SIZE] = response.encode()[1:]
 
             for register in registers:
                 point = register.point_name
@@ -295,21 +477,21 @@ class Interface(BasicRevert, BaseInterface):
         register_ranges = self.register_ranges[('bit', read_only)]
 
         for register_range in register_ranges:
-            start, end, registers = register_range
+            start, end, registers, requests = register_range
             if not registers:
                 return result_dict
 
-            result = []
+            result = [False] * (end - start + 1)
 
-            for group in range(start, end + 1, MODBUS_READ_MAX):
-                count = min(end - group + 1, MODBUS_READ_MAX)
+            for group, count in requests:
                 response = client.read_discrete_inputs(group, count, unit=self.slave_id) if read_only else \
                     client.read_coils(group, count, unit=self.slave_id)
                 if response is None:
                     raise ModbusInterfaceException("pymodbus returned None")
                 if isinstance(response, ModbusException):
                     raise response
-                result += response.bits
+                # Responses are padded to a whole number of bytes.
+                result[group - start:group - start + count] = response.bits[:count]
 
             for register in registers:
                 point = register.point_name
@@ -318,21 +500,21 @@ class Interface(BasicRevert, BaseInterface):
             
         return result_dict
         
-    def _scrape_all(self):
+    def scrape_registers(self, client):
         result_dict = {}
-        with modbus_client(self.ip_address, self.port) as client:
-            try:
-                
-                result_dict.update(self.scrape_byte_registers(client, True))
-                result_dict.update(self.scrape_byte_registers(client, False))
-                
-                result_dict.update(self.scrape_bit_registers(client, True))
-                result_dict.update(self.scrape_bit_registers(client, False))
-            except (ConnectionException, ModbusIOException, ModbusInterfaceException) as e:
-                raise DriverInterfaceError("Failed to scrape device at " + self.ip_address + ":" + str(self.port) +
-                                           " ID: " + str(self.slave_id) + str(e))
-                
+        result_dict.update(self.scrape_byte_registers(client, True))
+        result_dict.update(self.scrape_byte_registers(client, False))
+
+        result_dict.update(self.scrape_bit_registers(client, True))
+        result_dict.update(self.scrape_bit_registers(client, False))
         return result_dict
+
+    def _scrape_all(self):
+        try:
+            return self.call_with_client(self.scrape_registers)
+        except (ConnectionException, ModbusIOException, ModbusInterfaceException) as e:
+            raise DriverInterfaceError("Failed to scrape device at " + self.ip_address + ":" + str(self.port) +
+                                       " ID: " + str(self.slave_id) + str(e))
     
     def parse_config(self, configDict):
         if configDict is None:
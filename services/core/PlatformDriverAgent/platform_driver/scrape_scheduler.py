@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2020, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""Central scheduling of the periodic device scrapes of the platform driver.
+
+All device timers live in one heap serviced by a single greenlet. Each device
+is scraped on a fixed grid of its interval, so a slow scrape never pushes the
+following scrapes of that or any other device back. A scrape that is still
+running (or still waiting for a concurrency slot) when the next one is due
+causes that cycle to be skipped and counted instead of queued.
+"""
+
+import bisect
+import datetime
+import heapq
+import itertools
+import logging
+import math
+import random
+import time
+from collections import defaultdict
+
+import gevent
+from gevent.event import Event
+from gevent.lock import BoundedSemaphore, DummySemaphore
+import pytz
+
+_log = logging.getLogger(__name__)
+
+# Upper bounds (in seconds) of the scrape latency histogram buckets.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Weight of the latest scrape in the moving average duration.
+DURATION_SMOOTHING = 0.2
+
+
+class ScrapeStats(object):
+    """Scrape counters and latency histogram of a single device."""
+
+    def __init__(self):
+        self.scrapes = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.mean_duration = 0.0
+        self.total_duration = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, duration):
+        if self.scrapes:
+            self.mean_duration += DURATION_SMOOTHING * (duration - self.mean_duration)
+        else:
+            self.mean_duration = duration
+        self.scrapes += 1
+        self.last_duration = duration
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+    def to_dict(self):
+        buckets = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+        return {"scrapes": self.scrapes,
+                "skipped": self.skipped,
+                "last_duration": self.last_duration,
+                "average_duration": self.total_duration / self.scrapes if self.scrapes else None,
+                "max_duration": self.max_duration,
+                "histogram": dict(zip(buckets, self.histogram))}
+
+
+class _ScheduledDevice(object):
+    def __init__(self, driver, jitter):
+        driver_config = driver.config.get("driver_config") or {}
+        self.driver = driver
+        self.path = driver.device_path
+        self.driver_type = driver.config.get("driver_type")
+        self.host = driver_config.get("device_address")
+        self.interval = driver.interval
+        self.jitter = random.uniform(0, jitter) if jitter else 0.0
+        self.offset = 0.0
+        self.planned_duration = 0.0
+        self.grid = None
+        self.generation = 0
+        self.busy = False
+        self.stats = ScrapeStats()
+
+    @property
+    def base_offset(self):
+        return (self.driver.time_slot_offset + self.jitter) % self.interval
+
+
+class ScrapeScheduler(object):
+    """Owns the scrape timers of every device of the platform driver.
+
+    :param max_scrapes_per_driver_type: Maximum number of concurrent scrapes of
+        devices with the same driver type, 0 for no limit.
+    :param max_scrapes_per_host: Maximum number of concurrent scrapes of devices
+        sharing a device_address, 0 for no limit.
+    :param adaptive_offsets: Stagger devices on the same host and interval by
+        their measured scrape durations so they do not contend.
+    :param jitter: Upper bound in seconds of a random offset added once per
+        device to spread devices configured with the same time slot.
+    """
+
+    def __init__(self, max_scrapes_per_driver_type=0, max_scrapes_per_host=0,
+                 adaptive_offsets=True, jitter=0.0):
+        self._devices = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = Event()
+        self._greenlet = None
+        self.max_scrapes_per_driver_type = None
+        self.max_scrapes_per_host = None
+        self.configure(max_scrapes_per_driver_type, max_scrapes_per_host, adaptive_offsets, jitter)
+
+    def configure(self, max_scrapes_per_driver_type=0, max_scrapes_per_host=0,
+                  adaptive_offsets=True, jitter=0.0):
+        max_scrapes_per_driver_type = int(max_scrapes_per_driver_type)
+        max_scrapes_per_host = int(max_scrapes_per_host)
+        jitter = float(jitter)
+        if max_scrapes_per_driver_type < 0 or max_scrapes_per_host < 0 or jitter < 0:
+            raise ValueError("Scrape concurrency limits and jitter may not be negative.")
+        # Scrapes already holding a slot release it on the semaphore they acquired.
+        if max_scrapes_per_driver_type != self.max_scrapes_per_driver_type:
+            self._driver_type_locks = defaultdict(self._limiter(max_scrapes_per_driver_type))
+        if max_scrapes_per_host != self.max_scrapes_per_host:
+            self._host_locks = defaultdict(self._limiter(max_scrapes_per_host))
+        self.max_scrapes_per_driver_type = max_scrapes_per_driver_type
+        self.max_scrapes_per_host = max_scrapes_per_host
+        self.adaptive_offsets = bool(adaptive_offsets)
+        # Only applies to devices added from now on.
+        self.jitter = jitter
+        for entry in self._devices.values():
+            self._update_offsets(entry)
+
+    @staticmethod
+    def _limiter(limit):
+        if limit < 1:
+            return DummySemaphore
+        return lambda: BoundedSemaphore(limit)
+
+    def add_device(self, driver):
+        """Start scraping driver, replacing any device registered on the same path."""
+        previous = self._devices.pop(driver.device_path, None)
+        if previous is not None:
+            previous.generation += 1
+        entry = _ScheduledDevice(driver, self.jitter)
+        self._devices[entry.path] = entry
+        self._update_offsets(entry)
+        self._schedule_first(entry, time.time())
+        if self._greenlet is None:
+            self._greenlet = gevent.spawn(self._run)
+
+    def update_device(self, driver):
+        """Reschedule driver after its interval or time slot changed."""
+        entry = self._devices.get(driver.device_path)
+        if entry is None or entry.driver is not driver:
+            return
+        entry.generation += 1
+        entry.interval = driver.interval
+        self._update_offsets(entry)
+        self._schedule_first(entry, time.time())
+
+    def remove_device(self, driver):
+        entry = self._devices.get(driver.device_path)
+        if entry is None or entry.driver is not driver:
+            return
+        del self._devices[entry.path]
+        entry.generation += 1
+        self._update_offsets(entry)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+
+    def get_stats(self):
+        """Return scrape statistics keyed by device path."""
+        stats = {}
+        for path, entry in self._devices.items():
+            stats[path] = entry.stats.to_dict()
+            stats[path].update(interval=entry.interval, offset=entry.offset)
+        return stats
+
+    def _schedule_first(self, entry, now):
+        entry.grid = (math.floor((now - entry.offset) / entry.interval) + 1) * entry.interval
+        self._push(entry)
+
+    def _schedule_next(self, entry, now):
+        entry.grid += entry.interval
+        missed = math.floor((now - entry.grid - entry.offset) / entry.interval)
+        if missed > 0:
+            # The loop was held up, for instance by a suspended VM. Do not catch up
+            # on every cycle that passed in the mean time.
+            _log.warning("{} missed {} scrapes".format(entry.path, missed))
+            entry.stats.skipped += missed
+            entry.grid += missed * entry.interval
+        self._push(entry)
+
+    def _push(self, entry):
+        deadline = entry.grid + entry.offset
+        wake = not self._heap or deadline < self._heap[0][0]
+        heapq.heappush(self._heap, (deadline, next(self._counter), entry, entry.generation))
+        if wake:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            while self._heap and self._heap[0][3] != self._heap[0][2].generation:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                continue
+            _, _, entry, _ = heapq.heappop(self._heap)
+            scheduled = entry.grid + entry.driver.time_slot_offset
+            if entry.busy:
+                entry.stats.skipped += 1
+                _log.warning("{} is still scraping, skipping scrape scheduled at {}".format(
+                    entry.path, datetime.datetime.fromtimestamp(scheduled, pytz.UTC)))
+            else:
+                entry.busy = True
+                gevent.spawn(self._scrape, entry, scheduled)
+            self._schedule_next(entry, time.time())
+
+    def _scrape(self, entry, scheduled):
+        # Devices without a device_address do not share a host limit.
+        host_lock = DummySemaphore() if entry.host is None else self._host_locks[entry.host]
+        try:
+            with self._driver_type_locks[entry.driver_type], host_lock:
+                start = time.monotonic()
+                try:
+                    entry.driver.periodic_read(datetime.datetime.fromtimestamp(scheduled, pytz.UTC))
+                finally:
+                    entry.stats.record(time.monotonic() - start)
+        except Exception:
+            _log.exception("Unhandled error scraping {}".format(entry.path))
+        finally:
+            entry.busy = False
+        planned = entry.planned_duration
+        if self.adaptive_offsets and entry.host is not None and \
+                abs(entry.stats.mean_duration - planned) > max(0.05, 0.1 * planned):
+            self._update_offsets(entry)
+
+    def _update_offsets(self, changed):
+        """Recompute the offsets of the devices sharing a host and interval with changed.
+
+        Devices on the same host are ordered by their configured offset and each
+        one is pushed back until the previous device's average scrape is done.
+        """
+        if not self.adaptive_offsets or changed.host is None:
+            changed.offset = changed.base_offset
+            return
+        peers = sorted((entry for entry in self._devices.values()
+                        if entry.host == changed.host and entry.interval == changed.interval),
+                       key=lambda entry: (entry.base_offset, entry.path))
+        end = 0.0
+        for entry in peers:
+            offset = max(entry.base_offset, end)
+            if offset >= entry.interval:
+                _log.warning("Scrapes of the devices at {} take longer than their {} second interval".format(
+                    entry.host, entry.interval))
+                offset %= entry.interval
+            entry.offset = offset
+            entry.planned_duration = entry.stats.mean_duration
+            end = offset + entry.planned_duration
@@ -36,10 +36,11 @@
 # under Contract DE-AC05-76RL01830
 # }}}
 
+import errno
 import logging
 import contextlib
-from datetime import datetime, date, time
-from mock import create_autospec
+from datetime import datetime
+from mock import MagicMock, create_autospec
 
 import pytest
 import pytz
@@ -48,10 +49,11 @@ from platform_driver import agent
 from platform_driver.agent import DriverAgent
 from platform_driver.interfaces import BaseInterface
 from platform_driver.interfaces.fakedriver import Interface as FakeInterface
+from platform_driver.scrape_scheduler import ScrapeScheduler
 from volttrontesting.utils.utils import AgentMock
 from volttron.platform.vip.agent import Agent
+from volttron.platform.vip.agent.errors import VIPError
 from volttron.platform.messaging.utils import Topic
-from volttron.platform.vip.agent.core import ScheduledEvent
 
 
 agent._log = logging.getLogger("test_logger")
@@ -80,18 +82,19 @@ def test_update_publish_types_should_only_set_depth_first_to_true():
                          "expected_time_slot_offset, expected_group",
                          [(60, 2, 0, 3, 0, 0),
                           (1, 4, 2, 3, 10, 2)])
-def test_update_scrape_schedule_should_set_periodic_event(time_slot, driver_scrape_interval, group, group_offset_interval,
-                                                          expected_time_slot_offset, expected_group):
-    with get_driver_agent(has_periodic_read_event=True, has_core_schedule=True) as driver_agent:
+def test_update_scrape_schedule_should_reschedule_scrapes(time_slot, driver_scrape_interval, group,
+                                                          group_offset_interval, expected_time_slot_offset,
+                                                          expected_group):
+    with get_driver_agent(scrape_scheduled=True) as driver_agent:
         driver_agent.update_scrape_schedule(time_slot, driver_scrape_interval, group, group_offset_interval)
 
         assert driver_agent.group == expected_group
         assert driver_agent.time_slot_offset == expected_time_slot_offset
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
+        driver_agent.parent.scrape_scheduler.update_device.assert_called_once_with(driver_agent)
 
 
 @pytest.mark.driver_unit
-def test_update_scrape_schedule_should_return_none_when_no_periodic_read_event():
+def test_update_scrape_schedule_should_return_none_when_not_started():
     time_slot = 1
     driver_scrape_interval = 4
     group = 2
@@ -103,30 +106,7 @@ def test_update_scrape_schedule_should_return_none_when_no_periodic_read_event()
 
         assert result is None
         assert driver_agent.time_slot_offset == expected_time_slot_offset
-
-
-@pytest.mark.driver_unit
-@pytest.mark.parametrize("seconds, expected_datetime", [(0,
-                                                         datetime.combine(
-                                                             date(2020, 6, 1),
-                                                             time(5, 30))),
-                                                        (1,
-                                                         datetime.combine(
-                                                             date(2020, 6, 1),
-                                                             time(5, 31, 4))),
-                                                        (59,
-                                                         datetime.combine(
-                                                             date(2020, 6, 1),
-                                                             time(5, 31, 4)))
-                                                        ])
-def test_find_starting_datetime_should_return_new_datetime(seconds, expected_datetime):
-    # Note: the expected datetime depends on the interval attribute of driver_agent
-    now = datetime.combine(date(2020, 6, 1), time(5, 30, seconds))
-
-    with get_driver_agent() as driver_agent:
-        actual_start_datetime = driver_agent.find_starting_datetime(now)
-
-        assert actual_start_datetime == expected_datetime
+        driver_agent.parent.scrape_scheduler.update_device.assert_not_called()
 
 
 @pytest.mark.driver_unit
@@ -152,12 +132,13 @@ def test_starting_should_succeed():
     expected_path_depth = "devices/path/to/my/device/all"
     expected_path_breadth = "devices/all/device/my/to/path"
 
-    with get_driver_agent(has_core_schedule=True) as driver_agent:
+    with get_driver_agent() as driver_agent:
         driver_agent.starting(sender)
 
         assert driver_agent.all_path_depth == expected_path_depth
         assert driver_agent.all_path_breadth == expected_path_breadth
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
+        assert driver_agent.scrape_scheduled
+        driver_agent.parent.scrape_scheduler.add_device.assert_called_once_with(driver_agent)
 
 
 @pytest.mark.driver_unit
@@ -178,7 +159,7 @@ def test_setup_device_should_succeed():
 def test_periodic_read_should_succeed():
     now = pytz.UTC.localize(datetime.utcnow())
 
-    with get_driver_agent(has_core_schedule=True, meta_data={"foo": "bar"},
+    with get_driver_agent(meta_data={"foo": "bar"},
                           has_base_topic=True, mock_publish_wrapper=True,
                           interface_scrape_all={"foo": "bar"}) as driver_agent:
         driver_agent.periodic_read(now)
@@ -186,7 +167,29 @@ def test_periodic_read_should_succeed():
         driver_agent.parent.scrape_starting.assert_called_once()
         driver_agent.parent.scrape_ending.assert_called_once()
         driver_agent._publish_wrapper.assert_called_once()
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
+
+
+@pytest.mark.driver_unit
+def test_periodic_read_should_publish_all_topics_in_one_batch(monkeypatch):
+    now = pytz.UTC.localize(datetime.utcnow())
+    monkeypatch.setattr("platform_driver.driver.publish_lock", contextlib.nullcontext)
+
+    with get_driver_agent(meta_data={"foo": "meta_foo", "baz": "meta_baz"},
+                          has_base_topic=True, interface_scrape_all={"foo": 1, "baz": 2}) as driver_agent:
+        driver_agent.vip = MagicMock()
+        driver_agent.publish_depth_first_all = True
+        driver_agent.publish_depth_first = True
+        driver_agent.publish_breadth_first = True
+        driver_agent.all_path_depth = "devices/path/to/my/device/all"
+        driver_agent.periodic_read(now)
+
+        driver_agent.vip.pubsub.publish_many.assert_called_once()
+        peer, publishes = driver_agent.vip.pubsub.publish_many.call_args[0]
+        assert peer == "pubsub"
+        assert [(topic, message) for topic, headers, message in publishes] == [
+            ("foo", [1, "meta_foo"]), ("devices", [1, "meta_foo"]),
+            ("baz", [2, "meta_baz"]), ("devices", [2, "meta_baz"]),
+            ("devices/path/to/my/device/all", [{"foo": 1, "baz": 2}, {"foo": "meta_foo", "baz": "meta_baz"}])]
 
 
 @pytest.mark.driver_unit
@@ -194,7 +197,7 @@ def test_periodic_read_should_succeed():
 def test_periodic_read_should_return_none_on_scrape_response(scrape_all_response):
     now = pytz.UTC.localize(datetime.utcnow())
 
-    with get_driver_agent(has_core_schedule=True, meta_data={"foo": "bar"},
+    with get_driver_agent(meta_data={"foo": "bar"},
                           mock_publish_wrapper=True, interface_scrape_all=scrape_all_response) as driver_agent:
         result = driver_agent.periodic_read(now)
 
@@ -202,7 +205,6 @@ def test_periodic_read_should_return_none_on_scrape_response(scrape_all_response
         driver_agent.parent.scrape_starting.assert_called_once()
         driver_agent.parent.scrape_ending.assert_not_called()
         driver_agent._publish_wrapper.assert_not_called()
-        assert isinstance(driver_agent.periodic_read_event, ScheduledEvent)
 
 
 @pytest.mark.driver_unit
@@ -293,6 +295,19 @@ def test_revert_all_should_succeed():
         driver_agent.interface.revert_all.assert_called_once()
 
 
+@pytest.mark.driver_unit
+def test_publish_wrapper_should_not_resend_batch_when_pubsub_is_busy(monkeypatch):
+    monkeypatch.setattr("platform_driver.driver.publish_lock", contextlib.nullcontext)
+
+    with get_driver_agent() as driver_agent:
+        driver_agent.vip = MagicMock()
+        driver_agent.vip.pubsub.publish_many.return_value.get.side_effect = VIPError.from_errno(
+            errno.EAGAIN, "Resource temporarily unavailable", "listener", "pubsub")
+        driver_agent._publish_wrapper([("devices/path/to/my/device/all", {}, [{}, {}])])
+
+        driver_agent.vip.pubsub.publish_many.assert_called_once()
+
+
 @pytest.mark.driver_unit
 def test_publish_cov_value_should_succeed_when_publish_depth_first_is_true():
     point_name = "pointname"
@@ -320,14 +335,13 @@ class MockedBaseTopic:
 
 
 class MockedPublishWrapper:
-    def __call__(self, depth_first_topic, headers, message):
+    def __call__(self, publishes):
         pass
 
 
 @contextlib.contextmanager
 def get_driver_agent(has_base_topic: bool = False,
-                     has_periodic_read_event: bool = False,
-                     has_core_schedule: bool = False,
+                     scrape_scheduled: bool = False,
                      meta_data: dict = None,
                      mock_publish_wrapper: bool = False,
                      interface_scrape_all: any = None,
@@ -335,8 +349,7 @@ def get_driver_agent(has_base_topic: bool = False,
     """
     Creates a Driver Agent and mocks its dependencies to be used for unit testing.
     :param has_base_topic:
-    :param has_periodic_read_event:
-    :param has_core_schedule:
+    :param scrape_scheduled:
     :param meta_data:
     :param mock_publish_wrapper:
     :param interface_scrape_all:
@@ -348,6 +361,7 @@ def get_driver_agent(has_base_topic: bool = False,
     # since parent is a mock and not a real instance of a class, we have to set attributes directly
     # create_autospec does not set attributes in a class' constructor
     parent.vip = ""
+    parent.scrape_scheduler = create_autospec(ScrapeScheduler, instance=True)
 
     config = {"driver_config": {},
               "driver_type": "fakedriver",
@@ -383,12 +397,8 @@ def get_driver_agent(has_base_topic: bool = False,
     if has_base_topic:
         driver_agent.base_topic = MockedBaseTopic()
 
-    if has_periodic_read_event:
-        driver_agent.periodic_read_event = create_autospec(ScheduledEvent)
-
-    if has_core_schedule:
-        driver_agent.core.schedule.return_value = create_autospec(ScheduledEvent)
-        driver_agent.core.schedule.cancel = None
+    if scrape_scheduled:
+        driver_agent.scrape_scheduled = True
 
     if meta_data is not None:
         driver_agent.meta_data = meta_data
@@ -0,0 +1,123 @@
+import socket
+from contextlib import contextmanager
+
+import pytest
+from pymodbus.exceptions import ConnectionException
+
+from platform_driver.interfaces import modbus
+from platform_driver.interfaces.modbus import ModbusConnectionPool
+
+
+class FakeClient(object):
+    instances = []
+
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.socket, self.peer = socket.socketpair()
+        FakeClient.instances.append(self)
+
+    def is_socket_open(self):
+        return self.socket is not None
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.peer.close()
+        self.socket = None
+
+
+@contextmanager
+def no_socket_lock():
+    yield
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeClient.instances = []
+    pool = ModbusConnectionPool(client_class=FakeClient)
+    monkeypatch.setattr(modbus, "connection_pool", pool)
+    monkeypatch.setattr(modbus, "socket_lock", no_socket_lock)
+    monkeypatch.setattr(modbus, "socket_limit", lambda: 0)
+    yield pool
+    pool.close_all()
+
+
+@pytest.mark.driver
+def test_pool_should_reuse_idle_connection(pool):
+    client, reused = pool.checkout("10.0.0.1", 502)
+    pool.checkin("10.0.0.1", 502, client, 60)
+
+    assert pool.checkout("10.0.0.1", 502) == (client, True)
+    assert pool.checkout("10.0.0.1", 502)[1] is False
+    assert pool.checkout("10.0.0.2", 502)[1] is False
+
+
+@pytest.mark.driver
+def test_pool_should_replace_connection_closed_by_device(pool):
+    client, _ = pool.checkout("10.0.0.1", 502)
+    pool.checkin("10.0.0.1", 502, client, 60)
+    client.peer.close()
+
+    new_client, reused = pool.checkout("10.0.0.1", 502)
+
+    assert new_client is not client
+    assert reused is False
+    assert client.socket is None
+
+
+@pytest.mark.driver
+def test_pool_should_close_expired_connections(pool, monkeypatch):
+    client, _ = pool.checkout("10.0.0.1", 502)
+    pool.checkin("10.0.0.1", 502, client, 60)
+    now = modbus.time.monotonic()
+    monkeypatch.setattr(modbus.time, "monotonic", lambda: now + 61)
+
+    assert pool.checkout("10.0.0.2", 502)[1] is False
+    assert client.socket is None
+
+
+@pytest.mark.driver
+def test_pool_should_respect_socket_limit(pool, monkeypatch):
+    monkeypatch.setattr(modbus, "socket_limit", lambda: 2)
+    first, _ = pool.checkout("10.0.0.1", 502)
+    second, _ = pool.checkout("10.0.0.2", 502)
+    pool.checkin("10.0.0.1", 502, first, 60)
+    pool.checkin("10.0.0.2", 502, second, 60)
+
+    pool.checkout("10.0.0.3", 502)
+
+    assert first.socket is None
+    assert second.socket is not None
+
+
+@pytest.mark.driver
+def test_interface_should_reconnect_dropped_connection(pool):
+    interface = modbus.Interface()
+    interface.configure({"device_address": "10.0.0.1"}, [])
+    interface.call_with_client(lambda client: None)
+    calls = []
+
+    def request(client):
+        calls.append(client)
+        if len(calls) == 1:
+            raise ConnectionException("Connection unexpectedly closed")
+        return 42
+
+    assert interface.call_with_client(request) == 42
+    assert calls[0] is FakeClient.instances[0]
+    assert calls[1] is FakeClient.instances[1]
+    assert calls[0].socket is None
+
+
+@pytest.mark.driver
+def test_interface_should_not_retry_new_connection(pool):
+    interface = modbus.Interface()
+    interface.configure({"device_address": "10.0.0.1", "connection_idle_timeout": 0}, [])
+
+    def request(client):
+        raise ConnectionException("Failed to connect")
+
+    with pytest.raises(ConnectionException):
+        interface.call_with_client(request)
+    assert len(FakeClient.instances) == 1
@@ -0,0 +1,78 @@
+import pytest
+from pymodbus.bit_read_message import ReadCoilsResponse
+from pymodbus.register_read_message import ReadHoldingRegistersResponse
+
+from platform_driver.interfaces.modbus import Interface, plan_requests
+
+
+def registry_row(name, register, address, writable="TRUE"):
+    return {"Volttron Point Name": name, "Units": "", "Modbus Register": register, "Writable": writable,
+            "Point Address": str(address)}
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.registers = {address: address * 10 for address in range(300)}
+        self.coils = {address: address % 3 == 0 for address in range(300)}
+        self.requests = []
+
+    def read_holding_registers(self, address, count, unit=0):
+        self.requests.append(("holding", address, count))
+        return ReadHoldingRegistersResponse([self.registers[a] for a in range(address, address + count)])
+
+    def read_coils(self, address, count, unit=0):
+        self.requests.append(("coils", address, count))
+        return ReadCoilsResponse([self.coils[a] for a in range(address, address + count)])
+
+    def read_input_registers(self, address, count, unit=0):
+        raise AssertionError("no input registers configured")
+
+    def read_discrete_inputs(self, address, count, unit=0):
+        raise AssertionError("no discrete inputs configured")
+
+
+@pytest.mark.driver
+@pytest.mark.parametrize(
+    "ranges, max_gap, max_count, expected",
+    [
+        ([(0, 1), (2, 3), (10, 10)], 0, 100, [(0, 4), (10, 1)]),
+        ([(0, 1), (2, 3), (10, 10)], 6, 100, [(0, 11)]),
+        ([(0, 1), (2, 3), (10, 10)], 5, 100, [(0, 4), (10, 1)]),
+        ([(address, address) for address in range(250)], 0, 100, [(0, 100), (100, 100), (200, 50)]),
+        ([(0, 50), (55, 160)], 10, 100, [(0, 51), (55, 100), (155, 6)]),
+        ([(0, 97), (98, 101)], 0, 100, [(0, 100), (100, 2)]),
+        ([(0, 0), (3, 3), (200, 201)], 150, 100, [(0, 4), (200, 2)]),
+        ([], 10, 100, []),
+    ],
+)
+def test_plan_requests(ranges, max_gap, max_count, expected):
+    assert plan_requests(ranges, max_gap, max_count) == expected
+
+
+@pytest.mark.driver
+def test_scrape_should_read_across_gaps():
+    interface = Interface()
+    interface.configure({"device_address": "10.0.0.1", "max_register_gap": 4, "max_read_registers": 6},
+                        [registry_row("a", ">H", 0), registry_row("b", ">I", 3), registry_row("c", ">H", 10),
+                         registry_row("d", ">H", 20), registry_row("coil1", "BOOL", 3),
+                         registry_row("coil2", "BOOL", 6)])
+    client = FakeClient()
+
+    result = interface.scrape_registers(client)
+
+    assert interface.scrape_request_count == 4
+    assert client.requests == [("holding", 0, 5), ("holding", 10, 1), ("holding", 20, 1), ("coils", 3, 4)]
+    assert result == {"a": 0, "b": (30 << 16) + 40, "c": 100, "d": 200, "coil1": True, "coil2": True}
+
+
+@pytest.mark.driver
+def test_scrape_should_split_long_bit_ranges():
+    interface = Interface()
+    interface.configure({"device_address": "10.0.0.1"},
+                        [registry_row("coil{}".format(address), "BOOL", address) for address in range(150)])
+    client = FakeClient()
+
+    result = interface.scrape_registers(client)
+
+    assert client.requests == [("coils", 0, 100), ("coils", 100, 50)]
+    assert result == {"coil{}".format(address): address % 3 == 0 for address in range(150)}
@@ -0,0 +1,151 @@
+import gevent
+import pytest
+
+from platform_driver.scrape_scheduler import ScrapeScheduler, ScrapeStats
+
+
+class FakeDriver(object):
+    """Records the scrapes the scheduler starts, each taking duration seconds."""
+
+    in_flight = {}
+    max_in_flight = {}
+
+    def __init__(self, device_path, interval=0.1, duration=0.01, time_slot_offset=0.0,
+                 driver_type="fakedriver", host=None):
+        self.device_path = device_path
+        self.interval = interval
+        self.duration = duration
+        self.time_slot_offset = time_slot_offset
+        self.config = {"driver_type": driver_type, "driver_config": {"device_address": host}}
+        self.scrapes = []
+        self.overlapping = False
+        self.running = False
+
+    def periodic_read(self, now):
+        self.overlapping = self.overlapping or self.running
+        self.running = True
+        self.scrapes.append(now.timestamp())
+        for key in ("all", self.config["driver_type"], self.config["driver_config"]["device_address"]):
+            FakeDriver.in_flight[key] = FakeDriver.in_flight.get(key, 0) + 1
+            FakeDriver.max_in_flight[key] = max(FakeDriver.max_in_flight.get(key, 0), FakeDriver.in_flight[key])
+        gevent.sleep(self.duration)
+        for key in ("all", self.config["driver_type"], self.config["driver_config"]["device_address"]):
+            FakeDriver.in_flight[key] -= 1
+        self.running = False
+
+
+@pytest.fixture
+def scheduler():
+    FakeDriver.in_flight.clear()
+    FakeDriver.max_in_flight.clear()
+    scheduler = ScrapeScheduler()
+    yield scheduler
+    scheduler.stop()
+
+
+@pytest.mark.driver_unit
+def test_scrapes_should_follow_interval_grid(scheduler):
+    driver = FakeDriver("campus/device", interval=0.1, duration=0.03, time_slot_offset=0.02)
+    scheduler.add_device(driver)
+    gevent.sleep(0.55)
+
+    assert 4 <= len(driver.scrapes) <= 6
+    for first, second in zip(driver.scrapes, driver.scrapes[1:]):
+        assert second - first == pytest.approx(0.1, abs=1e-3)
+    assert (driver.scrapes[0] - 0.02) / 0.1 == pytest.approx(round((driver.scrapes[0] - 0.02) / 0.1), abs=1e-3)
+    stats = scheduler.get_stats()["campus/device"]
+    assert stats["skipped"] == 0
+    # The last scrape may still be running.
+    assert len(driver.scrapes) - 1 <= stats["scrapes"] <= len(driver.scrapes)
+
+
+@pytest.mark.driver_unit
+def test_overrunning_scrapes_should_be_skipped_and_counted(scheduler):
+    driver = FakeDriver("campus/slow", interval=0.1, duration=0.25)
+    scheduler.add_device(driver)
+    gevent.sleep(0.75)
+
+    stats = scheduler.get_stats()["campus/slow"]
+    assert not driver.overlapping
+    assert stats["skipped"] >= 3
+    assert stats["histogram"]["0.5"] == stats["scrapes"]
+    for first, second in zip(driver.scrapes, driver.scrapes[1:]):
+        assert round((second - first) / 0.1) == 3
+
+
+@pytest.mark.driver_unit
+def test_scrapes_should_be_limited_per_host(scheduler):
+    scheduler.configure(max_scrapes_per_host=1, adaptive_offsets=False)
+    drivers = [FakeDriver("campus/device{}".format(index), interval=0.2, duration=0.02, host="10.0.0.{}".format(
+        index % 2)) for index in range(6)]
+    for driver in drivers:
+        scheduler.add_device(driver)
+    gevent.sleep(0.5)
+
+    assert all(driver.scrapes for driver in drivers)
+    assert FakeDriver.max_in_flight["10.0.0.0"] == 1
+    assert FakeDriver.max_in_flight["10.0.0.1"] == 1
+    assert FakeDriver.max_in_flight["all"] == 2
+
+
+@pytest.mark.driver_unit
+def test_scrapes_should_be_limited_per_driver_type(scheduler):
+    scheduler.configure(max_scrapes_per_driver_type=2)
+    drivers = [FakeDriver("campus/bacnet{}".format(index), interval=0.2, duration=0.02, driver_type="bacnet")
+               for index in range(5)]
+    drivers.append(FakeDriver("campus/modbus", interval=0.2, duration=0.02, driver_type="modbus"))
+    for driver in drivers:
+        scheduler.add_device(driver)
+    gevent.sleep(0.5)
+
+    assert all(driver.scrapes for driver in drivers)
+    assert FakeDriver.max_in_flight["bacnet"] == 2
+    assert FakeDriver.max_in_flight["all"] == 3
+
+
+@pytest.mark.driver_unit
+def test_adaptive_offsets_should_stagger_devices_on_same_host(scheduler):
+    slow = FakeDriver("campus/a", interval=1.0, duration=0.3, host="10.0.0.1")
+    fast = FakeDriver("campus/b", interval=1.0, duration=0.01, host="10.0.0.1")
+    other = FakeDriver("campus/c", interval=1.0, duration=0.01, host="10.0.0.2")
+    for driver in (slow, fast, other):
+        scheduler.add_device(driver)
+
+    scheduler._devices["campus/a"].stats.record(0.3)
+    scheduler._update_offsets(scheduler._devices["campus/a"])
+
+    stats = scheduler.get_stats()
+    assert stats["campus/a"]["offset"] == 0.0
+    assert stats["campus/b"]["offset"] == pytest.approx(0.3)
+    assert stats["campus/c"]["offset"] == 0.0
+
+    scheduler.configure(adaptive_offsets=False)
+    assert scheduler.get_stats()["campus/b"]["offset"] == 0.0
+
+
+@pytest.mark.driver_unit
+def test_removed_devices_should_not_be_scraped(scheduler):
+    driver = FakeDriver("campus/device", interval=0.1)
+    scheduler.add_device(driver)
+    gevent.sleep(0.25)
+    scheduler.remove_device(driver)
+    scrapes = len(driver.scrapes)
+    gevent.sleep(0.25)
+
+    assert scrapes > 0
+    assert len(driver.scrapes) == scrapes
+    assert scheduler.get_stats() == {}
+
+
+@pytest.mark.driver_unit
+def test_scrape_stats_should_bucket_durations():
+    stats = ScrapeStats()
+    for duration in (0.05, 0.1, 0.3, 4.0, 120.0):
+        stats.record(duration)
+
+    result = stats.to_dict()
+    assert result["scrapes"] == 5
+    assert result["max_duration"] == 120.0
+    assert result["last_duration"] == 120.0
+    assert result["histogram"] == {"0.1": 2, "0.25": 0, "0.5": 1, "1.0": 0, "2.5": 0, "5.0": 1, "10.0": 0,
+                                   "30.0": 0, "60.0": 0, "+Inf": 1}
@@ -155,7 +155,7 @@ class SQLHistorian(BaseHistorian):
         """
         Optional function to manage database size.
         """
-        self.bg_thread_dbutils.manage_db_size(history_limit_timestamp, storage_limit_gb)
+        return self.bg_thread_dbutils.manage_db_size(history_limit_timestamp, storage_limit_gb)
 
     @doc_inherit
     def version(self):
@@ -543,8 +543,9 @@ class SQLiteTaggingService(BaseTaggingService):
     @doc_inherit
     def query_topics_by_tags(self, ast, skip=0, count=None, order=None):
 
-        query = self.sqlite_utils.get_tagging_query_from_ast(
-            self.topic_tags_table, ast, self.tag_refs)
+        query = self.get_backend_query(
+            ast, lambda tree: self.sqlite_utils.get_tagging_query_from_ast(
+                self.topic_tags_table, tree, self.tag_refs))
         order_by = ' \nORDER BY topic_prefix ASC'
         if order == 'LAST_TO_FIRST':
             order_by = ' \nORDER BY topic_prefix DESC'
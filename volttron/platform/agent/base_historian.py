@@ -63,7 +63,8 @@ The :py:class:`BaseHistorian` class provides the following features:
 - Automatically subscribe to and process device publishes.
 - Automatically backup data retrieved off the message bus to a disk cache.
   Cached data will only be removed once it is successfully published to a data
-  store.
+  store. The cache is a SQLite database by default, the `cache_backend`
+  setting "segment_log" selects an append-only log of segment files instead.
 - Existing Agents that publish analytical data for storage or query for
   historical data will be able to use the new Historian without any code
   changes.
@@ -189,6 +190,31 @@ As records are published to the data store
 records that was published or :py:meth:`BaseHistorianAgent.report_all_handled`
 if everything was published.
 
+Batch Publishing
+----------------
+
+Device and analysis `all` publishes are queued and cached as a single
+:py:class:`BatchRecord` per scrape rather than one record per point. By default
+these are expanded back into the per-point form shown above before
+:py:meth:`BaseHistorianAgent.publish_to_historian` is called. A historian that
+can write a whole scrape at once may pass `batch_publish=True` to the
+:py:class:`BaseHistorianAgent` constructor, in which case `to_publish_list` is
+a list of :py:class:`BatchRecord` objects. Each holds the parallel lists
+`topics`, `values` and `meta` sharing one `timestamp`, `source` and `headers`.
+A :py:class:`BatchRecord` may be passed to
+:py:meth:`BaseHistorianAgent.report_handled` directly.
+
+Pipelined Publishing
+--------------------
+
+With the `pipelined_publish` setting the process loop reads and decodes the
+next batch from the cache in a worker thread while
+:py:meth:`BaseHistorianAgent.publish_to_historian` writes the current one, and
+removes published records from the cache a few batches at a time. This helps
+historians whose writes spend most of their time waiting on a remote
+database. Records that were not reported as handled are retried on the next
+pass through the cache rather than in the very next batch.
+
 Querying Data
 -------------
 
@@ -215,17 +241,23 @@ the same date over again.
 
 
 from abc import abstractmethod
+import bisect
 from collections import defaultdict
 from datetime import datetime, timedelta
 from functools import wraps
+import hashlib
 import logging
 from queue import Queue, Empty
 import os
 import re
+import shutil
 import sqlite3
+import struct
 import threading
 from threading import Thread
+import time
 import weakref
+import zlib
 
 from dateutil.parser import parse
 import gevent
@@ -306,6 +338,98 @@ def add_timing_data_to_header(headers, agent_id, phase):
     return abs((time1 - time2).total_seconds())
 
 
+class BatchRecord:
+    """
+    All of the points from a single device scrape.
+
+    Point names, values and metadata are kept in parallel lists which share a
+    single timestamp and headers dict. This is the unit that travels through
+    the event queue and the backup cache for device and analysis data, and
+    optionally the unit passed to
+    :py:meth:`BaseHistorianAgent.publish_to_historian`.
+
+    `ids` holds the cache ids of the points once they have been read back
+    from the backup cache, in the same order as `points`.
+    """
+    __slots__ = ('source', 'device', 'timestamp', 'headers', 'points', 'values', 'meta', 'ids')
+
+    def __init__(self, source, device, timestamp, headers, points, values, meta, ids=None):
+        self.source = source
+        self.device = device
+        self.timestamp = timestamp
+        self.headers = headers
+        self.points = points
+        self.values = values
+        self.meta = meta
+        self.ids = ids if ids is not None else []
+
+    def __len__(self):
+        return len(self.points)
+
+    def __repr__(self):
+        return "BatchRecord(source={!r}, device={!r}, timestamp={!r}, points={})".format(
+            self.source, self.device, self.timestamp, len(self.points))
+
+    @property
+    def topics(self):
+        prefix = self.device + '/' if self.device else ''
+        return [prefix + point for point in self.points]
+
+    def to_records(self):
+        """
+        Expand the batch into the per point record dictionaries normally
+        passed to :py:meth:`BaseHistorianAgent.publish_to_historian`.
+        """
+        records = []
+        for index, topic in enumerate(self.topics):
+            record = {'timestamp': self.timestamp,
+                      'source': self.source,
+                      'topic': topic,
+                      'value': self.values[index],
+                      'headers': self.headers,
+                      'meta': self.meta[index]}
+            if self.ids:
+                record['_id'] = self.ids[index]
+            records.append(record)
+        return records
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Group consecutive per point records read from the cache which share a
+        source, timestamp and device back into batches.
+
+        :param records: List of records from
+                        :py:meth:`BackupDatabase.get_outstanding_to_publish`
+        :returns: List of :py:class:`BatchRecord`
+        """
+        batches = []
+        current = None
+        for record in records:
+            device, _, point = record['topic'].rpartition('/')
+            if (current is None or
+                    current.device != device or
+                    current.timestamp != record['timestamp'] or
+                    current.source != record['source']):
+                current = cls(record['source'], device, record['timestamp'], record['headers'],
+                              [], [], [], [])
+                batches.append(current)
+            current.points.append(point)
+            current.values.append(record['value'])
+            current.meta.append(record['meta'])
+            current.ids.append(record['_id'])
+        return batches
+
+
+# Valid values for the cache_backend setting.
+CACHE_BACKENDS = ("sqlite", "segment_log")
+# Valid values for the backup_journal_mode and backup_synchronous settings.
+BACKUP_JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+BACKUP_SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+# With pipelined_publish, published records are removed from the cache once
+# this many batches worth of them have been acknowledged.
+PIPELINE_DELETE_BATCHES = 4
+
 STATUS_KEY_BACKLOGGED = "backlogged"
 STATUS_KEY_CACHE_COUNT = "cache_count"
 STATUS_KEY_PUBLISHING = "publishing"
@@ -313,6 +437,8 @@ STATUS_KEY_CACHE_FULL = "cache_full"
 STATUS_KEY_TIME_ERROR = "records_with_invalid_timestamp"
 STATUS_KEY_CACHE_ONLY = "cache_only_enabled"
 STATUS_KEY_ERROR_MANAGE_DB_SIZE = "error_managing_db_size"
+STATUS_KEY_RETENTION_DURATION = "retention_duration"
+STATUS_KEY_RETENTION_ROWS_REMOVED = "retention_rows_removed"
 
 
 class BaseHistorianAgent(Agent):
@@ -350,6 +476,9 @@ class BaseHistorianAgent(Agent):
                  max_time_publishing=30.0,
                  backup_storage_limit_gb=None,
                  backup_storage_report=0.9,
+                 backup_journal_mode="WAL",
+                 backup_synchronous="NORMAL",
+                 cache_backend="sqlite",
                  topic_replace_list=[],
                  gather_timing_data=False,
                  readonly=False,
@@ -361,6 +490,7 @@ class BaseHistorianAgent(Agent):
                  message_publish_count=10000,
                  history_limit_days=None,
                  storage_limit_gb=None,
+                 retention_period=600.0,
                  sync_timestamp=False,
                  custom_topics={},
                  device_data_filter={},
@@ -368,6 +498,8 @@ class BaseHistorianAgent(Agent):
                  time_tolerance=None,
                  time_tolerance_topics=None,
                  cache_only_enabled=False,
+                 batch_publish=False,
+                 pipelined_publish=False,
                  **kwargs):
 
         super(BaseHistorianAgent, self).__init__(**kwargs)
@@ -376,6 +508,9 @@ class BaseHistorianAgent(Agent):
         # cache database
         self._process_loop_in_greenlet = process_loop_in_greenlet
         self._topic_replace_list = topic_replace_list
+        # Concrete historians which can consume whole device scrapes set this
+        # to receive BatchRecord objects in publish_to_historian.
+        self._batch_publish = bool(batch_publish)
 
         self._async_call = AsyncCall()
 
@@ -386,11 +521,20 @@ class BaseHistorianAgent(Agent):
 
         self._backup_storage_limit_gb = backup_storage_limit_gb
         self._backup_storage_report = backup_storage_report
+        self._backup_journal_mode, self._backup_synchronous = self._validate_backup_pragmas(
+            backup_journal_mode, backup_synchronous)
+        if cache_backend not in CACHE_BACKENDS:
+            raise ValueError(f"cache_backend should be one of {CACHE_BACKENDS}. Got {cache_backend}")
+        self._cache_backend = cache_backend
+        self._pipelined_publish = bool(pipelined_publish)
         self._retry_period = float(retry_period)
         self._submit_size_limit = int(submit_size_limit)
         self._max_time_publishing = float(max_time_publishing)
         self._history_limit_days = history_limit_days
         self._storage_limit_gb = storage_limit_gb
+        self._retention_period = float(retention_period)
+        # Monotonic time manage_db_size is next due.
+        self._next_retention_time = 0.0
         self._successful_published = set()
         # Remove the need to reset subscriptions to eliminate possible data
         # loss at config change.
@@ -438,6 +582,10 @@ class BaseHistorianAgent(Agent):
                                 "max_time_publishing": self._max_time_publishing,
                                 "backup_storage_limit_gb": self._backup_storage_limit_gb,
                                 "backup_storage_report": self._backup_storage_report,
+                                "backup_journal_mode": self._backup_journal_mode,
+                                "backup_synchronous": self._backup_synchronous,
+                                "cache_backend": self._cache_backend,
+                                "pipelined_publish": self._pipelined_publish,
                                 "topic_replace_list": self._topic_replace_list,
                                 "gather_timing_data": self.gather_timing_data,
                                 "readonly": self._readonly,
@@ -448,6 +596,7 @@ class BaseHistorianAgent(Agent):
                                 "message_publish_count": self._message_publish_count,
                                 "storage_limit_gb": storage_limit_gb,
                                 "history_limit_days": history_limit_days,
+                                "retention_period": self._retention_period,
                                 "custom_topics": custom_topics,
                                 "device_data_filter": device_data_filter,
                                 "all_platforms": self._all_platforms,
@@ -467,6 +616,16 @@ class BaseHistorianAgent(Agent):
         self._default_config.update(config)
         self.vip.config.set_default("config", self._default_config)
 
+    @staticmethod
+    def _validate_backup_pragmas(journal_mode, synchronous):
+        journal_mode = str(journal_mode).upper()
+        synchronous = str(synchronous).upper()
+        if journal_mode not in BACKUP_JOURNAL_MODES:
+            raise ValueError(f"backup_journal_mode should be one of {BACKUP_JOURNAL_MODES}. Got {journal_mode}")
+        if synchronous not in BACKUP_SYNCHRONOUS_LEVELS:
+            raise ValueError(f"backup_synchronous should be one of {BACKUP_SYNCHRONOUS_LEVELS}. Got {synchronous}")
+        return journal_mode, synchronous
+
     def start_process_thread(self):
         if self._process_loop_in_greenlet:
             self._process_thread = self.core.spawn(self._process_loop)
@@ -480,13 +639,16 @@ class BaseHistorianAgent(Agent):
 
     def manage_db_size(self, history_limit_timestamp, storage_limit_gb):
         """
-        Called in the process thread after data is published.
+        Called in the process thread every `retention_period` seconds,
+        between publishes.
         This can be overridden in historian implementations
         to apply the storage_limit_gb and history_limit_days
         settings to the storage medium.
 
         :param history_limit_timestamp: remove all data older than this timestamp
         :param storage_limit_gb: remove oldest data until database is smaller than this value.
+        :returns: Number of records removed, or None if not known. Reported
+                  in the agent status as retention_rows_removed.
         """
         pass
 
@@ -533,6 +695,13 @@ class BaseHistorianAgent(Agent):
             else:
                 backup_storage_report = 0.9
 
+            backup_journal_mode, backup_synchronous = self._validate_backup_pragmas(
+                config.get("backup_journal_mode", "WAL"), config.get("backup_synchronous", "NORMAL"))
+            cache_backend = config.get("cache_backend", "sqlite")
+            if cache_backend not in CACHE_BACKENDS:
+                raise ValueError(f"cache_backend should be one of {CACHE_BACKENDS}. Got {cache_backend}")
+            pipelined_publish = bool(config.get("pipelined_publish", False))
+
             retry_period = float(config.get("retry_period", 300.0))
 
             storage_limit_gb = config.get("storage_limit_gb")
@@ -544,6 +713,7 @@ class BaseHistorianAgent(Agent):
                 history_limit_days = float(history_limit_days)
             else:
                 history_limit_days = None
+            retention_period = float(config.get("retention_period", 600.0))
 
             submit_size_limit = int(config.get("submit_size_limit", 1000))
             max_time_publishing = float(config.get("max_time_publishing", 30.0))
@@ -591,11 +761,17 @@ class BaseHistorianAgent(Agent):
         self.gather_timing_data = gather_timing_data
         self._backup_storage_limit_gb = backup_storage_limit_gb
         self._backup_storage_report = backup_storage_report
+        self._backup_journal_mode = backup_journal_mode
+        self._backup_synchronous = backup_synchronous
+        self._cache_backend = cache_backend
+        self._pipelined_publish = pipelined_publish
         self._retry_period = retry_period
         self._submit_size_limit = submit_size_limit
         self._max_time_publishing = max_time_publishing
         self._history_limit_days = history_limit_days
         self._storage_limit_gb = storage_limit_gb
+        self._retention_period = retention_period
+        self._next_retention_time = 0.0
         self._all_platforms = all_platforms
         self._readonly = readonly
         self._message_publish_count = message_publish_count
@@ -1007,13 +1183,11 @@ class BaseHistorianAgent(Agent):
         if self.gather_timing_data:
             add_timing_data_to_header(headers, self.core.agent_uuid or self.core.identity, "collected")
 
-        for key, value in values.items():
-            point_topic = device + '/' + key
-            self._event_queue.put({'source': source,
-                                   'topic': point_topic,
-                                   'readings': [(timestamp, value)],
-                                   'meta': meta.get(key, {}),
-                                   'headers': headers})
+        points = list(values)
+        self._event_queue.put(BatchRecord(source, device, timestamp, headers,
+                                          points,
+                                          list(values.values()),
+                                          [meta.get(point, {}) for point in points]))
 
     def _capture_actuator_data(self, topic, headers, message, match):
         """Capture actuation data and submit it to be published by a historian.
@@ -1124,8 +1298,17 @@ class BaseHistorianAgent(Agent):
                 _log.info("Historian setup in readonly mode.")
                 return
 
-            backupdb = BackupDatabase(self, self._backup_storage_limit_gb,
-                                      self._backup_storage_report)
+            if self._cache_backend == "segment_log":
+                backupdb = SegmentLogBackupCache(self, self._backup_storage_limit_gb,
+                                                 self._backup_storage_report)
+            else:
+                # The pipelined publish loop reads ahead from a threadpool
+                # thread. Reads never overlap other use of the connection.
+                backupdb = BackupDatabase(self, self._backup_storage_limit_gb,
+                                          self._backup_storage_report,
+                                          check_same_thread=not self._pipelined_publish,
+                                          journal_mode=self._backup_journal_mode,
+                                          synchronous=self._backup_synchronous)
             self._update_status({STATUS_KEY_CACHE_COUNT: backupdb.get_backlog_count()})
 
             # now that everything is setup we need to make sure that the topics
@@ -1189,18 +1372,25 @@ class BaseHistorianAgent(Agent):
                     self._historian_setup()
 
                 # if setup was successful proceed to publish loop
-                if not self._setup_failed:
+                if not self._setup_failed and self._pipelined_publish:
+                    wait_for_input, published_count = self._do_pipelined_publish(backupdb)
+                    current_published_count += published_count
+                    if self._message_publish_count > 0 and current_published_count >= next_report_count:
+                        _log.info("Historian processed {} total records.".format(current_published_count))
+                        next_report_count = current_published_count + self._message_publish_count
+
+                elif not self._setup_failed:
                     wait_for_input = True
                     start_time = datetime.utcnow()
 
                     while True:
                         # use local variable that will be written only one time during this loop
                         cache_only_enabled = self.is_cache_only_enabled()
-                        to_publish_list = backupdb.get_outstanding_to_publish(
+                        records = backupdb.get_outstanding_to_publish(
                             self._submit_size_limit)
 
                         # Check to see if we are caught up.
-                        if not to_publish_list:
+                        if not records:
                             if self._message_publish_count > 0 and next_report_count < current_published_count:
                                 _log.info("Historian processed {} total records.".format(current_published_count))
                                 next_report_count = current_published_count + self._message_publish_count
@@ -1212,11 +1402,10 @@ class BaseHistorianAgent(Agent):
                         if self._stop_process_loop:
                             break
 
-                        history_limit_timestamp = None
-                        if self._history_limit_days is not None:
-                            last_element = to_publish_list[-1]
-                            last_time_stamp = last_element["timestamp"]
-                            history_limit_timestamp = last_time_stamp - self._history_limit_days
+                        if self._batch_publish:
+                            to_publish_list = BatchRecord.from_records(records)
+                        else:
+                            to_publish_list = records
 
                         try:
                             if not cache_only_enabled:
@@ -1226,14 +1415,6 @@ class BaseHistorianAgent(Agent):
                             _log.exception(
                                 f"An unhandled exception occurred while publishing: {e}")
 
-                        try:
-                            self.manage_db_size(history_limit_timestamp, self._storage_limit_gb)
-                            self._update_status({STATUS_KEY_ERROR_MANAGE_DB_SIZE: False})
-                        except Exception as e:
-                            _log.exception(
-                                f"An unhandled exception occurred while attempting to managing db size: {e}")
-                            self._send_alert({STATUS_KEY_ERROR_MANAGE_DB_SIZE: True}, "error_managing_db_size")
-
                         # if the success queue is empty then we need not remove
                         # them from the database and we are probably having connection problems.
                         # Update the status and send alert accordingly.
@@ -1256,7 +1437,7 @@ class BaseHistorianAgent(Agent):
                                              STATUS_KEY_CACHE_ONLY: cache_only_enabled})
 
                         if None in self._successful_published:
-                            current_published_count += len(to_publish_list)
+                            current_published_count += len(records)
                         else:
                             current_published_count += len(self._successful_published)
 
@@ -1279,6 +1460,9 @@ class BaseHistorianAgent(Agent):
                 if self._stop_process_loop:
                     break
 
+                if not self._setup_failed:
+                    self._manage_db_size()
+
             backupdb.close()
 
             try:
@@ -1292,6 +1476,120 @@ class BaseHistorianAgent(Agent):
             _log.debug("Process loop stopped.")
             self._stop_process_loop = False
 
+    def _do_pipelined_publish(self, backupdb):
+        """
+        Publish the backlog while reading ahead. The next batch is read from
+        the cache and decoded in the hub threadpool while the concrete
+        historian writes the current one, and published records are removed
+        from the cache in coalesced chunks rather than after every batch.
+        Records that were not reported as handled stay in the cache and are
+        retried on the next pass.
+
+        :returns: Whether to wait for input and the number of records published.
+        :rtype: tuple
+        """
+        threadpool = get_hub().threadpool
+        size_limit = self._submit_size_limit
+        start_time = datetime.utcnow()
+        wait_for_input = True
+        published_count = 0
+        # Rows at the head of the cache that have already been read. These
+        # are skipped by the read ahead until they are removed.
+        read_offset = 0
+        pending_removal = []
+
+        def read_batch(offset):
+            records = backupdb.get_outstanding_to_publish(size_limit, offset)
+            if self._batch_publish:
+                return records, BatchRecord.from_records(records), backupdb.last_read_count
+            return records, records, backupdb.last_read_count
+
+        records, to_publish_list, read_count = read_batch(read_offset)
+        try:
+            while records:
+                read_offset += read_count
+                cache_only_enabled = self.is_cache_only_enabled()
+                # Nothing is removed from the cache while cache only is enabled.
+                if self._stop_process_loop or cache_only_enabled:
+                    break
+
+                next_batch = threadpool.spawn(read_batch, read_offset)
+
+                try:
+                    self.publish_to_historian(to_publish_list)
+                except Exception as e:
+                    _log.exception(
+                        f"An unhandled exception occurred while publishing: {e}")
+
+                successful_published = self._successful_published
+                self._successful_published = set()
+                next_records, next_to_publish_list, next_read_count = next_batch.get()
+
+                if not successful_published:
+                    self._send_alert({STATUS_KEY_PUBLISHING: False}, "historian_not_publishing")
+                    break
+
+                if None in successful_published:
+                    published = [record['_id'] for record in records]
+                else:
+                    published = [_id for _id in successful_published if _id is not None]
+                pending_removal.extend(published)
+                published_count += len(published)
+                if len(pending_removal) >= size_limit * PIPELINE_DELETE_BATCHES:
+                    read_offset -= backupdb.remove_published(pending_removal)
+                    pending_removal = []
+
+                backlog_count = backupdb.get_backlog_count()
+                old_backlog_state = self._current_status_context[STATUS_KEY_BACKLOGGED]
+                self._update_status({STATUS_KEY_PUBLISHING: True,
+                                     STATUS_KEY_BACKLOGGED: old_backlog_state and backlog_count > 0,
+                                     STATUS_KEY_CACHE_COUNT: backlog_count,
+                                     STATUS_KEY_CACHE_ONLY: cache_only_enabled})
+
+                records, to_publish_list, read_count = next_records, next_to_publish_list, next_read_count
+                if (datetime.utcnow() - start_time).total_seconds() > self._max_time_publishing:
+                    wait_for_input = False
+                    break
+            else:
+                # Caught up.
+                if pending_removal:
+                    backupdb.remove_published(pending_removal)
+                    pending_removal = []
+                self._update_status({STATUS_KEY_BACKLOGGED: False,
+                                     STATUS_KEY_CACHE_COUNT: backupdb.get_backlog_count()})
+        finally:
+            if pending_removal:
+                backupdb.remove_published(pending_removal)
+
+        return wait_for_input, published_count
+
+    def _manage_db_size(self):
+        """
+        Apply the history_limit_days and storage_limit_gb settings by calling
+        :py:meth:`manage_db_size` if retention_period has passed since it
+        last ran. Runs in the process thread, between publishes.
+        """
+        now = time.monotonic()
+        if now < self._next_retention_time:
+            return
+        self._next_retention_time = now + self._retention_period
+
+        history_limit_timestamp = None
+        if self._history_limit_days is not None:
+            history_limit_timestamp = get_aware_utc_now() - timedelta(days=self._history_limit_days)
+
+        try:
+            rows_removed = self.manage_db_size(history_limit_timestamp, self._storage_limit_gb)
+            self._update_status({STATUS_KEY_ERROR_MANAGE_DB_SIZE: False,
+                                 STATUS_KEY_RETENTION_DURATION: round(time.monotonic() - now, 3),
+                                 STATUS_KEY_RETENTION_ROWS_REMOVED: rows_removed})
+        except Exception as e:
+            _log.exception(
+                f"An unhandled exception occurred while attempting to managing db size: {e}")
+            self._send_alert({STATUS_KEY_ERROR_MANAGE_DB_SIZE: True,
+                              STATUS_KEY_RETENTION_DURATION: round(time.monotonic() - now, 3)},
+                             "error_managing_db_size")
+
     def _historian_setup(self):
         try:
             _log.info("Trying to setup historian")
@@ -1313,13 +1611,14 @@ class BaseHistorianAgent(Agent):
         removed from the cache.
 
         :param record: Record or list of records to remove from cache.
-        :type record: dict or list
+        :type record: dict, BatchRecord or list
         """
-        if isinstance(record, list):
-            for x in record:
+        records = record if isinstance(record, list) else [record]
+        for x in records:
+            if isinstance(x, BatchRecord):
+                self._successful_published.update(x.ids)
+            else:
                 self._successful_published.add(x['_id'])
-        else:
-            self._successful_published.add(record['_id'])
 
     def report_all_handled(self):
         """
@@ -1360,6 +1659,10 @@ class BaseHistorianAgent(Agent):
                 ...
             ]
 
+        If the historian was created with `batch_publish=True` the list
+        contains :py:class:`BatchRecord` objects instead, one per device
+        scrape.
+
         The contents of `meta` is not consistent. The keys in the meta data
         values can be different and can
         change along with the values of the meta data. It is safe to assume
@@ -1451,6 +1754,19 @@ class BaseHistorianAgent(Agent):
 #             my_deque.popleft()
 
 
+def _backup_cache_dir():
+    """
+    Directory the backup cache is created in. We want to create it in the
+    agent-data directory since agent will not have write access to any other
+    directory in agent isolation mode.
+    """
+    agent_data_dir = os.path.join(os.getcwd(), os.path.basename(os.getcwd()) + ".agent-data")
+    if os.path.exists(agent_data_dir):
+        return agent_data_dir
+    # means its a dynamic agent
+    return os.getcwd()
+
+
 class BackupDatabase:
     """
     A creates and manages backup cache for the
@@ -1461,7 +1777,8 @@ class BackupDatabase:
     """
 
     def __init__(self, owner, backup_storage_limit_gb, backup_storage_report,
-                 check_same_thread=True):
+                 check_same_thread=True, journal_mode="WAL", synchronous="NORMAL",
+                 page_check_interval=1000):
         # The topic cache is only meant as a local lookup and should not be
         # accessed via the implemented historians.
         self._backup_cache = {}
@@ -1472,10 +1789,30 @@ class BackupDatabase:
         self._owner = weakref.ref(owner)
         self._backup_storage_limit_gb = backup_storage_limit_gb
         self._backup_storage_report = backup_storage_report
+        self._journal_mode = journal_mode.upper()
+        self._synchronous = synchronous.upper()
+        if self._journal_mode not in BACKUP_JOURNAL_MODES:
+            raise ValueError(f"Invalid journal mode for backup cache: {journal_mode}")
+        if self._synchronous not in BACKUP_SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Invalid synchronous level for backup cache: {synchronous}")
+        # The size of the cache on disk is only checked after this many rows
+        # have been added since the last check, or while the cache is full.
+        self._page_check_interval = page_check_interval
+        self._rows_since_page_check = 0
+        self._cache_full = False
+        # Interned headers: JSON string to header_id and back, and the
+        # decoded dict shared by every record read with that header_id.
+        self._header_ids = {}
+        self._header_strings = {}
+        self._header_dicts = {}
+        self._read_header_ids = set()
         self._connection = None
         self._setupdb(check_same_thread)
         self._dupe_ids = []
         self._unique_ids = []
+        # Number of cache rows, duplicates included, consumed by the last
+        # call to get_outstanding_to_publish.
+        self.last_read_count = 0
 
     def backup_new_data(self, new_publish_list, time_tolerance_check=False):
         """
@@ -1491,31 +1828,19 @@ class BackupDatabase:
         for item in new_publish_list:
             if item is None:
                 continue
+            if isinstance(item, BatchRecord):
+                self._backup_batch(c, item, time_tolerance_check)
+                continue
             source = item['source']
             topic = item['topic']
             meta = item.get('meta', {})
             readings = item['readings']
             headers = item.get('headers', {})
 
-            topic_id = self._backup_cache.get(topic)
-
-            if topic_id is None:
-                c.execute('''INSERT INTO topics values (?,?)''',
-                          (None, topic))
-                c.execute('''SELECT last_insert_rowid()''')
-                row = c.fetchone()
-                topic_id = row[0]
-                self._backup_cache[topic_id] = topic
-                self._backup_cache[topic] = topic_id
-
-            meta_dict = self._meta_data[(source, topic_id)]
-            for name, value in meta.items():
-                current_meta_value = meta_dict.get(name)
-                if current_meta_value != value:
-                    c.execute('''INSERT OR REPLACE INTO metadata
-                                 values(?, ?, ?, ?)''',
-                              (source, topic_id, name, value))
-                    meta_dict[name] = value
+            topic_id = self._get_topic_id(c, topic)
+            self._update_meta(c, source, topic_id, meta)
+            header_string = dumps(headers)
+            header_id = None
 
             # Check outside loop so that we do the check inside loop only if necessary
             if time_tolerance_check:
@@ -1527,108 +1852,27 @@ class BackupDatabase:
                         c.execute(
                             '''INSERT INTO time_error
                             values(NULL, ?, ?, ?, ?, ?)''',
-                            (timestamp, source, topic_id, dumps(value), dumps(headers)))
+                            (timestamp, source, topic_id, dumps(value), header_string))
                         self.time_error_records = True
+                        self._rows_since_page_check += 1
                         continue  # continue to the next record. don't record in outstanding
-                    try:
-                        c.execute(
-                            '''INSERT INTO outstanding
-                            values(NULL, ?, ?, ?, ?, ?)''',
-                            (timestamp, source, topic_id, dumps(value), dumps(headers)))
-                        self._record_count += 1
-                    except sqlite3.IntegrityError as e:
-                        # In the case where we are upgrading an existing installed historian the
-                        # unique constraint may still exist on the outstanding database.
-                        # Ignore this case.
-                        _log.warning(f"sqlite3.Integrity error -- {e}")
-                        pass
+                    if header_id is None:
+                        header_id = self._get_header_id(c, header_string)
+                    self._insert_outstanding(c, [(timestamp, source, topic_id, dumps(value), header_id)])
             else:
-                for timestamp, value in readings:
-                    if timestamp is None:
-                        timestamp = get_aware_utc_now()
-                    try:
-                        c.execute(
-                            '''INSERT INTO outstanding
-                            values(NULL, ?, ?, ?, ?, ?)''',
-                            (timestamp, source, topic_id, dumps(value), dumps(headers)))
-                        self._record_count += 1
-                    except sqlite3.IntegrityError as e:
-                        # In the case where we are upgrading an existing installed historian the
-                        # unique constraint may still exist on the outstanding database.
-                        # Ignore this case.
-                        _log.warning(f"sqlite3.Integrity error -- {e}")
-                        pass
+                header_id = self._get_header_id(c, header_string)
+                self._insert_outstanding(c, [(timestamp if timestamp is not None else get_aware_utc_now(),
+                                              source, topic_id, dumps(value), header_id)
+                                             for timestamp, value in readings])
 
         cache_full = False
         if self._backup_storage_limit_gb is not None:
-            try:
-                def page_count():
-                    c.execute("PRAGMA page_count")
-                    return c.fetchone()[0]
-
-                def free_count():
-                    c.execute("PRAGMA freelist_count")
-                    return c.fetchone()[0]
-
-                p = page_count()
-                f = free_count()
-
-                # check if we are over the alert threshold.
-                if page_count() >= self.max_pages - int(self.max_pages * (1.0 - self._backup_storage_report)):
-                    cache_full = True
-
-                # Now check if we are above the limit, if so start deleting in batches of 100
-                # page count doesnt update even after deleting all records
-                # and record count becomes zero. If we have deleted all record
-                # exit.
-                # _log.debug(f"record count before check is {self._record_count} page count is {p}"
-                #            f" free count is {f}")
-                # max_pages  gets updated based on inserts but freelist_count doesn't
-                # enter delete loop based on page_count
-                min_free_pages = p - self.max_pages
-                error_record_count = 0
-                get_error_count_from_db = True
-                while p > self.max_pages:
-                    cache_full = True
-                    if time_tolerance_check and get_error_count_from_db:
-                        # if time_tolerance_check is enabled and this the first time
-                        # we get into this loop, get the count from db
-                        c.execute("SELECT count(ts) from time_error")
-                        error_record_count = c.fetchone()[0]
-                        get_error_count_from_db = False # after this we will reduce count as we delete
-                    if error_record_count > 0:
-                        # if time_error table has records, try deleting those first before outstanding table
-                        _log.info("cache size exceeded limit Deleting data from time_error")
-                        c.execute(
-                            '''DELETE FROM time_error
-                            WHERE ROWID IN
-                            (SELECT ROWID FROM time_error
-                            ORDER BY ROWID ASC LIMIT 100)''')
-                        error_record_count -= c.rowcount
-                    else:
-                        # error record count is 0, sp set time_error_records to False
-                        self.time_error_records = False
-                        _log.info("cache size exceeded limit Deleting data from outstanding")
-                        c.execute(
-                            '''DELETE FROM outstanding
-                            WHERE ROWID IN
-                            (SELECT ROWID FROM outstanding
-                            ORDER BY ROWID ASC LIMIT 100)''')
-                        if self._record_count < c.rowcount:
-                            self._record_count = 0
-                        else:
-                            self._record_count -= c.rowcount
-                    p = page_count()  # page count doesn't reflect delete without commit
-                    f = free_count()  # freelist count does. So using that to break from loop
-                    if f >= min_free_pages:
-                        break
-                    _log.debug(f" Cleaning cache since we are over the limit. "
-                               f"After delete of 100 records from cache"
-                               f" record count is {self._record_count} time_error record count is {error_record_count} "
-                               f"page count is {p} freelist count is{f}")
-
-            except Exception:
-                _log.exception(f"Exception when checking page count and deleting")
+            if self._cache_full or self._rows_since_page_check >= self._page_check_interval:
+                try:
+                    cache_full = self._check_cache_size(c, time_tolerance_check)
+                except Exception:
+                    _log.exception(f"Exception when checking page count and deleting")
+            self._cache_full = cache_full
 
         try:
             self._connection.commit()
@@ -1643,6 +1887,222 @@ class BackupDatabase:
                 self.time_error_records = True
         return cache_full
 
+    def _check_cache_size(self, c, time_tolerance_check):
+        """
+        Compare the size of the cache file against the configured limit and
+        delete the oldest records if it has been exceeded. Records in
+        time_error are removed before those in outstanding.
+
+        :returns: True if the cache is over the reporting threshold.
+        """
+        self._rows_since_page_check = 0
+
+        c.execute("PRAGMA page_count")
+        p = c.fetchone()[0]
+
+        # check if we are over the alert threshold.
+        cache_full = p >= self.max_pages - int(self.max_pages * (1.0 - self._backup_storage_report))
+        if p <= self.max_pages:
+            return cache_full
+
+        # page count doesnt update even after deleting records until commit,
+        # freelist_count does. So we delete until enough pages are free.
+        min_free_pages = p - self.max_pages
+        # Estimate how many rows fit on a page so the excess can usually be
+        # freed with a single delete.
+        rows_per_page = max(1, self._record_count // p)
+        chunk_size = max(100, int(min_free_pages * rows_per_page))
+
+        error_record_count = 0
+        if time_tolerance_check:
+            c.execute("SELECT count(ts) from time_error")
+            error_record_count = c.fetchone()[0]
+
+        while True:
+            if error_record_count > 0:
+                # if time_error table has records, try deleting those first before outstanding table
+                _log.info("cache size exceeded limit Deleting data from time_error")
+                c.execute(
+                    '''DELETE FROM time_error
+                    WHERE ROWID IN
+                    (SELECT ROWID FROM time_error
+                    ORDER BY ROWID ASC LIMIT ?)''', (chunk_size,))
+                error_record_count -= c.rowcount
+            else:
+                # error record count is 0, sp set time_error_records to False
+                self.time_error_records = False
+                _log.info("cache size exceeded limit Deleting data from outstanding")
+                c.execute(
+                    '''DELETE FROM outstanding
+                    WHERE id IN
+                    (SELECT id FROM outstanding
+                    ORDER BY id ASC LIMIT ?)''', (chunk_size,))
+                self._record_count = max(0, self._record_count - c.rowcount)
+            deleted = c.rowcount
+
+            c.execute("PRAGMA freelist_count")
+            f = c.fetchone()[0]
+            _log.debug(f" Cleaning cache since we are over the limit. "
+                       f"After delete of {deleted} records from cache"
+                       f" record count is {self._record_count} time_error record count is {error_record_count} "
+                       f"page count is {p} freelist count is {f}")
+            if f >= min_free_pages or deleted <= 0:
+                break
+
+        self._remove_unused_headers(c)
+        return True
+
+    @staticmethod
+    def _id_ranges(ids):
+        """
+        Collapse ids into sorted, inclusive (first, last) ranges of
+        consecutive values.
+        """
+        ranges = []
+        for _id in sorted(ids):
+            if ranges and _id == ranges[-1][1] + 1:
+                ranges[-1][1] = _id
+            else:
+                ranges.append([_id, _id])
+        return ranges
+
+    def _get_topic_id(self, c, topic):
+        topic_id = self._backup_cache.get(topic)
+        if topic_id is None:
+            c.execute('''INSERT INTO topics values (?,?)''',
+                      (None, topic))
+            topic_id = c.lastrowid
+            self._backup_cache[topic_id] = topic
+            self._backup_cache[topic] = topic_id
+        return topic_id
+
+    def _get_header_id(self, c, header_string):
+        """
+        Intern a JSON encoded headers dict in the headers table, returning
+        its header_id. Identical headers share a single row.
+        """
+        header_id = self._header_ids.get(header_string)
+        if header_id is None:
+            digest = hashlib.sha1(header_string.encode('utf-8')).hexdigest()
+            c.execute('''SELECT header_id FROM headers WHERE hash = ?''', (digest,))
+            row = c.fetchone()
+            if row is None:
+                c.execute('''INSERT INTO headers (hash, header_string) values (?, ?)''',
+                          (digest, header_string))
+                header_id = c.lastrowid
+            else:
+                header_id = row[0]
+            self._header_ids[header_string] = header_id
+            self._header_strings[header_id] = header_string
+        return header_id
+
+    def _get_headers(self, c, header_id):
+        """
+        Decoded headers for a header_id. Every record with the same headers
+        shares the returned dict.
+        """
+        headers = self._header_dicts.get(header_id)
+        if headers is None:
+            header_string = self._header_strings.get(header_id)
+            if header_string is None:
+                header_string = c.execute('''SELECT header_string FROM headers WHERE header_id = ?''',
+                                          (header_id,)).fetchone()[0]
+            headers = self._header_dicts[header_id] = loads(header_string)
+        return headers
+
+    def _remove_unused_headers(self, c, header_ids=None):
+        """
+        Delete headers no longer referenced by any outstanding row. Only the
+        given header_ids are checked, or the whole table if None. Returns the
+        given header_ids that were deleted.
+        """
+        if header_ids is None:
+            c.execute('''DELETE FROM headers WHERE NOT EXISTS
+                         (SELECT 1 FROM outstanding WHERE outstanding.header_id = headers.header_id)''')
+            self._header_ids.clear()
+            self._header_strings.clear()
+            self._header_dicts.clear()
+            return
+        unused = [header_id for header_id in header_ids
+                  if c.execute('''SELECT 1 FROM outstanding WHERE header_id = ? LIMIT 1''',
+                               (header_id,)).fetchone() is None]
+        c.executemany('''DELETE FROM headers WHERE header_id = ?''', ((header_id,) for header_id in unused))
+        for header_id in unused:
+            self._header_ids.pop(self._header_strings.pop(header_id, None), None)
+            self._header_dicts.pop(header_id, None)
+        return unused
+
+    def _update_meta(self, c, source, topic_id, meta):
+        meta_dict = self._meta_data[(source, topic_id)]
+        if meta_dict == meta:
+            return
+        for name, value in meta.items():
+            current_meta_value = meta_dict.get(name)
+            if current_meta_value != value:
+                c.execute('''INSERT OR REPLACE INTO metadata
+                             values(?, ?, ?, ?)''',
+                          (source, topic_id, name, value))
+                meta_dict[name] = value
+
+    def _insert_outstanding(self, c, rows):
+        """
+        Insert rows of (ts, source, topic_id, value_string, header_id)
+        into the outstanding table with a single executemany.
+        """
+        if len(rows) > 1:
+            c.execute("SAVEPOINT insert_outstanding")
+            try:
+                c.executemany('''INSERT INTO outstanding (ts, source, topic_id, value_string, header_id)
+                                 values(?, ?, ?, ?, ?)''', rows)
+                c.execute("RELEASE insert_outstanding")
+                self._record_count += len(rows)
+                self._rows_since_page_check += len(rows)
+                return
+            except sqlite3.IntegrityError:
+                # Undo the partial batch and retry row by row below.
+                c.execute("ROLLBACK TO insert_outstanding")
+                c.execute("RELEASE insert_outstanding")
+
+        for row in rows:
+            try:
+                c.execute('''INSERT INTO outstanding (ts, source, topic_id, value_string, header_id)
+                             values(?, ?, ?, ?, ?)''', row)
+                self._record_count += 1
+                self._rows_since_page_check += 1
+            except sqlite3.IntegrityError as e:
+                # In the case where we are upgrading an existing installed historian the
+                # unique constraint may still exist on the outstanding database.
+                # Ignore this case.
+                _log.warning(f"sqlite3.Integrity error -- {e}")
+
+    def _backup_batch(self, c, batch, time_tolerance_check):
+        """
+        Cache every point of a :py:class:`BatchRecord`. The timestamp and
+        headers are encoded once for the whole batch.
+        """
+        source = batch.source
+        timestamp = batch.timestamp if batch.timestamp is not None else get_aware_utc_now()
+        # Format once here rather than once per row in the sqlite3 adapter.
+        timestamp = utils.format_timestamp(timestamp)
+        header_string = dumps(batch.headers)
+        topic_ids = [self._get_topic_id(c, topic) for topic in batch.topics]
+        for topic_id, meta in zip(topic_ids, batch.meta):
+            if meta:
+                self._update_meta(c, source, topic_id, meta)
+
+        if time_tolerance_check and batch.headers.get("time_error"):
+            _log.warning(f"Found data with timestamp {timestamp} that is out of configured tolerance ")
+            c.executemany('''INSERT INTO time_error
+                             values(NULL, ?, ?, ?, ?, ?)''',
+                          [(timestamp, source, topic_id, dumps(value), header_string)
+                           for topic_id, value in zip(topic_ids, batch.values)])
+            self.time_error_records = True
+            self._rows_since_page_check += len(topic_ids)
+        else:
+            header_id = self._get_header_id(c, header_string)
+            self._insert_outstanding(c, [(timestamp, source, topic_id, dumps(value), header_id)
+                                         for topic_id, value in zip(topic_ids, batch.values)])
+
     def remove_successfully_published(self, successful_publishes,
                                       submit_size):
         """
@@ -1662,51 +2122,85 @@ class BackupDatabase:
         c = self._connection.cursor()
         try:
             if None in successful_publishes:
-                c.executemany('''DELETE FROM outstanding
-                                          WHERE id = ?''',
-                              ((_id,) for _id in self._unique_ids))
-                if self._record_count < c.rowcount:
-                    self._record_count = 0
-                else:
-                    self._record_count -= len(self._unique_ids)
+                published = self._unique_ids
             else:
-                temp = list(successful_publishes)
-                temp.sort()
-                c.executemany('''DELETE FROM outstanding
-                                WHERE id = ?''',
-                              ((_id,) for _id in
-                               successful_publishes))
-                self._record_count -= len(temp)
+                published = [_id for _id in successful_publishes if _id is not None]
+            self._delete_published(c, published)
         finally:
             # if we don't clear these attributes on every publish,
             # we could possibly delete a non-existing record on the next publish
             self._unique_ids.clear()
             self._dupe_ids.clear()
+            self._read_header_ids.clear()
 
         self._connection.commit()
 
-    def get_outstanding_to_publish(self, size_limit):
+    def remove_published(self, published):
+        """
+        Removes records by id from the backup database. Unlike
+        :py:meth:`remove_successfully_published` this does not depend on
+        the last call to :py:meth:`get_outstanding_to_publish`, so removal
+        of several published batches can be deferred and done at once.
+
+        :param published: Ids of the published records.
+        :type published: list
+        :returns: Number of records removed.
+        :rtype: int
+        """
+        c = self._connection.cursor()
+        try:
+            removed = self._delete_published(c, published)
+        finally:
+            self._unique_ids.clear()
+            self._dupe_ids.clear()
+        self._connection.commit()
+        return removed
+
+    def _delete_published(self, c, published):
+        # Ids are allocated in insertion order, so a published batch is
+        # almost always a handful of contiguous ranges.
+        c.executemany('''DELETE FROM outstanding
+                         WHERE id BETWEEN ? AND ?''',
+                      self._id_ranges(published))
+        removed = c.rowcount
+        self._record_count = max(0, self._record_count - removed)
+        self._read_header_ids.difference_update(
+            self._remove_unused_headers(c, self._read_header_ids))
+        return removed
+
+    def get_outstanding_to_publish(self, size_limit, offset=0):
         """
         Retrieve up to `size_limit` records from the cache. Guarantees a unique list of records,
         where unique is defined as (topic, timestamp).
 
         :param size_limit: Max number of records to retrieve.
+        :param offset: Number of rows at the head of the cache to skip.
         :type size_limit: int
+        :type offset: int
         :returns: List of records for publication.
         :rtype: list
         """
         # _log.debug("Getting oldest outstanding to publish.")
         c = self._connection.cursor()
-        c.execute('select * from outstanding order by ts limit ?', (size_limit,))
+        c.execute('''SELECT id, ts, source, topic_id, value_string, header_string, header_id
+                     FROM outstanding order by ts, id limit ? offset ?''', (size_limit, offset))
+        rows = c.fetchall()
+        self.last_read_count = len(rows)
         results = []
         unique_records = set()
-        for row in c:
+        for row in rows:
             _id = row[0]
             timestamp = row[1]
             source = row[2]
             topic_id = row[3]
             value = loads(row[4])
-            headers = {} if row[5] is None else loads(row[5])
+            header_id = row[6]
+            if header_id is not None:
+                headers = self._get_headers(c, header_id)
+                self._read_header_ids.add(header_id)
+            else:
+                # Rows cached before headers were interned.
+                headers = {} if row[5] is None else loads(row[5])
             meta = self._meta_data[(source, topic_id)].copy()
             topic = self._backup_cache[topic_id]
 
@@ -1728,12 +2222,13 @@ class BackupDatabase:
 
         c.close()
         # If we were backlogged at startup and our initial estimate was
-        # off this will correct it.
-        if len(results) < size_limit:
+        # off this will correct it. A read from an offset only sees part of
+        # the cache so it can't.
+        if not offset and len(results) < size_limit:
             self._record_count = len(results)
 
         # if we have duplicates, we must count them as part of the "real" total of _record_count
-        if self._dupe_ids:
+        if self._dupe_ids and not offset:
             _log.debug(f"Adding duplicates to the total record count: {self._dupe_ids}")
             self._record_count += len(self._dupe_ids)
 
@@ -1753,14 +2248,7 @@ class BackupDatabase:
         """ Creates a backup database for the historian if doesn't exist."""
 
         _log.debug(f"Setting up backup DB. {os.getcwd()}")
-        # we want to create it in the agent-data directory since agent will not have write access to any other
-        # directory in agent isolation mode
-        if os.path.exists(os.path.join(os.getcwd(), os.path.basename(os.getcwd()) + ".agent-data")):
-            backup_db = os.path.join(os.getcwd(), os.path.basename(os.getcwd()) + ".agent-data", 'backup.sqlite')
-        else:   
-            # means its a dynamic agent
-            backup_db = os.path.join(os.getcwd(), 'backup.sqlite')
-        
+        backup_db = os.path.join(_backup_cache_dir(), 'backup.sqlite')
         _log.info(f"Creating  backup db at {backup_db}")
         
         self._connection = sqlite3.connect(
@@ -1788,10 +2276,11 @@ class BackupDatabase:
                                          source TEXT NOT NULL,
                                          topic_id INTEGER NOT NULL,
                                          value_string TEXT NOT NULL,
-                                         header_string TEXT)''')
+                                         header_string TEXT,
+                                         header_id INTEGER)''')
             self._record_count = 0
         else:
-            # Check to see if we have a header_string column.
+            # Check to see if we have the header_string and header_id columns.
             c.execute("pragma table_info(outstanding);")
             name_index = 0
             for description in c.description:
@@ -1799,15 +2288,14 @@ class BackupDatabase:
                     break
                 name_index += 1
 
-            found_header_column = False
-            for row in c:
-                if row[name_index] == "header_string":
-                    found_header_column = True
-                    break
+            columns = set(row[name_index] for row in c)
 
-            if not found_header_column:
+            if "header_string" not in columns:
                 _log.info("Updating cache database to support storing header data.")
                 c.execute("ALTER TABLE outstanding ADD COLUMN header_string text;")
+            if "header_id" not in columns:
+                _log.info("Updating cache database to support shared header data.")
+                c.execute("ALTER TABLE outstanding ADD COLUMN header_id INTEGER;")
 
             # Initialize record_count at startup.
             # This is a (probably correct) estimate of the total records cached.
@@ -1831,6 +2319,16 @@ class BackupDatabase:
         c.execute('''CREATE INDEX IF NOT EXISTS outstanding_ts_index
                                            ON outstanding (ts)''')
 
+        # Headers shared by many outstanding rows are stored once, keyed by a
+        # hash of their JSON encoding.
+        self._connection.execute('''CREATE TABLE IF NOT EXISTS headers
+                                    (header_id INTEGER PRIMARY KEY,
+                                     hash TEXT NOT NULL,
+                                     header_string TEXT NOT NULL,
+                                     UNIQUE(hash))''')
+        c.execute('''CREATE INDEX IF NOT EXISTS outstanding_header_index
+                     ON outstanding (header_id)''')
+
         c.execute("SELECT name FROM sqlite_master WHERE type='table' "
                   "AND name='time_error';")
 
@@ -1875,10 +2373,13 @@ class BackupDatabase:
                 self._backup_cache[row[0]] = row[1]
                 self._backup_cache[row[1]] = row[0]
 
-        c.close()
-
         self._connection.commit()
 
+        c.execute(f"PRAGMA journal_mode = {self._journal_mode}")
+        _log.debug(f"Backup DB journal mode is {c.fetchone()[0]}")
+        c.execute(f"PRAGMA synchronous = {self._synchronous}")
+        c.close()
+
 
 # Code reimplemented from https://github.com/gilesbrown/gsqlite3
 def _using_threadpool(method):
@@ -1898,11 +2399,543 @@ class AsyncBackupDatabase(BackupDatabase):
 
 for method in [BackupDatabase.get_outstanding_to_publish,
                BackupDatabase.remove_successfully_published,
+               BackupDatabase.remove_published,
                BackupDatabase.backup_new_data,
                BackupDatabase._setupdb]:
     setattr(AsyncBackupDatabase, method.__name__, _using_threadpool(method))
 
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+# Frame prefix: payload length, crc32 of payload.
+_FRAME_PREFIX = struct.Struct("<II")
+# Frame head: first record id, timestamp in microseconds since the epoch, record count.
+_FRAME_HEAD = struct.Struct("<QqI")
+_UINT32 = struct.Struct("<I")
+_INT64 = struct.Struct("<q")
+_DOUBLE = struct.Struct("<d")
+
+
+def _pack_bytes(data):
+    return _UINT32.pack(len(data)) + data
+
+
+def _encode_value(value):
+    value_type = type(value)
+    if value_type is float:
+        return b'f' + _DOUBLE.pack(value)
+    if value_type is int and -2 ** 63 <= value < 2 ** 63:
+        return b'i' + _INT64.pack(value)
+    if value_type is str:
+        return b's' + _pack_bytes(value.encode('utf-8'))
+    return b'j' + _pack_bytes(dumps(value).encode('utf-8'))
+
+
+def _decode_value(payload, offset):
+    tag = payload[offset:offset + 1]
+    offset += 1
+    if tag == b'f':
+        return _DOUBLE.unpack_from(payload, offset)[0], offset + 8
+    if tag == b'i':
+        return _INT64.unpack_from(payload, offset)[0], offset + 8
+    length = _UINT32.unpack_from(payload, offset)[0]
+    offset += 4
+    data = payload[offset:offset + length].decode('utf-8')
+    if tag == b's':
+        return data, offset + length
+    return loads(data), offset + length
+
+
+def _encode_frame(first_id, timestamp_us, source, header_string, topic_ids, value_strings):
+    parts = [_FRAME_HEAD.pack(first_id, timestamp_us, len(topic_ids)),
+             _pack_bytes(source.encode('utf-8')),
+             _pack_bytes(header_string.encode('utf-8'))]
+    for topic_id, value_string in zip(topic_ids, value_strings):
+        parts.append(_UINT32.pack(topic_id))
+        parts.append(value_string)
+    payload = b''.join(parts)
+    return _FRAME_PREFIX.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_frame(f):
+    """
+    Read the next frame from an open segment file.
+
+    :returns: The frame payload or None at the end of the file or at a
+              truncated or corrupt frame.
+    """
+    prefix = f.read(_FRAME_PREFIX.size)
+    if len(prefix) < _FRAME_PREFIX.size:
+        return None
+    length, crc = _FRAME_PREFIX.unpack(prefix)
+    payload = f.read(length)
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    return payload
+
+
+class _Segment:
+    """Bookkeeping for one segment file of a :py:class:`SegmentLogBackupCache`."""
+    __slots__ = ('path', 'size', 'frame_ids', 'frame_offsets', 'last_id')
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        # First record id and file offset of every frame, for seeking.
+        self.frame_ids = []
+        self.frame_offsets = []
+        self.last_id = 0
+
+
+class SegmentLogBackupCache:
+    """
+    Backup cache for the :py:class:`BaseHistorianAgent` class stored as an
+    append-only log of length prefixed, checksummed binary frames split across
+    segment files. Selected with the `cache_backend` setting "segment_log".
+
+    Every frame holds the records of one :py:class:`BatchRecord` (or one
+    reading of any other record) which share a timestamp, source and headers.
+    Numbers and strings are stored in binary form, anything else as JSON.
+    Topic names and metadata are kept in small side files. Records are
+    returned in the order they were cached.
+
+    Data is flushed on every :py:meth:`backup_new_data` call but only synced
+    to disk once every `sync_interval` seconds. Publishes are acknowledged by
+    advancing a persisted low water mark, records above the mark that have
+    already been acknowledged are tracked in memory only. A segment file is
+    deleted once every record in it has been acknowledged.
+
+    The side files count towards `backup_storage_limit_gb`. Over the limit
+    the oldest records with time errors are dropped before any segment.
+
+    Historian implementors do not need to use this class. It is for internal
+    use only.
+    """
+
+    def __init__(self, owner, backup_storage_limit_gb, backup_storage_report,
+                 segment_size=16 * 1024 ** 2, sync_interval=1.0):
+        self._backup_cache = {}
+        self.time_error_records = False
+        self._meta_data = defaultdict(dict)
+        self._owner = weakref.ref(owner)
+        self._backup_storage_limit_gb = backup_storage_limit_gb
+        self._backup_storage_report = backup_storage_report
+        self._max_bytes = None
+        self._segment_size = segment_size
+        if backup_storage_limit_gb is not None:
+            self._max_bytes = backup_storage_limit_gb * 1024 ** 3
+            # Keep segments small enough relative to the limit that dropping
+            # the oldest one frees a reasonable fraction of the cache.
+            self._segment_size = max(64 * 1024, min(segment_size, int(self._max_bytes // 8)))
+        self._sync_interval = sync_interval
+        self._last_sync = time.monotonic()
+        self._dirty = False
+
+        self._segments = []
+        self._writer = None
+        self._next_id = 1
+        # Every id below the water mark has been published.
+        self._watermark = 1
+        self._acked = set()
+        self._dupe_ids = []
+        self._unique_ids = []
+        # Number of unpublished records, duplicates included, consumed by
+        # the last call to get_outstanding_to_publish.
+        self.last_read_count = 0
+        self._setup()
+
+    def backup_new_data(self, new_publish_list, time_tolerance_check=False):
+        """
+        :param new_publish_list: An iterable of records to cache to disk.
+        :type new_publish_list: iterable
+        :param time_tolerance_check: Boolean to know if time tolerance check is enabled.default =False
+        :returns: True if records the cache has reached a full state.
+        :rtype: bool
+        """
+        frames = []
+        time_error_frames = []
+        for item in new_publish_list:
+            if item is None:
+                continue
+            if isinstance(item, BatchRecord):
+                topic_ids = [self._get_topic_id(topic) for topic in item.topics]
+                for topic_id, meta in zip(topic_ids, item.meta):
+                    if meta:
+                        self._update_meta(item.source, topic_id, meta)
+                entries = [(item.timestamp, item.source, item.headers, topic_ids, item.values)]
+            else:
+                topic_id = self._get_topic_id(item['topic'])
+                self._update_meta(item['source'], topic_id, item.get('meta', {}))
+                entries = [(timestamp, item['source'], item.get('headers', {}), [topic_id], [value])
+                           for timestamp, value in item['readings']]
+
+            for timestamp, source, headers, topic_ids, values in entries:
+                timestamp_us = self._to_microseconds(timestamp)
+                value_strings = [_encode_value(value) for value in values]
+                if time_tolerance_check and timestamp is not None and headers.get("time_error"):
+                    _log.warning(f"Found data with timestamp {timestamp} that is out of configured tolerance ")
+                    time_error_frames.append(_encode_frame(0, timestamp_us, source, dumps(headers),
+                                                           topic_ids, value_strings))
+                    continue
+                frames.append(_encode_frame(self._next_id, timestamp_us, source, dumps(headers),
+                                            topic_ids, value_strings))
+                self._next_id += len(topic_ids)
+
+        self._append_frames(frames)
+        if time_error_frames:
+            self._time_error_file.write(b''.join(time_error_frames))
+            self._time_error_file.flush()
+            self.time_error_records = True
+        self._maybe_sync()
+
+        cache_full = False
+        if self._max_bytes is not None:
+            total_size = self._side_files_size() + sum(segment.size for segment in self._segments)
+            if total_size > self._max_bytes and self.time_error_records:
+                _log.info("cache size exceeded limit Deleting data from time_error.log")
+                total_size -= self._trim_time_errors(total_size - self._max_bytes)
+            cache_full = total_size >= self._max_bytes * self._backup_storage_report
+            while total_size > self._max_bytes and len(self._segments) > 1:
+                cache_full = True
+                segment = self._segments[0]
+                _log.info(f"cache size exceeded limit Deleting segment {segment.path}")
+                total_size -= segment.size
+                self._advance_watermark(segment.last_id + 1)
+                self._remove_acknowledged_segments()
+        return cache_full
+
+    def remove_successfully_published(self, successful_publishes, submit_size):
+        """
+        Acknowledges the reported successful publishes.
+        If None is found in `successful_publishes` we assume that everything
+        was published.
+
+        :param successful_publishes: Set of records that was published.
+        :param submit_size: Number of things requested from previous call to
+                            :py:meth:`get_outstanding_to_publish`
+
+        :type successful_publishes: set
+        :type submit_size: int
+
+        """
+        try:
+            if None in successful_publishes:
+                published = self._unique_ids
+            else:
+                published = [_id for _id in successful_publishes if _id is not None]
+            self._acknowledge(published)
+        finally:
+            self._unique_ids.clear()
+            self._dupe_ids.clear()
+        self._maybe_sync()
+
+    def remove_published(self, published):
+        """
+        Acknowledges records by id. Unlike
+        :py:meth:`remove_successfully_published` this does not depend on
+        the last call to :py:meth:`get_outstanding_to_publish`.
+
+        :param published: Ids of the published records.
+        :type published: list
+        :returns: Number of records acknowledged.
+        :rtype: int
+        """
+        try:
+            acknowledged = self._acknowledge(published)
+        finally:
+            self._unique_ids.clear()
+            self._dupe_ids.clear()
+        self._maybe_sync()
+        return acknowledged
+
+    def get_outstanding_to_publish(self, size_limit, offset=0):
+        """
+        Retrieve up to `size_limit` records from the cache. Guarantees a unique list of records,
+        where unique is defined as (topic, timestamp).
+
+        :param size_limit: Max number of records to retrieve.
+        :param offset: Number of unpublished records at the head of the cache to skip.
+        :type size_limit: int
+        :type offset: int
+        :returns: List of records for publication.
+        :rtype: list
+        """
+        if self._writer is not None:
+            self._writer.flush()
+        results = []
+        unique_records = set()
+        watermark = self._watermark
+        acked = self._acked
+        self.last_read_count = 0
+        for segment in self._segments:
+            if segment.last_id < watermark or not segment.frame_ids:
+                continue
+            start = max(0, bisect.bisect_right(segment.frame_ids, watermark) - 1)
+            with open(segment.path, 'rb') as f:
+                f.seek(segment.frame_offsets[start])
+                for _ in range(start, len(segment.frame_ids)):
+                    payload = _read_frame(f)
+                    if payload is None:
+                        break
+                    offset = self._decode_frame(payload, watermark, acked, unique_records, results,
+                                                size_limit, offset)
+                    if len(results) >= size_limit:
+                        break
+            if len(results) >= size_limit:
+                break
+        return results
+
+    def get_backlog_count(self):
+        """
+        Retrieve the current number of records in the cache.
+        """
+        return self._next_id - self._watermark - len(self._acked)
+
+    def close(self):
+        self._sync()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for f in (self._topics_file, self._metadata_file, self._time_error_file):
+            f.close()
+
+    def _acknowledge(self, published):
+        """
+        Mark ids as published and advance the water mark past any
+        contiguous run of them. Returns the number of newly acknowledged ids.
+        """
+        previous = len(self._acked)
+        self._acked.update(_id for _id in published if self._watermark <= _id < self._next_id)
+        acknowledged = len(self._acked) - previous
+        watermark = self._watermark
+        while watermark in self._acked:
+            self._acked.discard(watermark)
+            watermark += 1
+        if watermark != self._watermark:
+            self._advance_watermark(watermark)
+            self._remove_acknowledged_segments()
+        return acknowledged
+
+    def _decode_frame(self, payload, watermark, acked, unique_records, results, size_limit, skip=0):
+        """
+        Append the unpublished records of a frame to `results` after skipping
+        the first `skip` of them. Returns how many are still to be skipped.
+        """
+        first_id, timestamp_us, count = _FRAME_HEAD.unpack_from(payload, 0)
+        offset = _FRAME_HEAD.size
+        length = _UINT32.unpack_from(payload, offset)[0]
+        source = payload[offset + 4:offset + 4 + length].decode('utf-8')
+        offset += 4 + length
+        length = _UINT32.unpack_from(payload, offset)[0]
+        headers = loads(payload[offset + 4:offset + 4 + length].decode('utf-8'))
+        offset += 4 + length
+        timestamp = _EPOCH + timedelta(microseconds=timestamp_us)
+        for _id in range(first_id, first_id + count):
+            if len(results) >= size_limit:
+                break
+            topic_id = _UINT32.unpack_from(payload, offset)[0]
+            value, offset = _decode_value(payload, offset + 4)
+            if _id < watermark or _id in acked:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            self.last_read_count += 1
+            # check for duplicates before appending row to results
+            if (topic_id, timestamp_us) in unique_records:
+                _log.debug(f"Found duplicate from cache: {_id}")
+                self._dupe_ids.append(_id)
+                continue
+            unique_records.add((topic_id, timestamp_us))
+            self._unique_ids.append(_id)
+            results.append({'_id': _id,
+                            'timestamp': timestamp,
+                            'source': source,
+                            'topic': self._backup_cache[topic_id],
+                            'value': value,
+                            'headers': headers,
+                            'meta': self._meta_data[(source, topic_id)].copy()})
+        return skip
+
+    @staticmethod
+    def _to_microseconds(timestamp):
+        if timestamp is None:
+            timestamp = get_aware_utc_now()
+        elif isinstance(timestamp, str):
+            timestamp = parse_timestamp_string(timestamp)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=pytz.UTC)
+        return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+    def _get_topic_id(self, topic):
+        topic_id = self._backup_cache.get(topic)
+        if topic_id is None:
+            topic_id = len(self._backup_cache) // 2 + 1
+            self._topics_file.write(dumps([topic_id, topic]) + "\n")
+            self._topics_file.flush()
+            self._dirty = True
+            self._backup_cache[topic_id] = topic
+            self._backup_cache[topic] = topic_id
+        return topic_id
+
+    def _update_meta(self, source, topic_id, meta):
+        meta_dict = self._meta_data[(source, topic_id)]
+        if meta_dict == meta:
+            return
+        for name, value in meta.items():
+            if meta_dict.get(name) != value:
+                self._metadata_file.write(dumps([source, topic_id, name, value]) + "\n")
+                meta_dict[name] = value
+        self._metadata_file.flush()
+        self._dirty = True
+
+    def _append_frames(self, frames):
+        for frame in frames:
+            first_id, _, count = _FRAME_HEAD.unpack_from(frame, _FRAME_PREFIX.size)
+            if self._writer is None or self._segments[-1].size >= self._segment_size:
+                self._roll_segment(first_id)
+            segment = self._segments[-1]
+            segment.frame_ids.append(first_id)
+            segment.frame_offsets.append(segment.size)
+            segment.last_id = first_id + count - 1
+            segment.size += len(frame)
+            self._writer.write(frame)
+        if frames:
+            self._writer.flush()
+            self._dirty = True
+
+    def _side_files_size(self):
+        return sum(os.fstat(f.fileno()).st_size
+                   for f in (self._topics_file, self._metadata_file, self._time_error_file))
+
+    def _trim_time_errors(self, excess):
+        """
+        Drop the oldest records of the time error log until at least `excess`
+        bytes are freed or the log is empty. Returns the number of bytes freed.
+        """
+        path = self._time_error_file.name
+        self._time_error_file.close()
+        size = os.path.getsize(path)
+        dropped = 0
+        with open(path, 'rb') as f, open(path + ".tmp", 'wb') as trimmed:
+            while dropped < excess:
+                payload = _read_frame(f)
+                if payload is None:
+                    break
+                dropped += _FRAME_PREFIX.size + len(payload)
+            if dropped >= excess:
+                shutil.copyfileobj(f, trimmed)
+        os.replace(path + ".tmp", path)
+        self._time_error_file = open(path, 'ab')
+        self.time_error_records = self._time_error_file.tell() > 0
+        return size - self._time_error_file.tell()
+
+    def _roll_segment(self, first_id):
+        if self._writer is not None:
+            self._sync()
+            self._writer.close()
+        path = os.path.join(self._directory, "{:020d}.seg".format(first_id))
+        self._segments.append(_Segment(path))
+        self._writer = open(path, 'ab')
+
+    def _advance_watermark(self, watermark):
+        self._watermark = max(self._watermark, watermark)
+        self._acked = set(_id for _id in self._acked if _id >= self._watermark)
+        self._dirty = True
+
+    def _remove_acknowledged_segments(self):
+        while self._segments and self._segments[0].last_id < self._watermark:
+            if len(self._segments) == 1:
+                if self._segments[0].size < self._segment_size:
+                    # Keep appending to a partly filled active segment.
+                    break
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+            segment = self._segments.pop(0)
+            os.remove(segment.path)
+
+    def _maybe_sync(self):
+        if self._dirty and time.monotonic() - self._last_sync >= self._sync_interval:
+            self._sync()
+
+    def _sync(self):
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        for f in (self._topics_file, self._metadata_file, self._time_error_file):
+            f.flush()
+            os.fsync(f.fileno())
+        ack_path = os.path.join(self._directory, "ack")
+        with open(ack_path + ".tmp", 'w') as f:
+            f.write(str(self._watermark))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ack_path + ".tmp", ack_path)
+        self._last_sync = time.monotonic()
+        self._dirty = False
+
+    def _setup(self):
+        """ Opens the segment log, creating it if it doesn't exist."""
+        self._directory = os.path.join(_backup_cache_dir(), 'backup_segments')
+        _log.info(f"Opening backup segment log at {self._directory}")
+        os.makedirs(self._directory, exist_ok=True)
+
+        topics_path = os.path.join(self._directory, "topics")
+        if os.path.exists(topics_path):
+            with open(topics_path) as f:
+                for line in f:
+                    if line.strip():
+                        topic_id, topic = loads(line)
+                        self._backup_cache[topic_id] = topic
+                        self._backup_cache[topic] = topic_id
+
+        metadata_path = os.path.join(self._directory, "metadata")
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                for line in f:
+                    if line.strip():
+                        source, topic_id, name, value = loads(line)
+                        self._meta_data[(source, topic_id)][name] = value
+
+        ack_path = os.path.join(self._directory, "ack")
+        if os.path.exists(ack_path):
+            with open(ack_path) as f:
+                self._watermark = int(f.read().strip() or 1)
+
+        for name in sorted(os.listdir(self._directory)):
+            if not name.endswith(".seg"):
+                continue
+            segment = _Segment(os.path.join(self._directory, name))
+            with open(segment.path, 'rb') as f:
+                while True:
+                    payload = _read_frame(f)
+                    if payload is None:
+                        break
+                    first_id, _, count = _FRAME_HEAD.unpack_from(payload, 0)
+                    segment.frame_ids.append(first_id)
+                    segment.frame_offsets.append(segment.size)
+                    segment.last_id = first_id + count - 1
+                    segment.size += _FRAME_PREFIX.size + len(payload)
+            if segment.size < os.path.getsize(segment.path):
+                _log.warning(f"Truncating incomplete frame at end of {segment.path}")
+                os.truncate(segment.path, segment.size)
+            if segment.frame_ids:
+                self._next_id = max(self._next_id, segment.last_id + 1)
+                self._segments.append(segment)
+            else:
+                os.remove(segment.path)
+
+        self._next_id = max(self._next_id, self._watermark)
+        self._remove_acknowledged_segments()
+        if self._segments and self._segments[-1].size < self._segment_size:
+            self._writer = open(self._segments[-1].path, 'ab')
+
+        self._topics_file = open(topics_path, 'a')
+        self._metadata_file = open(metadata_path, 'a')
+        self._time_error_file = open(os.path.join(self._directory, "time_error.log"), 'ab')
+        self.time_error_records = self._time_error_file.tell() > 0
+
+
 class BaseQueryHistorianAgent(Agent):
     """This is the base agent for historian Agents that support querying of
     their data stores.
@@ -73,6 +73,7 @@ import os
 import re
 
 from abc import abstractmethod
+from collections import OrderedDict
 
 from volttron.platform.agent.known_identities import (PLATFORM_HISTORIAN)
 from volttron.platform.vip.agent import Agent, Core, RPC
@@ -81,6 +82,58 @@ from volttron.platform.vip.agent.errors import Unreachable
 
 _log = logging.getLogger(__name__)
 
+# Quoted strings of a query condition, matched as the query lexer does.
+_QUOTED_STRING = re.compile(r'(\'(?:[^\\\n]|\\.)*?\'|"(?:[^\\\n]|\\.)*?")')
+
+
+class QueryCache(object):
+    """Least recently used cache of up to max_size entries. A max_size of 0
+    disables the cache."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def normalize_query(condition):
+    """Returns the query condition with the whitespace outside of quoted
+    strings collapsed, so that equivalent conditions share cache entries."""
+    parts = _QUOTED_STRING.split(condition)
+    # Every other part is a quoted string.
+    parts[::2] = [re.sub(r"\s+", " ", part) for part in parts[::2]]
+    return "".join(parts).strip()
+
+
+def ast_cache_key(ast):
+    """Returns a cache key for a parsed query condition. Values are paired with
+    their type, as the leaves True (tag) and 1 (tag = 1) compare equal but
+    backends can query them differently."""
+    if isinstance(ast, tuple):
+        return tuple(ast_cache_key(node) for node in ast)
+    return type(ast), ast
+
 
 class BaseTaggingService(Agent):
     """This is the base class for tagging service implementations. There can
@@ -88,10 +141,20 @@ class BaseTaggingService(Agent):
     the tag details
     """
 
-    def __init__(self, historian_vip_identity=None, **kwargs):
+    def __init__(self, historian_vip_identity=None, query_cache_size=256,
+                 result_cache_size=0, **kwargs):
         super(BaseTaggingService, self).__init__(**kwargs)
         self.valid_tags = dict()
         self.tag_refs = dict()
+        if query_cache_size < 0 or result_cache_size < 0:
+            raise ValueError("query_cache_size and result_cache_size should "
+                             "not be negative")
+        # Parsed conditions by normalized condition and backend queries by
+        # parsed condition.
+        self._parsed_queries = QueryCache(query_cache_size)
+        self._backend_queries = QueryCache(query_cache_size)
+        # Query results, cleared whenever tags are added.
+        self._query_results = QueryCache(result_cache_size)
         self.historian_vip_identity = historian_vip_identity
         if historian_vip_identity is None:
             self.historian_vip_identity = PLATFORM_HISTORIAN
@@ -433,9 +496,39 @@ class BaseTaggingService(Agent):
                                  "dict".format(type(or_condition)))
             condition = self._process_and_or_param(and_condition,
                                                    or_condition)
-        ast = parse_query(condition, self.valid_tags, self.tag_refs)
-        return self.query_topics_by_tags(ast=ast, skip=skip, count=count,
-                                         order=order)
+        condition = normalize_query(condition)
+        ast = self._parsed_queries.get(condition)
+        if ast is None:
+            ast = parse_query(condition, self.valid_tags, self.tag_refs)
+            self._parsed_queries.put(condition, ast)
+
+        key = (ast_cache_key(ast), skip, count, order)
+        result = self._query_results.get(key)
+        if result is None:
+            result = self.query_topics_by_tags(ast=ast, skip=skip, count=count,
+                                               order=order)
+            self._query_results.put(key, result)
+        return list(result)
+
+    def get_backend_query(self, ast, build_query):
+        """
+        Returns the backend query for a parsed query condition. Implementing
+        services can use this in
+        :py:meth:`BaseTaggingService.query_topics_by_tags` so that the query
+        is only built once for repeated conditions.
+
+        :param ast: parsed query condition
+        :param build_query: function that builds the backend query from the
+         ast. The backend query should not be modified by the caller.
+        :type ast: tuple
+        :return: build_query(ast)
+        """
+        key = ast_cache_key(ast)
+        query = self._backend_queries.get(key)
+        if query is None:
+            query = build_query(ast)
+            self._backend_queries.put(key, query)
+        return query
 
     @abstractmethod
     def query_topics_by_tags(self, ast, skip=0, count=None, order=None):
@@ -537,7 +630,10 @@ class BaseTaggingService(Agent):
 
         """
         _log.debug("add_tags: tags:{}".format(tags))
-        return self.insert_topic_tags(tags, update_version)
+        try:
+            return self.insert_topic_tags(tags, update_version)
+        finally:
+            self._query_results.clear()
 
 
     @abstractmethod
@@ -1025,13 +1121,20 @@ def pretty_print(tup):
     return "( {} {} {})".format(left, tup[0], right)
 
 
+# Built on first use and shared by all queries of the process.
+_query_parser = None
+_query_lexer = None
+
+
 def parse_query(query, tags, refs):
-    global valid_tags, tag_refs
+    global valid_tags, tag_refs, _query_parser, _query_lexer
     valid_tags = tags
     tag_refs = refs
-    query_parser = yacc.yacc()
-    lexer = lex.lex()
-    ast = query_parser.parse(query)
+    if _query_parser is None:
+        _query_lexer = lex.lex()
+        _query_parser = yacc.yacc()
+    _query_lexer.lineno = 1
+    ast = _query_parser.parse(query, lexer=_query_lexer)
     return ast
 
 
@@ -50,7 +50,7 @@ from volttron.platform.agent.known_identities import (
     PROCESS_IDENTITIES,
 )
 from volttron.platform.auth.auth_utils import load_user
-from volttron.platform.auth.auth_entry import AuthEntry
+from volttron.platform.auth.auth_entry import AuthEntry, AuthEntryIndex
 from volttron.platform.auth.auth_file import AuthFile
 from volttron.platform.jsonrpc import RemoteError
 from volttron.platform.vip.agent.errors import Unreachable
@@ -92,7 +92,7 @@ class AuthService(Agent):
         self.aip = aip
         self.zap_socket = None
         self._zap_greenlet = None
-        self.auth_entries = []
+        self.auth_entry_index = AuthEntryIndex()
         self._is_connected = False
         self._protected_topics_file = protected_topics_file
         self._protected_topics_file_path = os.path.abspath(
@@ -107,6 +107,14 @@ class AuthService(Agent):
         self.authentication_server = None
         self.authorization_server = None
 
+    @property
+    def auth_entries(self):
+        return self.auth_entry_index.entries
+
+    @auth_entries.setter
+    def auth_entries(self, entries):
+        self.auth_entry_index = AuthEntryIndex(entries)
+
     def export_auth_file(self):
         """
         Export all relevant AuthFile methods to external agents
@@ -628,17 +636,15 @@ class AuthService(Agent):
         :returns: tuple of capabiliy-list, group-list, role-list
         :rtype: tuple
         """
-        use_parts = True
-        try:
-            domain, address, mechanism, credentials = load_user(user_id)
-        except ValueError:
-            use_parts = False
-        for entry in self.auth_entries:
-            if entry.user_id == user_id:
-                return [entry.capabilities, entry.groups, entry.roles]
-            elif use_parts:
-                if entry.match(domain, address, mechanism, [credentials]):
-                    return entry.capabilities, entry.groups, entry.roles
+        parts = load_user(user_id)
+        if len(parts) != 4:
+            parts = None
+        entry, by_user_id = self.auth_entry_index.find(user_id, parts)
+        if entry is None:
+            return None
+        if by_user_id:
+            return [entry.capabilities, entry.groups, entry.roles]
+        return entry.capabilities, entry.groups, entry.roles
 
     @RPC.export
     @RPC.allow(capabilities="allow_auth_modifications")
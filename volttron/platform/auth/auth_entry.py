@@ -37,6 +37,7 @@
 # }}}
 
 
+import heapq
 import logging
 import re
 from typing import Optional
@@ -285,3 +286,80 @@ class AuthEntry(object):
         AuthEntry.valid_credentials(self.credentials, self.mechanism)
 
 
+class AuthEntryIndex(object):
+    """
+    Lookup tables over an ordered list of auth entries.
+
+    Entries are found by exact user_id or by concrete credentials with a
+    dictionary lookup. Only the entries that can match any credentials
+    (regex credentials or the NULL mechanism) are matched one by one.
+    When several entries match, the one earliest in the list wins, as it
+    would with a linear scan.
+
+    :param list entries: Enabled auth entries in match order
+    """
+
+    def __init__(self, entries=None):
+        self.entries = list(entries or [])
+        self._by_user_id = {}
+        self._by_credentials = {}
+        self._patterns = []
+        for position, entry in enumerate(self.entries):
+            self._by_user_id.setdefault(entry.user_id, position)
+            credentials = entry.credentials
+            if entry.mechanism == "NULL" or not credentials:
+                self._patterns.append(position)
+                continue
+            values = credentials if isinstance(credentials, List) \
+                else [credentials]
+            if any(hasattr(value, "regex") for value in values):
+                self._patterns.append(position)
+                continue
+            for value in values:
+                positions = self._by_credentials.setdefault(
+                    (entry.mechanism, str(value)), []
+                )
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _match_position(self, domain, address, mechanism, credentials,
+                        before=None):
+        concrete = self._by_credentials.get(
+            (mechanism, credentials[0]), []
+        ) if mechanism != "NULL" and credentials else []
+        for position in heapq.merge(concrete, self._patterns):
+            if before is not None and position >= before:
+                break
+            if self.entries[position].match(
+                    domain, address, mechanism, credentials):
+                return position
+        return None
+
+    def match(self, domain, address, mechanism, credentials):
+        """Returns the first entry matching the connection or None."""
+        position = self._match_position(
+            domain, address, mechanism, credentials
+        )
+        return None if position is None else self.entries[position]
+
+    def find(self, user_id, parts=None):
+        """
+        Returns the first entry with the given user_id or, when parts
+        (domain, address, mechanism, credentials) are given, the first
+        entry that matches them, together with a flag telling whether the
+        match was by user_id.
+        """
+        position = self._by_user_id.get(user_id)
+        if parts is not None:
+            domain, address, mechanism, credentials = parts
+            matched = self._match_position(
+                domain, address, mechanism, [credentials], before=position
+            )
+            if matched is not None:
+                return self.entries[matched], False
+        if position is None:
+            return None, False
+        return self.entries[position], True
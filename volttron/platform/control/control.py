@@ -204,6 +204,11 @@ class ControlService(BaseAgent):
         peer_list = self.vip.peerlist().get(timeout=5)
         return peer_list
 
+    @RPC.export
+    def pubsub_send_queues(self):
+        # Depth and drop counters of the queues the platform keeps for slow subscribers.
+        return self.vip.pubsub.send_queue_stats().get(timeout=5)
+
     @RPC.export
     def serverkey(self):
         q = Query(self.core)
@@ -40,18 +40,70 @@
 import contextlib
 import importlib
 import logging
+import re
 import threading
 import sqlite3
 import sys
 from abc import abstractmethod
+from datetime import datetime, timedelta
 from gevent.local import local
 
+import pytz
+
 from volttron.platform.agent import utils
 from volttron.platform import jsonapi
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 
+# Valid values for the partition_interval connection parameter. Partitions
+# of the data table are named <data_table>_p<YYYYMMDD> after the UTC date
+# their period starts on.
+PARTITION_INTERVALS = ("day", "week", "month")
+
+
+def partition_start(ts, interval):
+    """
+    Start of the partition period containing `ts` as a naive UTC datetime.
+    Weekly partitions start on Monday.
+    :param ts: datetime or timestamp string
+    :param interval: one of PARTITION_INTERVALS
+    """
+    if isinstance(ts, str):
+        ts = utils.parse_timestamp_string(ts)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(pytz.UTC).replace(tzinfo=None)
+    start = datetime(ts.year, ts.month, ts.day)
+    if interval == "week":
+        start -= timedelta(days=start.weekday())
+    elif interval == "month":
+        start = start.replace(day=1)
+    return start
+
+
+def next_partition_start(start, interval):
+    """
+    Start of the partition period following the one starting at `start`.
+    """
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "week":
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(data_table, start):
+    return "{}_p{:%Y%m%d}".format(data_table, start)
+
+
+def parse_partition_name(data_table, name):
+    """
+    Start of the period of the partition called `name`, or None if `name` is
+    not a partition of `data_table`.
+    """
+    match = re.fullmatch(re.escape(data_table) + r"_p(\d{8})", name)
+    return datetime.strptime(match.group(1), "%Y%m%d") if match else None
+
 
 class ConnectionError(Exception):
     """
@@ -276,6 +328,7 @@ class DbDriver:
         Optional function to manage database size.
         :param history_limit_timestamp: remove all data older than this timestamp
         :param storage_limit_gb: remove oldest data until database is smaller than this value.
+        :return: number of rows removed, or None if not known
         """
         pass
 
@@ -483,7 +536,8 @@ class DbDriver:
         :param end: End of query timestamp as a datetime.
         :param agg_type: If this is a query for aggregate data, the type of aggregation ( for example, sum, avg)
         :param agg_period: If this is a query for aggregate data, the time period of aggregation
-        :param skip: Skip this number of results.
+        :param skip: Skip this number of results. When the query is for multiple topics, skip applies to individual
+        topics
         :param count: Limit results to this value. When the query is for multiple topics, count applies to individual
         topics. For example, a query on 2 topics with count=5 will return 5 records for each topic
         :param order: How to order the results, either "FIRST_TO_LAST" or "LAST_TO_FIRST"
@@ -36,13 +36,15 @@
 # under Contract DE-AC05-76RL01830
 # }}}
 import ast
+import calendar
 import contextlib
 import logging
 from collections import defaultdict
 
 import pytz
 import re
-from .basedb import DbDriver
+from .basedb import (DbDriver, PARTITION_INTERVALS, next_partition_start, parse_partition_name, partition_name,
+                     partition_start)
 from mysql.connector import Error as MysqlError
 from mysql.connector import errorcode as mysql_errorcodes
 from volttron.platform.agent import utils
@@ -62,6 +64,7 @@ class MySqlFuncts(DbDriver):
     def __init__(self, connect_params, table_names):
         # kwargs['dbapimodule'] = 'mysql.connector'
         self.MICROSECOND_SUPPORT = None
+        self.WINDOW_FUNCTION_SUPPORT = None
         self.db_name = connect_params.get('database')
 
         self.data_table = None
@@ -76,6 +79,14 @@ class MySqlFuncts(DbDriver):
             self.meta_table = table_names['meta_table']
             self.agg_topics_table = table_names.get('agg_topics_table', None)
             self.agg_meta_table = table_names.get('agg_meta_table', None)
+        # Natively range partition the data table by day, week or month.
+        self.partition_interval = connect_params.get('partition_interval')
+        if self.partition_interval is not None and self.partition_interval not in PARTITION_INTERVALS:
+            raise ValueError("partition_interval should be one of {}. Got {}".format(
+                PARTITION_INTERVALS, self.partition_interval))
+        connect_params = {k: v for k, v in connect_params.items() if k != 'partition_interval'}
+        # Period starts of the partitions known to exist.
+        self._partitions = set()
         # This is needed when reusing the same connection. Else cursor returns
         # cached data even if we create a new cursor for each query and
         # close the cursor after fetching results
@@ -89,6 +100,11 @@ class MySqlFuncts(DbDriver):
         p = re.compile(r'(\d+)\D+(\d+)\D+(\d+)\D*')
         version_nums = p.match(rows[0][0]).groups()
         _log.debug(f"MYSQL version number components {version_nums}")
+        # Window functions are available from MySQL 8.0 and MariaDB 10.2
+        if 'mariadb' in rows[0][0].lower():
+            self.WINDOW_FUNCTION_SUPPORT = (int(version_nums[0]), int(version_nums[1])) >= (10, 2)
+        else:
+            self.WINDOW_FUNCTION_SUPPORT = int(version_nums[0]) >= 8
         self.MICROSECOND_SUPPORT = True
         if int(version_nums[0]) < 5:
             self.MICROSECOND_SUPPORT = False
@@ -117,8 +133,23 @@ class MySqlFuncts(DbDriver):
                 # metadata is now in topics table
                 _log.debug("Found new schema. topics table contains metadata")
                 self.meta_table = self.topics_table
+            if self.partition_interval and not self.select(
+                    "SELECT 1 FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s "
+                    "AND PARTITION_NAME IS NOT NULL", [self.db_name, self.data_table]):
+                _log.warning("Table {} was created without partitioning. Ignoring partition_interval".format(
+                    self.data_table))
+                self.partition_interval = None
+            if self.partition_interval:
+                self._partitions = set(self._load_partitions())
             return
 
+        # Rows go to the catch all pmax partition until _create_partitions
+        # splits a partition for their period off it.
+        partition_clause = ''
+        if self.partition_interval:
+            partition_clause = ' PARTITION BY RANGE (UNIX_TIMESTAMP(ts)) ' \
+                               '(PARTITION pmax VALUES LESS THAN MAXVALUE)'
+
         try:
             if self.MICROSECOND_SUPPORT:
                 self.execute_stmt(
@@ -126,14 +157,14 @@ class MySqlFuncts(DbDriver):
                     ' (ts timestamp(6) NOT NULL,\
                      topic_id INTEGER NOT NULL, \
                      value_string TEXT NOT NULL, \
-                     UNIQUE(topic_id, ts))')
+                     UNIQUE(topic_id, ts))' + partition_clause)
             else:
                 self.execute_stmt(
                     'CREATE TABLE ' + self.data_table +
                     ' (ts timestamp NOT NULL,\
                      topic_id INTEGER NOT NULL, \
                      value_string TEXT NOT NULL, \
-                     UNIQUE(topic_id, ts))')
+                     UNIQUE(topic_id, ts))' + partition_clause)
 
             self.execute_stmt('''CREATE INDEX data_idx
                                     ON ''' + self.data_table + ''' (ts ASC)''')
@@ -196,17 +227,13 @@ class MySqlFuncts(DbDriver):
             table_name = agg_type + "_" + agg_period
             value_col = 'agg_value'
 
-        query = '''SELECT topic_id, ts, ''' + value_col + ''' FROM ''' + table_name + '''
-                {where}
-                {order_by}
-                {limit}
-                {offset}'''
-
         if self.MICROSECOND_SUPPORT is None:
             self.init_microsecond_support()
 
-        where_clauses = ["WHERE topic_id = %s"]
-        args = [topic_ids[0]]
+        # All topics are read by a single statement. Paging applies to each
+        # topic, so skip and count are applied to a per topic row number.
+        where_clauses = ["WHERE topic_id IN ({})".format(', '.join(['%s'] * len(topic_ids)))]
+        args = list(topic_ids)
 
         if start is not None:
             if start.tzinfo != pytz.UTC:
@@ -235,51 +262,53 @@ class MySqlFuncts(DbDriver):
 
         where_statement = ' AND '.join(where_clauses)
 
-        order_by = 'ORDER BY ts ASC'
-        if order == 'LAST_TO_FIRST':
-            order_by = ' ORDER BY topic_id DESC, ts DESC'
+        direction = 'DESC' if order == 'LAST_TO_FIRST' else 'ASC'
 
-        # can't have an offset without a limit
-        # -1 = no limit and allows the user to
-        # provide just an offset
         if count is None:
             count = 100
+        skip = max(skip, 0)
+
+        statements = []
+        if self.WINDOW_FUNCTION_SUPPORT:
+            statements.append((
+                '''SELECT topic_id, ts, value FROM (
+                       SELECT topic_id, ts, ''' + value_col + ''' AS value,
+                              ROW_NUMBER() OVER (PARTITION BY topic_id ORDER BY ts ''' + direction + ''') AS row_num
+                       FROM ''' + table_name + '''
+                       ''' + where_statement + ''') AS page
+                   WHERE row_num > %s AND row_num <= %s
+                   ORDER BY topic_id ''' + direction + ''', ts ''' + direction,
+                args + [skip, skip + int(count)]))
+        else:
+            # No window functions before MySQL 8.0, page each topic on its own.
+            where_statement = where_statement.replace(where_clauses[0], "WHERE topic_id = %s")
+            for topic_id in topic_ids:
+                statements.append((
+                    '''SELECT topic_id, ts, ''' + value_col + ''' FROM ''' + table_name + '''
+                       ''' + where_statement + '''
+                       ORDER BY ts ''' + direction + '''
+                       LIMIT %s OFFSET %s''',
+                    [topic_id] + args[len(topic_ids):] + [int(count), skip]))
 
-        limit_statement = 'LIMIT %s'
-        args.append(int(count))
-
-        offset_statement = ''
-        if skip > 0:
-            offset_statement = 'OFFSET %s'
-            args.append(skip)
-
-        _log.debug("About to do real_query")
         values = defaultdict(list)
         for topic_id in topic_ids:
-            args[0] = topic_id
             values[id_name_map[topic_id]] = []
-            real_query = query.format(where=where_statement,
-                                      limit=limit_statement,
-                                      offset=offset_statement,
-                                      order_by=order_by)
+        # Topics written together share timestamps, format each one once.
+        timestamps = {}
+        for real_query, real_args in statements:
             _log.debug("Real Query: " + real_query)
-            _log.debug("args: " + str(args))
-
-            cursor = self.select(real_query, args, fetch_all=False)
-            if cursor:
-                if value_col == 'agg_value':
-                    for _id, ts, value in cursor:
-                        values[id_name_map[topic_id]].append(
-                            (utils.format_timestamp(ts.replace(tzinfo=pytz.UTC)),
-                             value))
-                else:
-                    for _id, ts, value in cursor:
-                        values[id_name_map[topic_id]].append(
-                            (utils.format_timestamp(ts.replace(tzinfo=pytz.UTC)),
-                             jsonapi.loads(value)))
-
-            if cursor is not None:
-                cursor.close()
+            _log.debug("args: " + str(real_args))
+            cursor = self.select(real_query, real_args, fetch_all=False)
+            if cursor is None:
+                continue
+            for topic_id, ts, value in cursor:
+                formatted = timestamps.get(ts)
+                if formatted is None:
+                    formatted = timestamps[ts] = utils.format_timestamp(ts.replace(tzinfo=pytz.UTC))
+                if value_col != 'agg_value':
+                    value = jsonapi.loads(value)
+                values[id_name_map[topic_id]].append((formatted, value))
+            cursor.close()
         return values
 
     @contextlib.contextmanager
@@ -312,6 +341,8 @@ class MySqlFuncts(DbDriver):
         yield insert_data
 
         if records:
+            if self.partition_interval:
+                self._create_partitions(ts for ts, _, _ in records)
             query = f"""
 INSERT INTO {self.data_table} (ts, topic_id, value_string) VALUES(%s, %s, %s)
 ON DUPLICATE KEY UPDATE value_string=VALUES(value_string);
@@ -319,6 +350,106 @@ ON DUPLICATE KEY UPDATE value_string=VALUES(value_string);
             _log.debug(f"calling execute many with records {len(records)}")
             self.execute_many(query, records)
 
+    def insert_data(self, ts, topic_id, data):
+        if self.partition_interval:
+            self._create_partitions([ts])
+        return super(MySqlFuncts, self).insert_data(ts, topic_id, data)
+
+    def manage_db_size(self, history_limit_timestamp, storage_limit_gb):
+        """
+        Manage database size. Only supported when the data table is
+        partitioned. Partitions entirely older than history_limit_timestamp
+        are dropped and the remaining old rows deleted, then the oldest
+        partitions are dropped until the data table is smaller than
+        storage_limit_gb. The newest partition is never dropped.
+        :param history_limit_timestamp: remove all data older than this timestamp
+        :param storage_limit_gb: remove oldest data until database is smaller than this value.
+        :return: number of rows removed, or None if not partitioned
+        """
+        if not self.partition_interval:
+            return None
+
+        removed = 0
+        partitions = self._load_partitions()
+
+        if history_limit_timestamp is not None:
+            limit = history_limit_timestamp
+            if limit.tzinfo is not None:
+                limit = limit.astimezone(pytz.UTC).replace(tzinfo=None)
+            expired = [start for start in sorted(partitions)
+                       if next_partition_start(start, self.partition_interval) <= limit]
+            if expired:
+                removed += self._drop_partitions({start: partitions.pop(start) for start in expired})
+            removed += self.execute_stmt('DELETE FROM ' + self.data_table + ' WHERE ts < %s', [limit],
+                                         commit=True)
+            if removed:
+                _log.debug("Deleted {} old items from historian. (TTL exceeded)".format(removed))
+
+        if storage_limit_gb is not None:
+            max_bytes = storage_limit_gb * 1024 ** 3
+            # information_schema sizes may be cached by the server so track
+            # the dropped sizes here instead of querying again.
+            sizes = dict(self.select(
+                "SELECT PARTITION_NAME, DATA_LENGTH + INDEX_LENGTH FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+                [self.db_name, self.data_table]))
+            total = sum(sizes.values())
+            while total >= max_bytes and len(partitions) > 1:
+                start = min(partitions)
+                name = partitions.pop(start)
+                count = self._drop_partitions({start: name})
+                removed += count
+                total -= sizes.get(name, 0)
+                _log.debug("Dropped partition {} of {} items. (Managing store size)".format(name, count))
+
+        return removed
+
+    def _load_partitions(self):
+        """
+        :return: dictionary of partition period start to partition name
+        """
+        rows = self.select("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                           "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+                           [self.db_name, self.data_table])
+        partitions = {}
+        for (name,) in rows:
+            start = parse_partition_name(self.data_table, name)
+            if start is not None:
+                partitions[start] = name
+        return partitions
+
+    def _create_partitions(self, timestamps):
+        """
+        Split partitions for any new periods off pmax. Range partitions must
+        be added in increasing order so periods older than the newest
+        partition are stored in the partition covering them.
+        """
+        starts = {partition_start(ts, self.partition_interval) for ts in timestamps}
+        newest = max(self._partitions, default=None)
+        starts = sorted(start for start in starts if newest is None or start > newest)
+        if not starts:
+            return
+        definitions = ["PARTITION {} VALUES LESS THAN ({})".format(
+            partition_name(self.data_table, start),
+            calendar.timegm(next_partition_start(start, self.partition_interval).timetuple()))
+            for start in starts]
+        definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        self.execute_stmt('ALTER TABLE ' + self.data_table + ' REORGANIZE PARTITION pmax INTO (' +
+                          ', '.join(definitions) + ')')
+        self._partitions.update(starts)
+
+    def _drop_partitions(self, partitions):
+        """
+        Drop partitions of the data table.
+        :param partitions: dictionary of partition period start to partition name
+        :return: number of rows dropped
+        """
+        names = ', '.join(partitions.values())
+        rows = self.select('SELECT COUNT(*) FROM ' + self.data_table + ' PARTITION (' + names + ')')
+        self.execute_stmt('ALTER TABLE ' + self.data_table + ' DROP PARTITION ' + names)
+        self._partitions.difference_update(partitions)
+        return rows[0][0] if rows else 0
+
     @contextlib.contextmanager
     def bulk_insert_meta(self):
         """
@@ -30,7 +30,8 @@ from psycopg2.extras import execute_values
 from volttron.platform.agent import utils
 from volttron.platform import jsonapi
 
-from .basedb import DbDriver
+from .basedb import (DbDriver, PARTITION_INTERVALS, next_partition_start, parse_partition_name, partition_name,
+                     partition_start)
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
@@ -57,6 +58,16 @@ class PostgreSqlFuncts(DbDriver):
             del connect_params["timescale_dialect"]
         else:
             self.timescale_dialect = False
+        # Natively range partition the data table by day, week or month.
+        self.partition_interval = connect_params.pop("partition_interval", None)
+        if self.partition_interval is not None and self.partition_interval not in PARTITION_INTERVALS:
+            raise ValueError("partition_interval should be one of {}. Got {}".format(
+                PARTITION_INTERVALS, self.partition_interval))
+        if self.partition_interval and self.timescale_dialect:
+            raise ValueError("partition_interval can not be used with timescale_dialect. "
+                             "Hypertables are already partitioned by time")
+        # Period starts of the partitions known to exist.
+        self._partitions = set()
         def connect():
             connection = psycopg2.connect(**connect_params)
             connection.autocommit = True
@@ -96,6 +107,8 @@ class PostgreSqlFuncts(DbDriver):
         yield insert_data
 
         if records:
+            if self.partition_interval:
+                self._create_partitions(ts for ts, _, _ in records)
             query = SQL('INSERT INTO {} VALUES %s '
                         'ON CONFLICT (ts, topic_id) DO UPDATE '
                         'SET value_string = EXCLUDED.value_string').format(
@@ -157,6 +170,12 @@ class PostgreSqlFuncts(DbDriver):
             if rows:
                 # metadata is in topics table
                 self.meta_table = self.topics_table
+            if self.partition_interval and not self.select(
+                    SQL('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass({})').format(
+                        Literal(self.data_table))):
+                _log.warning("Table {} was created without partitioning. Ignoring partition_interval".format(
+                    self.data_table))
+                self.partition_interval = None
         else:
             self.execute_stmt(SQL(
                 'CREATE TABLE IF NOT EXISTS {} ('
@@ -164,7 +183,8 @@ class PostgreSqlFuncts(DbDriver):
                     'topic_id INTEGER NOT NULL, '
                     'value_string TEXT NOT NULL, '
                     'UNIQUE (topic_id, ts)'
-                ')').format(Identifier(self.data_table)))
+                '){}').format(Identifier(self.data_table),
+                              SQL(' PARTITION BY RANGE (ts)' if self.partition_interval else '')))
             if self.timescale_dialect:
                 _log.debug("trying to create hypertable")
                 self.execute_stmt(SQL(
@@ -191,6 +211,97 @@ class PostgreSqlFuncts(DbDriver):
             # metadata is in topics table
             self.meta_table = self.topics_table
             self.commit()
+        if self.partition_interval:
+            self._partitions = set(self._load_partitions())
+
+    def insert_data(self, ts, topic_id, data):
+        if self.partition_interval:
+            self._create_partitions([ts])
+        return super(PostgreSqlFuncts, self).insert_data(ts, topic_id, data)
+
+    def manage_db_size(self, history_limit_timestamp, storage_limit_gb):
+        """
+        Manage database size. Only supported when the data table is
+        partitioned. Partitions entirely older than history_limit_timestamp
+        are dropped and the remaining old rows deleted, then the oldest
+        partitions are dropped until the data table is smaller than
+        storage_limit_gb. The newest partition is never dropped.
+        :param history_limit_timestamp: remove all data older than this timestamp
+        :param storage_limit_gb: remove oldest data until database is smaller than this value.
+        :return: number of rows removed, or None if not partitioned
+        """
+        if not self.partition_interval:
+            return None
+
+        removed = 0
+        partitions = self._load_partitions()
+
+        if history_limit_timestamp is not None:
+            limit = history_limit_timestamp
+            if limit.tzinfo is not None:
+                limit = limit.astimezone(pytz.UTC).replace(tzinfo=None)
+            for start in sorted(partitions):
+                if next_partition_start(start, self.partition_interval) <= limit:
+                    removed += self._drop_partition(start, partitions.pop(start))
+            removed += self.execute_stmt(SQL('DELETE FROM {} WHERE ts < %s').format(Identifier(self.data_table)),
+                                         (limit,), commit=True)
+            if removed:
+                _log.debug("Deleted {} old items from historian. (TTL exceeded)".format(removed))
+
+        if storage_limit_gb is not None:
+            max_bytes = storage_limit_gb * 1024 ** 3
+            sizes = dict(self.select(SQL(
+                'SELECT c.relname, pg_total_relation_size(c.oid) FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid '
+                'WHERE i.inhparent = to_regclass({})').format(Literal(self.data_table))))
+            total = sum(sizes.values())
+            while total >= max_bytes and len(partitions) > 1:
+                start = min(partitions)
+                name = partitions.pop(start)
+                count = self._drop_partition(start, name)
+                removed += count
+                total -= sizes.get(name, 0)
+                _log.debug("Dropped partition {} of {} items. (Managing store size)".format(name, count))
+
+        return removed
+
+    def _load_partitions(self):
+        """
+        :return: dictionary of partition period start to partition name
+        """
+        rows = self.select(SQL(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass({})').format(Literal(self.data_table)))
+        partitions = {}
+        for (name,) in rows:
+            start = parse_partition_name(self.data_table, name)
+            if start is not None:
+                partitions[start] = name
+        return partitions
+
+    def _create_partitions(self, timestamps):
+        """
+        Create any partitions missing for the given timestamps. Rows without a
+        partition would be rejected by PostgreSQL.
+        """
+        starts = {partition_start(ts, self.partition_interval) for ts in timestamps}
+        for start in starts - self._partitions:
+            self.execute_stmt(SQL('CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})').format(
+                Identifier(partition_name(self.data_table, start)),
+                Identifier(self.data_table),
+                Literal(start),
+                Literal(next_partition_start(start, self.partition_interval))))
+            self._partitions.add(start)
+
+    def _drop_partition(self, start, name):
+        """
+        Drop a partition of the data table.
+        :return: number of rows dropped
+        """
+        rows = self.select(SQL('SELECT COUNT(*) FROM {}').format(Identifier(name)))
+        self.execute_stmt(SQL('DROP TABLE IF EXISTS {}').format(Identifier(name)))
+        self._partitions.discard(start)
+        return rows[0][0] if rows else 0
 
     def setup_aggregate_historian_tables(self):
 
@@ -219,43 +330,52 @@ class PostgreSqlFuncts(DbDriver):
             table_name = self.data_table
             value_col = 'value_string'
 
-        topic_id = Literal(0)
-        query = [SQL(
-            '''SELECT to_char(ts, 'YYYY-MM-DD"T"HH24:MI:SS.USOF:00'), ''' + value_col + ' \n'
-            'FROM {}\n'
-            'WHERE topic_id = {}'
-        ).format(Identifier(table_name), topic_id)]
+        # All topics are read by a single statement. Paging applies to each
+        # topic, so skip and count are applied to a per topic row number.
+        direction = 'DESC' if order == 'LAST_TO_FIRST' else 'ASC'
+        where = [SQL('WHERE topic_id IN ({})').format(
+            SQL(', ').join(Literal(topic_id) for topic_id in topic_ids))]
         if start and start.tzinfo != pytz.UTC:
             start = start.astimezone(pytz.UTC)
         if end and end.tzinfo != pytz.UTC:
             end = end.astimezone(pytz.UTC)
         if start and start == end:
-            query.append(SQL(' AND ts = {}').format(Literal(start)))
+            where.append(SQL(' AND ts = {}').format(Literal(start)))
         else:
             if start:
-                query.append(SQL(' AND ts >= {}').format(Literal(start)))
+                where.append(SQL(' AND ts >= {}').format(Literal(start)))
             if end:
-                query.append(SQL(' AND ts < {}').format(Literal(end)))
-        query.append(SQL('ORDER BY ts {}'.format(
-            'DESC' if order == 'LAST_TO_FIRST' else 'ASC')))
+                where.append(SQL(' AND ts < {}').format(Literal(end)))
+        where = SQL('\n').join(where)
+
         if skip or count:
-            query.append(SQL('LIMIT {} OFFSET {}').format(
-                Literal(None if not count or count < 0 else count),
-                Literal(None if not skip or skip < 0 else skip)))
-        query = SQL('\n').join(query)
-        values = {}
-        if value_col == 'agg_value':
-            for topic_id._wrapped in topic_ids:
-                name = id_name_map[topic_id.wrapped]
-                with self.select(query, fetch_all=False) as cursor:
-                    values[name] = [(ts, value)
-                                    for ts, value in cursor]
+            skip = skip if skip and skip > 0 else 0
+            row_limit = SQL('')
+            if count and count > 0:
+                row_limit = SQL(' AND row_num <= {}').format(Literal(skip + count))
+            source = SQL(
+                '(SELECT topic_id, ts, ' + value_col + ', '
+                'ROW_NUMBER() OVER (PARTITION BY topic_id ORDER BY ts ' + direction + ') AS row_num\n'
+                'FROM {}\n'
+                '{}) AS page\n'
+                'WHERE row_num > {}{}'
+            ).format(Identifier(table_name), where, Literal(skip), row_limit)
         else:
-            for topic_id._wrapped in topic_ids:
-                name = id_name_map[topic_id.wrapped]
-                with self.select(query, fetch_all=False) as cursor:
-                    values[name] = [(ts, jsonapi.loads(value))
-                                    for ts, value in cursor]
+            source = SQL('{}\n{}').format(Identifier(table_name), where)
+        query = SQL(
+            '''SELECT topic_id, to_char(ts, 'YYYY-MM-DD"T"HH24:MI:SS.USOF:00'), ''' + value_col + ' \n'
+            'FROM {}\n'
+            'ORDER BY topic_id ' + direction + ', ts ' + direction
+        ).format(source)
+
+        values = {id_name_map[topic_id]: [] for topic_id in topic_ids}
+        with self.select(query, fetch_all=False) as cursor:
+            if value_col == 'agg_value':
+                for topic_id, ts, value in cursor:
+                    values[id_name_map[topic_id]].append((ts, value))
+            else:
+                for topic_id, ts, value in cursor:
+                    values[id_name_map[topic_id]].append((ts, jsonapi.loads(value)))
         return values
 
     def insert_topic(self, topic, **kwargs):
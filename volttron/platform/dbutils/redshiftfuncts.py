@@ -150,13 +150,14 @@ class RedshiftFuncts(DbDriver):
             table_name = agg_type + '_' + agg_period
         else:
             table_name = self.data_table
-        topic_id = Literal(0)
+        # All topics are read by a single statement. Paging applies to each
+        # topic, so skip and count are applied to a per topic row number.
+        direction = 'DESC' if order == 'LAST_TO_FIRST' else 'ASC'
         query = [SQL(
-            '''SELECT DISTINCT to_char(ts, 'YYYY-MM-DD"T"HH24:MI:SS.USOF:00'), '''
-            'value_string\n'
+            'SELECT DISTINCT topic_id, ts, value_string\n'
             'FROM {}\n'
-            'WHERE topic_id = {}'
-        ).format(Identifier(table_name), topic_id)]
+            'WHERE topic_id IN ({})'
+        ).format(Identifier(table_name), SQL(', ').join(Literal(topic_id) for topic_id in topic_ids))]
         if start and start.tzinfo != pytz.UTC:
             start = start.astimezone(pytz.UTC)
         if end and end.tzinfo != pytz.UTC:
@@ -168,19 +169,27 @@ class RedshiftFuncts(DbDriver):
                 query.append(SQL(' AND ts >= {}').format(Literal(start)))
             if end:
                 query.append(SQL(' AND ts < {}').format(Literal(end)))
-        query.append(SQL('ORDER BY ts {}'.format(
-            'DESC' if order == 'LAST_TO_FIRST' else 'ASC')))
+        source = SQL('({}) AS topic_rows').format(SQL('\n').join(query))
         if skip or count:
-            query.append(SQL('LIMIT {} OFFSET {}').format(
-                Literal(None if not count or count < 0 else count),
-                Literal(None if not skip or skip < 0 else skip)))
-        query = SQL('\n').join(query)
-        values = {}
-        for topic_id._wrapped in topic_ids:
-            name = id_name_map[topic_id.wrapped]
-            with self.select(query, fetch_all=False) as cursor:
-                values[name] = [(ts, jsonapi.loads(value))
-                                for ts, value in cursor]
+            skip = skip if skip and skip > 0 else 0
+            row_limit = SQL('')
+            if count and count > 0:
+                row_limit = SQL(' AND row_num <= {}').format(Literal(skip + count))
+            source = SQL(
+                '(SELECT topic_id, ts, value_string, '
+                'ROW_NUMBER() OVER (PARTITION BY topic_id ORDER BY ts ' + direction + ') AS row_num\n'
+                'FROM {}) AS page\n'
+                'WHERE row_num > {}{}'
+            ).format(source, Literal(skip), row_limit)
+        query = SQL(
+            '''SELECT topic_id, to_char(ts, 'YYYY-MM-DD"T"HH24:MI:SS.USOF:00'), value_string\n'''
+            'FROM {}\n'
+            'ORDER BY topic_id ' + direction + ', ts ' + direction
+        ).format(source)
+        values = {id_name_map[topic_id]: [] for topic_id in topic_ids}
+        with self.select(query, fetch_all=False) as cursor:
+            for topic_id, ts, value in cursor:
+                values[id_name_map[topic_id]].append((ts, jsonapi.loads(value)))
         return values
 
     def insert_topic(self, topic, **kwargs):
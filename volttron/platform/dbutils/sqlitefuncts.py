@@ -44,7 +44,8 @@ import pytz
 import threading
 import os
 import re
-from .basedb import DbDriver
+from .basedb import (DbDriver, PARTITION_INTERVALS, next_partition_start, parse_partition_name, partition_name,
+                     partition_start)
 from collections import defaultdict
 from datetime import datetime
 from math import ceil
@@ -102,6 +103,18 @@ class SqlLiteFuncts(DbDriver):
         if 'timeout' not in connect_params.keys():
             connect_params['timeout'] = 10
 
+        # Store data in one table per day, week or month rather than a
+        # single data table.
+        self.partition_interval = connect_params.get('partition_interval')
+        if self.partition_interval is not None and self.partition_interval not in PARTITION_INTERVALS:
+            raise ValueError("partition_interval should be one of {}. Got {}".format(
+                PARTITION_INTERVALS, self.partition_interval))
+        connect_params = {k: v for k, v in connect_params.items() if k != 'partition_interval'}
+        # Partition period start to table name.
+        self._partitions = {}
+
+        # Most rows deleted in one transaction by manage_db_size.
+        self.retention_chunk_size = 10000
         self.data_table = None
         self.topics_table = None
         self.meta_table = None
@@ -158,6 +171,8 @@ class SqlLiteFuncts(DbDriver):
             # metadata is in topics table
             self.meta_table = self.topics_table
             _log.debug("Created new schema. data and topics tables")
+        if self.partition_interval:
+            self._load_partitions()
 
     def setup_aggregate_historian_tables(self):
 
@@ -202,15 +217,8 @@ class SqlLiteFuncts(DbDriver):
             table_name = agg_type + "_" + agg_period
             value_col = 'agg_value'
 
-        query = '''SELECT topic_id, ts, ''' + value_col + '''
-                   FROM ''' + table_name + '''
-                   {where}
-                   {order_by}
-                   {limit}
-                   {offset}'''
-
-        where_clauses = ["WHERE topic_id = ?"]
-        args = [topic_ids[0]]
+        where_clauses = []
+        args = []
 
         # base historian converts naive timestamps to UTC, but if the start and end had explicit timezone info then they
         # need to get converted to UTC since sqlite3 only store naive timestamp
@@ -230,71 +238,117 @@ class SqlLiteFuncts(DbDriver):
                 where_clauses.append("ts < ?")
                 args.append(end)
 
-        where_statement = ' AND '.join(where_clauses)
+        def data_from(topic_clause):
+            where_statement = ' AND '.join([topic_clause] + where_clauses)
+            if value_col == 'agg_value':
+                return table_name, where_statement, 1
+            return self._data_from('topic_id, ts, value_string', where_statement, start, end)
+
+        # All topics are read by a single statement. Paging applies to each
+        # topic, so count and skip are applied to a per topic row number.
+        table, where_statement, repeat = data_from(
+            "WHERE topic_id IN ({})".format(', '.join('?' * len(topic_ids))))
+        topics_args = list(topic_ids) + args
 
-        order_by = 'ORDER BY topic_id ASC, ts ASC'
-        if order == 'LAST_TO_FIRST':
-            order_by = ' ORDER BY topic_id DESC, ts DESC'
+        direction = 'DESC' if order == 'LAST_TO_FIRST' else 'ASC'
 
-        # can't have an offset without a limit
         # -1 = no limit and allows the user to provide just an offset
         if count is None:
             count = -1
 
-        limit_statement = 'LIMIT ?'
-        args.append(count)
-
-        offset_statement = ''
-        if skip > 0:
-            offset_statement = 'OFFSET ?'
-            args.append(skip)
-
-        real_query = query.format(where=where_statement,
-                                  limit=limit_statement,
-                                  offset=offset_statement,
-                                  order_by=order_by)
-        _log.debug("Real Query: " + real_query)
-        _log.debug("args: " + str(args))
+        statements = []
+        if count < 0 and skip <= 0:
+            statements.append((
+                '''SELECT topic_id, CAST(ts AS TEXT), ''' + value_col + '''
+                   FROM ''' + table + '''
+                   ''' + where_statement + '''
+                   ORDER BY topic_id ''' + direction + ''', ts ''' + direction,
+                topics_args * repeat))
+        elif sqlite3.sqlite_version_info >= (3, 25, 0):
+            page_args = [max(skip, 0)]
+            row_limit = ''
+            if count >= 0:
+                row_limit = 'AND row_num <= ?'
+                page_args.append(max(skip, 0) + count)
+            statements.append((
+                '''SELECT topic_id, CAST(ts AS TEXT), value FROM (
+                       SELECT topic_id, ts, ''' + value_col + ''' AS value,
+                              ROW_NUMBER() OVER (PARTITION BY topic_id ORDER BY ts ''' + direction + ''') AS row_num
+                       FROM ''' + table + '''
+                       ''' + where_statement + ''')
+                   WHERE row_num > ? ''' + row_limit + '''
+                   ORDER BY topic_id ''' + direction + ''', ts ''' + direction,
+                topics_args * repeat + page_args))
+        else:
+            # No window functions before SQLite 3.25, page each topic on its own.
+            table, where_statement, repeat = data_from("WHERE topic_id = ?")
+            for topic_id in topic_ids:
+                topic_args = [topic_id] + args
+                statements.append((
+                    '''SELECT topic_id, CAST(ts AS TEXT), ''' + value_col + '''
+                       FROM ''' + table + '''
+                       ''' + where_statement + '''
+                       ORDER BY ts ''' + direction + '''
+                       LIMIT ? OFFSET ?''',
+                    topic_args * repeat + [count, max(skip, 0)]))
 
         values = defaultdict(list)
-        start_t = datetime.utcnow()
         for topic_id in topic_ids:
-            args[0] = topic_id
             values[id_name_map[topic_id]] = []
-            cursor = self.select(real_query, args, fetch_all=False)
-            if cursor:
-                if value_col == 'agg_value':
-                    for _id, ts, value in cursor:
-                        values[id_name_map[topic_id]].append((utils.format_timestamp(ts), value))
-                    cursor.close()
-                else:
-                    for _id, ts, value in cursor:
-                        values[id_name_map[topic_id]].append((utils.format_timestamp(ts), jsonapi.loads(value)))
-                    cursor.close()
+        # Timestamps are read as stored rather than through the timestamp
+        # converter. Topics written together share timestamps so each one is
+        # parsed and formatted once.
+        timestamps = {}
+        start_t = datetime.utcnow()
+        for real_query, real_args in statements:
+            _log.debug("Real Query: " + real_query)
+            _log.debug("args: " + str(real_args))
+            cursor = self.select(real_query, real_args, fetch_all=False)
+            if not cursor:
+                continue
+            for topic_id, ts, value in cursor:
+                formatted = timestamps.get(ts)
+                if formatted is None:
+                    formatted = timestamps[ts] = utils.format_timestamp(utils.parse_timestamp_string(ts))
+                if value_col != 'agg_value':
+                    value = jsonapi.loads(value)
+                values[id_name_map[topic_id]].append((formatted, value))
+            cursor.close()
 
         _log.debug("Time taken to load results from db:{}".format(datetime.utcnow()-start_t))
         return values
 
     def manage_db_size(self, history_limit_timestamp, storage_limit_gb):
         """
-        Manage database size.
+        Manage database size. Old data is deleted oldest first in chunks of
+        at most retention_chunk_size rows, committing after each chunk so
+        inserts from the historian are not blocked for long. With
+        partitioning, partitions entirely older than the limits are dropped
+        instead.
         :param history_limit_timestamp: remove all data older than this timestamp
         :param storage_limit_gb: remove oldest data until database is smaller than this value.
+        :return: number of rows removed
         """
 
         _log.debug("Managing store - timestamp limit: {}  GB size limit: {}".format(
             history_limit_timestamp, storage_limit_gb))
 
-        commit = False
+        removed = 0
 
         if history_limit_timestamp is not None:
-            count = self.execute_stmt(
-                '''DELETE FROM ''' + self.data_table +
-                ''' WHERE ts < ?''', (history_limit_timestamp,))
-
-            if count is not None and count > 0:
-                _log.debug("Deleted {} old items from historian. (TTL exceeded)".format(count))
-                commit = True
+            if self.partition_interval:
+                limit = self._naive_utc(history_limit_timestamp)
+                for start, name in sorted(self._load_partitions().items()):
+                    if next_partition_start(start, self.partition_interval) <= limit:
+                        removed += self._drop_partition(start)
+            for table in self._data_tables(end=history_limit_timestamp):
+                while True:
+                    count = self._delete_oldest(self.retention_chunk_size, history_limit_timestamp, table)
+                    removed += count
+                    if count < self.retention_chunk_size:
+                        break
+            if removed:
+                _log.debug("Deleted {} old items from historian. (TTL exceeded)".format(removed))
 
         if storage_limit_gb is not None:
             result = self.select('''PRAGMA page_size''')
@@ -302,25 +356,155 @@ class SqlLiteFuncts(DbDriver):
             max_storage_bytes = storage_limit_gb * 1024 ** 3
             max_pages = int(ceil(max_storage_bytes / page_size))
 
-            def page_count():
-                result = self.select("PRAGMA page_count")
-                return result[0][0]
+            def used_pages():
+                return self.select("PRAGMA page_count")[0][0] - self.select("PRAGMA freelist_count")[0][0]
+
+            pages = used_pages()
+            chunk_size = self.retention_chunk_size
+            while pages >= max_pages:
+                table = self._oldest_data_table()
+                partitions = sorted(self._partitions)
+                if table != self.data_table and len(partitions) > 1:
+                    # Never drop the newest partition, it is being written to.
+                    count = self._drop_partition(partitions[0])
+                    removed += count
+                    pages = used_pages()
+                    _log.debug("Dropped partition {} of {} items. (Managing store size)".format(table, count))
+                    continue
+                count = self._delete_oldest(chunk_size, table=table)
+                if not count:
+                    break
+                removed += count
+                freed = pages - used_pages()
+                pages -= freed
+                # Size the next chunk from how many rows it took to free a page.
+                if freed > 0:
+                    chunk_size = max(1, min(self.retention_chunk_size,
+                                            int(ceil((pages - max_pages + 1) * count / freed))))
+                _log.debug("Deleted {} old items from historian. (Managing store size)".format(count))
+
+        return removed
+
+    def _delete_oldest(self, limit, before=None, table=None):
+        """
+        Delete and commit up to `limit` of the oldest rows of `table`, the
+        data table by default, walking the ts index. Only rows older than
+        `before` if given.
+        """
+        table = table or self.data_table
+        if before is None:
+            where, args = '', (limit,)
+        else:
+            where, args = 'WHERE ts < ?', (before, limit)
+        count = self.execute_stmt(
+            '''DELETE FROM ''' + table + ''' WHERE rowid IN
+            (SELECT rowid FROM ''' + table + ' ' + where + '''
+            ORDER BY ts ASC LIMIT ?)''', args, commit=True)
+        return count or 0
+
+    @staticmethod
+    def _naive_utc(ts):
+        if isinstance(ts, str):
+            ts = utils.parse_timestamp_string(ts)
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(pytz.UTC).replace(tzinfo=None)
+        return ts
+
+    def _load_partitions(self):
+        """
+        Refresh the partitions of the data table from the schema. Other
+        connections to the database may have added or dropped some.
+        """
+        rows = self.select("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE ?",
+                           (self.data_table + '_p%',))
+        partitions = {}
+        for name, in rows:
+            start = parse_partition_name(self.data_table, name)
+            if start is not None:
+                partitions[start] = name
+        self._partitions = partitions
+        return partitions
+
+    def _partition_for(self, ts):
+        """
+        Name of the partition data at `ts` is stored in, creating it if needed.
+        """
+        start = partition_start(ts, self.partition_interval)
+        name = self._partitions.get(start)
+        if name is None:
+            name = partition_name(self.data_table, start)
+            self.execute_stmt(
+                '''CREATE TABLE IF NOT EXISTS ''' + name +
+                ''' (ts timestamp NOT NULL,
+                     topic_id INTEGER NOT NULL,
+                     value_string TEXT NOT NULL,
+                     UNIQUE(topic_id, ts))''', commit=False)
+            self.execute_stmt(
+                '''CREATE INDEX IF NOT EXISTS ''' + name + '''_idx
+                ON ''' + name + ''' (ts ASC)''', commit=False)
+            self._partitions[start] = name
+        return name
 
-            while page_count() >= max_pages:
-                count = self.execute_stmt(
-                    '''DELETE FROM ''' + self.data_table +
-                    '''
-                    WHERE ts IN
-                    (SELECT ts FROM ''' + self.data_table +
-                    '''
-                    ORDER BY ts ASC LIMIT 100)''')
+    def _drop_partition(self, start):
+        """
+        Drop the partition starting at `start`, returning its row count.
+        """
+        name = self._partitions.pop(start)
+        count = self.select('''SELECT count(*) FROM ''' + name)[0][0]
+        self.execute_stmt('''DROP TABLE IF EXISTS ''' + name, commit=True)
+        return count
 
-                _log.debug("Deleted 100 old items from historian. (Managing store size)".format(count))
-                commit = True
+    def _data_tables(self, start=None, end=None):
+        """
+        Tables holding raw data between start and end: the data table and,
+        with partitioning, every partition overlapping the range oldest
+        first. Data stored before partitioning was enabled stays in the data
+        table.
+        """
+        if not self.partition_interval:
+            return [self.data_table]
+        start = self._naive_utc(start) if start else None
+        end = self._naive_utc(end) if end else None
+        tables = [self.data_table]
+        for partition, name in sorted(self._load_partitions().items()):
+            if start is not None and next_partition_start(partition, self.partition_interval) <= start:
+                continue
+            if end is not None and (partition > end or (partition == end and start != end)):
+                continue
+            tables.append(name)
+        return tables
+
+    def _oldest_data_table(self):
+        """
+        Table holding the oldest raw data, or None if there is none.
+        """
+        if not self.partition_interval or self.select('''SELECT 1 FROM ''' + self.data_table + ''' LIMIT 1'''):
+            return self.data_table
+        partitions = self._load_partitions()
+        return partitions[min(partitions)] if partitions else None
 
-        if commit:
-            _log.debug("Committing changes for manage_db_size.")
-            self.commit()
+    def _data_from(self, columns, where_statement, start=None, end=None):
+        """
+        FROM target and WHERE statement for reading `columns` of the raw data
+        between start and end. With partitioning this is a UNION ALL of
+        every table holding data in the range, each filtered by
+        `where_statement`.
+        :return: FROM target, WHERE statement and the number of times the
+        arguments of `where_statement` must be repeated
+        """
+        tables = self._data_tables(start, end)
+        if len(tables) == 1:
+            return tables[0], where_statement, 1
+        union = ' UNION ALL '.join(
+            'SELECT ' + columns + ' FROM ' + table + ' ' + where_statement for table in tables)
+        return '(' + union + ')', '', len(tables)
+
+    def insert_data(self, ts, topic_id, data):
+        if not self.partition_interval:
+            return super(SqlLiteFuncts, self).insert_data(ts, topic_id, data)
+        self.execute_stmt('''INSERT OR REPLACE INTO ''' + self._partition_for(ts) + ''' values(?, ?, ?)''',
+                          (ts, topic_id, jsonapi.dumps(data)), commit=False)
+        return True
 
     def insert_meta_query(self):
         return '''INSERT OR REPLACE INTO ''' + self.meta_table + \
@@ -510,8 +694,7 @@ class SqlLiteFuncts(DbDriver):
         if isinstance(agg_type, str):
             if agg_type.upper() not in ['AVG', 'MIN', 'MAX', 'COUNT', 'SUM']:
                 raise ValueError("Invalid aggregation type {}".format(agg_type))
-        query = '''SELECT ''' + agg_type + '''(value_string), count(value_string) FROM ''' + \
-                self.data_table + ''' {where}'''
+        query = '''SELECT ''' + agg_type + '''(value_string), count(value_string) FROM {table} {where}'''
 
         where_clauses = ["WHERE topic_id = ?"]
         args = [topic_ids[0]]
@@ -543,8 +726,10 @@ class SqlLiteFuncts(DbDriver):
                 args.append(end)
 
         where_statement = ' AND '.join(where_clauses)
+        table, where_statement, repeat = self._data_from('value_string', where_statement, start, end)
 
-        real_query = query.format(where=where_statement)
+        real_query = query.format(table=table, where=where_statement)
+        args = args * repeat
         _log.debug("Real Query: " + real_query)
         _log.debug("args: " + str(args))
 
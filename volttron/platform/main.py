@@ -73,7 +73,7 @@ import gevent
 from volttron.platform.vip.healthservice import HealthService
 from volttron.platform.vip.servicepeer import ServicePeerNotifier
 from volttron.utils import get_random_key
-from volttron.utils.frame_serialization import deserialize_frames, serialize_frames
+from volttron.utils.frame_serialization import serialize_frames
 
 import zmq
 from zmq import ZMQError
@@ -108,7 +108,7 @@ from .agent.known_identities import PLATFORM_WEB, CONFIGURATION_STORE, AUTH, CON
     PLATFORM_HEALTH, KEY_DISCOVERY, PROXY_ROUTER, PLATFORM
 from .vip.agent.subsystems.pubsub import ProtectedPubSubTopics
 from .keystore import KeyStore, KnownHostsStore
-from .vip.pubsubservice import PubSubService
+from .vip.pubsubservice import PubSubService, SEND_QUEUE_POLICIES
 from .vip.routingservice import RoutingService
 from .vip.externalrpcservice import ExternalRPCService
 from .vip.keydiscovery import KeyDiscoveryAgent
@@ -154,6 +154,9 @@ for log_name in log_level_info:
 
 VOLTTRON_INSTANCES = '~/.volttron_instances'
 
+# Milliseconds between retries of publishes queued for slow subscribers
+PUBSUB_SEND_RETRY_INTERVAL = 50
+
 
 def log_to_file(file_, level=logging.WARNING,
                 handler_class=logging.StreamHandler):
@@ -309,7 +312,8 @@ class Router(BaseRouter):
                  bind_web_address=None, volttron_central_serverkey=None,
                  protected_topics={}, external_address_file='',
                  msgdebug=None, agent_monitor_frequency=600,
-                 service_notifier=Optional[ServicePeerNotifier]):
+                 service_notifier=Optional[ServicePeerNotifier],
+                 pubsub_send_queue_size=0, pubsub_send_queue_policy='drop-oldest'):
 
         super(Router, self).__init__(
             context=context, default_user_id=default_user_id, service_notifier=service_notifier)
@@ -343,6 +347,8 @@ class Router(BaseRouter):
         self._message_debugger_socket = None
         self._instance_name = instance_name
         self._agent_monitor_frequency = agent_monitor_frequency
+        self._pubsub_send_queue_size = pubsub_send_queue_size
+        self._pubsub_send_queue_policy = pubsub_send_queue_policy
 
     def setup(self):
         sock = self.socket
@@ -387,7 +393,9 @@ class Router(BaseRouter):
 
         self.pubsub = PubSubService(self.socket,
                                     self._protected_topics,
-                                    self._ext_routing)
+                                    self._ext_routing,
+                                    send_queue_size=self._pubsub_send_queue_size,
+                                    send_queue_policy=self._pubsub_send_queue_policy)
         self.ext_rpc = ExternalRPCService(self.socket,
                                           self._ext_routing)
         self._poller.register(sock, zmq.POLLIN)
@@ -516,8 +524,10 @@ class Router(BaseRouter):
         """
         Poll for incoming messages through router socket or other external socket connections
         """
+        # Wake up periodically to retry sending queued publishes to slow subscribers
+        timeout = PUBSUB_SEND_RETRY_INTERVAL if self.pubsub.has_pending_sends() else None
         try:
-            sockets = dict(self._poller.poll())
+            sockets = dict(self._poller.poll(timeout))
         except ZMQError as ex:
             _log.error("ZMQ Error while polling: {}".format(ex))
 
@@ -525,7 +535,7 @@ class Router(BaseRouter):
             if sock == self.socket:
                 if sockets[sock] == zmq.POLLIN:
                     frames = sock.recv_multipart(copy=False)
-                    self.route(deserialize_frames(frames))
+                    self.route(frames)
             elif sock in self._ext_routing._vip_sockets:
                 if sockets[sock] == zmq.POLLIN:
                     # _log.debug("From Ext Socket: ")
@@ -535,6 +545,8 @@ class Router(BaseRouter):
             else:
                 # _log.debug("External ")
                 frames = sock.recv_multipart(copy=False)
+        if self.pubsub.has_pending_sends():
+            self.pubsub.flush_send_queues()
 
     def ext_route(self, socket):
         """
@@ -545,7 +557,7 @@ class Router(BaseRouter):
         # Expecting incoming frames to follow this VIP format:
         #   [SENDER, PROTO, USER_ID, MSG_ID, SUBSYS, ...]
         frames = socket.recv_multipart(copy=False)
-        self.route(deserialize_frames(frames))
+        self.route(frames)
         # for f in frames:
         #     _log.debug("PUBSUBSERVICE Frames: {}".format(bytes(f)))
         if len(frames) < 6:
@@ -863,7 +875,9 @@ def start_volttron_process(opts):
                    protected_topics=protected_topics,
                    external_address_file=external_address_file,
                    msgdebug=opts.msgdebug,
-                   service_notifier=notifier).run()
+                   service_notifier=notifier,
+                   pubsub_send_queue_size=opts.pubsub_send_queue_size,
+                   pubsub_send_queue_policy=opts.pubsub_send_queue_policy).run()
         except Exception:
             _log.exception('Unhandled exception in router loop')
             raise
@@ -910,7 +924,8 @@ def start_volttron_process(opts):
         config_store = ConfigStoreService(address=address,
                                             identity=CONFIGURATION_STORE,
                                             message_bus=opts.message_bus,
-                                            enable_auth=opts.allow_auth)
+                                            enable_auth=opts.allow_auth,
+                                            max_parsed_configs=opts.config_store_cache_size)
 
         # Launch additional services and wait for them to start before
         # auto-starting agents
@@ -1313,6 +1328,18 @@ def main(argv=sys.argv):
         '--agent-monitor-frequency', default=600,
         help='How often should the platform check for crashed agents and '
              'attempt to restart. Units=seconds. Default=600')
+    agents.add_argument(
+        '--pubsub-send-queue-size', type=int, default=0,
+        help='Number of published messages the platform queues for each subscriber that is not keeping up. '
+             'Default=0, messages a subscriber cannot take are dropped')
+    agents.add_argument(
+        '--pubsub-send-queue-policy', default='drop-oldest', choices=SEND_QUEUE_POLICIES,
+        help='What to drop from a full subscriber send queue: drop-oldest, drop-newest, conflate to keep the latest '
+             'message per topic, or block-publisher to have the publisher retry. Default=drop-oldest')
+    agents.add_argument(
+        '--config-store-cache-size', type=int, default=1000,
+        help='Number of parsed configurations the configuration store keeps in memory across all agents. '
+             'Default=1000, 0 keeps all of them')
     agents.add_argument(
         '--agent-isolation-mode', default=False,
         help='Require that agents run with their own users (this requires '
@@ -42,6 +42,9 @@ import glob
 import os
 import os.path
 import errno
+import time
+from collections import ChainMap, OrderedDict
+from collections.abc import Mapping
 from csv import DictReader
 from io import StringIO
 
@@ -50,10 +53,11 @@ import gevent
 from volttron.platform import jsonapi
 from gevent.lock import Semaphore
 
-from volttron.utils.persistance import PersistentDict
+from volttron.utils.persistance import JournaledPersistentDict
 from volttron.platform.agent.utils import parse_json_config
 from volttron.platform.vip.agent import errors
 from volttron.platform.jsonrpc import RemoteError, MethodNotFound
+from volttron.platform.messaging import topics
 from volttron.platform.agent.utils import parse_timestamp_string, format_timestamp, get_aware_utc_now
 from volttron.platform.storeutils import check_for_recursion, strip_config_name, store_ext
 from .vip.agent import Agent, Core, RPC
@@ -63,25 +67,19 @@ _log = logging.getLogger(__name__)
 
 UPDATE_TIMEOUT = 30.0
 
+# Change notification topics by store action.
+CHANGE_TOPICS = {"NEW": topics.CONFIG_ADD,
+                 "UPDATE": topics.CONFIG_UPDATE,
+                 "DELETE": topics.CONFIG_REMOVE,
+                 "DELETE_ALL": topics.CONFIG_REMOVE}
+
 def process_store(identity, store):
-    """Parses raw store data and returns contents.
-    Called at startup to initialize the parsed version of the store."""
-    results = {}
+    """Checks raw store data for conflicting names and returns the name map.
+    Called when the store of an agent is first used. Configurations are
+    parsed on demand by AgentConfigs."""
     name_map = {}
     sync_store = False
-    for config_name, config_data in store.items():
-        config_type = config_data["type"]
-        config_string = config_data["data"]
-        try:
-            processed_config = process_raw_config(config_string, config_type)
-            if check_for_recursion(config_name, processed_config, results):
-                raise ValueError("Recursive configuration references")
-            results[config_name] = processed_config
-        except ValueError as e:
-            _log.error("Error processing Agent {} config {}: {}".format(identity, config_name, str(e)))
-            sync_store = True
-            del store[config_name]
-
+    for config_name in list(store):
         if config_name.lower() in name_map:
             _log.error("Conflicting names in store, dropping {}".format(config_name))
             sync_store = True
@@ -94,7 +92,7 @@ def process_store(identity, store):
         _log.warning("Removing invalid configurations for Agent {}".format(identity))
         store.sync()
 
-    return results, name_map
+    return name_map
 
 
 def process_raw_config(config_string, config_type="raw"):
@@ -113,8 +111,120 @@ def process_raw_config(config_string, config_type="raw"):
     raise ValueError("Unsupported configuration type.")
 
 
+_MISSING = object()
+
+
+class ParsedConfigCache(object):
+    """Least recently used parsed configurations of all agents, keyed by
+    (identity, config_name). A max_size below 1 keeps every configuration."""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self.max_size > 0:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+    def discard_identity(self, identity):
+        for key in [key for key in self._entries if key[0] == identity]:
+            del self._entries[key]
+
+    def get_metrics(self):
+        return {"size": len(self._entries), "max_size": self.max_size,
+                "hits": self.hits, "misses": self.misses}
+
+
+class AgentConfigs(Mapping):
+    """Parsed configurations of an agent, parsed from the raw store on first use.
+
+    Setting or deleting a configuration only updates the cache, the caller
+    updates the raw store."""
+
+    def __init__(self, identity, store, cache):
+        self.identity = identity
+        self.store = store
+        self.cache = cache
+
+    def __getitem__(self, config_name):
+        key = (self.identity, config_name)
+        parsed = self.cache.get(key)
+        if parsed is not _MISSING:
+            return parsed
+        config_data = self.store[config_name]
+        try:
+            parsed = process_raw_config(config_data["data"], config_data["type"])
+        except ValueError as e:
+            _log.error("Error processing Agent {} config {}: {}".format(self.identity, config_name, str(e)))
+            raise KeyError(config_name)
+        self.cache.put(key, parsed)
+        return parsed
+
+    def __contains__(self, config_name):
+        return config_name in self.store
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __setitem__(self, config_name, parsed):
+        self.cache.put((self.identity, config_name), parsed)
+
+    def __delitem__(self, config_name):
+        self.cache.discard((self.identity, config_name))
+
+    def pop(self, config_name, default=None):
+        parsed = self.get(config_name, default)
+        del self[config_name]
+        return parsed
+
+    def clear(self):
+        self.cache.discard_identity(self.identity)
+
+    def parse_all(self):
+        """Returns a dict of all configurations that parse."""
+        configs = {}
+        for config_name in self.store:
+            try:
+                configs[config_name] = self[config_name]
+            except KeyError:
+                pass
+        return configs
+
+
+class _StagedConfigs(ChainMap):
+    """Configurations of a batch in front of the stored ones. Stored configurations
+    that fail to parse read as missing, as they do from AgentConfigs.get."""
+
+    def get(self, config_name, default=None):
+        try:
+            return self[config_name]
+        except KeyError:
+            return default
+
+
 class ConfigStoreService(Agent):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, max_parsed_configs=1000, **kwargs):
         super(ConfigStoreService, self).__init__(*args, **kwargs)
 
         # This agent is started before the router so we need
@@ -123,6 +233,13 @@ class ConfigStoreService(Agent):
 
         self.store = {}
         self.store_path = os.path.join(os.environ['VOLTTRON_HOME'], 'configuration_store')
+        # Store files found at startup that have not been loaded yet.
+        self._store_files = {}
+        self._store_load_times = {}
+        self.parsed_configs = ParsedConfigCache(max_parsed_configs)
+        self.vip.health.add_metrics_callback("config_store", self._get_store_metrics)
+        # Changes are only published once the message bus is up.
+        self._publish_changes = False
 
     @Core.receiver('onsetup')
     def _setup(self, sender, **kwargs):
@@ -140,18 +257,49 @@ class ConfigStoreService(Agent):
             else:
                 _log.debug("Configuration directory already exists.")
 
+        start = time.time()
         config_store_iter = glob.iglob(os.path.join(self.store_path, "*" + store_ext))
 
+        # Stores are loaded when first used.
         for store_path in config_store_iter:
             root, ext = os.path.splitext(store_path)
             agent_identity = os.path.basename(root)
-            _log.debug("Processing store for agent {}".format(agent_identity))
-            store = PersistentDict(filename=store_path, flag='c', format='json')
-            parsed_configs, name_map = process_store(agent_identity, store)
-            self.store[agent_identity] = {"configs": parsed_configs,
-                                          "store": store,
-                                          "name_map": name_map,
-                                          "lock": Semaphore()}
+            self._store_files[agent_identity] = store_path
+
+        _log.info("Found {} configuration stores in {:.3f} seconds".format(len(self._store_files),
+                                                                         time.time() - start))
+
+    def _load_store(self, identity):
+        store_path = self._store_files.pop(identity, None)
+        if store_path is None:
+            return None
+
+        start = time.time()
+        store = JournaledPersistentDict(filename=store_path, flag='c')
+        name_map = process_store(identity, store)
+        agent_store = {"configs": AgentConfigs(identity, store, self.parsed_configs),
+                       "store": store,
+                       "name_map": name_map,
+                       "lock": Semaphore()}
+        self.store[identity] = agent_store
+        load_time = time.time() - start
+        self._store_load_times[identity] = load_time
+        _log.info("Loaded configuration store for agent {} with {} configurations in {:.3f} seconds".format(
+            identity, len(store), load_time))
+        return agent_store
+
+    def _find_agent_store(self, identity):
+        """Returns the store of identity, loading it on first use, or None if there is none."""
+        agent_store = self.store.get(identity)
+        if agent_store is None:
+            agent_store = self._load_store(identity)
+        return agent_store
+
+    def _get_store_metrics(self):
+        return {"stores": len(self.store) + len(self._store_files),
+                "loaded_stores": len(self.store),
+                "load_times": dict(self._store_load_times),
+                "parsed_configs": self.parsed_configs.get_metrics()}
 
     @Core.receiver('onstart')
     def _onstart(self, sender, **kwargs):
@@ -159,6 +307,20 @@ class ConfigStoreService(Agent):
             self.vip.peerlist().get(timeout=3)
         except Exception as e:
             _log.error(f"Exception getting peerlist on startup of config store: {e}")
+        self._publish_changes = True
+
+    def _publish_change(self, identity, action, config_name=""):
+        """Publishes a store change on config/<add|update|remove>/<identity>/<config name>
+        so that other agents can follow the configurations of an agent. Removing a whole
+        store publishes config/remove/<identity>."""
+        if not self._publish_changes:
+            return
+        topic = CHANGE_TOPICS[action](category=identity, name=config_name)
+        try:
+            self.vip.pubsub.publish("pubsub", topic, message={"action": action, "identity": identity,
+                                                              "config_name": config_name})
+        except Exception as e:
+            _log.debug("Unable to publish configuration change {}: {}".format(topic, e))
 
     @RPC.export
     @RPC.allow('edit_config_store')
@@ -167,6 +329,86 @@ class ConfigStoreService(Agent):
         self._add_config_to_store(identity, config_name, raw_contents, contents, config_type,
                                   trigger_callback=True)
 
+    @RPC.export
+    @RPC.allow('edit_config_store')
+    def manage_store_many(self, identity, configs):
+        """Add or update many configurations of an agent at once.
+
+        :param identity: VIP identity of the agent.
+        :param configs: List of [config_name, raw_contents] or
+            [config_name, raw_contents, config_type] entries, config_type
+            defaults to "raw".
+
+        Either all configurations are stored or, if any of them fails to
+        parse or references itself, none are. The agent is sent all changes
+        in a single config.update_many call.
+        """
+        entries = []
+        for entry in configs:
+            config_name, raw_contents = entry[:2]
+            config_type = entry[2] if len(entry) > 2 else "raw"
+            entries.append((strip_config_name(config_name), raw_contents,
+                            process_raw_config(raw_contents, config_type), config_type))
+        if not entries:
+            return
+
+        agent_store = self._get_agent_store(identity)
+        agent_configs = agent_store["configs"]
+        agent_disk_store = agent_store["store"]
+        agent_name_map = agent_store["name_map"]
+
+        # Check the whole batch before changing anything. Configurations
+        # renamed by the batch are staged as None, which reads as missing.
+        staged = {}
+        staged_configs = _StagedConfigs(staged, agent_configs)
+        staged_name_map = ChainMap({}, agent_name_map)
+        updates = []
+        for config_name, raw, parsed, config_type in entries:
+            config_name_lower = config_name.lower()
+            if check_for_recursion(config_name, parsed, staged_configs):
+                raise ValueError("Recursive configuration references detected in {}.".format(config_name))
+            action = "UPDATE" if config_name_lower in staged_name_map else "NEW"
+            if action == "UPDATE":
+                staged[staged_name_map[config_name_lower]] = None
+            staged[config_name] = parsed
+            staged_name_map[config_name_lower] = config_name
+            updates.append((action, config_name, parsed))
+
+        modified = format_timestamp(get_aware_utc_now())
+        for config_name, raw, parsed, config_type in entries:
+            old_config_name = agent_name_map.get(config_name.lower())
+            if old_config_name is not None and old_config_name != config_name:
+                agent_disk_store.pop(old_config_name)
+                del agent_configs[old_config_name]
+            agent_name_map[config_name.lower()] = config_name
+            agent_configs[config_name] = parsed
+            agent_disk_store[config_name] = {"type": config_type,
+                                             "modified": modified,
+                                             "data": raw}
+
+        agent_disk_store.async_sync()
+
+        _log.debug("Agent {} stored {} configs.".format(identity, len(entries)))
+
+        for action, config_name, parsed in updates:
+            self._publish_change(identity, action, config_name)
+
+        if identity in self.vip.peerlist.peers_list:
+            with agent_store["lock"]:
+                try:
+                    self.vip.rpc.call(identity, "config.update_many", updates,
+                                      trigger_callback=True).get(timeout=UPDATE_TIMEOUT)
+                except errors.Unreachable:
+                    _log.debug("Agent {} not currently running. Configuration update not sent.".format(identity))
+                except MethodNotFound:
+                    # Agents from before config.update_many get one update per configuration.
+                    for action, config_name, parsed in updates:
+                        self._send_update(identity, action, config_name, parsed, trigger_callback=True)
+                except RemoteError as e:
+                    _log.error("Agent {} failure when adding/updating configurations: {}".format(identity, e))
+                except gevent.timeout.Timeout:
+                    _log.error("Config update to agent {} timed out after {} seconds".format(identity, UPDATE_TIMEOUT))
+
     @RPC.export
     @RPC.allow('edit_config_store')
     def manage_delete_config(self, identity, config_name):
@@ -175,7 +417,7 @@ class ConfigStoreService(Agent):
     @RPC.export
     @RPC.allow('edit_config_store')
     def manage_delete_store(self, identity):
-        agent_store = self.store.get(identity)
+        agent_store = self._find_agent_store(identity)
         if agent_store is None:
             return
 
@@ -190,6 +432,7 @@ class ConfigStoreService(Agent):
 
         # Sync will delete the file if the store is empty.
         agent_disk_store.async_sync()
+        self._publish_change(identity, "DELETE_ALL")
 
         if identity in self.vip.peerlist.peers_list:
             with agent_store_lock:
@@ -212,19 +455,22 @@ class ConfigStoreService(Agent):
 
     @RPC.export
     def manage_list_configs(self, identity):
-        result = list(self.store.get(identity, {}).get("store", {}).keys())
+        agent_store = self._find_agent_store(identity)
+        if agent_store is None:
+            return []
+        result = list(agent_store["store"].keys())
         result.sort()
         return result
 
     @RPC.export
     def manage_list_stores(self):
-        result = list(self.store.keys())
+        result = list(set(self.store) | set(self._store_files))
         result.sort()
         return result
 
     @RPC.export
     def manage_get(self, identity, config_name, raw=True):
-        agent_store = self.store.get(identity)
+        agent_store = self._find_agent_store(identity)
         if agent_store is None:
             raise KeyError('No configuration file "{}" for VIP IDENTIY {}'.format(config_name, identity))
 
@@ -247,7 +493,7 @@ class ConfigStoreService(Agent):
 
     @RPC.export
     def manage_get_metadata(self, identity, config_name):
-        agent_store = self.store.get(identity)
+        agent_store = self._find_agent_store(identity)
         if agent_store is None:
             raise KeyError('No configuration file "{}" for VIP IDENTIY {}'.format(config_name, identity))
 
@@ -286,17 +532,7 @@ class ConfigStoreService(Agent):
 
         #We need to create store and lock if it doesn't exist in case someone
         # tries to add a configuration while we are sending the initial state.
-        agent_store = self.store.get(identity)
-
-        if agent_store is None:
-            # Initialize a new store.
-            store_path = os.path.join(self.store_path, identity + store_ext)
-            store = PersistentDict(filename=store_path, flag='c', format='json')
-            agent_store = {
-                "configs": {}, "store": store, "name_map": {},
-                "lock": Semaphore()
-            }
-            self.store[identity] = agent_store
+        agent_store = self._get_agent_store(identity)
 
         agent_configs = agent_store["configs"]
         agent_disk_store = agent_store["store"]
@@ -305,7 +541,7 @@ class ConfigStoreService(Agent):
             with agent_store_lock:
                 try:
                     self.vip.rpc.call(identity, "config.initial_update",
-                                      agent_configs).get(timeout=UPDATE_TIMEOUT)
+                                      agent_configs.parse_all()).get(timeout=UPDATE_TIMEOUT)
                 except errors.Unreachable:
                     _log.debug("Agent {} not currently running. Configuration update not sent.".format(identity))
                 except RemoteError as e:
@@ -331,7 +567,7 @@ class ConfigStoreService(Agent):
     # Helper method to allow the local services to delete configs before message
     # bus in online.
     def delete(self, identity, config_name, trigger_callback=False, send_update=True):
-        agent_store = self.store.get(identity)
+        agent_store = self._find_agent_store(identity)
         if agent_store is None:
             raise KeyError('No configuration file "{}" for VIP IDENTIY {}'.format(config_name, identity))
 
@@ -354,6 +590,7 @@ class ConfigStoreService(Agent):
 
         # Sync will delete the file if the store is empty.
         agent_disk_store.async_sync()
+        self._publish_change(identity, "DELETE", real_config_name)
 
         if send_update and identity in self.vip.peerlist.peers_list:
             with agent_store_lock:
@@ -396,17 +633,10 @@ class ConfigStoreService(Agent):
                              config_type, trigger_callback=False,
                              send_update=True):
         """Adds a processed configuration to the store."""
-        agent_store = self.store.get(identity)
+        agent_store = self._get_agent_store(identity)
 
         action = "UPDATE"
 
-        if agent_store is None:
-            #Initialize a new store.
-            store_path = os.path.join(self.store_path, identity+ store_ext)
-            store = PersistentDict(filename=store_path, flag='c', format='json')
-            agent_store = {"configs": {}, "store": store, "name_map": {}, "lock": Semaphore()}
-            self.store[identity] = agent_store
-
         agent_configs = agent_store["configs"]
         agent_disk_store = agent_store["store"]
         agent_store_lock = agent_store["lock"]
@@ -424,6 +654,8 @@ class ConfigStoreService(Agent):
         if config_name_lower in agent_name_map:
             old_config_name = agent_name_map[config_name_lower]
             del agent_configs[old_config_name]
+            if old_config_name != config_name:
+                agent_disk_store.pop(old_config_name, None)
 
         agent_configs[config_name] = parsed
         agent_name_map[config_name_lower] = config_name
@@ -435,19 +667,38 @@ class ConfigStoreService(Agent):
         agent_disk_store.async_sync()
 
         _log.debug("Agent {} config {} stored.".format(identity, config_name))
+        self._publish_change(identity, action, config_name)
 
         if send_update and identity in self.vip.peerlist.peers_list:
             with agent_store_lock:
-                try:
-                    self.vip.rpc.call(identity, "config.update", action, config_name, contents=parsed, trigger_callback=trigger_callback).get(timeout=UPDATE_TIMEOUT)
-                except errors.Unreachable:
-                    _log.debug("Agent {} not currently running. Configuration update not sent.".format(identity))
-                except RemoteError as e:
-                    _log.error("Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
-                except MethodNotFound as e:
-                    _log.error(
-                        "Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
-                except gevent.timeout.Timeout:
-                    _log.error("Config update to agent {} timed out after {} seconds".format(identity, UPDATE_TIMEOUT))
-                except Exception as e:
-                    _log.error("Unknown error sending update to agent identity {}.: {}".format(identity, e))
+                self._send_update(identity, action, config_name, parsed, trigger_callback)
+
+    def _get_agent_store(self, identity):
+        """Returns the store of identity, creating an empty one if needed."""
+        agent_store = self._find_agent_store(identity)
+
+        if agent_store is None:
+            #Initialize a new store.
+            store_path = os.path.join(self.store_path, identity + store_ext)
+            store = JournaledPersistentDict(filename=store_path, flag='c')
+            agent_store = {"configs": AgentConfigs(identity, store, self.parsed_configs),
+                           "store": store, "name_map": {}, "lock": Semaphore()}
+            self.store[identity] = agent_store
+
+        return agent_store
+
+    def _send_update(self, identity, action, config_name, parsed, trigger_callback):
+        """Sends a new or updated configuration to the agent. Caller must hold the store lock."""
+        try:
+            self.vip.rpc.call(identity, "config.update", action, config_name, contents=parsed, trigger_callback=trigger_callback).get(timeout=UPDATE_TIMEOUT)
+        except errors.Unreachable:
+            _log.debug("Agent {} not currently running. Configuration update not sent.".format(identity))
+        except RemoteError as e:
+            _log.error("Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
+        except MethodNotFound as e:
+            _log.error(
+                "Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
+        except gevent.timeout.Timeout:
+            _log.error("Config update to agent {} timed out after {} seconds".format(identity, UPDATE_TIMEOUT))
+        except Exception as e:
+            _log.error("Unknown error sending update to agent identity {}.: {}".format(identity, e))
@@ -53,7 +53,8 @@ class Agent:
     class Subsystems:
         def __init__(self, owner, core, heartbeat_autostart,
                      heartbeat_period, enable_store, enable_web,
-                     enable_channel, enable_fncs, enable_auth, message_bus):
+                     enable_channel, enable_fncs, enable_auth, message_bus,
+                     pubsub_dispatch='spawn', pubsub_pool_size=100, pubsub_queue_size=0):
             self.peerlist = PeerList(core)
             self.ping = Ping(core)
             self.rpc = RPC(core, owner, self.peerlist)
@@ -61,11 +62,14 @@ class Agent:
             if message_bus == 'rmq':
                 self.pubsub = RMQPubSub(core, self.rpc, self.peerlist, owner)
             else:
-                self.pubsub = PubSub(core, self.rpc, self.peerlist, owner)
+                self.pubsub = PubSub(core, self.rpc, self.peerlist, owner, dispatch=pubsub_dispatch,
+                                     pool_size=pubsub_pool_size, queue_size=pubsub_queue_size)
                 # Available only for ZMQ agents
                 if enable_channel:
                     self.channel = Channel(core)
             self.health = Health(owner, core, self.rpc)
+            if message_bus != 'rmq':
+                self.health.add_metrics_callback('pubsub', self.pubsub.get_dispatch_metrics)
             self.heartbeat = Heartbeat(owner, core, self.rpc, self.pubsub,
                                        heartbeat_autostart, heartbeat_period)
             if enable_store:
@@ -87,7 +91,8 @@ class Agent:
                  enable_web=False, enable_channel=False,
                  reconnect_interval=None, version='0.1', enable_fncs=False,
                  instance_name=None, message_bus=None,
-                 volttron_central_address=None, volttron_central_instance_name=None, enable_auth=is_auth_enabled()):
+                 volttron_central_address=None, volttron_central_instance_name=None, enable_auth=is_auth_enabled(),
+                 pubsub_dispatch='spawn', pubsub_pool_size=100, pubsub_queue_size=0):
 
         if volttron_home is None:
             volttron_home = os.path.abspath(platform.get_home())
@@ -125,7 +130,8 @@ class Agent:
                                     enable_auth=enable_auth)
             self.vip = Agent.Subsystems(self, self.core, heartbeat_autostart,
                                         heartbeat_period, enable_store, enable_web,
-                                        enable_channel, enable_fncs, enable_auth, message_bus)
+                                        enable_channel, enable_fncs, enable_auth, message_bus,
+                                        pubsub_dispatch, pubsub_pool_size, pubsub_queue_size)
             self.core.setup()
             self.vip.rpc.export(self.core.version, 'agent.version')
         except Exception as e:
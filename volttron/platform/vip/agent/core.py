@@ -36,9 +36,9 @@
 # under Contract DE-AC05-76RL01830
 # }}}
 
-import heapq
 import inspect
 import logging
+import math
 import os
 import platform as python_platform
 import signal
@@ -141,10 +141,15 @@ class ScheduledEvent:
         self.kwargs = kwargs or {}
         self.canceled = False
         self.finished = False
+        # Removes the pending timer of the event from the scheduler
+        self._cancel_timer = None
 
     def cancel(self):
         '''Mark the timer as canceled to avoid a callback.'''
         self.canceled = True
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
 
     def __call__(self):
         if not self.canceled:
@@ -152,6 +157,142 @@ class ScheduledEvent:
         self.finished = True
 
 
+class TimerWheel:
+    '''Hierarchical timing wheel of callbacks scheduled at absolute times.
+
+    Time is divided in ticks of resolution seconds. Level 0 has a slot for
+    each of the next slots ticks, every higher level has slots covering a
+    whole rotation of the level below and is cascaded down as that level
+    wraps around. Adding and cancelling a timer take constant time and
+    callbacks due within the same tick share a single entry of the wheel.
+    Callbacks are never returned before their deadline and at most one
+    tick after it. When the clock steps back or jumps ahead by more than a
+    rotation of level 0, the wheel is moved to the new time at once.
+    '''
+
+    def __init__(self, now, resolution=0.01, slots=256, levels=4):
+        self.resolution = resolution
+        self._slots = slots
+        self._levels = levels
+        self._span = slots ** levels
+        # Number of ticks covered by one slot of each level
+        self._widths = [slots ** level for level in range(levels)]
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        # tick -> [slot holding the bucket, {timer id: callback}]
+        self._buckets = {}
+        self._tick = math.floor(now / resolution)
+        self._next_id = 0
+
+    def __len__(self):
+        return sum(len(bucket[1]) for bucket in self._buckets.values())
+
+    def add(self, deadline, callback, now=None):
+        '''Add callback to be due at deadline, seconds since the epoch.
+
+        If now is before the time the wheel was last advanced to, the clock
+        was set back and the wheel is moved back first, so that the callback
+        is not held until the clock catches up again.
+
+        Returns the timer to pass to cancel.
+        '''
+        if now is not None and math.floor(now / self.resolution) < self._tick:
+            self._move(math.floor(now / self.resolution))
+        tick = math.ceil(deadline / self.resolution)
+        if tick <= self._tick:
+            tick = self._tick + 1
+        self._next_id += 1
+        bucket = self._buckets.get(tick)
+        if bucket is None:
+            bucket = self._buckets[tick] = [self._place(tick), {}]
+            bucket[0][tick] = bucket
+        bucket[1][self._next_id] = callback
+        return tick, self._next_id
+
+    def cancel(self, timer):
+        '''Remove a timer returned by add, if it is still pending.'''
+        tick, timer_id = timer
+        bucket = self._buckets.get(tick)
+        if bucket is not None and bucket[1].pop(timer_id, None) is not None and not bucket[1]:
+            del bucket[0][tick]
+            del self._buckets[tick]
+
+    def _place(self, tick):
+        # Timers beyond the span of the wheel are cascaded again until in range.
+        delta = tick - self._tick
+        if delta < self._slots:
+            return self._wheels[0][tick % self._slots]
+        delta = min(delta, self._span - 1)
+        level = 1
+        while delta >= self._widths[level] * self._slots:
+            level += 1
+        return self._wheels[level][((self._tick + delta) // self._widths[level]) % self._slots]
+
+    def _cascade(self):
+        # Move the slots of higher levels reached by the current tick down.
+        level = 1
+        while level < self._levels and (self._tick // self._widths[level - 1]) % self._slots == 0:
+            slot = self._wheels[level][(self._tick // self._widths[level]) % self._slots]
+            buckets = list(slot.items())
+            slot.clear()
+            for tick, bucket in buckets:
+                bucket[0] = self._place(tick)
+                bucket[0][tick] = bucket
+            level += 1
+
+    def advance(self, now):
+        '''Returns the callbacks due by now, in the order they are due.'''
+        target = math.floor(now / self.resolution)
+        due = []
+        if not self._buckets:
+            self._tick = target
+            return due
+        if target < self._tick or target - self._tick > self._slots:
+            return self._move(target)
+        while self._tick < target:
+            self._tick += 1
+            if self._tick % self._slots == 0:
+                self._cascade()
+            bucket = self._wheels[0][self._tick % self._slots].pop(self._tick, None)
+            if bucket is not None:
+                del self._buckets[self._tick]
+                due.extend(bucket[1].values())
+            if not self._buckets:
+                self._tick = target
+        return due
+
+    def _move(self, target):
+        # Take every bucket due by target at once and place the others
+        # again, rather than stepping through each tick up to the target.
+        due = []
+        for tick in sorted(tick for tick in self._buckets if tick <= target):
+            due.extend(self._buckets.pop(tick)[1].values())
+        self._tick = target
+        for wheel in self._wheels:
+            for slot in wheel:
+                slot.clear()
+        for tick, bucket in self._buckets.items():
+            bucket[0] = self._place(tick)
+            bucket[0][tick] = bucket
+        return due
+
+    def next_expiry(self):
+        '''Returns the time the wheel should next be advanced at, None if empty.
+
+        This is the deadline of the next callback due on level 0 or else
+        the time of the next cascade of the higher levels.
+        '''
+        if not self._buckets:
+            return None
+        wheel = self._wheels[0]
+        tick = self._tick + 1
+        while True:
+            if tick in wheel[tick % self._slots]:
+                return tick * self.resolution
+            if tick % self._slots == 0:
+                return tick * self.resolution
+            tick += 1
+
+
 def findsignal(obj, owner, name):
     parts = name.split('.')
     if len(parts) == 1:
@@ -175,13 +316,12 @@ class BasicCore:
         self._async_calls = []
         self._stop_event = None
         self._schedule_event = None
-        self._schedule = []
+        self._schedule = TimerWheel(time.time())
         self.onsetup = Signal()
         self.onstart = Signal()
         self.onstop = Signal()
         self.onfinish = Signal()
         self.oninterrupt = None
-        self.tie_breaker = 0
 
         # SIGINT does not work in Windows.
         # If using the standalone agent on a windows machine,
@@ -260,23 +400,16 @@ class BasicCore:
                 self.spawned_greenlets.add(greenlet)
 
         def schedule_loop():
-            heap = self._schedule
+            wheel = self._schedule
             event = self._schedule_event
-            cur = gevent.getcurrent()
-            now = time.time()
             while True:
-                if heap:
-                    deadline = heap[0][0]
-                    timeout = min(5.0, max(0.0, deadline - now))
-                else:
-                    timeout = None
+                expiry = wheel.next_expiry()
+                timeout = None if expiry is None else max(0.0, expiry - time.time())
                 if event.wait(timeout):
                     event.clear()
-                now = time.time()
-                while heap and now >= heap[0][0]:
-                    _, _, callback = heapq.heappop(heap)
+                for callback in wheel.advance(time.time()):
                     greenlet = gevent.spawn(callback)
-                    cur.link(lambda glt: greenlet.kill())
+                    self.spawned_greenlets.add(greenlet)
 
         self._stop_event = stop = gevent.event.Event()
         self._async = gevent.get_hub().loop.async_()
@@ -427,19 +560,19 @@ class BasicCore:
         try:
             it = iter(deadline)
         except TypeError:
-            self._schedule_callback(deadline, event)
+            self._schedule_callback(deadline, event, event)
         else:
             self._schedule_iter(it, event)
         return event
 
-    def get_tie_breaker(self):
-        self.tie_breaker += 1
-        return self.tie_breaker
-
-    def _schedule_callback(self, deadline, callback):
-        deadline = utils.get_utc_seconds_from_epoch(deadline)
-        heapq.heappush(self._schedule, (deadline, self.get_tie_breaker(), callback))
-        if self._schedule_event:
+    def _schedule_callback(self, deadline, callback, event):
+        if hasattr(deadline, 'timetuple'):
+            deadline = utils.get_utc_seconds_from_epoch(deadline)
+        expiry = self._schedule.next_expiry()
+        timer = self._schedule.add(deadline, callback, time.time())
+        event._cancel_timer = lambda: self._schedule.cancel(timer)
+        # Only wake the scheduler when it would otherwise sleep past this deadline.
+        if self._schedule_event and (expiry is None or deadline < expiry):
             self._schedule_event.set()
 
     def _schedule_iter(self, it, event):
@@ -450,10 +583,11 @@ class BasicCore:
             try:
                 deadline = next(it)
             except StopIteration:
+                event._cancel_timer = None
                 event.function(*event.args, **event.kwargs)
                 event.finished = True
             else:
-                self._schedule_callback(deadline, wrapper)
+                self._schedule_callback(deadline, wrapper, event)
                 event.function(*event.args, **event.kwargs)
 
         try:
@@ -461,7 +595,7 @@ class BasicCore:
         except StopIteration:
             event.finished = True
         else:
-            self._schedule_callback(deadline, wrapper)
+            self._schedule_callback(deadline, wrapper, event)
 
     @schedule.classmethod
     def schedule(cls, deadline, *args, **kwargs):  # pylint: disable=no-self-argument
@@ -126,6 +126,7 @@ class Auth(SubsystemBase):
                     .call(AUTH, "get_user_to_capabilities")
                     .get(timeout=10)
                 )
+                self._rpc().clear_capability_checks()
                 _log.debug("self. user to cap %s", self._user_to_capabilities)
             except RemoteError:
                 self._dirty = True
@@ -147,6 +148,7 @@ class Auth(SubsystemBase):
         if identity == AUTH:
             self._user_to_capabilities = user_to_capabilities
             self._dirty = True
+            self._rpc().clear_capability_checks()
 
     def get_rpc_exports(self):
         """
@@ -88,6 +88,7 @@ class ConfigStore(SubsystemBase):
 
         def onsetup(sender, **kwargs):
             rpc.export(self._update_config, 'config.update')
+            rpc.export(self._update_configs, 'config.update_many')
             rpc.export(self._initial_update, 'config.initial_update')
 
         core.onsetup.connect(onsetup, self)
@@ -210,56 +211,67 @@ class ConfigStore(SubsystemBase):
 
     def _update_config(self, action, config_name, contents=None, trigger_callback=False):
         """Called by the platform to push out configuration changes."""
+        self._update_configs([(action, config_name, contents)], trigger_callback=trigger_callback)
+
+    def _update_configs(self, updates, trigger_callback=False):
+        """Called by the platform to push out several configuration changes at once.
+
+        updates is a list of (action, config_name, contents) entries. Callbacks
+        are triggered once for every affected configuration after all of the
+        changes are applied."""
         #If we haven't yet grabbed the initial callback state we just bail.
         if not self._initialized:
             return
 
         affected_configs = {}
-
-        #Update local store.
-        if action == "DELETE":
-            config_name_lower = config_name.lower()
-            if config_name_lower in self._store:
-                del self._store[config_name_lower]
-
-                if config_name_lower not in self._default_store:
-                    affected_configs[config_name_lower] = "DELETE"
-                    self._gather_affected(config_name_lower, affected_configs)
-                    self._delete_refs(config_name_lower)
-                else:
-                    affected_configs[config_name_lower] = "UPDATE"
-                    self._gather_affected(config_name_lower, affected_configs)
-                    self._update_refs(config_name_lower, self._default_store[config_name_lower])
-
-        if action == "DELETE_ALL":
-            for name in self._store:
-                affected_configs[name] = "DELETE"
-            #Just assume all default stores updated.
-            for name in self._default_store:
-                affected_configs[name] = "UPDATE"
-            self._ref_map = {}
-            self._reverse_ref_map = defaultdict(set)
-            self._initial_update({}, False)
-
-        if action in ("NEW", "UPDATE"):
-            config_name_lower = config_name.lower()
-            self._store[config_name_lower] = contents
-            self._name_map[config_name_lower] = config_name
-            if config_name_lower in self._default_store:
-                action = "UPDATE"
-            affected_configs[config_name_lower] = action
-            self._update_refs(config_name_lower, self._store[config_name_lower])
-            self._gather_affected(config_name_lower, affected_configs)
+        deleted = set()
+
+        for action, config_name, contents in updates:
+            #Update local store.
+            if action == "DELETE":
+                config_name_lower = config_name.lower()
+                deleted.add(config_name_lower)
+                if config_name_lower in self._store:
+                    del self._store[config_name_lower]
+
+                    if config_name_lower not in self._default_store:
+                        affected_configs[config_name_lower] = "DELETE"
+                        self._gather_affected(config_name_lower, affected_configs)
+                        self._delete_refs(config_name_lower)
+                    else:
+                        affected_configs[config_name_lower] = "UPDATE"
+                        self._gather_affected(config_name_lower, affected_configs)
+                        self._update_refs(config_name_lower, self._default_store[config_name_lower])
+
+            if action == "DELETE_ALL":
+                deleted.update(self._name_map)
+                for name in self._store:
+                    affected_configs[name] = "DELETE"
+                #Just assume all default stores updated.
+                for name in self._default_store:
+                    affected_configs[name] = "UPDATE"
+                self._ref_map = {}
+                self._reverse_ref_map = defaultdict(set)
+                self._initial_update({}, False)
+
+            if action in ("NEW", "UPDATE"):
+                config_name_lower = config_name.lower()
+                self._store[config_name_lower] = contents
+                self._name_map[config_name_lower] = config_name
+                if config_name_lower in self._default_store:
+                    action = "UPDATE"
+                affected_configs[config_name_lower] = action
+                self._update_refs(config_name_lower, self._store[config_name_lower])
+                self._gather_affected(config_name_lower, affected_configs)
 
 
         if trigger_callback and self._initial_callbacks_called:
             self._process_callbacks(affected_configs)
 
-        if action == "DELETE":
-            del self._name_map[config_name_lower]
-
-        if action == "DELETE_ALL":
-            self._name_map.clear()
+        # Deleted names are needed by the callbacks above.
+        for config_name_lower in deleted:
+            if config_name_lower not in self._store:
+                self._name_map.pop(config_name_lower, None)
 
 
 
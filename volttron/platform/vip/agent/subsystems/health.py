@@ -65,12 +65,14 @@ class Health(SubsystemBase):
         self._statusobj = Status.build(
             STATUS_GOOD, status_changed_callback=self._status_changed)
         self._status_callbacks = set()
+        self._metrics_callbacks = {}
 
         def onsetup(sender, **kwargs):
             rpc.export(self.set_status, 'health.set_status')
             rpc.export(self.get_status, 'health.get_status')
             rpc.export(self.get_status, 'health.get_status_json')
             rpc.export(self.send_alert, 'health.send_alert')
+            rpc.export(self.get_metrics, 'health.get_metrics')
 
         core.onsetup.connect(onsetup, self)
 
@@ -112,6 +114,37 @@ class Health(SubsystemBase):
         """
         self._status_callbacks.add(fn)
 
+    def add_metrics_callback(self, name, fn):
+        """
+        Add a function returning a serializable dictionary of metrics to be
+        reported under name by get_metrics.
+
+        :param name: The key of the metrics in the get_metrics result.
+        :param fn: The method returning the metrics.
+        :param fn: callable
+        """
+        self._metrics_callbacks[name] = fn
+
+    def get_metrics(self):
+        """RPC method
+
+        Returns the metrics of the agent's subsystems, for example:
+
+            {
+                "pubsub": {
+                    "dispatch": "pool",
+                    "queue_depth": 0,
+                    "dispatched": 5210,
+                    "in_flight": 2,
+                    "max_in_flight": 100,
+                    "avg_dispatch_latency": 0.0021,
+                    "max_dispatch_latency": 0.84
+                }
+            }
+
+        """
+        return {name: fn() for name, fn in self._metrics_callbacks.items()}
+
     def _status_changed(self):
         """ Internal function that happens when the status changes state.
         :return:
@@ -43,9 +43,11 @@ import inspect
 import logging
 import random
 import re
+import time
 import weakref
 import sys
 import gevent
+from gevent.pool import Pool
 
 from zmq import green as zmq
 from zmq import SNDMORE
@@ -57,7 +59,7 @@ from ..errors import Unreachable, VIPError, UnknownSubsystem
 from .... import jsonrpc
 from volttron.platform.agent import utils
 from ..results import ResultsDictionary
-from gevent.queue import Queue, Empty
+from gevent.queue import Queue, Empty, Full
 from collections import defaultdict
 from datetime import timedelta
 
@@ -82,12 +84,37 @@ def decode_peer(peer):
     return peer
 
 
+DISPATCH_MODES = ('spawn', 'ordered', 'pool')
+
+
 class PubSub(SubsystemBase):
     """
     Pubsub subsystem concrete class implementation for ZMQ message bus.
+
+    Incoming publishes are queued and dispatched to the subscription callbacks
+    according to dispatch:
+
+    spawn
+        Every message is handled in its own greenlet.
+    ordered
+        Messages are handled one at a time in the order received.
+    pool
+        Messages are handled by at most pool_size greenlets. The queue stops
+        being drained while all of them are busy.
+
+    A non zero queue_size bounds the number of queued messages. When the queue
+    is full the oldest queued message is dropped and counted, as the core's
+    receive loop must never block on it. Responses to publish, subscribe and
+    list requests are not queued.
     """
 
-    def __init__(self, core, rpc_subsys, peerlist_subsys, owner):
+    def __init__(self, core, rpc_subsys, peerlist_subsys, owner, dispatch='spawn', pool_size=100,
+                 queue_size=0):
+        if dispatch not in DISPATCH_MODES:
+            raise ValueError("Invalid pubsub dispatch mode {}, expected one of {}".format(
+                dispatch, ", ".join(DISPATCH_MODES)))
+        if dispatch == 'pool' and pool_size < 1:
+            raise ValueError("pubsub pool_size must be at least 1")
         self.core = weakref.ref(core)
         self.rpc = weakref.ref(rpc_subsys)
         self.peerlist = weakref.ref(peerlist_subsys)
@@ -100,11 +127,21 @@ class PubSub(SubsystemBase):
             return defaultdict(set)
 
         self._my_subscriptions = defaultdict(platform_subscriptions)
+        # Per bus index of the callback sets in _my_subscriptions
+        self._subscription_index = defaultdict(TopicTrie)
         self.protected_topics = ProtectedPubSubTopics()
         core.register('pubsub', self._handle_subsystem, self._handle_error)
         self.vip_socket = None
         self._results = ResultsDictionary()
-        self._event_queue = Queue()
+        self._event_queue = Queue(queue_size or None)
+        self._dispatch = dispatch
+        self._pool = Pool(pool_size) if dispatch == 'pool' else None
+        self._dispatched = 0
+        self._dropped = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
         self._retry_period = 300.0
         self._processgreenlet = None
 
@@ -135,8 +172,8 @@ class PubSub(SubsystemBase):
         self.synchronize()
 
     def _process_callback(self, sender, bus, topic, headers, message):
-        """Handle incoming subscription pushes from PubSubService. It iterates over all subscriptions to find the
-        subscription matching the topic and bus. It then calls the corresponding callback on finding a match.
+        """Handle incoming subscription pushes from PubSubService. It looks up the subscriptions matching the topic
+        and bus in the subscription index. It then calls the corresponding callback on finding a match.
         param sender: identity of the publisher
         type sender: str
         param bus: bus
@@ -151,16 +188,12 @@ class PubSub(SubsystemBase):
         peer = 'pubsub'
 
         handled = 0
-        for platform in self._my_subscriptions:
-            # _log.debug("SYNC: process callback subscriptions: {}".format(self._my_subscriptions[platform][bus]))
-            buses = self._my_subscriptions[platform]
-            if bus in buses:
-                subscriptions = buses[bus]
-                for prefix, callbacks in subscriptions.items():
-                    if topic.startswith(prefix):
-                        handled += 1
-                        for callback in callbacks:
-                            callback(peer, sender, bus, topic, headers, message)
+        index = self._subscription_index.get(bus)
+        if index is not None:
+            for callbacks in index.match(topic):
+                handled += 1
+                for callback in callbacks:
+                    callback(peer, sender, bus, topic, headers, message)
         if not handled:
             # No callbacks for topic; synchronize with sender
             self.synchronize()
@@ -284,16 +317,46 @@ class PubSub(SubsystemBase):
         self.vip_socket.send_vip('', 'pubsub', frames, result.ident, copy=False)
         return result
 
+    def set_send_queue(self, policy=None, size=None):
+        """Configure the queue in which the platform holds messages published to this agent while it is not
+        keeping up.
+
+        param policy: What to drop when the queue is full: 'drop-oldest', 'drop-newest', 'conflate' to keep the
+        latest message per topic or 'block-publisher' to have publishers retry. None keeps the platform default.
+        type policy: str
+        param size: Maximum number of queued messages, 0 disables the queue. None keeps the platform default.
+        type size: int
+        :returns: Configuration was accepted or not
+        :rtype: boolean
+        """
+        result = next(self._results)
+        msg = dict(policy=policy)
+        if size is not None:
+            msg['size'] = size
+        frames = ['send_queue', jsonapi.dumpb(msg)]
+        self.vip_socket.send_vip('', 'pubsub', frames, result.ident, copy=False)
+        return result
+
+    def send_queue_stats(self):
+        """Gets the send queues the platform keeps for subscribers that did not keep up.
+
+        :returns: Policy, size, depth and number of dropped and refused messages of each subscriber's queue
+        :rtype: dict
+        """
+        result = next(self._results)
+        frames = ['send_queue_stats']
+        self.vip_socket.send_vip('', 'pubsub', frames, result.ident, copy=False)
+        return result
+
     def _add_subscription(self, prefix, callback, bus='', all_platforms=False):
         # _log.debug(f"Adding subscription prefix: {prefix} allplatforms: {all_platforms}")
         if not callable(callback):
             raise ValueError('callback %r is not callable' % (callback,))
+        platform = 'all' if all_platforms else 'internal'
         try:
-            if not all_platforms:
-                self._my_subscriptions['internal'][bus][prefix].add(callback)
-            else:
-                self._my_subscriptions['all'][bus][prefix].add(callback)
-                # _log.debug("SYNC: add subscriptions: {}".format(self._my_subscriptions['internal'][bus][prefix]))
+            callbacks = self._my_subscriptions[platform][bus][prefix]
+            callbacks.add(callback)
+            self._subscription_index[bus].add(prefix, platform, callbacks)
         except KeyError:
             _log.error("PUBSUB something went wrong in add subscriptions")
 
@@ -387,6 +450,7 @@ class PubSub(SubsystemBase):
                             remove.append(topic)
                     for topic in remove:
                         del subscriptions[topic]
+                        self._subscription_index[bus].remove(topic, platform)
                     if not subscriptions:
                         del bus_subscriptions[bus]
                     if not bus_subscriptions:
@@ -406,6 +470,7 @@ class PubSub(SubsystemBase):
                             del subscriptions[prefix]
                         except KeyError:
                             return []
+                        self._subscription_index[bus].remove(prefix, platform)
                     else:
                         try:
                             callbacks = subscriptions[prefix]
@@ -423,6 +488,7 @@ class PubSub(SubsystemBase):
                                 _log.debug(f"subscriptions: {subscriptions}")
                             except KeyError:
                                 return []
+                            self._subscription_index[bus].remove(prefix, platform)
                     topics = [prefix]
                     if not subscriptions:
                         del bus_subscriptions[bus]
@@ -503,6 +569,37 @@ class PubSub(SubsystemBase):
         self.vip_socket.send_vip('', 'pubsub', args, result.ident, copy=False)
         return result
 
+    def publish_many(self, peer: str, items, bus=''):
+        """Publish several messages to their topics in one request.
+
+        Each item is a (topic, headers, message) tuple published as by
+        publish, but the platform fans out all items of the request and
+        replies once.
+        param peer: peer
+        type peer: str
+        param items: topics, headers and messages to publish
+        type items: list of tuples
+        param bus: bus
+        type bus: str
+        return: Number of subscribers each message was sent to.
+        :rtype: list of int
+
+        :Return Values:
+        List of number of subscribers, in order of items
+        """
+        batch = []
+        for topic, headers, message in items:
+            if headers is None:
+                headers = {}
+            headers['min_compatible_version'] = min_compatible_version
+            headers['max_compatible_version'] = max_compatible_version
+            batch.append(dict(topic=topic, headers=headers, message=message))
+
+        result = next(self._results)
+        args = ['publish_batch', dict(bus=bus, items=batch)]
+        self.vip_socket.send_vip('', 'pubsub', args, result.ident, copy=False)
+        return result
+
     def _check_if_protected_topic(self, topic):
         required_caps = self.protected_topics.get(topic)
         if required_caps:
@@ -519,9 +616,57 @@ class PubSub(SubsystemBase):
         param message: VIP message from PubSubService
         type message: dict
         """
-        self._event_queue.put(message)
+        # Responses only complete results, never wait behind queued publishes
+        if message.args and message.args[0] in ('request_response', 'list_response'):
+            self._process_incoming_message(message)
+        else:
+            self._enqueue((time.monotonic(), message))
+
+    def _enqueue(self, item):
+        # Runs on the core's receive loop, which also delivers RPC responses
+        # callbacks may be waiting for, so a full queue drops its oldest
+        # message rather than blocking.
+        while True:
+            try:
+                self._event_queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    self._event_queue.get_nowait()
+                except Empty:
+                    continue
+                self._dropped += 1
+                if self._dropped == 1 or self._dropped % 1000 == 0:
+                    _log.warning("Pubsub queue full, dropped {} messages so far".format(self._dropped))
+
+    def get_dispatch_metrics(self):
+        """Returns statistics of the dispatch of incoming messages.
+
+        Latencies are the seconds messages spent queued before being handled.
+        """
+        return dict(dispatch=self._dispatch,
+                    queue_depth=self._event_queue.qsize(),
+                    dispatched=self._dispatched,
+                    dropped=self._dropped,
+                    in_flight=self._in_flight,
+                    max_in_flight=self._max_in_flight,
+                    avg_dispatch_latency=self._total_latency / self._dispatched if self._dispatched else 0.0,
+                    max_dispatch_latency=self._max_latency)
+
+    def _dispatch_message(self, queued, message):
+        latency = time.monotonic() - queued
+        self._dispatched += 1
+        self._total_latency += latency
+        self._max_latency = max(self._max_latency, latency)
+        self._in_flight += 1
+        self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        try:
+            self._process_incoming_message(message)
+        except Exception:
+            _log.exception("Error handling pubsub message")
+        finally:
+            self._in_flight -= 1
 
-    @spawn
     def _process_incoming_message(self, message):
         """Process incoming messages
         param message: VIP message from PubSubService
@@ -538,7 +683,8 @@ class PubSub(SubsystemBase):
 
             response = message.args[1]
             import struct
-            if not isinstance(response, int):
+            # publish_batch and send_queue_stats respond with a list and dictionary
+            if not isinstance(response, (int, list, dict)):
                 if len(response) == 4: #integer
                     response = struct.unpack('I', response.encode('utf-8'))
                     response = response[0]
@@ -578,8 +724,14 @@ class PubSub(SubsystemBase):
 
     def _process_loop(self):
         """Incoming message processing loop"""
-        for msg in self._event_queue:
-            self._process_incoming_message(msg)
+        for queued, msg in self._event_queue:
+            if self._dispatch == 'ordered':
+                self._dispatch_message(queued, msg)
+            elif self._dispatch == 'pool':
+                # Blocks while all greenlets of the pool are busy
+                self._pool.spawn(self._dispatch_message, queued, msg)
+            else:
+                gevent.spawn(self._dispatch_message, queued, msg)
 
     def _handle_error(self, sender, message, error, **kwargs):
         """Error handler. If UnknownSubsystem error is received, it implies that agent is connected to platform that has
@@ -621,3 +773,96 @@ class ProtectedPubSubTopics:
             if regex.match(topic):
                 return capabilities
         return None
+
+
+class _TopicNode:
+    __slots__ = ('children', 'prefixes')
+
+    def __init__(self):
+        self.children = {}
+        self.prefixes = {}
+
+
+class TopicTrie:
+    """Index of subscription prefixes split into topic segments.
+
+    A prefix matches a topic exactly when ``topic.startswith(prefix)``: the
+    leading segments of the prefix must equal those of the topic and its last,
+    possibly partial, segment must begin the corresponding topic segment.
+    Values are stored per prefix and key. Lookups take time proportional to
+    the topic length rather than the number of prefixes, and their results are
+    cached per topic until a prefix is added or removed.
+    """
+
+    def __init__(self, cache_size=10000):
+        self._root = _TopicNode()
+        self._cache = {}
+        self._cache_size = cache_size
+
+    def add(self, prefix, key, value):
+        segments = prefix.split('/')
+        last = segments.pop()
+        node = self._root
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                node.children[segment] = child = _TopicNode()
+            node = child
+        values = node.prefixes.get(last)
+        if values is None:
+            node.prefixes[last] = values = {}
+        if values.get(key) is not value:
+            values[key] = value
+            self._cache.clear()
+
+    def remove(self, prefix, key):
+        segments = prefix.split('/')
+        last = segments.pop()
+        path = [self._root]
+        for segment in segments:
+            node = path[-1].children.get(segment)
+            if node is None:
+                return
+            path.append(node)
+        node = path[-1]
+        values = node.prefixes.get(last)
+        if values is None or key not in values:
+            return
+        del values[key]
+        if not values:
+            del node.prefixes[last]
+        self._cache.clear()
+        # Prune the nodes left without prefixes or children
+        for segment, parent, child in zip(reversed(segments), reversed(path[:-1]), reversed(path[1:])):
+            if child.children or child.prefixes:
+                break
+            del parent.children[segment]
+
+    def match(self, topic):
+        """Return a tuple of the values of all prefixes matching topic."""
+        try:
+            return self._cache[topic]
+        except KeyError:
+            pass
+        matched = []
+        node = self._root
+        for segment in topic.split('/'):
+            prefixes = node.prefixes
+            if prefixes:
+                if len(prefixes) <= len(segment):
+                    for partial, values in prefixes.items():
+                        if segment.startswith(partial):
+                            matched.extend(values.values())
+                else:
+                    for end in range(len(segment) + 1):
+                        values = prefixes.get(segment[:end])
+                        if values:
+                            matched.extend(values.values())
+            node = node.children.get(segment)
+            if node is None:
+                break
+        matched = tuple(matched)
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[topic] = matched
+        return matched
@@ -412,6 +412,28 @@ class RMQPubSub(SubsystemBase):
                               'rabbitmq broker', 'pubsub')
         return result
 
+    def publish_many(self, peer, items, bus=''):
+        """Publish several messages to their topics.
+
+        Each item is a (topic, headers, message) tuple published as by
+        publish. RabbitMQ has no batched publish, so every item is published
+        on the exchange individually and the result is set once all of them
+        are sent.
+        param peer: peer
+        type peer: str
+        param items: topics, headers and messages to publish
+        type items: list of tuples
+        param bus: bus
+        type bus: str
+        return: Number of subscribers each message was sent to.
+        :rtype: list of int
+        """
+        for topic, headers, message in items:
+            self.publish(peer, topic, headers=headers, message=message, bus=bus)
+        result = next(self._results)
+        self.core().spawn_later(0.01, self.set_result, result.ident, [1] * len(items))
+        return result
+
     def set_result(self, ident, value=None):
         try:
             result = self._results.pop(ident)
@@ -235,6 +235,8 @@ class RPC(SubsystemBase):
         self._dispatcher = None
         self._counter = counter()
         self._outstanding = weakref.WeakValueDictionary()
+        # (checked method, user) -> compiled capability check
+        self._capability_checks = {}
         core.register("RPC", self._handle_subsystem, self._handle_error)
         core.register(
             "external_rpc",
@@ -298,11 +300,25 @@ class RPC(SubsystemBase):
             # if caps:
             #     self._exports[method_name] = self._add_auth_check(method, caps)
 
+    def clear_capability_checks(self):
+        """
+        Drops the compiled capability checks so they are rebuilt from the
+        current user capabilities on the next protected call.
+        """
+        self._capability_checks.clear()
+
     def _add_auth_check(self, method, required_caps):
         """
         Adds an authorization check to verify the calling agent has the
         required capabilities.
+
+        The check for each calling user is compiled once and cached until
+        the user capabilities change.
         """
+        try:
+            signature = inspect.signature(method)
+        except (TypeError, ValueError):
+            signature = None
 
         def checked_method(*args, **kwargs):
             user = str(self.context.vip_message.user)
@@ -310,92 +326,105 @@ class RPC(SubsystemBase):
                 # When we address issue #2107 external platform user should
                 # have instance name also included in username.
                 user = user.split(".")[1]
-            user_capabilites = self._owner.vip.auth.get_capabilities(user)
-            _log.debug("**user caps is: {}".format(user_capabilites))
-            if user_capabilites:
-                user_capabilities_names = set(user_capabilites.keys())
-            else:
-                user_capabilities_names = set()
-            if required_caps == {""}:
-                pass
-            elif not required_caps.issubset(user_capabilities_names):
-                msg = (
-                    "method '{}' requires capabilities {}, but capability {} "
-                    "was provided for user {}"
-                ).format(
-                    method.__name__,
-                    required_caps,
-                    user_capabilites,
-                    user
+            key = (checked_method, user)
+            check = self._capability_checks.get(key)
+            if check is None:
+                user_capabilites = self._owner.vip.auth.get_capabilities(user)
+                _log.debug("**user caps is: {}".format(user_capabilites))
+                check = self._compile_capability_check(
+                    method, signature, required_caps, user, user_capabilites
                 )
-                raise jsonrpc.exception_from_json(jsonrpc.UNAUTHORIZED, msg)
-            else:
-                # Now check if args passed to method are the ones allowed.
-
-                for cap_name, param_dict in user_capabilites.items():
-                    if (
-                            param_dict
-                            and required_caps
-                            and cap_name in required_caps
-                    ):
-                        # if the method has required capabilities and
-                        # if the user capability has argument restrictions,
-                        # check if the args passed to method match the
-                        # requirement
-                        _log.debug("args = {} kwargs= {}".format(args, kwargs))
-                        args_dict = inspect.getcallargs(method, *args, **kwargs)
-                        _log.debug("dict = {}".format(args_dict))
-                        _log.debug(
-                            "name= %r parameters allowed=%r",
-                            cap_name,
-                            param_dict
-                        )
-                        for name, value in param_dict.items():
-                            _log.debug("name= {} value={}".format(name, value))
-                            if name not in args_dict:
-                                raise jsonrpc.exception_from_json(
-                                    jsonrpc.UNAUTHORIZED,
-                                    "User {} capability is not defined "
-                                    "properly. method {} does not have "
-                                    "a parameter {}".format(
-                                        user, method.__name__, name
-                                    ),
-                                )
-                            if _isregex(value):
-                                regex = re.compile("^" + value[1:-1] + "$")
-                                if not regex.match(args_dict[name]):
-                                    raise jsonrpc.exception_from_json(
-                                        jsonrpc.UNAUTHORIZED,
-                                        "User {} can call method {} only "
-                                        "with {} matching pattern {} but "
-                                        "called with {}={}".format(
-                                            user,
-                                            method.__name__,
-                                            name,
-                                            value,
-                                            name,
-                                            args_dict[name],
-                                        ),
-                                    )
-                            elif args_dict[name] != value:
-                                raise jsonrpc.exception_from_json(
-                                    jsonrpc.UNAUTHORIZED,
-                                    "User {} can call method {} only "
-                                    "with {}={} but called with "
-                                    "{}={}".format(
-                                        user,
-                                        method.__name__,
-                                        name,
-                                        value,
-                                        name,
-                                        args_dict[name],
-                                    ),
-                                )
-
+                self._capability_checks[key] = check
+            check(args, kwargs)
             return method(*args, **kwargs)
 
         return checked_method
 
+    @staticmethod
+    def _compile_capability_check(method, signature, required_caps, user,
+                                  user_capabilites):
+        """
+        Returns a function of (args, kwargs) that raises an UNAUTHORIZED
+        error if the user may not call method with those arguments.
+        """
+
+        def unauthorized(msg):
+            return jsonrpc.exception_from_json(jsonrpc.UNAUTHORIZED, msg)
+
+        if user_capabilites:
+            user_capabilities_names = set(user_capabilites.keys())
+        else:
+            user_capabilities_names = set()
+        if required_caps == {""}:
+            return lambda args, kwargs: None
+        if not required_caps.issubset(user_capabilities_names):
+            msg = (
+                "method '{}' requires capabilities {}, but capability {} "
+                "was provided for user {}"
+            ).format(method.__name__, required_caps, user_capabilites, user)
+
+            def denied(args, kwargs):
+                raise unauthorized(msg)
+
+            return denied
+
+        # Argument restrictions of the required capabilities, with regex
+        # values compiled up front.
+        restrictions = []
+        for cap_name, param_dict in user_capabilites.items():
+            if param_dict and required_caps and cap_name in required_caps:
+                for name, value in param_dict.items():
+                    regex = None
+                    if _isregex(value):
+                        regex = re.compile("^" + value[1:-1] + "$")
+                    restrictions.append((name, value, regex))
+        if not restrictions:
+            return lambda args, kwargs: None
+
+        def check(args, kwargs):
+            if signature is not None:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                args_dict = bound.arguments
+            else:
+                args_dict = inspect.getcallargs(method, *args, **kwargs)
+            for name, value, regex in restrictions:
+                if name not in args_dict:
+                    raise unauthorized(
+                        "User {} capability is not defined "
+                        "properly. method {} does not have "
+                        "a parameter {}".format(user, method.__name__, name)
+                    )
+                if regex is not None:
+                    if not regex.match(args_dict[name]):
+                        raise unauthorized(
+                            "User {} can call method {} only "
+                            "with {} matching pattern {} but "
+                            "called with {}={}".format(
+                                user,
+                                method.__name__,
+                                name,
+                                value,
+                                name,
+                                args_dict[name],
+                            )
+                        )
+                elif args_dict[name] != value:
+                    raise unauthorized(
+                        "User {} can call method {} only "
+                        "with {}={} but called with "
+                        "{}={}".format(
+                            user,
+                            method.__name__,
+                            name,
+                            value,
+                            name,
+                            args_dict[name],
+                        )
+                    )
+
+        return check
+
     @spawn
     def _handle_external_rpc_subsystem(self, message):
         ret_msg = dict()
@@ -46,15 +46,15 @@ import re
 import zmq
 from zmq import SNDMORE, EHOSTUNREACH, ZMQError, EAGAIN, NOBLOCK
 from zmq import green
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
 
 # Create a context common to the green and non-green zmq modules.
 from volttron.platform.agent.utils import get_platform_instance_name
-from volttron.utils.frame_serialization import serialize_frames
+from volttron.utils.frame_serialization import ENCODE_FORMAT, serialize_frames
 
 green.Context._instance = green.Context.shadow(zmq.Context.instance().underlying)
 from volttron.platform import get_home
-from .agent.subsystems.pubsub import ProtectedPubSubTopics
+from .agent.subsystems.pubsub import ProtectedPubSubTopics, TopicTrie
 from volttron.platform.jsonrpc import (INVALID_REQUEST, UNAUTHORIZED)
 from volttron.platform import jsonapi
 
@@ -67,9 +67,90 @@ _ROUTE_ERRORS = {
 
 _log = logging.getLogger(__name__)
 
+SEND_QUEUE_POLICIES = ('drop-oldest', 'drop-newest', 'conflate', 'block-publisher')
+
+
+class SendQueue:
+    """
+    Bounded queue of publish messages a subscriber could not accept yet.
+
+    When the queue is full the policy decides which message is lost:
+
+    drop-oldest
+        the oldest queued message is dropped to make room.
+    drop-newest
+        the new message is dropped.
+    conflate
+        only the latest message of each topic is kept, the oldest topic is
+        dropped to make room.
+    block-publisher
+        the new message is refused and the publisher is asked to try again.
+    """
+
+    def __init__(self, policy, size):
+        self.policy = policy
+        self.size = size
+        self.dropped = 0
+        self.refused = 0
+        self._messages = OrderedDict() if policy == 'conflate' else deque()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def push(self, topic, frames):
+        """
+        Queue the serialized frames of a message published to topic.
+        :returns: False if the message was refused
+        :rtype: bool
+        """
+        messages = self._messages
+        if self.policy == 'conflate':
+            if messages.pop(topic, None) is not None:
+                self.dropped += 1
+            elif len(messages) >= self.size:
+                messages.popitem(last=False)
+                self.dropped += 1
+            messages[topic] = frames
+            return True
+        if len(messages) >= self.size:
+            if self.policy == 'drop-oldest':
+                messages.popleft()
+                self.dropped += 1
+            elif self.policy == 'drop-newest':
+                self.dropped += 1
+                return True
+            else:
+                self.refused += 1
+                return False
+        messages.append((topic, frames))
+        return True
+
+    def peek(self):
+        """
+        Returns the topic and frames of the oldest queued message.
+        """
+        if self.policy == 'conflate':
+            return next(iter(self._messages.items()))
+        return self._messages[0]
+
+    def pop(self):
+        if self.policy == 'conflate':
+            self._messages.popitem(last=False)
+        else:
+            self._messages.popleft()
+
+    def stats(self):
+        return dict(policy=self.policy, size=self.size, depth=len(self._messages),
+                    dropped=self.dropped, refused=self.refused)
+
+
 class PubSubService:
-    def __init__(self, socket, protected_topics, routing_service, *args, **kwargs):
+    def __init__(self, socket, protected_topics, routing_service, *args, send_queue_size=0,
+                 send_queue_policy='drop-oldest', **kwargs):
         self._logger = logging.getLogger(__name__)
+        if send_queue_policy not in SEND_QUEUE_POLICIES:
+            raise ValueError("Invalid pubsub send queue policy {}, expected one of {}".format(
+                send_queue_policy, ", ".join(SEND_QUEUE_POLICIES)))
 
         def platform_subscriptions():
             return defaultdict(subscriptions)
@@ -78,6 +159,8 @@ class PubSubService:
             return defaultdict(set)
 
         self._peer_subscriptions = defaultdict(platform_subscriptions)
+        # Per bus index of the subscriber sets in _peer_subscriptions
+        self._subscription_index = defaultdict(TopicTrie)
         self._vip_sock = socket
         self._user_capabilities = {}
         self._protected_topics = ProtectedPubSubTopics()
@@ -88,6 +171,11 @@ class PubSubService:
             self._ext_router.register('on_connect', self.external_platform_add)
             self._ext_router.register('on_disconnect', self.external_platform_drop)
         self._rabbitmq_agent = None
+        # Subscribers' queues of publishes the router socket could not take yet
+        self._send_queue_default = (send_queue_policy, int(send_queue_size))
+        self._send_queue_config = {}
+        self._send_queues = {}
+        self._pending_sends = set()
 
     def _add_peer_subscription(self, peer, bus, prefix, platform='internal'):
         """
@@ -99,7 +187,16 @@ class PubSubService:
         :param prefix subscription prefix (peer is subscribing to all topics matching the prefix)
         :type str
         """
-        self._peer_subscriptions[platform][bus][prefix].add(peer)
+        subscribers = self._peer_subscriptions[platform][bus][prefix]
+        subscribers.add(peer)
+        self._subscription_index[bus].add(prefix, platform, subscribers)
+
+    def _remove_prefix(self, platform, bus, prefix):
+        """
+        Remove the subscription prefix of the platform and bus for all its subscribers.
+        """
+        self._peer_subscriptions[platform][bus].pop(prefix, None)
+        self._subscription_index[bus].remove(prefix, platform)
 
     def peer_drop(self, peer, **kwargs):
         """
@@ -110,6 +207,9 @@ class PubSubService:
         :type pointer to arguments
         """
         self._sync(peer, {})
+        self._send_queue_config.pop(peer, None)
+        self._send_queues.pop(peer, None)
+        self._pending_sends.discard(peer)
 
     def peer_add(self, peer):
         # To do
@@ -156,8 +256,7 @@ class PubSubService:
                     else:
                         subscribers.add(peer)
         for platform, bus, prefix in remove:
-            subscriptions = self._peer_subscriptions[platform][bus]
-            assert not subscriptions.pop(prefix)
+            self._remove_prefix(platform, bus, prefix)
 
         for platform, bus, prefix in items:
             self._add_peer_subscription(peer, bus, prefix, platform)
@@ -268,13 +367,13 @@ class PubSubService:
                         if not subscribers:
                             remove.append(topic)
                     for topic in remove:
-                        del subscriptions[topic]
+                        self._remove_prefix(platform, bus, topic)
                 else:
                     for prefix in prefix if isinstance(prefix, list) else [prefix]:
                         subscribers = subscriptions[prefix]
                         subscribers.discard(peer)
                         if not subscribers:
-                            del subscriptions[prefix]
+                            self._remove_prefix(platform, bus, prefix)
 
                 if platform == 'all' and self._ext_router is not None:
                     # Send updated subscription list to all connected platforms
@@ -313,6 +412,46 @@ class PubSubService:
                 self._publish_on_rmq_bus(frames)
             return self._distribute(frames, user_id)
 
+    def _peer_publish_batch(self, frames, user_id):
+        """Publish each message of a batch to all the subscribers subscribed to its topic.
+        :param frames list of frames
+        :type frames list
+        :param user_id user id of the publishing agent. This is required for protected topics check.
+        :type user_id  UTF-8 encoded User-Id property
+        :returns: Count of subscribers of each message.
+        :rtype: list
+
+        :Return Values:
+        List of number of subscribers to whom each message was sent
+        """
+        counts = []
+        if len(frames) > 7:
+            try:
+                msg = frames[7]
+                bus = msg['bus']
+                items = msg['items']
+            except KeyError as exc:
+                self._logger.error("Missing key in _peer_publish_batch message {}".format(exc))
+                return counts
+            except TypeError:
+                self._logger.error("Invalid _peer_publish_batch message")
+                return counts
+            peer = frames[0]
+            for item in items:
+                try:
+                    topic = item['topic']
+                    pub_msg = dict(sender=peer, bus=bus, headers=item['headers'], message=item['message'])
+                except KeyError as exc:
+                    self._logger.error("Missing key in _peer_publish_batch item {}".format(exc))
+                    counts.append(0)
+                    continue
+                # Each item is distributed as an individual publish from the same peer
+                item_frames = frames[:6] + ['publish', topic, pub_msg]
+                if self._rabbitmq_agent:
+                    self._publish_on_rmq_bus(item_frames)
+                counts.append(self._distribute(item_frames, user_id))
+        return counts
+
     def _peer_list(self, frames):
         """Returns a list of subscriptions for a specific bus. If bus is None, then it returns list of subscriptions
         for all the buses.
@@ -423,34 +562,22 @@ class PubSubService:
             self._logger.error("JSON decode error. Invalid character")
             return 0
 
-        all_subscriptions = dict()
-        subscriptions = dict()
-        subs = dict()
-        # Get subscriptions for all platforms
-        try:
-            all_subscriptions = self._peer_subscriptions['all'][bus]
-        except KeyError:
-            pass
-        try:
-            subscriptions = self._peer_subscriptions['internal'][bus]
-        except KeyError:
-            pass
-
-        subs.update(all_subscriptions)
-        subs.update(subscriptions)
         subscribers = set()
-        # Check for local subscribers
-        for prefix, subscription in subs.items():
-            if subscription and topic.startswith(prefix):
+        # Check for local subscribers of all platforms
+        index = self._subscription_index.get(bus)
+        if index is not None:
+            for subscription in index.match(topic):
                 subscribers |= subscription
 
         if subscribers:
             # self._logger.debug("PUBSUBSERVICE: found subscribers: {}".format(subscribers))
+            # Serialize the message once, only the recipient frame differs between subscribers.
+            serialized = serialize_frames(frames)
             for subscriber in subscribers:
-                frames[0] = subscriber
+                serialized[0] = zmq.Frame(subscriber.encode(ENCODE_FORMAT))
                 try:
                     # Send the message to the subscriber
-                    for sub in self._send(frames, publisher):
+                    for sub in self._send_publish(serialized, publisher, subscriber, topic):
                         # Drop the subscriber if unreachable
                         self.peer_drop(sub)
                 except ZMQError:
@@ -506,7 +633,132 @@ class PubSubService:
                         raise
         return len(external_subscribers)
 
-    def _send(self, frames, publisher):
+    def _send_publish(self, frames, publisher, subscriber, topic):
+        """
+        Sends serialized publish frames to the subscriber. Messages the subscriber cannot take yet are queued, if
+        its send queue is enabled, and sent later by flush_send_queues.
+        :param frames serialized frames
+        :type frames list
+        :param publisher
+        :type str
+        :param subscriber identity of the recipient
+        :type subscriber str
+        :param topic topic of the message
+        :type topic str
+        :returns: List of dropped recipients, if any
+        :rtype: list
+        """
+        policy, size = self._send_queue_config.get(subscriber, self._send_queue_default)
+        if not size:
+            return self._send(frames, publisher, subscriber)
+        queue = self._send_queues.get(subscriber)
+        if not queue:
+            try:
+                self._vip_sock.send_multipart(frames, flags=NOBLOCK, copy=False)
+                return []
+            except ZMQError as exc:
+                if exc.errno == EHOSTUNREACH:
+                    self._logger.debug("Host unreachable {}".format(subscriber))
+                    return [subscriber]
+                if exc.errno != EAGAIN:
+                    raise
+            if queue is None:
+                self._send_queues[subscriber] = queue = SendQueue(policy, size)
+        # Keep the order of messages, queue behind the ones already waiting
+        if queue.push(topic, list(frames)):
+            self._pending_sends.add(subscriber)
+        else:
+            self._send_error(frames, publisher, subscriber, EAGAIN)
+        return []
+
+    def has_pending_sends(self):
+        """
+        Returns True if messages are queued for subscribers.
+        """
+        return bool(self._pending_sends)
+
+    def flush_send_queues(self):
+        """
+        Sends queued messages to their subscribers until the subscribers stop accepting them.
+        """
+        for subscriber in list(self._pending_sends):
+            queue = self._send_queues[subscriber]
+            while queue:
+                try:
+                    self._vip_sock.send_multipart(queue.peek()[1], flags=NOBLOCK, copy=False)
+                except ZMQError as exc:
+                    if exc.errno == EHOSTUNREACH:
+                        self._logger.debug("Host unreachable {}".format(subscriber))
+                        self.peer_drop(subscriber)
+                        break
+                    if exc.errno == EAGAIN:
+                        break
+                    raise
+                queue.pop()
+            if not queue:
+                self._pending_sends.discard(subscriber)
+                if not self._send_queue_config.get(subscriber, self._send_queue_default)[1]:
+                    # Send queue was disabled while messages were waiting
+                    self._send_queues.pop(subscriber, None)
+
+    def _send_error(self, frames, publisher, subscriber, errnum):
+        """
+        Reports an error sending the message in frames to the subscriber back to the publisher.
+        """
+        errnum, errmsg = _ROUTE_ERRORS[errnum]
+        proto, user_id, msg_id, subsystem = frames[2:6]
+        frames = [publisher, '', proto, user_id, msg_id,
+                  'error', errnum, errmsg, subscriber, subsystem]
+        try:
+            frames = serialize_frames(frames)
+            self._vip_sock.send_multipart(frames, flags=NOBLOCK, copy=False)
+        except ZMQError:
+            pass
+
+    def _peer_send_queue(self, frames):
+        """
+        Sets the send queue policy and size of the calling agent (peer).
+        :param frames list of frames
+        :type frames list
+        :returns: success or failure
+        :rtype: boolean
+        """
+        if len(frames) < 8:
+            return False
+        msg = frames[7]
+        peer = frames[0]
+        default_policy, default_size = self._send_queue_default
+        try:
+            policy = msg.get('policy') or default_policy
+            size = int(msg.get('size', default_size))
+        except (AttributeError, TypeError, ValueError) as exc:
+            self._logger.error("Invalid _peer_send_queue message {}".format(exc))
+            return False
+        if policy not in SEND_QUEUE_POLICIES or size < 0:
+            self._logger.error("Invalid send queue policy {} or size {} from {}".format(policy, size, peer))
+            return False
+        self._send_queue_config[peer] = (policy, size)
+        queue = self._send_queues.get(peer)
+        if queue is not None and size and (queue.policy, queue.size) != (policy, size):
+            # Move the waiting messages to a queue with the new policy and size
+            new_queue = SendQueue(policy, size)
+            new_queue.dropped = queue.dropped
+            new_queue.refused = queue.refused
+            while queue:
+                new_queue.push(*queue.peek())
+                queue.pop()
+            self._send_queues[peer] = new_queue
+        return True
+
+    def _peer_send_queue_stats(self, frames):
+        """
+        Returns the depth and drop counters of the subscribers' send queues.
+        :returns: dictionary of subscriber to queue statistics
+        :rtype: dict
+        """
+        return {subscriber: queue.stats() for subscriber, queue in self._send_queues.items()}
+
+    def _send(self, frames, publisher, subscriber=None):
         """
         Sends the message to the recipient. If the recipient is unreachable, it is dropped from list of peers (and
         associated subscriptions are removed. Any EAGAIN errors are reported back to the publisher.
@@ -514,6 +766,9 @@ class PubSubService:
         :type frames list
         :param publisher
         :type bytes
+        :param subscriber identity of the recipient, defaults to the first frame. Required when frames are already
+        serialized
+        :type subscriber str
         :returns: List of dropped recipients, if any
         :rtype: list
 
@@ -521,7 +776,8 @@ class PubSubService:
         List of dropped recipients, if any
         """
         drop = []
-        subscriber = frames[0]
+        if subscriber is None:
+            subscriber = frames[0]
         # Expecting outgoing frames:
         #   [RECIPIENT, SENDER, PROTO, USER_ID, MSG_ID, SUBSYS, ...]
         # _log.debug(f"pubsubservice _send {frames}")
@@ -634,8 +890,14 @@ class PubSubService:
                 except IndexError:
                     #send response back -- Todo
                     return []
+            elif op == 'publish_batch':
+                result = self._peer_publish_batch(frames, user_id)
             elif op == 'unsubscribe':
                 result = self._peer_unsubscribe(frames)
+            elif op == 'send_queue':
+                result = self._peer_send_queue(frames)
+            elif op == 'send_queue_stats':
+                result = self._peer_send_queue_stats(frames)
             elif op == 'list':
                 result = self._peer_list(frames)
                 # Form response frame
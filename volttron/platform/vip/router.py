@@ -47,7 +47,7 @@ import zmq
 from zmq import Frame, NOBLOCK, ZMQError, EINVAL, EHOSTUNREACH
 
 from volttron.platform.vip.servicepeer import ServicePeerNotifier
-from volttron.utils.frame_serialization import serialize_frames
+from volttron.utils.frame_serialization import deserialize_envelope, deserialize_payload, serialize_frames
 
 __all__ = ['BaseRouter', 'OUTGOING', 'INCOMING', 'UNROUTABLE', 'ERROR']
 
@@ -254,12 +254,17 @@ class BaseRouter:
         and ping subsystems are handled. Other subsystems are sent to
         handle_subsystem() for processing. Messages destined for other
         entities are routed appropriately.
+
+        frames may be the zmq.Frame objects as received. Only the
+        envelope is decoded for messages routed to other entities, their
+        payload frames are forwarded as received.
         '''
         socket = self.socket
         issue = self.issue
 
         issue(INCOMING, frames)
         # _log.debug(f"ROUTER Receiving frames: {frames}")
+        frames = deserialize_envelope(frames)
         if len(frames) < 6:
             # Cannot route if there are insufficient frames, such as
             # might happen with a router probe.
@@ -283,6 +288,7 @@ class BaseRouter:
         subsystem = frames[5]
         if not recipient:
             # Handle requests directed at the router
+            frames = deserialize_payload(frames)
             name = subsystem
             if name == 'hello':
                 frames = [sender, recipient, proto, user_id, msg_id,
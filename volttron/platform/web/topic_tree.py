@@ -121,6 +121,8 @@ class DeviceTree(TopicTree):
     def __init__(self, topic_list=None, root_name='devices', assume_full_topics=False,  *args, **kwargs):
         super(DeviceTree, self).__init__(topic_list=topic_list, root_name=root_name, node_class=DeviceNode,
                                          *args, **kwargs)
+        # Registry config name by device node id, for devices loaded from the store.
+        self.registry_configs = {}
         if assume_full_topics:
             for n in self.leaves():
                 n.segment_type = 'POINT'
@@ -151,21 +153,61 @@ class DeviceTree(TopicTree):
     def from_store(cls, platform, rpc_caller):
         # TODO: Duplicate logic for external_platform check from VUIEndpoints to remove reference to it from here.
         kwargs = {'external_platform': platform} if 'VUIEndpoints' in rpc_caller.__repr__() else {}
-        devices = rpc_caller(CONFIGURATION_STORE, 'manage_list_configs', 'platform.driver', **kwargs)
-        devices = devices if kwargs else devices.get(timeout=5)
-        devices = [d for d in devices if re.match('^devices/.*', d)]
+        devices = cls._list_store_devices(rpc_caller, kwargs)
         device_tree = cls(devices)
         for d in devices:
-            dev_config = rpc_caller(CONFIGURATION_STORE, 'manage_get', 'platform.driver', d, raw=False, **kwargs)
-            # TODO: If not AsyncResponse instead of if kwargs
-            dev_config = dev_config if kwargs else dev_config.get(timeout=5)
-            reg_cfg_name = dev_config.pop('registry_config')[len('config://'):]
-            device_tree.update_node(d, data=dev_config, segment_type='DEVICE')
-            registry_config = rpc_caller('config.store', 'manage_get', 'platform.driver',
-                                         f'{reg_cfg_name}', raw=False, **kwargs)
-            registry_config = registry_config if kwargs else registry_config.get(timeout=5)
-            for pnt in registry_config:
-                point_name = pnt.pop('Volttron Point Name')
-                n = device_tree.create_node(point_name, f"{d}/{point_name}", parent=d, data=pnt)
-                n.segment_type = 'POINT'
+            device_tree._load_device(d, rpc_caller, kwargs)
         return device_tree
+
+    def update_from_store(self, platform, rpc_caller, config_names):
+        """Reloads the devices affected by changes to the given platform driver configurations.
+
+        Changed device configurations are reloaded or removed. Changed registry configurations reload the devices
+        that use them.
+        """
+        kwargs = {'external_platform': platform} if 'VUIEndpoints' in rpc_caller.__repr__() else {}
+        devices = set(self._list_store_devices(rpc_caller, kwargs))
+        changed = {c for c in config_names if re.match('^devices/.*', c)}
+        changed.update(d for d, r in self.registry_configs.items() if r in config_names)
+        for d in sorted(changed):
+            if self.contains(d):
+                self._remove_device(d)
+            if d in devices:
+                self._load_device(d, rpc_caller, kwargs)
+
+    @staticmethod
+    def _list_store_devices(rpc_caller, kwargs):
+        devices = rpc_caller(CONFIGURATION_STORE, 'manage_list_configs', 'platform.driver', **kwargs)
+        devices = devices if kwargs else devices.get(timeout=5)
+        return [d for d in devices if re.match('^devices/.*', d)]
+
+    def _load_device(self, d, rpc_caller, kwargs):
+        dev_config = rpc_caller(CONFIGURATION_STORE, 'manage_get', 'platform.driver', d, raw=False, **kwargs)
+        # TODO: If not AsyncResponse instead of if kwargs
+        dev_config = dev_config if kwargs else dev_config.get(timeout=5)
+        reg_cfg_name = dev_config.pop('registry_config')[len('config://'):]
+        parent = self.root
+        for segment in d.split('/')[1:]:
+            nid = '/'.join([parent, segment])
+            if not self.contains(nid):
+                self.create_node(segment, nid, parent=parent)
+            parent = nid
+        self.update_node(d, data=dev_config, segment_type='DEVICE')
+        self.registry_configs[d] = reg_cfg_name
+        registry_config = rpc_caller('config.store', 'manage_get', 'platform.driver',
+                                     f'{reg_cfg_name}', raw=False, **kwargs)
+        registry_config = registry_config if kwargs else registry_config.get(timeout=5)
+        for pnt in registry_config:
+            point_name = pnt.pop('Volttron Point Name')
+            n = self.create_node(point_name, f"{d}/{point_name}", parent=d, data=pnt)
+            n.segment_type = 'POINT'
+
+    def _remove_device(self, d):
+        parent = self.parent(d)
+        self.remove_node(d)
+        self.registry_configs.pop(d, None)
+        # Drop the topic segments left without devices.
+        while parent is not None and parent.identifier != self.root and not self.children(parent.identifier):
+            grandparent = self.parent(parent.identifier)
+            self.remove_node(parent.identifier)
+            parent = grandparent
@@ -1,15 +1,21 @@
 import functools
+import hashlib
 import os
 import re
 import json
 from os.path import normpath, join
+from uuid import uuid4
+from gevent.lock import Semaphore
 from gevent.timeout import Timeout
 from collections import defaultdict
 from typing import List, Union
 
 from werkzeug import Response
+from werkzeug.http import parse_etags
 from werkzeug.urls import url_decode
 
+from volttron.platform.agent.known_identities import PLATFORM_DRIVER
+from volttron.platform.messaging.topics import CONFIG_ADD, CONFIG_REMOVE, CONFIG_UPDATE
 from volttron.platform.vip.agent.subsystems.query import Query
 from volttron.platform.jsonrpc import MethodNotFound, RemoteError
 from volttron.platform.web.topic_tree import DeviceTree, TopicTree
@@ -147,6 +153,16 @@ class VUIEndpoints:
         if self.active_routes['vui']['platforms']['pubsub']:
             self.pubsub_manager = VUIPubsubManager(self._agent)
 
+        # Device trees of the local platform are cached and kept current from the
+        # config store changes of the platform driver.
+        self._device_trees = {}
+        self._device_tree_changes = defaultdict(set)
+        self._device_tree_versions = defaultdict(int)
+        self._device_tree_lock = Semaphore()
+        self._device_tree_subscribed = False
+        # Distinguishes the ETags of this process from those of earlier runs.
+        self._etag_prefix = uuid4().hex
+
     def get_routes(self):
         """
         Returns a list of tuples with the routes for the administration endpoints
@@ -613,8 +629,17 @@ class VUIEndpoints:
             tag_list = None
         # Prune device tree and get nodes matching topic:
         try:
-            # TODO: Should we be storing this tree to use for faster requests later? How to keep it updated?
-            device_tree = DeviceTree.from_store(platform, self._rpc).prune(topic, regex, tag_list)
+            device_tree, version = self._get_device_tree(platform)
+            # An ETag is only sent with responses that do not contain point values, so a match means
+            # the client already has the response to this request for the current device tree.
+            etag = None
+            if request_method == 'GET' and version is not None:
+                etag = self._device_tree_etag(platform, version, env, tag_list)
+                if etag in parse_etags(env.get('HTTP_IF_NONE_MATCH')):
+                    response = Response(status=304)
+                    response.set_etag(etag)
+                    return response
+            device_tree = device_tree.prune(topic, regex, tag_list)
             topic_nodes = device_tree.get_matches(f'devices/{topic}' if topic else 'devices')
             if not topic_nodes:
                 return Response(json.dumps({f'error': f'Device topic {topic} not found on platform: {platform}.'}),
@@ -649,7 +674,10 @@ class VUIEndpoints:
                             ret_dict[point.topic]['writable'] = self._to_bool(point.data.get('Writable'))
                         if return_config:
                             ret_dict[point.topic]['config'] = point.data
-                    return Response(json.dumps(ret_dict), 200, content_type='application/json')
+                    response = Response(json.dumps(ret_dict), 200, content_type='application/json')
+                    if etag and not return_values:
+                        response.set_etag(etag)
+                    return response
                 else:
                     # All topics are not complete to points and read_all=False -- return route to next segments:
                     ret_dict = {
@@ -657,7 +685,10 @@ class VUIEndpoints:
                                                                        replace_topic=topic,
                                                                        prefix=f'/vui/platforms/{platform}')
                     }
-                    return Response(json.dumps(ret_dict), 200, content_type='application/json')
+                    response = Response(json.dumps(ret_dict), 200, content_type='application/json')
+                    if etag:
+                        response.set_etag(etag)
+                    return response
 
             except Timeout as e:
                 return Response(json.dumps({'error': f'RPC Timed Out: {e}'}), 504, content_type='application/json')
@@ -1002,6 +1033,52 @@ class VUIEndpoints:
                   external_platform=platform)
         return None
 
+    def _get_device_tree(self, platform):
+        """Returns the device tree of a platform and its version.
+
+        The tree of the local platform is built once and then updated with the platform driver configurations
+        changed since the last request. Config store changes are not published to other platforms, so their
+        trees are rebuilt on every request and have no version.
+        """
+        if platform != self.local_instance_name:
+            return DeviceTree.from_store(platform, self._rpc), None
+        with self._device_tree_lock:
+            if not self._device_tree_subscribed:
+                for topic in (CONFIG_ADD, CONFIG_UPDATE, CONFIG_REMOVE):
+                    self._agent.vip.pubsub.subscribe('pubsub', topic(category=PLATFORM_DRIVER, name=''),
+                                                     self._on_driver_config_change).get(timeout=5)
+                self._device_tree_subscribed = True
+            # Changes arriving while the tree is loaded are applied on the next request.
+            version = self._device_tree_versions[platform]
+            changes = self._device_tree_changes.pop(platform, None)
+            device_tree = self._device_trees.get(platform)
+            if device_tree is None:
+                device_tree = DeviceTree.from_store(platform, self._rpc)
+                self._device_trees[platform] = device_tree
+            elif changes:
+                try:
+                    device_tree.update_from_store(platform, self._rpc, changes)
+                except (Exception, Timeout):
+                    # The tree may be partly updated and the changes are consumed, so rebuild it on the next request.
+                    self._device_trees.pop(platform, None)
+                    raise
+            return device_tree, version
+
+    def _on_driver_config_change(self, peer, sender, bus, topic, headers, message):
+        if not isinstance(message, dict) or message.get('identity') != PLATFORM_DRIVER:
+            return
+        platform = self.local_instance_name
+        self._device_tree_versions[platform] += 1
+        if message.get('config_name'):
+            self._device_tree_changes[platform].add(message['config_name'])
+        else:
+            # The whole store was removed.
+            self._device_trees.pop(platform, None)
+
+    def _device_tree_etag(self, platform, version, env, tag_list):
+        key = [self._etag_prefix, platform, version, env.get('PATH_INFO'), env.get('QUERY_STRING'), tag_list]
+        return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+
     def _rpc(self, vip_identity, method, *args, external_platform=None, **kwargs):
         external_platform = {'external_platform': external_platform}\
             if external_platform != self.local_instance_name else {}
@@ -83,15 +83,42 @@ def deserialize_frames(frames: List[Frame]) -> List:
     return decoded
 
 
+def deserialize_envelope(frames: List, count: int = 6) -> List:
+    """
+    Decode the first count frames of a VIP message, the envelope, to strings
+    and leave the remaining frames as they are. Unlike deserialize_frames
+    the envelope frames are never JSON decoded, so the payload frames can
+    be forwarded untouched by serialize_frames.
+    """
+    decoded = []
+    for x in frames[:count]:
+        if isinstance(x, Frame):
+            x = x.bytes.decode(ENCODE_FORMAT)
+        elif isinstance(x, bytes):
+            x = x.decode(ENCODE_FORMAT)
+        decoded.append(x)
+    decoded.extend(frames[count:])
+    return decoded
+
+
+def deserialize_payload(frames: List) -> List:
+    """
+    Decode frames still in wire form as deserialize_frames does and leave
+    frames that are already decoded as they are.
+    """
+    return [deserialize_frames([x])[0] if isinstance(x, (Frame, bytes)) else x for x in frames]
+
+
 def serialize_frames(data: List[Any]) -> List[Frame]:
     frames = []
 
     for x in data:
         try:
-            if isinstance(x, list) or isinstance(x, dict):
-                frames.append(Frame(jsonapi.dumps(x).encode(ENCODE_FORMAT)))
-            elif isinstance(x, Frame):
+            # Frames forwarded as received by the router are the common case.
+            if isinstance(x, Frame):
                 frames.append(x)
+            elif isinstance(x, list) or isinstance(x, dict):
+                frames.append(Frame(jsonapi.dumps(x).encode(ENCODE_FORMAT)))
             elif isinstance(x, bytes):
                 frames.append(Frame(x))
             elif isinstance(x, bool):
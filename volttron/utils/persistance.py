@@ -8,12 +8,15 @@ import pickle
 
 from volttron.platform import jsonapi
 
-from threading import Thread
+from threading import Lock, Thread
 from queue import Queue
 from copy import deepcopy
 
 _log = logging.getLogger(__name__)
 
+# Key holding the sequence number of the last journal entry in a snapshot.
+_SEQUENCE_KEY = "__journal_sequence__"
+
 
 def load_create_store(filename):
     persist = PersistentDict(filename=filename, flag='c', format='json')
@@ -58,9 +61,12 @@ class PersistentDict(dict):
     @staticmethod
     def _process_loop():
         while True:
-            filename, contents, format, mode = PersistentDict._event_queue.get()
+            item = PersistentDict._event_queue.get()
 
-            PersistentDict._update_file(filename, contents, format, mode)
+            if callable(item):
+                item()
+            else:
+                PersistentDict._update_file(*item)
 
 
     def sync(self):
@@ -130,6 +136,180 @@ class PersistentDict(dict):
         raise ValueError('File not in a supported format')
 
 
+class JournaledPersistentDict(PersistentDict):
+    """JSON PersistentDict that appends changes to a journal next to the file.
+
+    async_sync only writes the entries changed since the previous call to
+    filename + '.journal'. Calls made before the writer thread gets to the
+    dict are written together. The whole dict is written to filename when
+    the journal outgrows the dict (and compact_threshold entries), when no
+    file exists yet, after clear() and on sync or close.
+
+    Journal entries are numbered and each snapshot records the number of the
+    last entry it contains under _SEQUENCE_KEY, so entries left behind by an
+    interrupted compaction are skipped when the journal is replayed.
+    """
+
+    def __init__(self, filename, flag='c', mode=None, compact_threshold=1000, *args, **kwds):
+        self.journal_filename = filename + '.journal'
+        self.compact_threshold = compact_threshold
+        self._changed = {}
+        self._cleared = False
+        self._journal_entries = 0
+        self._sequence = 0
+        self._pending = []
+        self._queued = False
+        self._pending_lock = Lock()
+        self._file_lock = Lock()
+        super(JournaledPersistentDict, self).__init__(filename, flag, mode, 'json', *args, **kwds)
+        self._changed.clear()
+        self._sequence = dict.pop(self, _SEQUENCE_KEY, 0)
+        self._has_file = os.access(filename, os.R_OK)
+        if flag != 'n' and os.access(self.journal_filename, os.R_OK):
+            self._replay()
+
+    def _replay(self):
+        snapshot_sequence = self._sequence
+        with open(self.journal_filename, 'r') as journal:
+            for line in journal:
+                try:
+                    entry = jsonapi.loads(line)
+                except ValueError:
+                    _log.warning("Ignoring incomplete entry at the end of {}".format(self.journal_filename))
+                    break
+                # Journals written before entries were numbered have no "s".
+                sequence = entry.get("s")
+                if sequence is not None:
+                    if sequence <= snapshot_sequence:
+                        continue
+                    self._sequence = max(self._sequence, sequence)
+                if "v" in entry:
+                    dict.__setitem__(self, entry["k"], entry["v"])
+                else:
+                    dict.pop(self, entry["k"], None)
+                self._journal_entries += 1
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed[key] = None
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed[key] = None
+
+    def pop(self, key, *args):
+        self._changed[key] = None
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._changed[key] = None
+        return key, value
+
+    def setdefault(self, key, default=None):
+        self._changed[key] = None
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwds):
+        changes = dict(*args, **kwds)
+        dict.update(self, changes)
+        self._changed.update(dict.fromkeys(changes))
+
+    def clear(self):
+        dict.clear(self)
+        self._changed.clear()
+        self._cleared = True
+
+    def _take_changes(self):
+        """Return the journal lines for the changes since the last call."""
+        lines = []
+        for key in self._changed:
+            self._sequence += 1
+            entry = {"s": self._sequence, "k": key}
+            if key in self:
+                entry["v"] = self[key]
+            lines.append(jsonapi.dumps(entry, separators=(',', ':')))
+        self._changed.clear()
+        return lines
+
+    def _take_snapshot(self):
+        self._changed.clear()
+        self._cleared = False
+        self._journal_entries = 0
+        self._has_file = bool(self)
+        contents = dict(self)
+        contents[_SEQUENCE_KEY] = self._sequence
+        return ("snapshot" if self else "clear"), jsonapi.dumps(contents, separators=(',', ':'))
+
+    def sync(self):
+        """ Write dict to disk and empty the journal """
+        if self.flag == 'r':
+            return
+        # Wait for the writer thread so it cannot append changes it took
+        # before this snapshot once the snapshot is written.
+        with self._file_lock:
+            with self._pending_lock:
+                self._pending = []
+                item = self._take_snapshot()
+            self._write(item)
+
+    def async_sync(self):
+        """Write the changes to disk via worker thread. Don't mix with sync if it can be helped"""
+        if self.flag == 'r':
+            return
+        with self._pending_lock:
+            lines = self._take_changes()
+            self._journal_entries += len(lines)
+            if self._cleared or not self._has_file or \
+                    self._journal_entries > max(self.compact_threshold, len(self)):
+                # A snapshot makes everything written before it obsolete.
+                self._pending = [self._take_snapshot()]
+            elif lines:
+                self._pending.append(("journal", "\n".join(lines) + "\n"))
+            else:
+                return
+            if self._queued:
+                return
+            self._queued = True
+        PersistentDict._event_queue.put(self._write_pending)
+
+    def _write_pending(self):
+        with self._file_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+                self._queued = False
+            for item in pending:
+                self._write(item)
+
+    def _write(self, item):
+        """Write a journal or snapshot item, the caller holds _file_lock."""
+        kind, contents = item
+        try:
+            if kind == "journal":
+                with open(self.journal_filename, 'a') as journal:
+                    journal.write(contents)
+                # Keep the modification time meaningful to readers of the file.
+                os.utime(self.filename)
+                return
+            if kind == "clear" and not os.path.exists(self.filename) and \
+                    not os.path.exists(self.journal_filename):
+                return
+            # An empty store is written too, so its sequence number outlives
+            # the journal if the files below are only partly removed.
+            tempname = self.filename + '.tmp'
+            with open(tempname, 'w') as fileobj:
+                fileobj.write(contents)
+            shutil.move(tempname, self.filename)  # atomic commit
+            if self.mode is not None:
+                os.chmod(self.filename, self.mode)
+            if os.path.exists(self.journal_filename):
+                os.remove(self.journal_filename)
+            if kind == "clear":
+                os.remove(self.filename)
+        except OSError as e:
+            _log.error("Unable to sync to file {}: {}".format(self.filename, e))
+
+
 if __name__ == '__main__':
     import random
 
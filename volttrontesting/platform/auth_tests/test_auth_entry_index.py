@@ -0,0 +1,38 @@
+import pytest
+
+from volttron.platform.auth.auth_entry import AuthEntry, AuthEntryIndex
+
+KEY = "A" * 43
+
+
+def make_entries():
+    return [AuthEntry(credentials=KEY, user_id="first"),
+            AuthEntry(credentials="/B.*/", user_id="pattern"),
+            AuthEntry(credentials="B" * 43, user_id="second"),
+            AuthEntry(mechanism="NULL", address="/192\\.168\\..*/", user_id="local"),
+            AuthEntry(credentials=KEY, user_id="duplicate")]
+
+
+@pytest.mark.auth
+def test_index_should_match_entries_in_list_order():
+    index = AuthEntryIndex(make_entries())
+
+    assert index.match("vip", "10.0.0.1", "CURVE", [KEY]).user_id == "first"
+    assert index.match("vip", "10.0.0.1", "CURVE", ["B" * 43]).user_id == "pattern"
+    assert index.match("vip", "192.168.1.2", "NULL", []).user_id == "local"
+    assert index.match("vip", "10.0.0.1", "NULL", []) is None
+    assert index.match("vip", "10.0.0.1", "CURVE", ["C" * 43]) is None
+
+
+@pytest.mark.auth
+def test_index_should_find_by_user_id_or_earlier_match():
+    index = AuthEntryIndex(make_entries())
+
+    entry, by_user_id = index.find("second")
+    assert (entry.user_id, by_user_id) == ("second", True)
+    assert index.find("missing") == (None, False)
+
+    entry, by_user_id = index.find("duplicate", ["vip", "10.0.0.1", "CURVE", KEY])
+    assert (entry.user_id, by_user_id) == ("first", False)
+    entry, by_user_id = index.find("first", ["vip", "10.0.0.1", "CURVE", KEY])
+    assert (entry.user_id, by_user_id) == ("first", True)
@@ -1,11 +1,12 @@
 import os
+import sqlite3
 import pytest
 from pathlib import Path
 from gevent import subprocess
 from datetime import datetime
 from pytz import UTC
 
-from volttron.platform.agent.base_historian import BackupDatabase, BaseHistorian
+from volttron.platform.agent.base_historian import BackupDatabase, BaseHistorian, BatchRecord
 
 SIZE_LIMIT = 1000  # the default submit_size_limit for BaseHistorianAgents
 
@@ -95,8 +96,8 @@ def test_remove_successfully_published_should_keep_duplicates_in_cache(
     assert len(get_all_data("outstanding")) == len(new_publish_list_dupes)
 
     expected_cache_after_update = [
-        "2|2020-06-01 12:30:59|dupesource|1|456|{}",
-        "3|2020-06-01 12:30:59|dupesource|1|789|{}",
+        "2|2020-06-01 12:30:59|dupesource|1|456||1",
+        "3|2020-06-01 12:30:59|dupesource|1|789||1",
     ]
 
     backup_database.get_outstanding_to_publish(SIZE_LIMIT)
@@ -183,6 +184,166 @@ def test_get_outstanding_to_publish_should_return_unique_records_on_multiple_tra
     assert backup_database.get_outstanding_to_publish(SIZE_LIMIT) == []
 
 
+def test_backup_new_data_should_cache_batch_records(backup_database):
+    timestamp = datetime(2020, 6, 1, 12, 31, tzinfo=UTC)
+    headers = {"Date": "2020-06-01T12:31:00+00:00"}
+    batch = BatchRecord("scrape", "campus/building/device", timestamp, headers,
+                        ["point0", "point1", "point2"],
+                        [0, 1.5, "on"],
+                        [{"units": "F"}, {}, {"type": "string"}])
+
+    backup_database.backup_new_data([batch, None])
+
+    assert backup_database._record_count == 3
+    actual_records = backup_database.get_outstanding_to_publish(SIZE_LIMIT)
+    assert actual_records == [
+        {"_id": 1, "headers": headers, "meta": {"units": "F"}, "source": "scrape",
+         "timestamp": timestamp, "topic": "campus/building/device/point0", "value": 0},
+        {"_id": 2, "headers": headers, "meta": {}, "source": "scrape",
+         "timestamp": timestamp, "topic": "campus/building/device/point1", "value": 1.5},
+        {"_id": 3, "headers": headers, "meta": {"type": "string"}, "source": "scrape",
+         "timestamp": timestamp, "topic": "campus/building/device/point2", "value": "on"},
+    ]
+
+
+def test_batch_record_from_records_should_regroup_scrapes(backup_database):
+    timestamp = datetime(2020, 6, 1, 12, 31, tzinfo=UTC)
+    batches = [BatchRecord("scrape", f"campus/building/device{idx}", timestamp, {},
+                           ["a", "b"], [idx, idx + 1], [{}, {}])
+               for idx in range(3)]
+    backup_database.backup_new_data(batches)
+
+    records = backup_database.get_outstanding_to_publish(SIZE_LIMIT)
+    regrouped = BatchRecord.from_records(records)
+
+    assert [batch.device for batch in regrouped] == [batch.device for batch in batches]
+    assert [batch.values for batch in regrouped] == [batch.values for batch in batches]
+    assert regrouped[1].ids == [3, 4]
+    assert regrouped[1].topics == ["campus/building/device1/a", "campus/building/device1/b"]
+    assert regrouped[1].to_records() == records[2:4]
+
+
+def test_backup_new_data_should_share_identical_headers(backup_database):
+    timestamp = datetime(2020, 6, 1, 12, 31, tzinfo=UTC)
+    batches = [BatchRecord("scrape", f"campus/building/device{idx}", timestamp,
+                           {"Date": "2020-06-01T12:31:00+00:00", "TimeStamp": "2020-06-01T12:31:00+00:00"},
+                           ["a", "b"], [idx, idx + 1], [{}, {}])
+               for idx in range(3)]
+    batches.append(BatchRecord("scrape", "campus/building/device3", timestamp,
+                               {"Date": "2020-06-01T12:32:00+00:00"}, ["a"], [0], [{}]))
+    backup_database.backup_new_data(batches)
+
+    assert len(get_all_data("headers")) == 2
+    records = backup_database.get_outstanding_to_publish(SIZE_LIMIT)
+    assert all(record["headers"] is records[0]["headers"] for record in records[:6])
+    assert records[6]["headers"] == {"Date": "2020-06-01T12:32:00+00:00"}
+
+    backup_database.remove_successfully_published({records[6]["_id"]}, SIZE_LIMIT)
+    assert len(get_all_data("headers")) == 1
+
+    backup_database.get_outstanding_to_publish(SIZE_LIMIT)
+    backup_database.remove_successfully_published({None}, SIZE_LIMIT)
+    assert get_all_data("headers") == []
+
+
+def test_get_outstanding_to_publish_should_read_rows_cached_before_header_interning():
+    os.makedirs(agent_data_dir, exist_ok=True)
+    connection = sqlite3.connect(cache_db)
+    connection.execute("""CREATE TABLE outstanding
+                          (id INTEGER PRIMARY KEY,
+                           ts timestamp NOT NULL,
+                           source TEXT NOT NULL,
+                           topic_id INTEGER NOT NULL,
+                           value_string TEXT NOT NULL,
+                           header_string TEXT)""")
+    connection.execute("""CREATE TABLE topics
+                          (topic_id INTEGER PRIMARY KEY,
+                           topic_name TEXT NOT NULL,
+                           UNIQUE(topic_name))""")
+    connection.execute("INSERT INTO topics VALUES (1, 'old/topic')")
+    connection.execute("""INSERT INTO outstanding
+                          VALUES (1, '2020-06-01 12:30:00', 'scrape', 1, '1', '{"Date": "old"}')""")
+    connection.commit()
+    connection.close()
+
+    backup_database = BackupDatabase(BaseHistorian(), None, 0.9)
+    try:
+        backup_database.backup_new_data([{"source": "scrape", "topic": "old/topic", "meta": {},
+                                          "readings": [("2020-06-01 12:31:00", 2)],
+                                          "headers": {"Date": "new"}}])
+        records = backup_database.get_outstanding_to_publish(SIZE_LIMIT)
+        assert [(record["value"], record["headers"]) for record in records] == [(1, {"Date": "old"}),
+                                                                               (2, {"Date": "new"})]
+    finally:
+        backup_database.close()
+        for path in (cache_db, cache_db + "-wal", cache_db + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def test_remove_successfully_published_should_delete_reported_id_ranges(
+    backup_database, new_publish_list_unique
+):
+    init_db(backup_database, new_publish_list_unique)
+    records = backup_database.get_outstanding_to_publish(SIZE_LIMIT)
+
+    published = set(record["_id"] for record in records[:10] + records[20:30] + records[-1:])
+    backup_database.remove_successfully_published(published, SIZE_LIMIT)
+
+    remaining = [int(row.split("|")[0]) for row in get_all_data("outstanding")]
+    assert remaining == list(range(11, 21)) + list(range(31, 1000))
+    assert backup_database._record_count == len(remaining)
+
+
+def test_get_outstanding_to_publish_should_read_ahead_from_offset(
+    backup_database, new_publish_list_unique
+):
+    init_db(backup_database, new_publish_list_unique)
+    first = backup_database.get_outstanding_to_publish(400)
+    second = backup_database.get_outstanding_to_publish(400, backup_database.last_read_count)
+
+    assert [record["_id"] for record in first + second] == list(range(1, 801))
+
+    removed = backup_database.remove_published([record["_id"] for record in first])
+    # The second batch is now at the head of the cache.
+    third = backup_database.get_outstanding_to_publish(400, 400)
+
+    assert removed == 400
+    assert [record["_id"] for record in third] == list(range(801, 1001))
+    assert backup_database.get_backlog_count() == 600
+
+
+def test_id_ranges_should_collapse_consecutive_ids():
+    assert BackupDatabase._id_ranges([]) == []
+    assert BackupDatabase._id_ranges({7, 1, 2, 3, 5, 6, 10}) == [[1, 3], [5, 7], [10, 10]]
+
+
+def test_backup_database_should_use_configured_journal_mode(backup_database):
+    assert query_db("PRAGMA journal_mode").strip() == "wal"
+
+    with pytest.raises(ValueError):
+        BackupDatabase(BaseHistorian(), None, 0.9, synchronous="SOMETIMES")
+
+
+def test_backup_new_data_should_enforce_storage_limit(new_publish_list_unique):
+    os.makedirs(agent_data_dir, exist_ok=True)
+    backup_database = BackupDatabase(BaseHistorian(), 0.001, 0.9, page_check_interval=100)
+    try:
+        for _ in range(20):
+            backup_database.backup_new_data(new_publish_list_unique)
+        backup_database._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        page_count = backup_database._connection.execute("PRAGMA page_count").fetchone()[0]
+        assert page_count <= backup_database.max_pages * 1.1
+        assert 0 < backup_database._record_count < 20 * len(new_publish_list_unique)
+        assert backup_database._record_count == len(get_all_data("outstanding"))
+    finally:
+        backup_database.close()
+        for path in (cache_db, cache_db + "-wal", cache_db + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
 def init_db_with_dupes(backup_database, new_publish_list_dupes):
     backup_database.backup_new_data(new_publish_list_dupes)
 
@@ -248,13 +409,18 @@ def new_publish_list_dupes():
 @pytest.fixture()
 def backup_database():
     os.makedirs(agent_data_dir, exist_ok=True)
-    yield BackupDatabase(BaseHistorian(), None, 0.9)
+    backup_database = BackupDatabase(BaseHistorian(), None, 0.9)
+    yield backup_database
 
     # Teardown
     # the backup database is an sqlite database with the name "backup.sqlite".
     # the db is created if it doesn't exist; see the method: BackupDatabase._setupdb(check_same_thread) for details
-    if os.path.exists(cache_db):
-        os.remove(cache_db)
+    # In WAL mode closing the last connection checkpoints and removes the -wal and -shm files.
+    if backup_database._connection is not None:
+        backup_database.close()
+    for path in (cache_db, cache_db + "-wal", cache_db + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
     if os.path.exists(agent_data_dir):
         os.rmdir(agent_data_dir)
 
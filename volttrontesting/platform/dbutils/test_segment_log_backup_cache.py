@@ -0,0 +1,203 @@
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from pytz import UTC
+
+from volttron.platform.agent.base_historian import BaseHistorian, BatchRecord, SegmentLogBackupCache
+
+SIZE_LIMIT = 1000  # the default submit_size_limit for BaseHistorianAgents
+
+agent_data_dir = os.path.join(os.getcwd(), os.path.basename(os.getcwd()) + ".agent-data")
+segment_dir = Path(agent_data_dir).joinpath("backup_segments")
+TIMESTAMP = datetime(2020, 6, 1, 12, 31, tzinfo=UTC)
+
+
+def test_get_outstanding_to_publish_should_return_records(segment_cache, new_publish_list_unique):
+    segment_cache.backup_new_data(new_publish_list_unique)
+
+    actual_records = segment_cache.get_outstanding_to_publish(SIZE_LIMIT)
+
+    assert actual_records == [
+        {
+            "_id": idx + 1,
+            "headers": {},
+            "meta": {},
+            "source": "foobar_source",
+            "timestamp": TIMESTAMP,
+            "topic": f"foobar_topic{idx}",
+            "value": idx,
+        }
+        for idx in range(1000)
+    ]
+    assert segment_cache.get_backlog_count() == 1000
+
+
+def test_backup_new_data_should_round_trip_batch_values(segment_cache):
+    headers = {"Date": "2020-06-01T12:31:00+00:00"}
+    values = [1.5, -3, "on", True, None, {"nested": [1, 2]}, 2 ** 70]
+    points = [f"point{idx}" for idx in range(len(values))]
+    meta = [{"units": "F"}] + [{}] * (len(values) - 1)
+    segment_cache.backup_new_data([BatchRecord("scrape", "campus/building/device", TIMESTAMP,
+                                               headers, points, values, meta)])
+
+    records = segment_cache.get_outstanding_to_publish(SIZE_LIMIT)
+
+    assert [record["value"] for record in records] == values
+    assert records[0]["meta"] == {"units": "F"}
+    assert records[3]["topic"] == "campus/building/device/point3"
+    assert all(record["headers"] == headers for record in records)
+
+
+def test_get_outstanding_to_publish_should_return_unique_records_on_multiple_trans(segment_cache):
+    dupes = [{"source": "dupesource", "topic": "dupetopic", "meta": {},
+              "readings": [("2020-06-01 12:30:59", value)], "headers": {}}
+             for value in (123, 456, 789)]
+    segment_cache.backup_new_data(dupes)
+
+    for expected in (123, 456, 789):
+        records = segment_cache.get_outstanding_to_publish(SIZE_LIMIT)
+        assert [record["value"] for record in records] == [expected]
+        segment_cache.remove_successfully_published({None}, SIZE_LIMIT)
+
+    assert segment_cache.get_outstanding_to_publish(SIZE_LIMIT) == []
+    assert segment_cache.get_backlog_count() == 0
+
+
+def test_get_outstanding_to_publish_should_read_ahead_from_offset(segment_cache, new_publish_list_unique):
+    segment_cache.backup_new_data(new_publish_list_unique)
+    first = segment_cache.get_outstanding_to_publish(400)
+    second = segment_cache.get_outstanding_to_publish(400, 400)
+
+    assert [record["_id"] for record in first + second] == list(range(1, 801))
+
+    # Acknowledge out of order; the skipped records are still outstanding.
+    removed = segment_cache.remove_published([record["_id"] for record in second])
+    third = segment_cache.get_outstanding_to_publish(400, 200)
+
+    assert removed == 400
+    assert [record["_id"] for record in third] == list(range(201, 401)) + list(range(801, 1001))
+    assert segment_cache.get_backlog_count() == 600
+
+
+def test_remove_successfully_published_should_survive_restart(new_publish_list_unique):
+    owner = BaseHistorian()
+    cache = SegmentLogBackupCache(owner, None, 0.9)
+    cache.backup_new_data(new_publish_list_unique)
+    records = cache.get_outstanding_to_publish(100)
+    cache.remove_successfully_published({None}, 100)
+    # Acknowledge a record past the water mark as well.
+    cache.get_outstanding_to_publish(100)
+    cache.remove_successfully_published({150}, 100)
+    cache.close()
+
+    cache = SegmentLogBackupCache(owner, None, 0.9)
+    try:
+        records = cache.get_outstanding_to_publish(SIZE_LIMIT)
+        # Acknowledgements above the water mark are only kept in memory so
+        # record 150 is published a second time.
+        assert [record["_id"] for record in records] == list(range(101, 1001))
+        assert records[0]["topic"] == "foobar_topic100"
+        assert cache.get_backlog_count() == 900
+    finally:
+        cache.close()
+
+
+def test_setup_should_truncate_incomplete_frame(new_publish_list_unique):
+    owner = BaseHistorian()
+    cache = SegmentLogBackupCache(owner, None, 0.9)
+    cache.backup_new_data(new_publish_list_unique[:10])
+    cache.close()
+
+    segment = next(path for path in segment_dir.iterdir() if path.suffix == ".seg")
+    size = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00partial")
+
+    cache = SegmentLogBackupCache(owner, None, 0.9)
+    try:
+        assert segment.stat().st_size == size
+        assert len(cache.get_outstanding_to_publish(SIZE_LIMIT)) == 10
+        cache.backup_new_data(new_publish_list_unique[10:20])
+        assert [record["_id"] for record in cache.get_outstanding_to_publish(SIZE_LIMIT)] == list(range(1, 21))
+    finally:
+        cache.close()
+
+
+def test_remove_successfully_published_should_delete_acknowledged_segments(new_publish_list_unique):
+    cache = SegmentLogBackupCache(BaseHistorian(), None, 0.9, segment_size=1024)
+    try:
+        cache.backup_new_data(new_publish_list_unique)
+        segments = sorted(path.name for path in segment_dir.iterdir() if path.suffix == ".seg")
+        assert len(segments) > 2
+
+        while cache.get_outstanding_to_publish(100):
+            cache.remove_successfully_published({None}, 100)
+
+        remaining = sorted(path.name for path in segment_dir.iterdir() if path.suffix == ".seg")
+        assert len(remaining) <= 1
+        assert cache.get_backlog_count() == 0
+    finally:
+        cache.close()
+
+
+def test_backup_new_data_should_drop_oldest_segments_over_limit(new_publish_list_unique):
+    cache = SegmentLogBackupCache(BaseHistorian(), 0.0001, 0.9)
+    try:
+        cache_full = False
+        for _ in range(20):
+            cache_full = cache.backup_new_data(new_publish_list_unique) or cache_full
+
+        assert cache_full
+        total_size = sum(path.stat().st_size for path in segment_dir.iterdir() if path.suffix == ".seg")
+        assert total_size <= 0.0001 * 1024 ** 3
+        records = cache.get_outstanding_to_publish(SIZE_LIMIT)
+        assert records[0]["_id"] > 1
+        assert 0 < cache.get_backlog_count() < 20000
+    finally:
+        cache.close()
+
+
+def test_backup_new_data_should_drop_time_errors_before_segments(new_publish_list_unique):
+    limit_gb = 0.0001
+    time_errors = [dict(record, headers={"time_error": True}) for record in new_publish_list_unique]
+    cache = SegmentLogBackupCache(BaseHistorian(), limit_gb, 0.9)
+    try:
+        cache.backup_new_data(new_publish_list_unique[:100])
+        for _ in range(10):
+            cache.backup_new_data(time_errors, time_tolerance_check=True)
+
+        total_size = sum(path.stat().st_size for path in segment_dir.iterdir())
+        assert total_size <= limit_gb * 1024 ** 3
+        assert 0 < segment_dir.joinpath("time_error.log").stat().st_size
+        assert cache.time_error_records
+        records = cache.get_outstanding_to_publish(SIZE_LIMIT)
+        assert [record["_id"] for record in records] == list(range(1, 101))
+    finally:
+        cache.close()
+
+
+@pytest.fixture(scope="module")
+def new_publish_list_unique():
+    return tuple({"source": "foobar_source",
+                  "topic": f"foobar_topic{idx}",
+                  "meta": {},
+                  "readings": [("2020-06-01 12:31:00", idx)],
+                  "headers": {}}
+                 for idx in range(1000))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir():
+    os.makedirs(agent_data_dir, exist_ok=True)
+    yield
+    shutil.rmtree(agent_data_dir, ignore_errors=True)
+
+
+@pytest.fixture()
+def segment_cache():
+    cache = SegmentLogBackupCache(BaseHistorian(), None, 0.9)
+    yield cache
+    cache.close()
@@ -1,7 +1,9 @@
 import sqlite3
+from datetime import datetime
 
 from gevent import subprocess
 import pytest
+import pytz
 import os
 
 from setuptools import glob
@@ -77,6 +79,29 @@ def test_query(get_sqlitefuncts, topic_ids, id_name_map, expected_values):
     assert actual_results == expected_values
 
 
+@pytest.mark.sqlitefuncts
+@pytest.mark.dbutils
+@pytest.mark.parametrize("sqlite_version", [sqlite3.sqlite_version_info, (3, 24, 0)])
+def test_query_should_page_each_topic(get_sqlitefuncts, monkeypatch, sqlite_version):
+    sqlitefuncts, historain_version = get_sqlitefuncts
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", sqlite_version)
+    query = (
+        "INSERT OR REPLACE INTO data VALUES('2020-06-01 12:30:57',42,'1');"
+        "INSERT OR REPLACE INTO data VALUES('2020-06-01 12:30:58',42,'2');"
+        "INSERT OR REPLACE INTO data VALUES('2020-06-01 12:30:59',42,'3');"
+        "INSERT OR REPLACE INTO data VALUES('2020-06-01 12:30:58',43,'4');"
+        "INSERT OR REPLACE INTO data VALUES('2020-06-01 12:30:59',43,'5')"
+    )
+    query_db(query)
+
+    actual_results = sqlitefuncts.query([42, 43, 44], {42: "topic42", 43: "topic43", 44: "topic44"},
+                                        skip=1, count=1, order="LAST_TO_FIRST")
+
+    assert actual_results == {"topic42": [("2020-06-01T12:30:58.000000", 2)],
+                              "topic43": [("2020-06-01T12:30:58.000000", 4)],
+                              "topic44": []}
+
+
 @pytest.mark.sqlitefuncts
 @pytest.mark.dbutils
 @pytest.mark.parametrize(
@@ -106,6 +131,20 @@ def test_manage_db_size(get_sqlitefuncts, history_limit_timestamp, storage_limit
     assert get_all_data(DATA_TABLE) == expected_data
 
 
+@pytest.mark.sqlitefuncts
+@pytest.mark.dbutils
+def test_manage_db_size_should_delete_in_chunks(get_sqlitefuncts):
+    sqlitefuncts, historain_version = get_sqlitefuncts
+    sqlitefuncts.retention_chunk_size = 10
+    query_db("; ".join(f"INSERT OR REPLACE INTO data VALUES('2000-06-01 12:{minute:02}:00',42,'[2,3]')"
+                       for minute in range(25)))
+
+    removed = sqlitefuncts.manage_db_size("2000-06-01 12:21:00", None)
+
+    assert removed == 21
+    assert get_all_data(DATA_TABLE) == [f"2000-06-01 12:{minute:02}:00|42|[2,3]" for minute in range(21, 25)]
+
+
 @pytest.mark.sqlitefuncts
 @pytest.mark.dbutils
 def test_insert_meta(get_sqlitefuncts):
@@ -423,6 +462,70 @@ def get_indexes(table):
     return res.splitlines()
 
 
+@pytest.mark.sqlitefuncts
+@pytest.mark.dbutils
+def test_insert_data_should_route_to_partitions(partitioned_sqlitefuncts):
+    for ts in ("2020-06-01 23:59:59", "2020-06-02 00:00:00", "2020-06-03 12:00:00"):
+        assert partitioned_sqlitefuncts.insert_data(ts, 42, ts[:10])
+    partitioned_sqlitefuncts.commit()
+
+    assert {"data_p20200601", "data_p20200602", "data_p20200603"} <= get_tables()
+    assert get_all_data("data") == []
+    assert get_all_data("data_p20200602") == ['2020-06-02 00:00:00|42|"2020-06-02"']
+
+
+@pytest.mark.sqlitefuncts
+@pytest.mark.dbutils
+def test_query_should_read_across_partitions(partitioned_sqlitefuncts):
+    for day in range(1, 5):
+        partitioned_sqlitefuncts.insert_data(datetime(2020, 6, day, 12, tzinfo=pytz.UTC), 42, day)
+    partitioned_sqlitefuncts.commit()
+
+    actual_results = partitioned_sqlitefuncts.query([42], {42: "topic42"},
+                                                    start=datetime(2020, 6, 2, tzinfo=pytz.UTC),
+                                                    end=datetime(2020, 6, 4, 12, tzinfo=pytz.UTC))
+    last = partitioned_sqlitefuncts.query([42], {42: "topic42"}, count=1, order="LAST_TO_FIRST")
+
+    assert actual_results == {"topic42": [("2020-06-02T12:00:00.000000+00:00", 2),
+                                          ("2020-06-03T12:00:00.000000+00:00", 3)]}
+    assert last == {"topic42": [("2020-06-04T12:00:00.000000+00:00", 4)]}
+    assert partitioned_sqlitefuncts.collect_aggregate([42], "SUM") == (10, 4)
+
+
+@pytest.mark.sqlitefuncts
+@pytest.mark.dbutils
+@pytest.mark.parametrize("sqlite_version", [sqlite3.sqlite_version_info, (3, 24, 0)])
+def test_query_should_page_each_topic_across_partitions(partitioned_sqlitefuncts, monkeypatch, sqlite_version):
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", sqlite_version)
+    for day in range(1, 5):
+        partitioned_sqlitefuncts.insert_data(datetime(2020, 6, day, 12, tzinfo=pytz.UTC), 42, day)
+        partitioned_sqlitefuncts.insert_data(datetime(2020, 6, day, 12, tzinfo=pytz.UTC), 43, day * 10)
+    partitioned_sqlitefuncts.commit()
+
+    actual_results = partitioned_sqlitefuncts.query([42, 43], {42: "topic42", 43: "topic43"},
+                                                    start=datetime(2020, 6, 2, tzinfo=pytz.UTC),
+                                                    skip=1, count=1, order="LAST_TO_FIRST")
+
+    assert actual_results == {"topic42": [("2020-06-03T12:00:00.000000+00:00", 3)],
+                              "topic43": [("2020-06-03T12:00:00.000000+00:00", 30)]}
+
+
+@pytest.mark.sqlitefuncts
+@pytest.mark.dbutils
+def test_manage_db_size_should_drop_old_partitions(partitioned_sqlitefuncts):
+    for day in range(1, 5):
+        for hour in (6, 18):
+            partitioned_sqlitefuncts.insert_data(datetime(2020, 6, day, hour, tzinfo=pytz.UTC), 42, day)
+    partitioned_sqlitefuncts.commit()
+
+    removed = partitioned_sqlitefuncts.manage_db_size(datetime(2020, 6, 3, 12, tzinfo=pytz.UTC), None)
+
+    assert removed == 5
+    assert "data_p20200601" not in get_tables()
+    assert "data_p20200602" not in get_tables()
+    assert get_all_data("data_p20200603") == ["2020-06-03T18:00:00.000000+00:00|42|3"]
+
+
 def get_tables():
     result = query_db(""".tables""")
     res = set(result.replace("\n", "").split())
@@ -460,6 +563,7 @@ def sqlitefuncts_db_not_initialized():
     yield client
 
     # Teardown
+    client.close()
     if os.path.isdir("./data"):
         files = glob.glob("./data/*", recursive=True)
         for f in files:
@@ -508,5 +612,20 @@ def init_database(sqlitefuncts_client, historian_version):
         sqlitefuncts_client.setup_aggregate_historian_tables()
 
 
+@pytest.fixture()
+def partitioned_sqlitefuncts(sqlitefuncts_db_not_initialized):
+    table_names = {
+        "data_table": DATA_TABLE,
+        "topics_table": TOPICS_TABLE,
+        "meta_table": META_TABLE,
+        "agg_topics_table": AGG_TOPICS_TABLE,
+        "agg_meta_table": AGG_META_TABLE,
+    }
+    client = SqlLiteFuncts(dict(CONNECT_PARAMS, partition_interval="day"), table_names)
+    client.setup_historian_tables()
+    yield client
+    client.close()
+
+
 def init_historian_tables(sqlitefuncts_client):
     sqlitefuncts_client.setup_historian_tables()
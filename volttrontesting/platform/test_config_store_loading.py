@@ -0,0 +1,124 @@
+import json
+import os
+
+import pytest
+from mock import MagicMock
+
+from volttron.platform.store import ConfigStoreService, ParsedConfigCache
+from volttron.utils.persistance import PersistentDict
+
+
+def write_store(volttron_home, identity, configs):
+    store = {name: {"type": config_type, "data": data, "modified": None}
+             for name, (data, config_type) in configs.items()}
+    with open(os.path.join(volttron_home, "configuration_store", identity + ".store"), "w") as store_file:
+        json.dump(store, store_file)
+
+
+@pytest.fixture
+def config_store(tmpdir, monkeypatch):
+    volttron_home = str(tmpdir)
+    os.mkdir(os.path.join(volttron_home, "configuration_store"))
+    monkeypatch.setenv("VOLTTRON_HOME", volttron_home)
+    # Keep store writes out of the file writer thread.
+    monkeypatch.setattr(PersistentDict, "_process_thread", object())
+    monkeypatch.setattr(PersistentDict, "_event_queue", MagicMock())
+    write_store(volttron_home, "platform.driver", {
+        "config": ('{"driver_scrape_interval": 0.05}', "json"),
+        "registry.csv": ("Point Name,Units\nTemp,F\n", "csv"),
+        "devices/a": ('{"registry_config": "config://registry.csv"}', "json"),
+        "broken": ("[", "json"),
+    })
+    write_store(volttron_home, "other", {"config": ("raw value", "raw")})
+
+    def make_service(max_parsed_configs=1000):
+        service = ConfigStoreService(identity="config.store", enable_auth=False,
+                                     max_parsed_configs=max_parsed_configs)
+        service._setup(None)
+        service.vip = MagicMock()
+        service.vip.peerlist.peers_list = []
+        return service
+
+    return make_service
+
+
+@pytest.mark.config_store
+def test_stores_should_load_on_first_use(config_store):
+    service = config_store()
+
+    assert service.store == {}
+    assert service.manage_list_stores() == ["other", "platform.driver"]
+
+    assert service.manage_get("other", "config") == "raw value"
+    assert list(service.store) == ["other"]
+    assert service.manage_list_configs("platform.driver") == ["broken", "config", "devices/a", "registry.csv"]
+    assert service._get_store_metrics()["loaded_stores"] == 2
+
+
+@pytest.mark.config_store
+def test_configs_should_be_parsed_on_first_get(config_store):
+    service = config_store(max_parsed_configs=1)
+
+    assert service.manage_get("platform.driver", "registry.csv", raw=False) == [{"Point Name": "Temp", "Units": "F"}]
+    assert service.manage_get("platform.driver", "registry.csv", raw=False) == [{"Point Name": "Temp", "Units": "F"}]
+    assert service.manage_get("platform.driver", "config", raw=False) == {"driver_scrape_interval": 0.05}
+
+    assert service.parsed_configs.get_metrics() == {"size": 1, "max_size": 1, "hits": 1, "misses": 2}
+    with pytest.raises(KeyError):
+        service.manage_get("platform.driver", "broken", raw=False)
+    assert service.manage_get("platform.driver", "broken") == "["
+    assert sorted(service.store["platform.driver"]["configs"].parse_all()) == ["config", "devices/a",
+                                                                                "registry.csv"]
+
+
+@pytest.mark.config_store
+def test_store_many_should_check_lazily_loaded_configs(config_store):
+    service = config_store()
+
+    with pytest.raises(ValueError):
+        service.manage_store_many("platform.driver", [["registry.csv", '{"a": "config://devices/a"}', "json"],
+                                                      ["devices/b", '{"b": 1}', "json"]])
+    assert service.manage_list_configs("platform.driver") == ["broken", "config", "devices/a", "registry.csv"]
+
+    service.vip.peerlist.peers_list = ["platform.driver"]
+    service.manage_store_many("platform.driver", [["devices/b", '{"registry_config": "config://devices/c"}', "json"],
+                                                  ["devices/c", "c"]])
+
+    assert service.manage_get("platform.driver", "devices/c", raw=False) == "c"
+    service.vip.rpc.call.assert_called_once_with(
+        "platform.driver", "config.update_many",
+        [("NEW", "devices/b", {"registry_config": "config://devices/c"}), ("NEW", "devices/c", "c")],
+        trigger_callback=True)
+
+
+@pytest.mark.config_store
+def test_parsed_config_cache_should_evict_least_recently_used():
+    cache = ParsedConfigCache(max_size=2)
+    cache.put(("a", "1"), 1)
+    cache.put(("a", "2"), 2)
+    cache.get(("a", "1"))
+    cache.put(("b", "1"), 3)
+
+    assert ("a", "2") not in cache._entries
+    assert cache.get(("a", "1")) == 1
+    cache.discard_identity("a")
+    assert cache.get_metrics()["size"] == 1
+
+
+@pytest.mark.config_store
+def test_store_changes_should_be_published(config_store):
+    service = config_store()
+    service.store_config("platform.driver", "devices/b", {"registry_config": "config://registry.csv"})
+    assert not service.vip.pubsub.publish.called
+
+    service._publish_changes = True
+    service.store_config("platform.driver", "devices/b", {"registry_config": "config://registry.csv"})
+    service.store_config("platform.driver", "devices/c", {"registry_config": "config://registry.csv"})
+    service.delete("platform.driver", "Devices/A")
+    service.manage_delete_store("other")
+
+    topics = [call[0][1] for call in service.vip.pubsub.publish.call_args_list]
+    assert topics == ["config/update/platform.driver/devices/b", "config/add/platform.driver/devices/c",
+                      "config/remove/platform.driver/devices/a", "config/remove/other"]
+    assert service.vip.pubsub.publish.call_args[1]["message"] == {"action": "DELETE_ALL", "identity": "other",
+                                                                  "config_name": ""}
@@ -0,0 +1,59 @@
+import pytest
+import zmq
+
+from volttron.platform.vip.router import BaseRouter
+
+ADDRESS = "inproc://test-router"
+
+
+class InprocRouter(BaseRouter):
+
+    def setup(self):
+        self.socket.identity = b"router"
+        self.socket.bind(ADDRESS)
+
+
+@pytest.fixture
+def router():
+    context = zmq.Context()
+    router = InprocRouter(context=context, service_notifier=None)
+    router.start()
+    peers = []
+
+    def connect(identity):
+        sock = context.socket(zmq.DEALER)
+        sock.identity = identity
+        sock.connect(ADDRESS)
+        sock.send_multipart([b"", b"VIP1", b"", b"", b"hello"])
+        router.route(router.socket.recv_multipart(copy=False))
+        assert sock.recv_multipart()[5] == b"welcome"
+        peers.append(sock)
+        return sock
+
+    yield router, connect
+    for sock in peers:
+        sock.close(0)
+    router.stop(0)
+    context.term()
+
+
+def test_route_should_forward_payload_frames_unchanged(router):
+    router, connect = router
+    sender = connect(b"sender")
+    receiver = connect(b"receiver")
+    payload = [b'{"jsonrpc": "2.0", "id": "12.5"}', b"\xff\x00not json", b"42"]
+
+    sender.send_multipart([b"receiver", b"VIP1", b"", b"7", b"RPC"] + payload)
+    router.route(router.socket.recv_multipart(copy=False))
+
+    assert receiver.recv_multipart() == [b"sender", b"VIP1", b"sender", b"7", b"RPC"] + payload
+
+
+def test_route_should_answer_router_requests(router):
+    router, connect = router
+    sender = connect(b"sender")
+
+    sender.send_multipart([b"", b"VIP1", b"", b"3.5", b"ping", b"hi"])
+    router.route(router.socket.recv_multipart(copy=False))
+
+    assert sender.recv_multipart() == [b"", b"VIP1", b"sender", b"3.5", b"ping", b"pong"]
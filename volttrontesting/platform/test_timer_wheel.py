@@ -0,0 +1,130 @@
+import time
+
+import gevent
+import pytest
+
+from volttron.platform.scheduling import periodic
+from volttron.platform.vip.agent.core import BasicCore, TimerWheel
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_return_callbacks_in_deadline_order():
+    wheel = TimerWheel(100.0, resolution=0.01, slots=8, levels=3)
+    wheel.add(100.5, "c")
+    wheel.add(100.05, "a")
+    wheel.add(100.3, "b")
+
+    assert wheel.advance(100.04) == []
+    assert wheel.advance(100.4) == ["a", "b"]
+    assert wheel.advance(101.0) == ["c"]
+    assert len(wheel) == 0
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_share_entry_for_same_tick():
+    wheel = TimerWheel(100.0)
+    wheel.add(100.5, "a")
+    wheel.add(100.5, "b")
+
+    assert len(wheel._buckets) == 1
+    assert wheel.advance(100.5) == ["a", "b"]
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_remove_cancelled_timers():
+    wheel = TimerWheel(100.0)
+    first = wheel.add(100.5, "a")
+    second = wheel.add(100.5, "b")
+
+    wheel.cancel(first)
+    assert len(wheel) == 1
+    wheel.cancel(second)
+    wheel.cancel(second)
+    assert len(wheel) == 0
+    assert wheel.next_expiry() is None
+    assert wheel.advance(101.0) == []
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_cascade_higher_levels():
+    wheel = TimerWheel(0.0, resolution=1, slots=4, levels=3)
+    deadlines = [3, 4, 7, 15, 16, 33, 63, 200]
+    for deadline in deadlines:
+        wheel.add(deadline, deadline)
+
+    fired = []
+    for now in range(1, 201):
+        due = wheel.advance(now)
+        assert all(deadline == now for deadline in due)
+        fired.extend(due)
+    assert fired == deadlines
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_fire_past_deadlines_on_next_tick():
+    wheel = TimerWheel(100.0)
+    wheel.add(50.0, "late")
+
+    assert wheel.next_expiry() == pytest.approx(100.01)
+    assert wheel.advance(100.01) == ["late"]
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_report_next_expiry():
+    wheel = TimerWheel(0.0, resolution=1, slots=4, levels=3)
+    wheel.add(2, "a")
+    assert wheel.next_expiry() == 2
+    wheel.advance(2)
+    wheel.add(10, "b")
+    # The next cascade happens before b is due.
+    assert wheel.next_expiry() == 4
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_jump_over_large_clock_steps():
+    day = 86400.0
+    wheel = TimerWheel(0.0)
+    for deadline in (5.0, 0.5 * day, day + 1, 365 * day):
+        wheel.add(deadline, deadline)
+
+    begin = time.perf_counter()
+    assert wheel.advance(day) == [5.0, 0.5 * day]
+    assert wheel.advance(day + 1) == [day + 1]
+    assert wheel.advance(400 * day) == [365 * day]
+    assert time.perf_counter() - begin < 0.5
+    assert len(wheel) == 0
+
+
+@pytest.mark.agent
+def test_timer_wheel_should_follow_clock_set_back():
+    wheel = TimerWheel(1000.0)
+    wheel.add(1005.0, "a")
+    wheel.add(505.0, "b", now=500.0)
+
+    assert 500.0 < wheel.next_expiry() <= 505.0
+    assert wheel.advance(505.0) == ["b"]
+    assert wheel.advance(1004.0) == []
+    assert wheel.advance(1005.0) == ["a"]
+
+
+@pytest.mark.agent
+def test_core_schedule_should_drop_cancelled_events():
+    core = BasicCore(object())
+    greenlet = gevent.spawn(core.run)
+    gevent.sleep(0.01)
+    try:
+        calls = []
+        core.schedule(time.time() + 0.05, calls.append, "once")
+        cancelled = core.schedule(time.time() + 0.05, calls.append, "cancelled")
+        repeating = core.schedule(periodic(0.02), calls.append, "periodic")
+        cancelled.cancel()
+        gevent.sleep(0.15)
+        repeating.cancel()
+
+        assert "once" in calls
+        assert "cancelled" not in calls
+        assert calls.count("periodic") >= 3
+        assert len(core._schedule) == 0
+    finally:
+        core.stop()
+        greenlet.join(1)
@@ -287,6 +287,30 @@ def test_from_store():
                for n in t.get_matches('Campus/-/Fake1'))
 
 
+def test_update_from_store():
+    t = DeviceTree.from_store('my_instance_name', _mock_rpc_caller)
+    store = {'devices/Campus/Building1/Fake1', 'devices/Campus/Building2/Fake1', 'devices/Campus/Building4/Fake2'}
+
+    def rpc_caller(peer, method, agent, file_name=None, raw=False, external_platform=None):
+        if method == 'manage_list_configs':
+            return sorted(store) + ['registry_configs/fake.csv']
+        return _mock_rpc_caller(peer, method, agent, file_name, raw, external_platform)
+    rpc_caller.__repr__ = lambda: 'VUIEndpoints'
+
+    t.update_from_store('my_instance_name', rpc_caller, {'devices/Campus/Building3/Fake1',
+                                                         'devices/Campus/Building4/Fake2'})
+    assert [n.identifier for n in t.devices()] == ['devices/Campus/Building1/Fake1', 'devices/Campus/Building2/Fake1',
+                                                   'devices/Campus/Building4/Fake2']
+    assert not t.contains('devices/Campus/Building3')
+    assert t['devices/Campus/Building4/Fake2'].is_device()
+    assert len(t.points('devices/Campus/Building4')) == 2
+
+    t['devices/Campus/Building1/Fake1/SampleBool1'].data = None
+    t.update_from_store('my_instance_name', rpc_caller, {'registry_configs/fake.csv'})
+    assert t['devices/Campus/Building1/Fake1/SampleBool1'].data['Writable'] == 'FALSE'
+    assert len(t) == 14
+
+
 @pytest.mark.parametrize(
     'nid, expected',
     [
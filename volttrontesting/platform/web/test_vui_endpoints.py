@@ -5,6 +5,7 @@ from unittest.mock import MagicMock
 import re
 import json
 import pickle
+from gevent.timeout import Timeout
 from werkzeug import Response
 
 mock.patch('volttron.platform.web.vui_endpoints.endpoint', lambda x: x).start()
@@ -849,6 +850,82 @@ DEVICE_TOPIC_LIST = ['Campus/Building1/Fake1/SampleWritableFloat1', 'Campus/Buil
                      'Campus/Building3/Fake1/SampleWritableFloat1', 'Campus/Building3/Fake1/SampleBool1']
 
 
+def test_handle_platforms_devices_caches_device_tree(mock_platform_web_service):
+    with mock.patch('volttron.platform.web.vui_endpoints.DeviceTree.from_store',
+                    return_value=pickle.loads(DEV_TREE)) as from_store:
+        vui_endpoints = VUIEndpoints(mock_platform_web_service)
+        vui_endpoints._rpc = _mock_devices_rpc
+        path = '/vui/platforms/my_instance_name/devices/Campus'
+        response = vui_endpoints.handle_platforms_devices(
+            get_test_web_env(path, method='GET', HTTP_AUTHORIZATION='BEARER foo'), {})
+        etag = response.get_etag()[0]
+        assert response.status_code == 200 and etag
+
+        response = vui_endpoints.handle_platforms_devices(
+            get_test_web_env(path, method='GET', HTTP_AUTHORIZATION='BEARER foo', HTTP_IF_NONE_MATCH=f'"{etag}"'), {})
+        assert response.status_code == 304
+        assert from_store.call_count == 1
+
+        # A change to the platform driver configurations updates the cached tree and the ETag.
+        vui_endpoints._on_driver_config_change('pubsub', 'config.store', None,
+                                               'config/update/platform.driver/devices/Campus/Building1/Fake1', {},
+                                               {'action': 'UPDATE', 'identity': 'platform.driver',
+                                                'config_name': 'devices/Campus/Building1/Fake1'})
+        with mock.patch('volttron.platform.web.topic_tree.DeviceTree.update_from_store') as update_from_store:
+            response = vui_endpoints.handle_platforms_devices(
+                get_test_web_env(path, method='GET', HTTP_AUTHORIZATION='BEARER foo', HTTP_IF_NONE_MATCH=f'"{etag}"'),
+                {})
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+        update_from_store.assert_called_once_with('my_instance_name', vui_endpoints._rpc,
+                                                  {'devices/Campus/Building1/Fake1'})
+        assert from_store.call_count == 1
+
+
+def test_handle_platforms_devices_rebuilds_device_tree_after_failed_update(mock_platform_web_service):
+    updated_tree = pickle.loads(DEV_TREE)
+    updated_tree.remove_node('devices/Campus/Building1')
+    with mock.patch('volttron.platform.web.vui_endpoints.DeviceTree.from_store',
+                    side_effect=[pickle.loads(DEV_TREE), updated_tree]) as from_store:
+        vui_endpoints = VUIEndpoints(mock_platform_web_service)
+        vui_endpoints._rpc = _mock_devices_rpc
+        path = '/vui/platforms/my_instance_name/devices/Campus'
+        response = vui_endpoints.handle_platforms_devices(
+            get_test_web_env(path, method='GET', HTTP_AUTHORIZATION='BEARER foo'), {})
+        etag = response.get_etag()[0]
+        assert 'Building1' in json.loads(response.response[0])['links']
+
+        vui_endpoints._on_driver_config_change('pubsub', 'config.store', None,
+                                               'config/remove/platform.driver/devices/Campus/Building1/Fake1', {},
+                                               {'action': 'DELETE', 'identity': 'platform.driver',
+                                                'config_name': 'devices/Campus/Building1/Fake1'})
+        with mock.patch('volttron.platform.web.topic_tree.DeviceTree.update_from_store',
+                        side_effect=Timeout()):
+            response = vui_endpoints.handle_platforms_devices(
+                get_test_web_env(path, method='GET', HTTP_AUTHORIZATION='BEARER foo'), {})
+        assert response.status_code == 504
+
+        response = vui_endpoints.handle_platforms_devices(
+            get_test_web_env(path, method='GET', HTTP_AUTHORIZATION='BEARER foo', HTTP_IF_NONE_MATCH=f'"{etag}"'), {})
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+        assert 'Building1' not in json.loads(response.response[0])['links']
+        assert from_store.call_count == 2
+
+
+def test_handle_platforms_devices_omits_etag_with_values(mock_platform_web_service):
+    with mock.patch('volttron.platform.web.vui_endpoints.DeviceTree.from_store', return_value=pickle.loads(DEV_TREE)):
+        vui_endpoints = VUIEndpoints(mock_platform_web_service)
+        vui_endpoints._rpc = _mock_devices_rpc
+        path = '/vui/platforms/my_instance_name/devices/Campus/Building1/Fake1/SampleBool1'
+        response = vui_endpoints.handle_platforms_devices(
+            get_test_web_env(path, method='GET', HTTP_AUTHORIZATION='BEARER foo'), {})
+        assert response.get_etag() == (None, None)
+        response = vui_endpoints.handle_platforms_devices(
+            get_test_web_env(path, query_string='values=false', method='GET', HTTP_AUTHORIZATION='BEARER foo'), {})
+        assert response.get_etag()[0]
+
+
 # TODO: Test with tag query parameters.
 @pytest.mark.parametrize('topic, is_point, read_all, return_routes, return_writability, return_values, return_config', [
     ('', False, False, True, True, True, False),
@@ -0,0 +1,107 @@
+import pytest
+
+from volttron.platform.agent import base_tagging
+from volttron.platform.agent.base_tagging import BaseTaggingService, normalize_query
+
+
+class _TaggingService(BaseTaggingService):
+    """Answers queries with the pretty printed condition and records the backend queries built."""
+
+    def __init__(self, **kwargs):
+        super(_TaggingService, self).__init__(**kwargs)
+        self.valid_tags = {'equip': 'Marker', 'boiler': 'Marker', 'geoCity': 'Str', 'siteRef': 'Ref', 'site': 'Marker'}
+        self.tag_refs = {'siteRef': 'site'}
+        self.built = []
+        self.queries = 0
+        self.tags = {}
+
+    def setup(self):
+        pass
+
+    def load_valid_tags(self):
+        pass
+
+    def load_tag_refs(self):
+        pass
+
+    def query_topics_by_tags(self, ast, skip=0, count=None, order=None):
+        self.queries += 1
+        return [self.get_backend_query(ast, self._build)] + sorted(self.tags)
+
+    def _build(self, ast):
+        self.built.append(ast)
+        return base_tagging.pretty_print(ast)
+
+    def insert_topic_tags(self, tags, update_version=False):
+        self.tags.update(tags)
+
+
+@pytest.mark.tagging
+def test_normalize_query_should_keep_quoted_strings():
+    assert normalize_query("  equip   AND\n geoCity = 'a   b'  OR geoCity LIKE \"x  y\" ") == \
+        "equip AND geoCity = 'a   b' OR geoCity LIKE \"x  y\""
+
+
+@pytest.mark.tagging
+def test_parser_should_be_built_once(monkeypatch):
+    service = _TaggingService()
+    service.get_topics_by_tags(condition="equip AND boiler")
+    parser = base_tagging._query_parser
+    monkeypatch.setattr(base_tagging.yacc, "yacc", None)
+
+    with pytest.raises(ValueError):
+        base_tagging.parse_query("equip AND AND boiler", service.valid_tags, service.tag_refs)
+    with pytest.raises(ValueError):
+        base_tagging.parse_query("unknown", service.valid_tags, service.tag_refs)
+    assert base_tagging.parse_query("siteRef.geoCity = 'Richland' AND NOT boiler", service.valid_tags,
+                                    service.tag_refs) == \
+        ('AND', ('=', 'siteRef.geoCity', 'Richland'), ('NOT', '', ('=', 'boiler', True)))
+    assert base_tagging._query_parser is parser
+
+
+@pytest.mark.tagging
+def test_backend_queries_should_be_cached_by_condition():
+    service = _TaggingService(query_cache_size=2)
+
+    first = service.get_topics_by_tags(condition="equip AND boiler")
+    assert service.get_topics_by_tags(condition=" equip  AND boiler ") == first
+    assert service.get_topics_by_tags(and_condition=['equip', 'boiler']) == first
+    assert len(service.built) == 1
+    # Results are not cached by default.
+    assert service.queries == 3
+
+    service.get_topics_by_tags(condition="equip")
+    service.get_topics_by_tags(condition="boiler")
+    service.get_topics_by_tags(condition="equip AND boiler")
+    assert len(service.built) == 4
+
+
+@pytest.mark.tagging
+def test_results_should_be_cached_until_tags_are_added():
+    service = _TaggingService(result_cache_size=10)
+
+    assert service.get_topics_by_tags(condition="equip") == ["( equip = True)"]
+    assert service.get_topics_by_tags(condition="equip") == ["( equip = True)"]
+    assert service.get_topics_by_tags(condition="equip", skip=1) == ["( equip = True)"]
+    assert service.queries == 2
+
+    service.add_topic_tags("campus/building/ahu", {"equip": True})
+    assert service.get_topics_by_tags(condition="equip") == ["( equip = True)", "campus/building/ahu"]
+    assert service.queries == 3
+
+
+@pytest.mark.tagging
+def test_caches_should_tell_marker_from_number_values():
+    service = _TaggingService(result_cache_size=10)
+
+    assert service.get_topics_by_tags(condition="boiler") == ["( boiler = True)"]
+    assert service.get_topics_by_tags(condition="boiler = 1") == ["( boiler = 1)"]
+    assert service.get_topics_by_tags(condition="boiler") == ["( boiler = True)"]
+    assert len(service.built) == 2
+    assert service.queries == 2
+
+
+@pytest.mark.tagging
+def test_negative_cache_sizes_should_be_rejected():
+    with pytest.raises(ValueError):
+        _TaggingService(result_cache_size=-1)
@@ -1,6 +1,8 @@
-from volttron.platform.vip.pubsubservice import PubSubService, ProtectedPubSubTopics
+from volttron.platform import jsonapi
+from volttron.platform.vip.pubsubservice import PubSubService, ProtectedPubSubTopics, SendQueue, TopicTrie
 from mock import Mock, MagicMock
 import pytest
+import zmq
 
 
 @pytest.fixture(params=[
@@ -53,3 +55,132 @@ def test_returns_empty_list_when_subsystem_not_specified(pubsub_service):
     frames[6] = "not_pubsub"
     result = service.handle_subsystem(frames)
     assert [] == result
+
+
+def test_publish_should_serialize_message_once_for_all_subscribers(pubsub_service):
+    parameters, service = pubsub_service
+    for subscriber in ("sub1", "sub2", "sub3"):
+        service.handle_subsystem([subscriber, "", "VIP1", "", "", "pubsub", "subscribe",
+                                  dict(prefix="devices", bus="")])
+    message = dict(bus="", headers=dict(Date="2020-01-01T00:00:00"), message=[{"Point": 1.0}, {}])
+
+    service.handle_subsystem(["publisher", "", "VIP1", "publisher", "", "pubsub", "publish", "devices/all", message],
+                             "publisher")
+
+    sent = [call[0][0] for call in parameters["socket"].send_multipart.call_args_list]
+    assert sorted(frames[0].bytes for frames in sent) == [b"sub1", b"sub2", b"sub3"]
+    for frames in sent[1:]:
+        assert all(frame is first for frame, first in zip(frames[1:], sent[0][1:]))
+    assert jsonapi.loads(sent[0][8].bytes)["message"] == [{"Point": 1.0}, {}]
+
+
+def test_topic_trie_should_match_like_startswith():
+    prefixes = ["", "d", "devices", "devices/", "devices/campus", "devices/campus/b", "devices/campus/building1/",
+                "devices/campus/building1/all", "devices/campus/building10", "analysis/campus", "a/b/c/d/e"]
+    topics = ["", "devices", "devices/campus/building1/all", "devices/campus/building10/rtu/all", "devices/campus",
+              "devices//x", "analysis", "analysis/campus/building1", "a/b/c/d", "a/b/c/d/e/f", "other/topic"]
+    trie = TopicTrie()
+    for prefix in prefixes:
+        trie.add(prefix, "internal", prefix)
+
+    for topic in topics:
+        assert sorted(trie.match(topic)) == sorted(p for p in prefixes if topic.startswith(p))
+
+    for prefix in prefixes[::2]:
+        trie.remove(prefix, "internal")
+    for topic in topics:
+        assert sorted(trie.match(topic)) == sorted(p for p in prefixes[1::2] if topic.startswith(p))
+
+
+def test_publish_should_follow_subscription_changes(pubsub_service):
+    parameters, service = pubsub_service
+    if parameters["has_external_routing"]:
+        parameters["routing_service"].my_instance_name.return_value = "local"
+        parameters["routing_service"].get_connected_platforms.return_value = []
+    message = dict(bus="", headers=dict(), message=1)
+
+    def publish(topic):
+        return service._peer_publish(["publisher", "", "VIP1", "publisher", "", "pubsub", "publish", topic,
+                                      dict(message)], "publisher")
+
+    service.handle_subsystem(["sub1", "", "VIP1", "", "", "pubsub", "subscribe",
+                              dict(prefix=["devices/campus", "devices/other"], bus="")])
+    service.handle_subsystem(["sub2", "", "VIP1", "", "", "pubsub", "subscribe",
+                              dict(prefix="devices", bus="", all_platforms=True)])
+    assert publish("devices/campus/building/all") == 2
+    assert publish("devices/other/all") == 2
+    assert publish("record/campus") == 0
+
+    service.handle_subsystem(["sub1", "", "VIP1", "", "", "pubsub", "unsubscribe",
+                              dict(prefix="devices/campus", bus="")])
+    assert publish("devices/campus/building/all") == 1
+    assert publish("devices/other/all") == 2
+
+    service.peer_drop("sub2")
+    assert publish("devices/campus/building/all") == 0
+    assert publish("devices/other/all") == 1
+
+
+def test_publish_batch_should_return_count_per_item(pubsub_service):
+    parameters, service = pubsub_service
+    service.handle_subsystem(["sub1", "", "VIP1", "", "", "pubsub", "subscribe", dict(prefix="devices", bus="")])
+    service.handle_subsystem(["sub2", "", "VIP1", "", "", "pubsub", "subscribe", dict(prefix="devices/a", bus="")])
+    items = [dict(topic=topic, headers=dict(), message=index)
+             for index, topic in enumerate(["devices/a/p1", "devices/b/p1", "analysis/a"])]
+
+    response = service.handle_subsystem(["publisher", "", "VIP1", "publisher", "7", "pubsub", "publish_batch",
+                                         dict(bus="", items=items)], "publisher")
+
+    assert response[4:] == ["7", "pubsub", "request_response", [2, 1, 0]]
+    sent = [call[0][0] for call in parameters["socket"].send_multipart.call_args_list]
+    assert sorted((frames[0].bytes, frames[7].bytes) for frames in sent) == \
+        [(b"sub1", b"devices/a/p1"), (b"sub1", b"devices/b/p1"), (b"sub2", b"devices/a/p1")]
+
+
+@pytest.mark.parametrize("policy, expected, dropped, refused", [
+    ("drop-oldest", ["b", "a", "c"], 1, 0),
+    ("drop-newest", ["a", "b", "a"], 1, 0),
+    ("conflate", ["b", "a", "c"], 1, 0),
+    ("block-publisher", ["a", "b", "a"], 0, 1),
+])
+def test_send_queue_should_apply_policy_when_full(policy, expected, dropped, refused):
+    queue = SendQueue(policy, 3)
+    accepted = [queue.push(topic, [topic]) for topic in ["a", "b", "a", "c"]]
+
+    topics = []
+    while queue:
+        topics.append(queue.peek()[1][0])
+        queue.pop()
+    assert accepted == [True, True, True, policy != "block-publisher"]
+    assert topics == expected
+    assert (queue.dropped, queue.refused) == (dropped, refused)
+
+
+def test_publish_should_queue_for_slow_subscriber():
+    socket = Mock()
+    service = PubSubService(socket=socket, protected_topics=MagicMock(), routing_service=None,
+                            send_queue_size=2, send_queue_policy="drop-oldest")
+    service.handle_subsystem(["sub1", "", "VIP1", "", "", "pubsub", "subscribe", dict(prefix="devices", bus="")])
+    delivered = []
+    socket.send_multipart.side_effect = lambda frames, **kwargs: delivered.append(frames[7].bytes)
+
+    def publish(topic):
+        service._peer_publish(["publisher", "", "VIP1", "publisher", "", "pubsub", "publish", topic,
+                               dict(bus="", headers=dict(), message=1)], "publisher")
+
+    publish("devices/1")
+    socket.send_multipart.side_effect = zmq.ZMQError(zmq.EAGAIN)
+    for index in range(2, 5):
+        publish("devices/{}".format(index))
+    service.flush_send_queues()
+
+    assert service.has_pending_sends()
+    assert service._peer_send_queue_stats([]) == \
+        {"sub1": dict(policy="drop-oldest", size=2, depth=2, dropped=1, refused=0)}
+
+    socket.send_multipart.side_effect = lambda frames, **kwargs: delivered.append(frames[7].bytes)
+    service.flush_send_queues()
+    publish("devices/5")
+
+    assert not service.has_pending_sends()
+    assert delivered == [b"devices/1", b"devices/3", b"devices/4", b"devices/5"]
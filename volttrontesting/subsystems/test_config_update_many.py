@@ -0,0 +1,48 @@
+import pytest
+from mock import MagicMock
+
+from volttron.platform.vip.agent.subsystems.configstore import ConfigStore
+
+
+@pytest.fixture
+def config_store():
+    core = MagicMock()
+    rpc = MagicMock()
+    store = ConfigStore(None, core, rpc)
+    store._initial_update({"config": {"a": 1}, "devices/old": {"b": 2}})
+    store._initial_callbacks_called = True
+    # The subsystem only holds weak references to core and rpc.
+    store.test_refs = (core, rpc)
+    return store
+
+
+@pytest.mark.config_store
+def test_update_many_should_apply_all_changes(config_store):
+    calls = []
+    config_store.subscribe(lambda name, action, contents: calls.append((name, action, contents)))
+
+    config_store._update_configs([("NEW", "devices/New", {"c": 3}),
+                                  ("UPDATE", "config", {"a": 4}),
+                                  ("DELETE", "devices/old", None)],
+                                 trigger_callback=True)
+
+    assert calls == [("config", "UPDATE", {"a": 4}),
+                     ("devices/New", "NEW", {"c": 3}),
+                     ("devices/old", "DELETE", None)]
+    assert config_store.list() == ["config", "devices/New"]
+
+
+@pytest.mark.config_store
+def test_update_many_should_update_referencing_configs_once(config_store):
+    calls = []
+    config_store.subscribe(lambda name, action, contents: calls.append((name, action, contents)))
+    config_store._update_configs([("NEW", "registry", [{"point": "x"}]),
+                                  ("NEW", "devices/new", {"registry_config": "config://registry"})])
+    calls.clear()
+
+    config_store._update_configs([("UPDATE", "registry", [{"point": "y"}]),
+                                  ("UPDATE", "devices/new", {"registry_config": "config://registry", "d": 1})],
+                                 trigger_callback=True)
+
+    assert calls == [("registry", "UPDATE", [{"point": "y"}]),
+                     ("devices/new", "UPDATE", {"registry_config": [{"point": "y"}], "d": 1})]
@@ -1,5 +1,6 @@
 import gevent
 import pytest
+from gevent.event import AsyncResult
 from mock import MagicMock
 from volttron.platform.messaging import topics
 from volttron.platform.messaging.headers import DATE
@@ -8,6 +9,7 @@ from volttrontesting.utils.utils import (poll_gevent_sleep,
                                          messages_contains_prefix)
 
 from volttron.platform.vip.agent import PubSub
+from volttron.platform.vip.socket import Message
 
 from volttron.platform.vip.agent import Agent
 
@@ -119,3 +121,82 @@ def test_multi_unsubscribe(volttron_instance):
     gevent.sleep(1)
 
     assert subscriber_agent.subscription_callback.call_count == 0
+
+
+def _publish_message(topic):
+    return Message(id="", args=["publish", topic, dict(headers={}, message=None, sender="publisher", bus="")])
+
+
+@pytest.mark.pubsub
+@pytest.mark.parametrize("dispatch, max_in_flight", [("spawn", 10), ("ordered", 1), ("pool", 3)])
+def test_dispatch_modes_should_bound_in_flight_callbacks(dispatch, max_in_flight):
+    pubsub = PubSub(MagicMock(), MagicMock(), MagicMock(), object(), dispatch=dispatch, pool_size=3)
+    received = []
+
+    def callback(peer, sender, bus, topic, headers, message):
+        gevent.sleep(0.01)
+        received.append(topic)
+
+    pubsub._add_subscription("devices", callback)
+    loop = gevent.spawn(pubsub._process_loop)
+    for index in range(10):
+        pubsub._handle_subsystem(_publish_message("devices/{}".format(index)))
+    poll_gevent_sleep(5, lambda: len(received) == 10)
+    loop.kill()
+
+    metrics = pubsub.get_dispatch_metrics()
+    assert metrics["dispatched"] == 10
+    assert metrics["max_in_flight"] == max_in_flight
+    assert metrics["in_flight"] == metrics["queue_depth"] == 0
+    if dispatch == "ordered":
+        assert received == ["devices/{}".format(index) for index in range(10)]
+
+
+@pytest.mark.pubsub
+def test_responses_should_not_wait_for_queued_messages():
+    pubsub = PubSub(MagicMock(), MagicMock(), MagicMock(), object(), dispatch="ordered")
+    result = next(pubsub._results)
+    pubsub._handle_subsystem(_publish_message("devices/all"))
+
+    pubsub._handle_subsystem(Message(id=result.ident, args=["request_response", [1, 2]]))
+
+    assert result.get(timeout=0) == [1, 2]
+    assert pubsub.get_dispatch_metrics()["queue_depth"] == 1
+
+
+@pytest.mark.pubsub
+def test_full_queue_should_not_block_rpc_replies_to_ordered_callbacks():
+    pubsub = PubSub(MagicMock(), MagicMock(), MagicMock(), object(), dispatch="ordered", queue_size=2)
+    rpc_reply = AsyncResult()
+    received = []
+
+    def callback(peer, sender, bus, topic, headers, message):
+        # Stands in for self.vip.rpc.call(...).get() in a callback.
+        rpc_reply.get(timeout=5)
+        received.append(topic)
+
+    def receive_loop():
+        for index in range(10):
+            pubsub._handle_subsystem(_publish_message("devices/{}".format(index)))
+        # The reply arrives on the receive loop after the publishes.
+        rpc_reply.set("reply")
+
+    pubsub._add_subscription("devices", callback)
+    loop = gevent.spawn(pubsub._process_loop)
+    receiver = gevent.spawn(receive_loop)
+    receiver.join(timeout=1)
+    assert receiver.successful()
+    poll_gevent_sleep(5, lambda: pubsub.get_dispatch_metrics()["queue_depth"] == 0 and
+                      pubsub.get_dispatch_metrics()["in_flight"] == 0)
+    loop.kill()
+
+    metrics = pubsub.get_dispatch_metrics()
+    assert metrics["dropped"] > 0
+    assert metrics["dropped"] + len(received) == 10
+    assert received[-2:] == ["devices/8", "devices/9"]
+
+
+@pytest.mark.pubsub
+def test_invalid_dispatch_mode_should_raise():
+    with pytest.raises(ValueError):
+        PubSub(MagicMock(), MagicMock(), MagicMock(), object(), dispatch="threads")
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+from mock import MagicMock
+
+from volttron.platform.jsonrpc import Error
+from volttron.platform.vip.agent.subsystems.rpc import RPC
+
+
+@pytest.fixture
+def rpc():
+    core = MagicMock()
+    core.messagebus = "zmq"
+    # Exported methods are looked up on the owner, so it cannot be a mock.
+    owner = SimpleNamespace(vip=SimpleNamespace(auth=MagicMock()))
+    owner.vip.auth.get_capabilities.return_value = {}
+    subsystem = RPC(core, owner, MagicMock())
+    subsystem.context = MagicMock()
+    subsystem.context.vip_message.user = "caller"
+    # The subsystem only holds a weak reference to core.
+    subsystem.test_refs = core
+    return subsystem
+
+
+def set_point(topic, value=None):
+    return topic, value
+
+
+@pytest.mark.rpc
+def test_auth_check_should_cache_checks_per_user(rpc):
+    capabilities = rpc._owner.vip.auth.get_capabilities
+    capabilities.return_value = {"edit": {"topic": "/campus/.*/point/"}}
+    checked = rpc._add_auth_check(set_point, {"edit"})
+
+    assert checked("campus/a/point", 1) == ("campus/a/point", 1)
+    assert checked(topic="campus/b/point") == ("campus/b/point", None)
+    with pytest.raises(Error) as excinfo:
+        checked("building/a/point")
+    assert "matching pattern" in str(excinfo.value)
+    assert capabilities.call_count == 1
+
+    rpc.context.vip_message.user = "other"
+    capabilities.return_value = {}
+    with pytest.raises(Error) as excinfo:
+        checked("campus/a/point")
+    assert "requires capabilities" in str(excinfo.value)
+    assert capabilities.call_count == 2
+
+
+@pytest.mark.rpc
+def test_auth_check_should_follow_capability_updates(rpc):
+    capabilities = rpc._owner.vip.auth.get_capabilities
+    capabilities.return_value = {"edit": {"value": 1}}
+    checked = rpc._add_auth_check(set_point, {"edit"})
+
+    assert checked("topic", 1) == ("topic", 1)
+    with pytest.raises(Error):
+        checked("topic", 2)
+
+    capabilities.return_value = {"edit": None}
+    rpc.clear_capability_checks()
+    assert checked("topic", 2) == ("topic", 2)
+
+
+@pytest.mark.rpc
+def test_auth_check_should_reject_unknown_parameters(rpc):
+    rpc._owner.vip.auth.get_capabilities.return_value = {"edit": {"device": "a"}}
+    checked = rpc._add_auth_check(set_point, {"edit"})
+
+    with pytest.raises(Error) as excinfo:
+        checked("topic")
+    assert "does not have a parameter device" in str(excinfo.value)
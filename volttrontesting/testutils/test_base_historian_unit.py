@@ -87,17 +87,44 @@ def test_base_historian_agent_should_filter_duplicates(base_historian_agent):
     assert base_historian_agent.last_to_publish_list == expected_to_publish_list
 
 
+def test_base_historian_agent_pipelined_publish_should_publish_each_record_once(base_historian_agent):
+    base_historian_agent._pipelined_publish = True
+    # Small batches so the read ahead and deferred removal span several batches.
+    base_historian_agent._submit_size_limit = 3
+    for num in range(10):
+        base_historian_agent._capture_record_data(
+            peer=None,
+            sender=None,
+            bus=None,
+            topic=f"pipelined_topic{num}",
+            headers={
+                "Date": f"2020-11-17 21:{num:02}:10.189393+00:00",
+                "TimeStamp": f"2020-11-17 21:{num:02}:10.189393+00:00",
+            },
+            message=f"pipelined_record_{num}",
+        )
+
+    base_historian_agent.start_process_thread()
+    import gevent
+    gevent.sleep(0.5)
+
+    assert [record["value"] for record in base_historian_agent.published] == \
+        [f"pipelined_record_{num}" for num in range(10)]
+
+
 BaseHistorianAgent.__bases__ = (AgentMock.imitate(Agent, Agent()),)
 
 
 class BaseHistorianAgentTestWrapper(BaseHistorianAgent):
     def __init__(self, **kwargs):
         self.last_to_publish_list = ""
+        self.published = []
         super(BaseHistorianAgentTestWrapper, self).__init__(**kwargs)
 
     def publish_to_historian(self, to_publish_list):
         self.report_all_handled()
         self.last_to_publish_list = to_publish_list
+        self.published.extend(to_publish_list)
 
 
 @pytest.fixture()
@@ -117,7 +144,8 @@ def base_historian_agent():
     # also, delete the historian database for this test, which is an sqlite db in folder /data
     if os.path.exists("./data"):
         rmtree("./data")
-    if os.path.exists(CACHE_NAME):
-        os.remove(CACHE_NAME)
+    for path in (CACHE_NAME, CACHE_NAME + "-wal", CACHE_NAME + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
     if os.path.exists(agent_data_dir):
         os.rmdir(agent_data_dir)
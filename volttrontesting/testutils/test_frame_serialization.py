@@ -1,5 +1,6 @@
 from zmq.sugar.frame import Frame
-from volttron.utils.frame_serialization import deserialize_frames, serialize_frames
+from volttron.utils.frame_serialization import deserialize_envelope, deserialize_frames, deserialize_payload, \
+    serialize_frames
 
 
 def test_can_deserialize_homogeneous_string():
@@ -32,3 +33,14 @@ def test_mixed_array():
 
     for r in range(len(original)):
         assert original[r] == after_deserialize[r], f"Element {r} is not the same."
+
+
+def test_deserialize_envelope_should_leave_payload():
+    frames = [Frame(x.encode('utf-8')) for x in ["sender", "", "VIP1", "", "12.5", "RPC", '{"id": 1}']]
+
+    decoded = deserialize_envelope(frames)
+
+    assert decoded[:6] == ["sender", "", "VIP1", "", "12.5", "RPC"]
+    assert decoded[6] is frames[6]
+    assert deserialize_payload(decoded) == ["sender", "", "VIP1", "", "12.5", "RPC", {"id": 1}]
+    assert serialize_frames(decoded)[6] is frames[6]
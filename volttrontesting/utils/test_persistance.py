@@ -0,0 +1,205 @@
+import json
+import os
+from threading import Thread
+
+import pytest
+from mock import patch
+
+from volttron.utils.persistance import JournaledPersistentDict, PersistentDict, _SEQUENCE_KEY
+
+
+@pytest.fixture
+def writes():
+    """Collects the writes queued for the writer thread so tests can run them in order."""
+    queued = []
+    with patch.object(PersistentDict, "_process_thread", object()), \
+            patch.object(PersistentDict, "_event_queue") as queue:
+        queue.put.side_effect = queued.append
+        yield queued
+
+
+def run_writes(writes):
+    while writes:
+        writes.pop(0)()
+
+
+def read_file(filename):
+    with open(filename) as fileobj:
+        contents = json.load(fileobj)
+    contents.pop(_SEQUENCE_KEY)
+    return contents
+
+
+@pytest.mark.config_store
+def test_journal_should_hold_changes_after_first_snapshot(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename)
+    store["a"] = {"data": 1}
+    store.async_sync()
+    run_writes(writes)
+
+    assert read_file(filename) == {"a": {"data": 1}}
+    assert not os.path.exists(store.journal_filename)
+
+    store["b"] = {"data": 2}
+    store["a"] = {"data": 3}
+    store.async_sync()
+    store.pop("b")
+    store.async_sync()
+    run_writes(writes)
+
+    assert read_file(filename) == {"a": {"data": 1}}
+    with open(store.journal_filename) as journal:
+        assert len(journal.readlines()) == 3
+    assert JournaledPersistentDict(filename) == {"a": {"data": 3}}
+
+
+@pytest.mark.config_store
+def test_async_sync_should_coalesce_writes(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename)
+    store["a"] = 1
+    store.async_sync()
+    run_writes(writes)
+
+    for value in range(5):
+        store[str(value)] = value
+        store.async_sync()
+
+    assert len(writes) == 1
+    run_writes(writes)
+    assert JournaledPersistentDict(filename) == {"a": 1, "0": 0, "1": 1, "2": 2, "3": 3, "4": 4}
+
+
+@pytest.mark.config_store
+def test_journal_should_be_compacted(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename, compact_threshold=3)
+    store["a"] = 1
+    store.async_sync()
+    for value in range(4):
+        store["b"] = value
+        store.async_sync()
+    run_writes(writes)
+
+    assert read_file(filename) == {"a": 1, "b": 3}
+    assert not os.path.exists(store.journal_filename)
+
+
+@pytest.mark.config_store
+def test_cleared_store_should_remove_files(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename)
+    store["a"] = 1
+    store.async_sync()
+    store["b"] = 2
+    store.async_sync()
+    run_writes(writes)
+    store["c"] = 3
+    store.async_sync()
+    run_writes(writes)
+    assert os.path.exists(store.journal_filename)
+
+    store.clear()
+    store.async_sync()
+    run_writes(writes)
+
+    assert not os.path.exists(filename)
+    assert not os.path.exists(store.journal_filename)
+
+
+@pytest.mark.config_store
+def test_sync_should_write_snapshot(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename)
+    store["a"] = 1
+    store.async_sync()
+    store["b"] = 2
+    store.sync()
+    run_writes(writes)
+
+    assert read_file(filename) == {"a": 1, "b": 2}
+    assert not os.path.exists(store.journal_filename)
+
+
+@pytest.mark.config_store
+def test_incomplete_journal_entry_should_be_ignored(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename)
+    store["a"] = 1
+    store.async_sync()
+    run_writes(writes)
+    store["b"] = 2
+    store.async_sync()
+    run_writes(writes)
+    with open(store.journal_filename, "a") as journal:
+        journal.write('{"k":"c","v":')
+
+    assert JournaledPersistentDict(filename) == {"a": 1, "b": 2}
+
+
+@pytest.mark.config_store
+def test_journal_left_by_interrupted_compaction_should_be_skipped(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename, compact_threshold=2)
+    store["k"] = "v0"
+    store.async_sync()
+    run_writes(writes)
+    store["k"] = "v1"
+    store.async_sync()
+    store["k"] = "v2"
+    store.async_sync()
+    run_writes(writes)
+    assert os.path.exists(store.journal_filename)
+
+    store["k"] = "v3"
+    store.async_sync()
+    # The process dies after the snapshot is in place but before the journal is removed.
+    with patch("volttron.utils.persistance.os.remove"):
+        run_writes(writes)
+
+    assert read_file(filename) == {"k": "v3"}
+    assert os.path.exists(store.journal_filename)
+    assert JournaledPersistentDict(filename) == {"k": "v3"}
+
+
+@pytest.mark.config_store
+def test_sync_should_wait_for_journal_items_taken_before_it(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    store = JournaledPersistentDict(filename)
+    store["k"] = "v1"
+    store.async_sync()
+    run_writes(writes)
+    store["k"] = "v2"
+    store.async_sync()
+
+    write = store._write
+    syncs = []
+
+    def sync_while_writing(item):
+        # The caller syncs while the writer thread holds a journal item.
+        if item[0] == "journal":
+            store["k"] = "v3"
+            syncs.append(Thread(target=store.sync))
+            syncs[0].start()
+            syncs[0].join(0.1)
+        write(item)
+
+    with patch.object(store, "_write", side_effect=sync_while_writing):
+        run_writes(writes)
+        syncs[0].join()
+
+    assert read_file(filename) == {"k": "v3"}
+    assert not os.path.exists(store.journal_filename)
+    assert JournaledPersistentDict(filename) == {"k": "v3"}
+
+
+@pytest.mark.config_store
+def test_journal_without_sequence_numbers_should_be_replayed(tmpdir, writes):
+    filename = str(tmpdir.join("agent.store"))
+    with open(filename, "w") as fileobj:
+        json.dump({"a": 1}, fileobj)
+    with open(filename + ".journal", "w") as journal:
+        journal.write('{"k":"a","v":2}\n{"k":"b","v":3}\n')
+
+    assert JournaledPersistentDict(filename) == {"a": 2, "b": 3}